@@ -5,6 +5,7 @@ import os
 import pulumi
 import pulumi_aws as aws
 from components.iam import (
+    create_lambda_invoke_policy,
     create_lambda_logging_policy,
     create_lambda_role,
     create_lambda_s3_policies,
@@ -50,6 +51,11 @@ lambda_logging_policy = create_lambda_logging_policy(
     account_id=account_id,
 )
 
+lambda_invoke_policy = create_lambda_invoke_policy(
+    lambda_role_name=lambda_role["lambda_role"].name,
+    lambda_function_arn=lambda_function["lambda_function"].arn,
+)
+
 
 pulumi.export("bucket_name", s3_resources["test_data_bucket"].id)
 pulumi.export("bucket_arn", s3_resources["test_data_bucket"].arn)
@@ -114,6 +114,7 @@ def create_lambda_s3_policies(
                     "s3:PutObject",
                     "s3:ListBucket",
                     "s3:DeleteObject",
+                    "s3:AbortMultipartUpload",
                 ],
                 "resources": [bucket_arn],
             }
@@ -137,3 +138,36 @@ def create_lambda_s3_policies(
         "lambda_s3_policy": lambda_s3_policy,
         "lambda_s3_policy_attachment": lambda_s3_policy_attachment,
     }
+
+
+def create_lambda_invoke_policy(lambda_role_name, lambda_function_arn):
+    """
+    Create a policy letting the Lambda function invoke itself, to run fan-out workers
+
+    :param lambda_role_name: Lambda role name (Output)
+    :param lambda_function_arn: Lambda function ARN (Output)
+    :return: Lambda invoke policy attachment
+    """
+    lambda_invoke_policy_doc = aws.iam.get_policy_document_output(
+        version="2012-10-17",
+        statements=[
+            {
+                "effect": "Allow",
+                "actions": ["lambda:InvokeFunction"],
+                "resources": [lambda_function_arn],
+            }
+        ],
+    )
+
+    lambda_invoke_policy = aws.iam.Policy(
+        "lambda-invoke-policy",
+        policy=lambda_invoke_policy_doc.json,
+    )
+
+    lambda_invoke_policy_attachment = aws.iam.RolePolicyAttachment(
+        "lambda-invoke-policy-attachment",
+        role=lambda_role_name,
+        policy_arn=lambda_invoke_policy.arn,
+    )
+
+    return {"lambda_invoke_policy_attachment": lambda_invoke_policy_attachment}
@@ -56,6 +56,7 @@ def create_lambda_function(
         code=lambda_function_archive,
         timeout=200,
         layers=[lambda_deps_layer.arn, lambda_gdpr_obfuscator_layer.arn],
+        environment={"variables": {"GDPR_OBFUSCATOR_WARM_UP": "true"}},
         logging_config={
             "log_format": "JSON",
             "application_log_level": "INFO",
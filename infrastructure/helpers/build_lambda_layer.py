@@ -22,6 +22,10 @@ def generate_lambda_dependency_requirements(
             "s3transfer",
             "six",
             "urllib3",
+            # Type stubs, only imported by type checkers
+            "types-boto3",
+            "types-awscrt",
+            "types-s3transfer",
         ]
 
         result = subprocess.run(
@@ -3,6 +3,98 @@
 __version__ = "0.1.0"
 __author__ = "GDPR Obfuscator Team"
 
-from .core.gdpr_obfuscator import gdpr_obfuscator
+import importlib
+from typing import TYPE_CHECKING, Any, List
 
-__all__ = ["gdpr_obfuscator"]
+if TYPE_CHECKING:
+    from .core.batch import ObfuscationResult, gdpr_obfuscator_batch
+    from .core.fan_out import (
+        FanOutTask,
+        gdpr_obfuscator_fan_out,
+        gdpr_obfuscator_fan_out_worker,
+    )
+    from .core.gdpr_obfuscator import (
+        gdpr_deobfuscator,
+        gdpr_obfuscate_to_s3,
+        gdpr_obfuscator,
+        get_s3_client,
+    )
+    from .core.gdpr_obfuscator_async import (
+        gdpr_obfuscator_async,
+        gdpr_obfuscator_batch_async,
+    )
+    from .core.masking import (
+        ConstantMask,
+        DeterministicEncryption,
+        KeyedHash,
+        MaskingStrategy,
+        PartialMask,
+        RegexMask,
+        Tokenize,
+    )
+    from .core.token_vault import SQLiteTokenVault, TokenVault
+    from .core.warm_up import warm_up
+
+_LAZY_ATTRIBUTES = {
+    "gdpr_obfuscator": ".core.gdpr_obfuscator",
+    "gdpr_obfuscate_to_s3": ".core.gdpr_obfuscator",
+    "gdpr_deobfuscator": ".core.gdpr_obfuscator",
+    "gdpr_obfuscator_batch": ".core.batch",
+    "gdpr_obfuscator_async": ".core.gdpr_obfuscator_async",
+    "gdpr_obfuscator_batch_async": ".core.gdpr_obfuscator_async",
+    "gdpr_obfuscator_fan_out": ".core.fan_out",
+    "gdpr_obfuscator_fan_out_worker": ".core.fan_out",
+    "get_s3_client": ".core.gdpr_obfuscator",
+    "warm_up": ".core.warm_up",
+    "ObfuscationResult": ".core.batch",
+    "FanOutTask": ".core.fan_out",
+    "MaskingStrategy": ".core.masking",
+    "ConstantMask": ".core.masking",
+    "KeyedHash": ".core.masking",
+    "DeterministicEncryption": ".core.masking",
+    "PartialMask": ".core.masking",
+    "RegexMask": ".core.masking",
+    "Tokenize": ".core.masking",
+    "TokenVault": ".core.token_vault",
+    "SQLiteTokenVault": ".core.token_vault",
+}
+"""The module every public name is imported from on first access, so `import gdpr_obfuscator` doesn't load Polars or boto3 until they are needed"""
+
+__all__ = [
+    "gdpr_obfuscator",
+    "gdpr_obfuscate_to_s3",
+    "gdpr_deobfuscator",
+    "gdpr_obfuscator_batch",
+    "gdpr_obfuscator_async",
+    "gdpr_obfuscator_batch_async",
+    "gdpr_obfuscator_fan_out",
+    "gdpr_obfuscator_fan_out_worker",
+    "get_s3_client",
+    "warm_up",
+    "ObfuscationResult",
+    "FanOutTask",
+    "MaskingStrategy",
+    "ConstantMask",
+    "KeyedHash",
+    "DeterministicEncryption",
+    "PartialMask",
+    "RegexMask",
+    "Tokenize",
+    "TokenVault",
+    "SQLiteTokenVault",
+]
+
+
+def __getattr__(name: str) -> Any:
+    if name not in _LAZY_ATTRIBUTES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    value = getattr(importlib.import_module(_LAZY_ATTRIBUTES[name], __name__), name)
+    # Cached in the package namespace, so later accesses don't go through __getattr__
+    globals()[name] = value
+
+    return value
+
+
+def __dir__() -> List[str]:
+    return sorted(list(globals()) + __all__)
@@ -0,0 +1,1035 @@
+"""Avro object container files read and written one block at a time, with a pure Python binary codec."""
+
+import bz2
+import copy
+import json
+import lzma
+import struct
+import zlib
+from dataclasses import dataclass
+from typing import IO, Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import polars as pl
+
+from .field_paths import LIST_ELEMENTS, FieldTree, NestedFieldsMask
+from .masking import MaskingStrategy
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+try:
+    import snappy
+except ImportError:  # pragma: no cover
+    snappy = None
+
+AVRO_MAGIC = b"Obj\x01"
+"""Magic bytes found at the start of every Avro object container file"""
+
+AVRO_SYNC_SIZE = 16
+"""Size of the sync marker written after the header and after every block"""
+
+AVRO_CODECS = ("null", "deflate", "bzip2", "xz", "zstandard", "snappy")
+"""The supported block codecs"""
+
+DEFLATE_COMPRESSION_LEVEL = 6
+"""zlib's default level, used to recompress deflate blocks"""
+
+_PRIMITIVES = {"null", "boolean", "int", "long", "float", "double", "bytes", "string"}
+
+_NAMED_TYPES = {"record", "error", "enum", "fixed"}
+
+_MASKED_TYPE = "string"
+"""Type of masked fields, as every masking strategy replaces values with strings"""
+
+AvroSchema = Any
+"""A parsed Avro schema: a type name, a list of union branches or a complex type definition"""
+
+Reader = Callable[[bytes, int], Tuple[Any, int]]
+Skipper = Callable[[bytes, int], int]
+Writer = Callable[[Any, bytearray], None]
+
+
+@dataclass
+class AvroHeader:
+    """The header of an Avro object container file
+
+    Attributes:
+        schema (AvroSchema): the schema of the records of the file
+        codec (str): the codec every block is compressed with
+        metadata (Dict[str, bytes]): every metadata entry, including `avro.schema` and `avro.codec`
+        sync (bytes): the sync marker written after every block
+    """
+
+    schema: AvroSchema
+    codec: str
+    metadata: Dict[str, bytes]
+    sync: bytes
+
+
+class AvroRecords:
+    """Decodes and re-encodes the PII fields of the records of a block, copying the bytes of every other field
+
+    Records are walked field by field: non-PII fields are skipped and their bytes are kept as
+    they are, fields in `decoded_fields` are decoded into Python values, and the bytes of fields
+    in `replaced_fields` are dropped without being decoded, as their masked values don't depend
+    on them. Masked values are encoded with the types of `output_schema`.
+
+    Args:
+        schema (AvroSchema): the schema of the records, a record type
+        output_schema (AvroSchema): the schema of the obfuscated records, see `masked_avro_schema`
+        decoded_fields (Iterable[str]): the top level PII fields whose values are needed to mask them
+        replaced_fields (Iterable[str]): the top level PII fields whose masked values don't depend on them
+
+    Raises:
+        ValueError: if the schema isn't a record type
+    """
+
+    def __init__(
+        self,
+        schema: AvroSchema,
+        output_schema: AvroSchema,
+        decoded_fields: Iterable[str],
+        replaced_fields: Iterable[str],
+    ) -> None:
+        decoded_fields, replaced_fields = set(decoded_fields), set(replaced_fields)
+        record, namespace, names = _top_level_record(schema)
+        output_record, output_namespace, output_names = _top_level_record(output_schema)
+
+        self.fields: List[Tuple[str, Skipper, Optional[Reader], bool]] = []
+        self.writers: List[Tuple[str, Writer]] = []
+        for field, output_field in zip(record["fields"], output_record["fields"]):
+            name = field["name"]
+            is_pii = name in decoded_fields or name in replaced_fields
+            reader = None
+            if name in decoded_fields:
+                reader = _compile_reader(field["type"], namespace, names, {})
+
+            self.fields.append(
+                (
+                    name,
+                    _compile_skipper(field["type"], namespace, names, {}),
+                    reader,
+                    is_pii,
+                )
+            )
+            if is_pii:
+                self.writers.append(
+                    (
+                        name,
+                        _compile_writer(
+                            output_field["type"], output_namespace, output_names, {}
+                        ),
+                    )
+                )
+
+    def decode_block(
+        self, data: bytes, count: int
+    ) -> Tuple[Dict[str, List[Any]], List[List[bytes]]]:
+        """Decodes the PII fields of the records of a block
+
+        Args:
+            data (bytes): the decompressed records of the block
+            count (int): the number of records in the block
+
+        Raises:
+            ValueError: if the records don't match the schema
+
+        Returns:
+            Tuple[Dict[str, List[Any]], List[List[bytes]]]: the values of every decoded field, and for every record the bytes before, between and after its PII fields
+        """
+        values: Dict[str, List[Any]] = {
+            name: [] for name, _, reader, _ in self.fields if reader
+        }
+        gaps = []
+        position = 0
+
+        try:
+            for _ in range(count):
+                start = position
+                record_gaps = []
+                for name, skip, reader, is_pii in self.fields:
+                    if not is_pii:
+                        position = skip(data, position)
+                        continue
+
+                    record_gaps.append(data[start:position])
+                    if reader is None:
+                        position = skip(data, position)
+                    else:
+                        value, position = reader(data, position)
+                        values[name].append(value)
+                    start = position
+
+                record_gaps.append(data[start:position])
+                gaps.append(record_gaps)
+        except (IndexError, KeyError, UnicodeDecodeError, struct.error):
+            raise ValueError("Invalid Avro file: a block doesn't match the schema")
+
+        if position != len(data):
+            raise ValueError("Invalid Avro file: a block doesn't match the schema")
+
+        return values, gaps
+
+    def encode_block(
+        self, values: Dict[str, List[Any]], gaps: List[List[bytes]]
+    ) -> bytes:
+        """Encodes the records of a block from the values of their PII fields and the bytes between them
+
+        Args:
+            values (Dict[str, List[Any]]): the masked values of every PII field
+            gaps (List[List[bytes]]): for every record, the bytes before, between and after its PII fields
+
+        Raises:
+            ValueError: if a masked value doesn't match the output schema
+
+        Returns:
+            bytes: the uncompressed records of the block
+        """
+        try:
+            encoded_columns = [
+                _encode_values(writer, values[name]) for name, writer in self.writers
+            ]
+        except (AttributeError, KeyError, TypeError, struct.error) as err:
+            raise ValueError(
+                f"Masked values don't match the Avro schema of the file: {err}"
+            )
+
+        pieces = []
+        for record_gaps, encoded_values in zip(gaps, zip(*encoded_columns)):
+            pieces.append(record_gaps[0])
+            for encoded, gap in zip(encoded_values, record_gaps[1:]):
+                pieces.append(encoded)
+                pieces.append(gap)
+
+        return b"".join(pieces)
+
+
+def read_avro_header(file: IO[bytes]) -> AvroHeader:
+    """Reads the header of an Avro object container file
+
+    Args:
+        file (IO[bytes]): the binary file object to read, positioned at its start
+
+    Raises:
+        ValueError: if the file isn't an Avro object container file or its codec isn't supported
+
+    Returns:
+        AvroHeader: the header, with the file positioned at the first block
+    """
+    if file.read(len(AVRO_MAGIC)) != AVRO_MAGIC:
+        raise ValueError("Invalid Avro file: the file doesn't start with Obj\\x01")
+
+    metadata = {}
+    while True:
+        count = _read_file_long(file)
+        if count == 0:
+            break
+        if count < 0:
+            count = -count
+            _read_file_long(file)
+        for _ in range(count):
+            key = _read_file_bytes(file).decode()
+            metadata[key] = _read_file_bytes(file)
+
+    sync = _read_file_exactly(file, AVRO_SYNC_SIZE)
+
+    if "avro.schema" not in metadata:
+        raise ValueError("Invalid Avro file: the header has no schema")
+
+    codec = metadata.get("avro.codec", b"null").decode()
+    _check_codec(codec)
+
+    return AvroHeader(
+        schema=json.loads(metadata["avro.schema"]),
+        codec=codec,
+        metadata=metadata,
+        sync=sync,
+    )
+
+
+def write_avro_header(output: IO[bytes], header: AvroHeader) -> None:
+    """Writes the header of an Avro object container file
+
+    Args:
+        output (IO[bytes]): the binary file object to write to
+        header (AvroHeader): the header to write
+    """
+    data = bytearray(AVRO_MAGIC)
+    _write_long(len(header.metadata), data)
+    for key, value in header.metadata.items():
+        _write_bytes(key.encode(), data)
+        _write_bytes(value, data)
+    _write_long(0, data)
+    data += header.sync
+
+    output.write(data)
+
+
+def iter_avro_blocks(
+    file: IO[bytes], header: AvroHeader
+) -> Iterator[Tuple[int, bytes]]:
+    """Yields the blocks of an Avro object container file one at a time
+
+    Args:
+        file (IO[bytes]): the binary file object to read, positioned after the header
+        header (AvroHeader): the header of the file
+
+    Raises:
+        ValueError: if a block is truncated, isn't followed by the sync marker or can't be decompressed
+
+    Yields:
+        Tuple[int, bytes]: the number of records of every block and its decompressed records
+    """
+    while True:
+        head = file.read(1)
+        if not head:
+            return
+
+        count = _read_file_long(file, head)
+        size = _read_file_long(file)
+        data = _read_file_exactly(file, size)
+        if _read_file_exactly(file, AVRO_SYNC_SIZE) != header.sync:
+            raise ValueError(
+                "Invalid Avro file: a block isn't followed by the sync marker"
+            )
+
+        yield count, _decompress_block(data, header.codec)
+
+
+def write_avro_block(
+    output: IO[bytes], header: AvroHeader, count: int, data: bytes
+) -> None:
+    """Compresses the records of a block with the codec of the file and writes the block
+
+    Args:
+        output (IO[bytes]): the binary file object to write to
+        header (AvroHeader): the header of the file
+        count (int): the number of records in the block
+        data (bytes): the uncompressed records of the block
+    """
+    data = _compress_block(data, header.codec)
+    block_head = bytearray()
+    _write_long(count, block_head)
+    _write_long(len(data), block_head)
+
+    output.write(block_head)
+    output.write(data)
+    output.write(header.sync)
+
+
+def avro_polars_schema(
+    schema: AvroSchema, strict_fields: Iterable[str] = ()
+) -> Dict[str, pl.DataType]:
+    """Returns the Polars type of every top level field of an Avro record schema
+
+    Records become structs, arrays lists, maps lists of {key, value} structs, enums strings and
+    fixed binaries. Unions of null and one other type become that type. Fields whose type
+    has no Polars equivalent, such as unions of several non-null types, are typed as
+    `pl.Object`, unless they are in `strict_fields`.
+
+    Args:
+        schema (AvroSchema): the schema of the records, a record type
+        strict_fields (Iterable[str]): the fields whose type must have a Polars equivalent
+
+    Raises:
+        ValueError: if the schema isn't a record type, or a strict field has no Polars equivalent
+
+    Returns:
+        Dict[str, pl.DataType]: the Polars type of every field, in order
+    """
+    record, namespace, names = _top_level_record(schema)
+    strict_fields = set(strict_fields)
+
+    dtypes = {}
+    for field in record["fields"]:
+        try:
+            dtypes[field["name"]] = _polars_dtype(
+                field["type"], namespace, names, set()
+            )
+        except ValueError as err:
+            if field["name"] in strict_fields:
+                raise ValueError(
+                    f"PII field {field['name']} can't be masked: {err}"
+                ) from None
+            dtypes[field["name"]] = pl.Object()
+
+    return dtypes
+
+
+def masked_avro_schema(
+    schema: AvroSchema, masking: Dict[str, MaskingStrategy]
+) -> AvroSchema:
+    """Returns the schema of the obfuscated records, where masked fields that aren't strings become strings
+
+    Masked values are always strings, so every other masked type, such as a long or an enum,
+    is replaced with a string, nullable if the original type was. The rest of the schema is
+    left unchanged.
+
+    Args:
+        schema (AvroSchema): the schema of the records, a record type
+        masking (Dict[str, MaskingStrategy]): the masking strategy of every PII column, as returned by `resolve_field_paths`
+
+    Raises:
+        ValueError: if a whole map entry is masked, rather than its key or value
+
+    Returns:
+        AvroSchema: a copy of the schema with the masked field types replaced
+    """
+    output_schema = copy.deepcopy(schema)
+    record, namespace, names = _top_level_record(output_schema)
+
+    for field in record["fields"]:
+        if field["name"] in masking:
+            strategy = masking[field["name"]]
+            masked = (
+                strategy.fields if isinstance(strategy, NestedFieldsMask) else strategy
+            )
+            field["type"] = _masked_type(field["type"], masked, namespace, names)
+
+    return output_schema
+
+
+def _top_level_record(
+    schema: AvroSchema,
+) -> Tuple[Dict[str, Any], str, Dict[str, Dict[str, Any]]]:
+    names: Dict[str, Dict[str, Any]] = {}
+    _collect_named_types(schema, "", names)
+    record, namespace = _resolve(schema, "", names)
+
+    if not isinstance(record, dict) or record["type"] not in ("record", "error"):
+        raise ValueError("Invalid Avro file: the schema isn't a record type")
+
+    return record, namespace, names
+
+
+def _fullname(name: str, namespace: str) -> str:
+    return name if "." in name or not namespace else f"{namespace}.{name}"
+
+
+def _collect_named_types(
+    schema: AvroSchema, namespace: str, names: Dict[str, Dict[str, Any]]
+) -> None:
+    """Records the definition of every named type of a schema by its full name"""
+    if isinstance(schema, list):
+        for branch in schema:
+            _collect_named_types(branch, namespace, names)
+    elif isinstance(schema, dict):
+        schema_type = schema["type"]
+        if schema_type in _NAMED_TYPES:
+            fullname = _fullname(schema["name"], schema.get("namespace", namespace))
+            names[fullname] = schema
+            for field in schema.get("fields", []):
+                _collect_named_types(field["type"], fullname.rpartition(".")[0], names)
+        elif schema_type == "array":
+            _collect_named_types(schema["items"], namespace, names)
+        elif schema_type == "map":
+            _collect_named_types(schema["values"], namespace, names)
+        elif not isinstance(schema_type, str):
+            _collect_named_types(schema_type, namespace, names)
+
+
+def _resolve(
+    schema: AvroSchema, namespace: str, names: Dict[str, Dict[str, Any]]
+) -> Tuple[AvroSchema, str]:
+    """Follows named type references, returning the type definition and the namespace its fields are in
+
+    Primitive types, including those with a logical type, are returned as their name.
+    """
+    while True:
+        if isinstance(schema, list):
+            return schema, namespace
+
+        if isinstance(schema, str):
+            if schema in _PRIMITIVES:
+                return schema, namespace
+            fullname = _fullname(schema, namespace)
+            if fullname not in names:
+                fullname = schema
+            if fullname not in names:
+                raise ValueError(f"Invalid Avro file: unknown type {schema}")
+            return names[fullname], fullname.rpartition(".")[0]
+
+        schema_type = schema["type"]
+        if schema_type in _NAMED_TYPES:
+            fullname = _fullname(schema["name"], schema.get("namespace", namespace))
+            return schema, fullname.rpartition(".")[0]
+        if schema_type in ("array", "map"):
+            return schema, namespace
+
+        schema = schema_type
+
+
+def _type_name(schema: AvroSchema) -> str:
+    """Returns the name of a resolved type: a primitive type name, "union" or a complex type"""
+    if isinstance(schema, list):
+        return "union"
+    if isinstance(schema, str):
+        return schema
+    return schema["type"]
+
+
+def _polars_dtype(
+    schema: AvroSchema,
+    namespace: str,
+    names: Dict[str, Dict[str, Any]],
+    seen: set,
+) -> pl.DataType:
+    schema, namespace = _resolve(schema, namespace, names)
+    type_name = _type_name(schema)
+
+    if type_name in _POLARS_PRIMITIVES:
+        return _POLARS_PRIMITIVES[type_name]
+    if type_name == "array":
+        return pl.List(_polars_dtype(schema["items"], namespace, names, seen))
+    if type_name == "map":
+        return pl.List(
+            pl.Struct(
+                {
+                    "key": pl.String(),
+                    "value": _polars_dtype(schema["values"], namespace, names, seen),
+                }
+            )
+        )
+    if type_name == "union":
+        branches = [
+            branch
+            for branch in schema
+            if _type_name(_resolve(branch, namespace, names)[0]) != "null"
+        ]
+        if not branches:
+            return pl.Null()
+        if len(branches) > 1:
+            raise ValueError("unions of several non-null types aren't supported")
+        return _polars_dtype(branches[0], namespace, names, seen)
+
+    # Records
+    if id(schema) in seen:
+        raise ValueError("recursive types aren't supported")
+    seen = seen | {id(schema)}
+    return pl.Struct(
+        {
+            field["name"]: _polars_dtype(field["type"], namespace, names, seen)
+            for field in schema["fields"]
+        }
+    )
+
+
+_POLARS_PRIMITIVES: Dict[str, pl.DataType] = {
+    "null": pl.Null(),
+    "boolean": pl.Boolean(),
+    "int": pl.Int32(),
+    "long": pl.Int64(),
+    "float": pl.Float32(),
+    "double": pl.Float64(),
+    "bytes": pl.Binary(),
+    "string": pl.String(),
+    "enum": pl.String(),
+    "fixed": pl.Binary(),
+}
+
+
+def _masked_type(
+    schema: AvroSchema,
+    masked: Any,
+    namespace: str,
+    names: Dict[str, Dict[str, Any]],
+) -> AvroSchema:
+    resolved, namespace = _resolve(schema, namespace, names)
+
+    if isinstance(masked, MaskingStrategy):
+        branches = resolved if isinstance(resolved, list) else [resolved]
+        type_names = {
+            _type_name(_resolve(branch, namespace, names)[0]) for branch in branches
+        }
+        if type_names <= {"null", _MASKED_TYPE}:
+            return schema
+        return ["null", _MASKED_TYPE] if "null" in type_names else _MASKED_TYPE
+
+    if isinstance(resolved, list):
+        return [
+            branch
+            if _type_name(_resolve(branch, namespace, names)[0]) == "null"
+            else _masked_type(branch, masked, namespace, names)
+            for branch in resolved
+        ]
+
+    # Named types are updated in place, so references to them stay valid
+    if resolved["type"] == "array":
+        resolved["items"] = _masked_type(
+            resolved["items"], masked[LIST_ELEMENTS], namespace, names
+        )
+    elif resolved["type"] == "map":
+        entry: FieldTree = masked[LIST_ELEMENTS]
+        if isinstance(entry, MaskingStrategy):
+            raise ValueError(
+                "Avro map entries can't be masked as a whole, mask their key or value"
+            )
+        if "value" in entry:
+            resolved["values"] = _masked_type(
+                resolved["values"], entry["value"], namespace, names
+            )
+    else:
+        for field in resolved["fields"]:
+            if field["name"] in masked:
+                field["type"] = _masked_type(
+                    field["type"], masked[field["name"]], namespace, names
+                )
+
+    return schema
+
+
+def _compile_reader(
+    schema: AvroSchema,
+    namespace: str,
+    names: Dict[str, Dict[str, Any]],
+    compiled: Dict[int, Reader],
+) -> Reader:
+    """Builds a function decoding a value of a type, returning it with the position after it"""
+    schema, namespace = _resolve(schema, namespace, names)
+    type_name = _type_name(schema)
+
+    if type_name in _PRIMITIVE_READERS:
+        return _PRIMITIVE_READERS[type_name]
+
+    if type_name == "enum":
+        symbols = schema["symbols"]
+
+        def read_enum(data: bytes, position: int) -> Tuple[Any, int]:
+            index, position = _read_long(data, position)
+            return symbols[index], position
+
+        return read_enum
+
+    if type_name == "fixed":
+        size = schema["size"]
+        return lambda data, position: (
+            data[position : position + size],
+            position + size,
+        )
+
+    if type_name == "union":
+        branches = [
+            _compile_reader(branch, namespace, names, compiled) for branch in schema
+        ]
+
+        def read_union(data: bytes, position: int) -> Tuple[Any, int]:
+            index, position = _read_long(data, position)
+            return branches[index](data, position)
+
+        return read_union
+
+    if type_name in ("array", "map"):
+        is_map = type_name == "map"
+        read_item = _compile_reader(
+            schema["values" if is_map else "items"], namespace, names, compiled
+        )
+
+        def read_items(data: bytes, position: int) -> Tuple[Any, int]:
+            items = []
+            while True:
+                count, position = _read_long(data, position)
+                if count == 0:
+                    return items, position
+                if count < 0:
+                    count = -count
+                    _, position = _read_long(data, position)
+                for _ in range(count):
+                    if is_map:
+                        key, position = _read_string(data, position)
+                        value, position = read_item(data, position)
+                        items.append({"key": key, "value": value})
+                    else:
+                        item, position = read_item(data, position)
+                        items.append(item)
+
+        return read_items
+
+    # Records, compiled once so recursive types refer back to themselves
+    if id(schema) in compiled:
+        return compiled[id(schema)]
+
+    fields: List[Tuple[str, Reader]] = []
+
+    def read_record(data: bytes, position: int) -> Tuple[Any, int]:
+        record = {}
+        for name, read_field in fields:
+            record[name], position = read_field(data, position)
+        return record, position
+
+    compiled[id(schema)] = read_record
+    fields.extend(
+        (field["name"], _compile_reader(field["type"], namespace, names, compiled))
+        for field in schema["fields"]
+    )
+
+    return read_record
+
+
+def _compile_skipper(
+    schema: AvroSchema,
+    namespace: str,
+    names: Dict[str, Dict[str, Any]],
+    compiled: Dict[int, Skipper],
+) -> Skipper:
+    """Builds a function returning the position after a value of a type, without decoding it"""
+    schema, namespace = _resolve(schema, namespace, names)
+    type_name = _type_name(schema)
+
+    if type_name in _PRIMITIVE_SKIPPERS:
+        return _PRIMITIVE_SKIPPERS[type_name]
+
+    if type_name == "fixed":
+        size = schema["size"]
+        return lambda data, position: position + size
+
+    if type_name == "union":
+        branches = [
+            _compile_skipper(branch, namespace, names, compiled) for branch in schema
+        ]
+
+        def skip_union(data: bytes, position: int) -> int:
+            index, position = _read_long(data, position)
+            return branches[index](data, position)
+
+        return skip_union
+
+    if type_name in ("array", "map"):
+        is_map = type_name == "map"
+        skip_item = _compile_skipper(
+            schema["values" if is_map else "items"], namespace, names, compiled
+        )
+
+        def skip_items(data: bytes, position: int) -> int:
+            while True:
+                count, position = _read_long(data, position)
+                if count == 0:
+                    return position
+                if count < 0:
+                    # Blocks of items with a negative count are preceded by their size
+                    size, position = _read_long(data, position)
+                    position += size
+                    continue
+                for _ in range(count):
+                    if is_map:
+                        position = _skip_bytes(data, position)
+                    position = skip_item(data, position)
+
+        return skip_items
+
+    if id(schema) in compiled:
+        return compiled[id(schema)]
+
+    fields: List[Skipper] = []
+
+    def skip_record(data: bytes, position: int) -> int:
+        for skip_field in fields:
+            position = skip_field(data, position)
+        return position
+
+    compiled[id(schema)] = skip_record
+    fields.extend(
+        _compile_skipper(field["type"], namespace, names, compiled)
+        for field in schema["fields"]
+    )
+
+    return skip_record
+
+
+def _compile_writer(
+    schema: AvroSchema,
+    namespace: str,
+    names: Dict[str, Dict[str, Any]],
+    compiled: Dict[int, Writer],
+) -> Writer:
+    """Builds a function encoding a value of a type, as read by `_compile_reader` or returned by Polars"""
+    schema, namespace = _resolve(schema, namespace, names)
+    type_name = _type_name(schema)
+
+    if type_name in _PRIMITIVE_WRITERS:
+        return _PRIMITIVE_WRITERS[type_name]
+
+    if type_name == "enum":
+        indexes = {symbol: index for index, symbol in enumerate(schema["symbols"])}
+        return lambda value, data: _write_long(indexes[value], data)
+
+    if type_name == "fixed":
+        size = schema["size"]
+
+        def write_fixed(value: Any, data: bytearray) -> None:
+            if len(value) != size:
+                raise TypeError(f"fixed value of {len(value)} bytes instead of {size}")
+            data += value
+
+        return write_fixed
+
+    if type_name == "union":
+        null_index = None
+        value_index, write_value = None, None
+        for index, branch in enumerate(schema):
+            if _type_name(_resolve(branch, namespace, names)[0]) == "null":
+                null_index = index
+            elif write_value is None:
+                value_index = index
+                write_value = _compile_writer(branch, namespace, names, compiled)
+            else:
+                raise ValueError(
+                    "Avro unions of several non-null types can't be masked"
+                )
+
+        def write_union(value: Any, data: bytearray) -> None:
+            if value is None:
+                if null_index is None:
+                    raise TypeError("null value for a non-nullable type")
+                _write_long(null_index, data)
+            else:
+                if write_value is None:
+                    raise TypeError(f"{value!r} for a null type")
+                _write_long(value_index, data)  # type: ignore
+                write_value(value, data)
+
+        return write_union
+
+    if type_name in ("array", "map"):
+        is_map = type_name == "map"
+        write_item = _compile_writer(
+            schema["values" if is_map else "items"], namespace, names, compiled
+        )
+
+        def write_items(value: Any, data: bytearray) -> None:
+            if value:
+                _write_long(len(value), data)
+                for item in value:
+                    if is_map:
+                        _write_string(item["key"], data)
+                        write_item(item["value"], data)
+                    else:
+                        write_item(item, data)
+            _write_long(0, data)
+
+        return write_items
+
+    if id(schema) in compiled:
+        return compiled[id(schema)]
+
+    fields: List[Tuple[str, Writer]] = []
+
+    def write_record(value: Any, data: bytearray) -> None:
+        for name, write_field in fields:
+            write_field(value[name], data)
+
+    compiled[id(schema)] = write_record
+    fields.extend(
+        (field["name"], _compile_writer(field["type"], namespace, names, compiled))
+        for field in schema["fields"]
+    )
+
+    return write_record
+
+
+def _encode_values(write: Writer, values: List[Any]) -> List[bytes]:
+    """Encodes every value of a column, encoding values repeated in the column only once
+
+    Masked values repeat often, as with constant masks and keyed hashes of low cardinality
+    columns.
+    """
+    cache: Dict[Any, bytes] = {}
+    encoded_values = []
+    for value in values:
+        hashable = not isinstance(value, (dict, list))
+        if hashable and value in cache:
+            encoded_values.append(cache[value])
+            continue
+
+        data = bytearray()
+        write(value, data)
+        encoded = bytes(data)
+        if hashable:
+            cache[value] = encoded
+        encoded_values.append(encoded)
+
+    return encoded_values
+
+
+def _read_long(data: bytes, position: int) -> Tuple[int, int]:
+    """Decodes a zig-zag variable-length int or long"""
+    byte = data[position]
+    position += 1
+    if byte < 0x80:
+        # Union indexes, lengths of short strings and small numbers take a single byte
+        return (byte >> 1) ^ -(byte & 1), position
+
+    value = byte & 0x7F
+    shift = 7
+    while byte & 0x80:
+        byte = data[position]
+        position += 1
+        value |= (byte & 0x7F) << shift
+        shift += 7
+
+    return (value >> 1) ^ -(value & 1), position
+
+
+def _write_long(value: int, data: bytearray) -> None:
+    """Encodes a zig-zag variable-length int or long"""
+    value = (value << 1) if value >= 0 else ((-value << 1) - 1)
+    while value > 0x7F:
+        data.append((value & 0x7F) | 0x80)
+        value >>= 7
+    data.append(value)
+
+
+def _read_bytes(data: bytes, position: int) -> Tuple[bytes, int]:
+    size, position = _read_long(data, position)
+    if size < 0 or position + size > len(data):
+        raise IndexError("bytes value past the end of the block")
+    return data[position : position + size], position + size
+
+
+def _read_string(data: bytes, position: int) -> Tuple[str, int]:
+    value, position = _read_bytes(data, position)
+    return value.decode(), position
+
+
+def _skip_bytes(data: bytes, position: int) -> int:
+    size, position = _read_long(data, position)
+    return position + size
+
+
+def _write_bytes(value: bytes, data: bytearray) -> None:
+    _write_long(len(value), data)
+    data += value
+
+
+def _write_string(value: str, data: bytearray) -> None:
+    _write_bytes(value.encode(), data)
+
+
+def _write_null(value: Any, data: bytearray) -> None:
+    if value is not None:
+        raise TypeError(f"{value!r} for a null type")
+
+
+_FLOAT = struct.Struct("<f")
+_DOUBLE = struct.Struct("<d")
+
+_PRIMITIVE_READERS: Dict[str, Reader] = {
+    "null": lambda data, position: (None, position),
+    "boolean": lambda data, position: (data[position] == 1, position + 1),
+    "int": _read_long,
+    "long": _read_long,
+    "float": lambda data, position: (
+        _FLOAT.unpack_from(data, position)[0],
+        position + 4,
+    ),
+    "double": lambda data, position: (
+        _DOUBLE.unpack_from(data, position)[0],
+        position + 8,
+    ),
+    "bytes": _read_bytes,
+    "string": _read_string,
+}
+
+_PRIMITIVE_SKIPPERS: Dict[str, Skipper] = {
+    "null": lambda data, position: position,
+    "boolean": lambda data, position: position + 1,
+    "int": lambda data, position: _read_long(data, position)[1],
+    "long": lambda data, position: _read_long(data, position)[1],
+    "float": lambda data, position: position + 4,
+    "double": lambda data, position: position + 8,
+    "bytes": _skip_bytes,
+    "string": _skip_bytes,
+    "enum": lambda data, position: _read_long(data, position)[1],
+}
+
+_PRIMITIVE_WRITERS: Dict[str, Writer] = {
+    "null": _write_null,
+    "boolean": lambda value, data: data.append(1 if value else 0),
+    "int": _write_long,
+    "long": _write_long,
+    "float": lambda value, data: data.extend(_FLOAT.pack(value)),
+    "double": lambda value, data: data.extend(_DOUBLE.pack(value)),
+    "bytes": _write_bytes,
+    "string": _write_string,
+}
+
+
+def _read_file_long(file: IO[bytes], head: bytes = b"") -> int:
+    """Decodes a zig-zag variable-length long from a file object, starting with an already read first byte"""
+    value = shift = 0
+    while True:
+        byte = head or _read_file_exactly(file, 1)
+        head = b""
+        value |= (byte[0] & 0x7F) << shift
+        shift += 7
+        if not byte[0] & 0x80:
+            return (value >> 1) ^ -(value & 1)
+
+
+def _read_file_bytes(file: IO[bytes]) -> bytes:
+    return _read_file_exactly(file, _read_file_long(file))
+
+
+def _read_file_exactly(file: IO[bytes], size: int) -> bytes:
+    data = file.read(size)
+    if size < 0 or len(data) != size:
+        raise ValueError("Invalid Avro file: the file is truncated")
+    return data
+
+
+def _check_codec(codec: str) -> None:
+    if codec not in AVRO_CODECS:
+        raise ValueError(f"Unsupported Avro codec: {codec}")
+    if codec == "zstandard" and zstandard is None:
+        raise ImportError(
+            "zstandard Avro files require the zstandard package, "
+            "install it with the `zstd` extra or `pip install zstandard`"
+        )
+    if codec == "snappy" and snappy is None:
+        raise ImportError(
+            "snappy Avro files require the python-snappy package, "
+            "install it with the `snappy` extra or `pip install python-snappy`"
+        )
+
+
+def _decompress_block(data: bytes, codec: str) -> bytes:
+    try:
+        if codec == "deflate":
+            return zlib.decompress(data, -zlib.MAX_WBITS)
+        if codec == "bzip2":
+            return bz2.decompress(data)
+        if codec == "xz":
+            return lzma.decompress(data)
+        if codec == "zstandard":
+            return zstandard.ZstdDecompressor().decompressobj().decompress(data)
+        if codec == "snappy":
+            # Snappy blocks are followed by the big-endian CRC32 of their uncompressed data
+            records = snappy.decompress(data[:-4])
+            if struct.unpack(">I", data[-4:])[0] != zlib.crc32(records):
+                raise ValueError("checksum mismatch")
+            return records
+    except Exception as err:
+        raise ValueError(
+            f"Invalid Avro file: a {codec} block can't be decompressed: {err}"
+        ) from None
+
+    return data
+
+
+def _compress_block(data: bytes, codec: str) -> bytes:
+    if codec == "deflate":
+        compressor = zlib.compressobj(
+            DEFLATE_COMPRESSION_LEVEL, zlib.DEFLATED, -zlib.MAX_WBITS
+        )
+        return compressor.compress(data) + compressor.flush()
+    if codec == "bzip2":
+        return bz2.compress(data)
+    if codec == "xz":
+        return lzma.compress(data)
+    if codec == "zstandard":
+        return zstandard.ZstdCompressor().compress(data)
+    if codec == "snappy":
+        return snappy.compress(data) + struct.pack(">I", zlib.crc32(data))
+
+    return data
@@ -0,0 +1,204 @@
+"""Obfuscation of many S3 objects concurrently."""
+
+import multiprocessing
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import partial
+from typing import TYPE_CHECKING, Any, Dict, List, Literal, Optional
+
+from .compression import CompressionArg
+from .gdpr_obfuscator import (
+    DEFAULT_CHUNK_SIZE,
+    DEFAULT_MAX_CONCURRENCY,
+    DEFAULT_MAX_POOL_CONNECTIONS,
+    DEFAULT_PART_SIZE,
+    Engine,
+    FileType,
+    gdpr_obfuscate_to_s3,
+    gdpr_obfuscator,
+    get_s3_client,
+)
+from .masking import MaskingStrategyArg
+
+if TYPE_CHECKING:
+    from types_boto3_s3.client import S3Client
+
+DEFAULT_MAX_WORKERS = 8
+"""Default number of files obfuscated at the same time by `gdpr_obfuscator_batch`"""
+
+
+@dataclass(frozen=True)
+class ObfuscationResult:
+    """The outcome of obfuscating a single file of a batch
+
+    Attributes:
+        source (str): S3 address of the file that was obfuscated
+        destination (Optional[str]): S3 address the obfuscated file was written to, if destinations were given
+        result (Optional[bytes]): the obfuscated file, if no destinations were given and obfuscation succeeded
+        error (Optional[Exception]): the exception raised while obfuscating the file, if it failed
+    """
+
+    source: str
+    destination: Optional[str] = None
+    result: Optional[bytes] = None
+    error: Optional[Exception] = None
+
+    @property
+    def ok(self) -> bool:
+        """Whether the file was obfuscated successfully"""
+        return self.error is None
+
+
+def gdpr_obfuscator_batch(
+    sources: List[str],
+    pii_fields: List[str],
+    masking_string: str = "***",
+    file_type: FileType = "csv",
+    destinations: Optional[List[str]] = None,
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    engine: Engine = "eager",
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    infer_schema: bool = True,
+    part_size: int = DEFAULT_PART_SIZE,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    s3_client: Optional["S3Client"] = None,
+    executor: Literal["thread", "process"] = "thread",
+    polars_max_threads: Optional[int] = None,
+    masking_strategy: MaskingStrategyArg = None,
+    compression: CompressionArg = "auto",
+    memory_budget: Optional[int] = None,
+) -> List[ObfuscationResult]:
+    """
+    Obfuscates PII fields in many files stored in S3 concurrently.
+
+    Files are downloaded, masked and (when `destinations` are given) uploaded on a pool of `max_workers` threads sharing a single S3 client, so the network waits of different files overlap. Polars releases the GIL while parsing and writing, so masking also runs in parallel. A file that fails to be obfuscated never stops the rest of the batch: its error is returned in its result instead of being raised.
+
+    With `executor="process"` files are spread across `max_workers` worker processes instead, each with its own S3 client and its own Polars thread pool capped at `polars_max_threads` threads, so large multi-core hosts aren't limited by a single Polars thread pool or by the GIL. Worker processes are started with the `spawn` method, so scripts using this mode must guard their entry point with `if __name__ == "__main__":`. Use `destinations` with this mode for large files: outputs are then uploaded from the workers directly instead of being sent back to the calling process.
+
+    Args:
+        sources (List[str]): S3 addresses of the files to be obfuscated. Formated as `s3://<bucket_name>/<file_key>`
+        pii_fields (List[str]): List of column names containing PII to obfuscate, the same for every file
+        masking_string (str): String used to replace PII data (default is "***")
+        file_type (FileType): Type of the files to obfuscate (default is "csv")
+        destinations (Optional[List[str]]): S3 addresses the obfuscated files are written to, one per source. When None, the obfuscated files are returned as bytes instead
+        max_workers (int): Maximum number of files obfuscated at the same time (default is 8)
+        engine (Engine): Processing engine (default is "eager"), see `gdpr_obfuscator`. With `auto` it is chosen for every file from its own size
+        chunk_size (int): Number of rows processed per batch by the `streaming` engine (default is 50,000)
+        infer_schema (bool): Whether to infer CSV column types (default is True)
+        part_size (int): Size in bytes of each part downloaded and uploaded (default is 8 MiB)
+        max_concurrency (int): Maximum number of S3 requests in flight at the same time for each file (default is 8)
+        s3_client (Optional[S3Client]): boto3 S3 client shared by every file. Defaults to a cached client whose connection pool fits `max_workers` * `max_concurrency` requests. Not supported with `executor="process"`, where every worker creates its own client
+        executor (Literal["thread", "process"]): Whether files are obfuscated on a pool of threads or of worker processes (default is "thread")
+        polars_max_threads (Optional[int]): Size of the Polars thread pool of each worker process (default is the number of CPUs divided by `max_workers`). Only applies to `executor="process"`
+        masking_strategy (MaskingStrategyArg): How PII values are replaced (default is None, replacing them with `masking_string`), see `gdpr_obfuscator`. Must be picklable with `executor="process"`
+        compression (CompressionArg): Codec the obfuscated files are compressed with (default is "auto", compressing each file like its input, or from the suffix of its destination when `destinations` are given), see `gdpr_obfuscator` and `gdpr_obfuscate_to_s3`
+        memory_budget (Optional[int]): Memory in bytes the `auto` engine lets the eager engine use for each file, see `gdpr_obfuscator`. Files processed at the same time share the memory of the process, so it should be divided by `max_workers`
+
+    Raises:
+        ValueError: If `destinations` is given and doesn't have one address per source
+        ValueError: If an unsupported executor is passed, or an s3_client is passed with `executor="process"`
+
+    Returns:
+        List[ObfuscationResult]: one result per source, in the same order as `sources`
+    """
+    if destinations is not None and len(destinations) != len(sources):
+        raise ValueError(
+            f"Expected {len(sources)} destinations, got {len(destinations)}"
+        )
+
+    options: Dict[str, Any] = dict(
+        pii_fields=pii_fields,
+        masking_string=masking_string,
+        file_type=file_type,
+        engine=engine,
+        chunk_size=chunk_size,
+        infer_schema=infer_schema,
+        part_size=part_size,
+        max_concurrency=max_concurrency,
+        masking_strategy=masking_strategy,
+        compression=compression,
+        memory_budget=memory_budget,
+    )
+
+    if executor == "thread":
+        s3_client = s3_client or get_s3_client(
+            max(DEFAULT_MAX_POOL_CONNECTIONS, max_workers * max_concurrency)
+        )
+        task = partial(_obfuscate_file, options=options, s3_client=s3_client)
+        pool: Executor = ThreadPoolExecutor(max_workers=max_workers)
+    elif executor == "process":
+        if s3_client is not None:
+            raise ValueError("s3_client can't be shared with worker processes")
+
+        max_pool_connections = max(DEFAULT_MAX_POOL_CONNECTIONS, 2 * max_concurrency)
+        task = partial(
+            _obfuscate_file,
+            options=options,
+            max_pool_connections=max_pool_connections,
+        )
+        pool = ProcessPoolExecutor(
+            max_workers=max_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(
+                max_pool_connections,
+                polars_max_threads or max(1, (os.cpu_count() or 1) // max_workers),
+            ),
+        )
+    else:
+        raise ValueError(f"Unsupported executor: {executor}")
+
+    with pool:
+        return list(pool.map(task, sources, destinations or [None] * len(sources)))
+
+
+def _init_worker(max_pool_connections: int, polars_max_threads: int) -> None:
+    """Caps the Polars thread pool of a worker process and builds its cached S3 client
+
+    Polars sizes its thread pool from POLARS_MAX_THREADS the first time it runs a query, so
+    setting it before the worker obfuscates any file caps the pool of this process only.
+
+    Args:
+        max_pool_connections (int): connection pool size of the worker's cached S3 client
+        polars_max_threads (int): size of the worker's Polars thread pool
+    """
+    os.environ["POLARS_MAX_THREADS"] = str(polars_max_threads)
+    get_s3_client(max_pool_connections)
+
+
+def _obfuscate_file(
+    source: str,
+    destination: Optional[str],
+    options: Dict[str, Any],
+    s3_client: Optional["S3Client"] = None,
+    max_pool_connections: int = DEFAULT_MAX_POOL_CONNECTIONS,
+) -> ObfuscationResult:
+    """Obfuscates a single file of a batch, returning any error instead of raising it
+
+    Args:
+        source (str): S3 address of the file to obfuscate
+        destination (Optional[str]): S3 address the obfuscated file is uploaded to, or None to return it as bytes
+        options (Dict[str, Any]): keyword arguments passed to `gdpr_obfuscator` or `gdpr_obfuscate_to_s3`
+        s3_client (Optional[S3Client]): the S3 client to use for the requests. Defaults to the client cached by the current process
+        max_pool_connections (int): connection pool size of the cached client, when no s3_client is passed
+
+    Returns:
+        ObfuscationResult: the outcome of obfuscating the file
+    """
+    try:
+        options = dict(
+            options, s3_client=s3_client or get_s3_client(max_pool_connections)
+        )
+
+        if destination is None:
+            return ObfuscationResult(
+                source=source, result=gdpr_obfuscator(source, **options)
+            )
+
+        return ObfuscationResult(
+            source=source,
+            destination=gdpr_obfuscate_to_s3(source, destination, **options),
+        )
+    except Exception as err:
+        return ObfuscationResult(source=source, destination=destination, error=err)
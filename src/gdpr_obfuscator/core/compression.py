@@ -0,0 +1,234 @@
+"""Detection and streaming (de)compression of gzip, bz2 and zstd compressed files."""
+
+import bz2
+import gzip
+import zlib
+from contextlib import contextmanager
+from typing import IO, Any, Iterable, Iterator, Literal, Optional, Union
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+_DECOMPRESSION_ERRORS = (OSError, EOFError, zlib.error) + (
+    (zstandard.ZstdError,) if zstandard is not None else ()
+)
+
+Compression = Literal["gzip", "bz2", "zstd"]
+"""The supported compression codecs"""
+
+CompressionArg = Union[Literal["auto"], Compression, None]
+"""A compression codec, "auto" to choose it from the input or destination, or None for uncompressed output"""
+
+COMPRESSION_SUFFIXES = {
+    ".gz": "gzip",
+    ".gzip": "gzip",
+    ".bz2": "bz2",
+    ".zst": "zstd",
+    ".zstd": "zstd",
+}
+"""Codec of every compressed key suffix"""
+
+COMPRESSION_CONTENT_ENCODINGS = {
+    "gzip": "gzip",
+    "x-gzip": "gzip",
+    "bzip2": "bz2",
+    "x-bzip2": "bz2",
+    "zstd": "zstd",
+}
+"""Codec of every HTTP Content-Encoding S3 objects can be stored with"""
+
+COMPRESSION_MAGIC_BYTES = {
+    b"\x1f\x8b": "gzip",
+    **{b"BZh%d" % block_size: "bz2" for block_size in range(1, 10)},
+    b"\x28\xb5\x2f\xfd": "zstd",
+}
+"""Codec of every magic number compressed files start with"""
+
+MAGIC_BYTES_SIZE = 4
+"""Number of leading bytes needed to recognise every magic number"""
+
+COMPRESSION_CONTENT_TYPES = {
+    "gzip": "application/gzip",
+    "bz2": "application/x-bzip2",
+    "zstd": "application/zstd",
+}
+"""MIME type of the files compressed with every codec"""
+
+GZIP_COMPRESSION_LEVEL = 6
+"""zlib's default level, much faster than the maximum level `gzip` uses by default for little size difference"""
+
+
+def detect_compression(
+    key: str, content_encoding: Optional[str] = None, head: bytes = b""
+) -> Optional[Compression]:
+    """Detects the codec a file is compressed with from its leading bytes, its Content-Encoding or its key suffix
+
+    Magic bytes are checked first, as they can't disagree with the actual contents.
+
+    Args:
+        key (str): the key or path of the file
+        content_encoding (Optional[str]): the Content-Encoding the file is stored with
+        head (bytes): the first bytes of the file, at least `MAGIC_BYTES_SIZE` of them for a reliable detection
+
+    Returns:
+        Optional[Compression]: the codec, or None if the file isn't compressed
+    """
+    for magic_bytes, compression in COMPRESSION_MAGIC_BYTES.items():
+        if head.startswith(magic_bytes):
+            return compression
+
+    if head:
+        # Any other content is plain text, whatever the key or metadata claim
+        return None
+
+    if content_encoding:
+        encoding = content_encoding.split(",")[-1].strip().lower()
+        if encoding in COMPRESSION_CONTENT_ENCODINGS:
+            return COMPRESSION_CONTENT_ENCODINGS[encoding]
+
+    return compression_from_key(key)
+
+
+def compression_from_key(key: str) -> Optional[Compression]:
+    """Returns the codec matching the suffix of a key (e.g. "gzip" for "data.csv.gz")
+
+    Args:
+        key (str): the key or path of a file
+
+    Returns:
+        Optional[Compression]: the codec, or None if the suffix isn't a compression suffix
+    """
+    for suffix, compression in COMPRESSION_SUFFIXES.items():
+        if key.lower().endswith(suffix):
+            return compression
+
+    return None
+
+
+def check_compression(compression: CompressionArg) -> None:
+    """Checks that a compression argument is supported
+
+    Args:
+        compression (CompressionArg): the compression argument
+
+    Raises:
+        ValueError: if the compression isn't supported
+        ImportError: if the compression is "zstd" and the `zstandard` package isn't installed
+    """
+    if compression not in (None, "auto", *COMPRESSION_CONTENT_TYPES):
+        raise ValueError(f"Unsupported compression: {compression}")
+
+    if compression == "zstd":
+        _require_zstandard()
+
+
+def decompress_chunks(
+    chunks: Iterable[bytes], compression: Compression
+) -> Iterator[bytes]:
+    """Decompresses a file incrementally, as its chunks are received
+
+    Files made of several concatenated compressed streams (e.g. appended gzip members) are
+    decompressed entirely.
+
+    Args:
+        chunks (Iterable[bytes]): the compressed contents of the file, in order
+        compression (Compression): the codec the file is compressed with
+
+    Raises:
+        ValueError: if the contents aren't valid for the codec
+
+    Returns:
+        Iterator[bytes]: the decompressed contents, in order
+    """
+    check_compression(compression)
+    decompressor = None
+
+    try:
+        for chunk in chunks:
+            while chunk:
+                if decompressor is None:
+                    decompressor = _decompressor(compression)
+
+                data = decompressor.decompress(chunk)
+                if data:
+                    yield data
+
+                chunk = b""
+                if decompressor.eof:
+                    chunk = decompressor.unused_data
+                    decompressor = None
+    except _DECOMPRESSION_ERRORS as err:
+        raise ValueError(f"Invalid {compression} compressed data: {err}")
+
+    if decompressor is not None:
+        raise ValueError(
+            f"Invalid {compression} compressed data: the file is truncated"
+        )
+
+
+def decompress(data: bytes, compression: Compression) -> bytes:
+    """Decompresses a whole file held in memory
+
+    Args:
+        data (bytes): the compressed contents of the file
+        compression (Compression): the codec the file is compressed with
+
+    Raises:
+        ValueError: if the contents aren't valid for the codec
+
+    Returns:
+        bytes: the decompressed contents
+    """
+    return b"".join(decompress_chunks([data], compression))
+
+
+@contextmanager
+def compressing_writer(
+    output: IO[bytes], compression: Optional[Compression]
+) -> Iterator[IO[bytes]]:
+    """Compresses everything written to the yielded file object into `output`
+
+    The compressed stream is finished when the block exits, without closing `output`.
+
+    Args:
+        output (IO[bytes]): the binary file object the compressed bytes are written to
+        compression (Optional[Compression]): the codec, or None to write to `output` unchanged
+
+    Yields:
+        IO[bytes]: the file object to write the uncompressed bytes to
+    """
+    if compression is None:
+        yield output
+        return
+
+    check_compression(compression)
+    if compression == "gzip":
+        writer: Any = gzip.GzipFile(
+            fileobj=output, mode="wb", compresslevel=GZIP_COMPRESSION_LEVEL, mtime=0
+        )
+    elif compression == "bz2":
+        writer = bz2.BZ2File(output, mode="wb")
+    else:
+        writer = zstandard.ZstdCompressor().stream_writer(output, closefd=False)
+
+    with writer:
+        yield writer
+
+
+def _decompressor(compression: Compression) -> Any:
+    if compression == "gzip":
+        return zlib.decompressobj(wbits=zlib.MAX_WBITS | 16)
+    if compression == "bz2":
+        return bz2.BZ2Decompressor()
+
+    return zstandard.ZstdDecompressor().decompressobj()
+
+
+def _require_zstandard() -> None:
+    if zstandard is None:
+        raise ImportError(
+            "zstd compression requires the zstandard package, "
+            "install it with the `zstd` extra or `pip install zstandard`"
+        )
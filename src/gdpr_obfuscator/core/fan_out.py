@@ -0,0 +1,657 @@
+"""Fan-out obfuscation of a single large S3 object across many worker invocations, joined by one S3 multipart upload."""
+
+import base64
+import dataclasses
+import io
+import logging
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    List,
+    Literal,
+    Optional,
+    Tuple,
+    Union,
+)
+
+from botocore.exceptions import ClientError
+
+from .compression import MAGIC_BYTES_SIZE, detect_compression
+from .gdpr_obfuscator import (
+    CONTENT_TYPES,
+    DEFAULT_CHUNK_SIZE,
+    FileType,
+    _download_parquet_columns_from_s3,
+    _get_parquet_tail_from_s3,
+    _get_range_from_s3,
+    _head_object,
+    _obfuscate_eager,
+    _obfuscate_parquet,
+    _translate_client_error,
+    get_s3_client,
+)
+from .masking import resolve_masking
+from .parquet import (
+    FILE_METADATA_ROW_GROUPS,
+    PARQUET_MAGIC,
+    PARQUET_TAIL_SIZE,
+    ParquetRowGroup,
+    parquet_footer_with_row_groups,
+    parse_parquet_footer,
+    read_parquet_metadata,
+    serialize_parquet_footer,
+)
+from .s3_multipart_writer import MIN_UPLOAD_PART_SIZE
+from .sources import _parse_s3_path
+
+if TYPE_CHECKING:
+    from types_boto3_s3.client import S3Client
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RANGE_SIZE = 64 * 1024 * 1024
+"""Default number of bytes of the source object processed by each worker"""
+
+DEFAULT_MAX_WORKERS = 16
+"""Default number of worker invocations in flight at the same time"""
+
+MAX_UPLOAD_PARTS = 10_000
+"""Largest number of parts S3 accepts in a multipart upload"""
+
+RECORD_BOUNDARY_WINDOW = 64 * 1024
+"""Number of bytes fetched at a time while looking for the end of the record a range boundary falls in"""
+
+FanOutFileType = Literal["csv", "ndjson", "parquet"]
+"""The file types that can be split: CSV and NDJSON files into ranges of whole lines, Parquet files into groups of row groups"""
+
+FAN_OUT_FILE_TYPES = ("csv", "ndjson", "parquet")
+"""Every `FanOutFileType`, checked before a multipart upload is created"""
+
+Invoke = Callable[[Dict[str, Any]], Dict[str, Any]]
+"""Runs a worker: called with the event of a `FanOutTask` and returning the event of the part it uploaded"""
+
+
+@dataclass(frozen=True)
+class FanOutTask:
+    """The part of a source object a single worker obfuscates, and the multipart upload part it uploads
+
+    Attributes:
+        source (str): S3 address of the object to obfuscate
+        destination (str): S3 address of the obfuscated object
+        upload_id (str): ID of the multipart upload of the obfuscated object
+        part_number (int): number of the upload part the worker uploads, starting at 1
+        file_type (FanOutFileType): type of the object to obfuscate
+        pii_fields (List[str]): names of the columns containing PII
+        masking_string (str): string used to replace PII values
+        start (int): offset of the first byte of the range, for CSV and NDJSON objects
+        end (int): offset after the last byte of the range, for CSV and NDJSON objects
+        header (Optional[str]): the header line of a CSV object, for every range but the first
+        row_groups (Optional[List[int]]): indexes of the row groups of a Parquet object
+        chunk_size (int): number of rows per row group written by Parquet workers
+    """
+
+    source: str
+    destination: str
+    upload_id: str
+    part_number: int
+    file_type: FanOutFileType
+    pii_fields: List[str]
+    masking_string: str = "***"
+    start: int = 0
+    end: int = 0
+    header: Optional[str] = None
+    row_groups: Optional[List[int]] = None
+    chunk_size: int = DEFAULT_CHUNK_SIZE
+
+    def to_event(self) -> Dict[str, Any]:
+        """Returns the task as a JSON serializable dict, such as the payload of a Lambda invocation"""
+        return dataclasses.asdict(self)
+
+    @classmethod
+    def from_event(cls, event: Dict[str, Any]) -> "FanOutTask":
+        """Builds a task from the dict returned by `to_event`"""
+        return cls(**event)
+
+
+@dataclass(frozen=True)
+class FanOutPart:
+    """An upload part uploaded by a worker
+
+    Attributes:
+        part_number (int): number of the upload part
+        etag (str): ETag S3 returned for the upload part
+        size (int): size in bytes of the upload part
+        footer (Optional[str]): base64 encoded footer of the Parquet file the part was cut from, for Parquet objects
+        pii_fields (Optional[List[str]]): the PII fields of the task found in the part's range, which can leave out some of them for NDJSON ranges
+    """
+
+    part_number: int
+    etag: str
+    size: int
+    footer: Optional[str] = None
+    pii_fields: Optional[List[str]] = None
+
+    def to_event(self) -> Dict[str, Any]:
+        """Returns the part as a JSON serializable dict, such as the response of a Lambda invocation"""
+        return dataclasses.asdict(self)
+
+    @classmethod
+    def from_event(cls, event: Dict[str, Any]) -> "FanOutPart":
+        """Builds a part from the dict returned by `to_event`"""
+        return cls(**event)
+
+
+def gdpr_obfuscator_fan_out(
+    file_to_obfuscate: str,
+    destination: str,
+    pii_fields: List[str],
+    masking_string: str = "***",
+    file_type: FanOutFileType = "csv",
+    range_size: int = DEFAULT_RANGE_SIZE,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    invoke: Optional[Invoke] = None,
+    s3_client: Optional["S3Client"] = None,
+) -> str:
+    """
+    Obfuscates a single large S3 object by splitting it into parts obfuscated by separate workers, such as separate Lambda invocations, so no single worker processes the whole object.
+
+    This is the coordinator: it creates a multipart upload for the obfuscated object and splits the source object into tasks. CSV and NDJSON objects are split into byte ranges of about `range_size` bytes that end on a line break, found with small ranged GET requests, and Parquet objects into groups of consecutive row groups of about `range_size` compressed bytes, found from their footer. Each task is passed to `invoke`, up to `max_workers` at a time. Workers run `gdpr_obfuscator_fan_out_worker`, which obfuscates the range and uploads it as one part of the upload. Once every part is uploaded, the coordinator completes the upload, adding a last part with the joined footer of Parquet objects. The upload is aborted if any worker fails, so no partial object is left behind.
+
+    CSV columns are read as raw strings, as in `gdpr_obfuscator` with `infer_schema=False`, so that every range writes its values the same way whatever their types look like in that range. NDJSON ranges aren't schema-aligned: each range infers the schema of its own lines, so a key is only written, as null by the lines that lack it, in the ranges where some line has it, and different ranges can write different sets of keys. PII fields absent from a range are treated as absent rather than raising a KeyError, and every worker returns the PII fields it found, so a KeyError is only raised, and the upload aborted, when a field is found in no range at all. CSV records must not contain line breaks inside quoted fields, as ranges are split on line breaks. Compressed CSV and NDJSON objects can't be split, as their records can only be found by decompressing them from the start.
+
+    S3 requires every upload part but the last to be at least 5 MiB. Ranges are sized on the source object, while that minimum applies to the obfuscated parts, which are smaller when the masking string is shorter than the values it replaces, or when Parquet row groups compress better once masked. The size of every part is checked once the workers return, and the upload is aborted with a ValueError naming the smallest part if any is too small, before S3 rejects it. The object is split into at most 10,000 parts, the most S3 accepts, raising `range_size` if needed.
+
+    Args:
+        file_to_obfuscate (str): S3 address of the object to obfuscate (e.g. "s3://my-bucket-name/some_file.csv")
+        destination (str): S3 address the obfuscated object is written to
+        pii_fields (List[str]): List of column names containing PII to obfuscate
+        masking_string (str): String used to replace PII data (default is "***")
+        file_type (FanOutFileType): Type of the object (default is "csv"), can be one of `csv`, `ndjson` or `parquet`
+        range_size (int): Number of bytes of the source object processed by each worker (default is 64 MiB)
+        chunk_size (int): Number of rows per row group of the obfuscated Parquet object (default is 50,000)
+        max_workers (int): Maximum number of workers running at the same time (default is 16)
+        invoke (Optional[Invoke]): Runs a worker with the event of a task and returns the event of the part it uploaded. Defaults to running `gdpr_obfuscator_fan_out_worker` in a thread of this process
+        s3_client (Optional[S3Client]): boto3 S3 client used for the coordinator's requests, and for the workers run in this process. Defaults to the client cached by `get_s3_client`
+
+    Raises:
+        ValueError: If an empty file is passed
+        ValueError: If an unsupported file_type is passed, or a compressed CSV or NDJSON object
+        ValueError: If an obfuscated part other than the last is smaller than the 5 MiB S3 requires
+        FileNotFoundError: If the specified file or the destination bucket doesn't exist
+        KeyError: If specified PII fields are not found in a CSV or Parquet file, or in any range of an NDJSON file
+        Exception: Any exception raised by `invoke`
+
+    Returns:
+        str: the S3 address of the obfuscated object
+    """
+    if file_type not in FAN_OUT_FILE_TYPES:
+        raise ValueError(f"Unsupported file type for fan-out: {file_type}")
+
+    resolve_masking(pii_fields, masking_string)
+    s3_client = s3_client or get_s3_client()
+    if invoke is None:
+        invoke = _in_process_invoke(s3_client)
+
+    bucket, key = _parse_s3_path(file_to_obfuscate)
+    destination_bucket, destination_key = _parse_s3_path(destination)
+
+    if file_type == "parquet":
+        ranges = _plan_row_group_ranges(bucket, key, s3_client, range_size)
+    else:
+        ranges = _plan_record_ranges(bucket, key, s3_client, file_type, range_size)
+
+    try:
+        upload_id = s3_client.create_multipart_upload(
+            Bucket=destination_bucket,
+            Key=destination_key,
+            ContentType=CONTENT_TYPES[file_type],
+        )["UploadId"]
+    except ClientError as err:
+        raise _translate_client_error(err)
+
+    try:
+        tasks = [
+            FanOutTask(
+                source=file_to_obfuscate,
+                destination=destination,
+                upload_id=upload_id,
+                part_number=part_number,
+                file_type=file_type,
+                pii_fields=pii_fields,
+                masking_string=masking_string,
+                chunk_size=chunk_size,
+                **fields,
+            )
+            for part_number, fields in enumerate(ranges, start=1)
+        ]
+        logger.info(
+            "Obfuscating %s in %d parts with up to %d workers",
+            file_to_obfuscate,
+            len(tasks),
+            max_workers,
+        )
+
+        executor = ThreadPoolExecutor(max_workers=min(max_workers, len(tasks)))
+        try:
+            futures = [executor.submit(invoke, task.to_event()) for task in tasks]
+            parts = [FanOutPart.from_event(future.result()) for future in futures]
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+        _check_pii_fields_found(pii_fields, parts)
+
+        if file_type == "parquet":
+            footer = _join_parquet_footers(parts)
+            response = s3_client.upload_part(
+                Bucket=destination_bucket,
+                Key=destination_key,
+                UploadId=upload_id,
+                PartNumber=len(parts) + 1,
+                Body=footer,
+            )
+            parts.append(FanOutPart(len(parts) + 1, response["ETag"], len(footer)))
+
+        _check_part_sizes(parts)
+
+        try:
+            s3_client.complete_multipart_upload(
+                Bucket=destination_bucket,
+                Key=destination_key,
+                UploadId=upload_id,
+                MultipartUpload={
+                    "Parts": [
+                        {"PartNumber": part.part_number, "ETag": part.etag}
+                        for part in parts
+                    ]
+                },
+            )
+        except ClientError as err:
+            raise _translate_client_error(err)
+    except BaseException:
+        s3_client.abort_multipart_upload(
+            Bucket=destination_bucket, Key=destination_key, UploadId=upload_id
+        )
+        raise
+
+    return destination
+
+
+def _check_pii_fields_found(pii_fields: List[str], parts: List[FanOutPart]) -> None:
+    """Raises a KeyError if any PII field wasn't found in the range of any part
+
+    NDJSON ranges leave out the PII fields absent from their own lines, so a field missing from
+    the whole object, e.g. a misspelled one, is only noticed once every part is uploaded.
+
+    Args:
+        pii_fields (List[str]): the PII fields of the tasks
+        parts (List[FanOutPart]): the parts uploaded by the workers
+
+    Raises:
+        KeyError: If specified PII fields are not found in any part
+    """
+    found = {field for part in parts for field in (part.pii_fields or [])}
+    missing_fields = [field for field in pii_fields if field not in found]
+    if missing_fields:
+        raise KeyError(f"PII fields not found: {missing_fields}")
+
+
+def _check_part_sizes(parts: List[FanOutPart]) -> None:
+    """Raises a ValueError if any part but the last is smaller than S3 accepts in a multipart upload
+
+    Args:
+        parts (List[FanOutPart]): every part of the upload, in order
+
+    Raises:
+        ValueError: If a part other than the last is smaller than `MIN_UPLOAD_PART_SIZE`
+    """
+    small_parts = [part for part in parts[:-1] if part.size < MIN_UPLOAD_PART_SIZE]
+    if small_parts:
+        smallest = min(small_parts, key=lambda part: part.size)
+        raise ValueError(
+            f"{len(small_parts)} obfuscated parts are smaller than the {MIN_UPLOAD_PART_SIZE} bytes "
+            f"S3 requires of every part but the last (part {smallest.part_number} is {smallest.size} bytes), "
+            "use a larger range_size"
+        )
+
+
+def gdpr_obfuscator_fan_out_worker(
+    task: Union[FanOutTask, Dict[str, Any]],
+    s3_client: Optional["S3Client"] = None,
+) -> Dict[str, Any]:
+    """
+    Obfuscates the range of a `FanOutTask` and uploads it as one part of the multipart upload created by `gdpr_obfuscator_fan_out`.
+
+    CSV and NDJSON ranges are fetched with a ranged GET request and obfuscated in memory. The CSV header is prepended to every range but the first, to name its columns, and is left out of the uploaded part. Parquet row groups are fetched without the PII columns whose masked values don't depend on them, obfuscated batch by batch through a temporary file, and the part is cut out of the resulting Parquet file without its footer, which is returned to the coordinator to be joined with the footers of the other parts.
+
+    Args:
+        task (Union[FanOutTask, Dict[str, Any]]): the task, or its event as returned by `FanOutTask.to_event`, such as the payload of a Lambda invocation
+        s3_client (Optional[S3Client]): boto3 S3 client used for every request. Defaults to the client cached by `get_s3_client`
+
+    Raises:
+        FileNotFoundError: If the specified file or the destination bucket doesn't exist
+        KeyError: If specified PII fields are not found in a CSV or Parquet file
+
+    Returns:
+        Dict[str, Any]: the event of the `FanOutPart` uploaded, to be returned to the coordinator
+    """
+    if isinstance(task, dict):
+        task = FanOutTask.from_event(task)
+
+    s3_client = s3_client or get_s3_client()
+    bucket, key = _parse_s3_path(task.source)
+    destination_bucket, destination_key = _parse_s3_path(task.destination)
+
+    footer = None
+    missing_fields: List[str] = []
+    if task.file_type == "parquet":
+        body, footer = _obfuscate_row_group_range(bucket, key, s3_client, task)
+    else:
+        body = _obfuscate_record_range(bucket, key, s3_client, task, missing_fields)
+
+    try:
+        response = s3_client.upload_part(
+            Bucket=destination_bucket,
+            Key=destination_key,
+            UploadId=task.upload_id,
+            PartNumber=task.part_number,
+            Body=body,
+        )
+    except ClientError as err:
+        raise _translate_client_error(err)
+
+    return FanOutPart(
+        part_number=task.part_number,
+        etag=response["ETag"],
+        size=len(body),
+        footer=base64.b64encode(footer).decode() if footer is not None else None,
+        pii_fields=[field for field in task.pii_fields if field not in missing_fields],
+    ).to_event()
+
+
+def _in_process_invoke(s3_client: "S3Client") -> Invoke:
+    """Returns an `Invoke` running workers in the calling thread, sharing the coordinator's S3 client"""
+
+    def invoke(event: Dict[str, Any]) -> Dict[str, Any]:
+        return gdpr_obfuscator_fan_out_worker(event, s3_client)
+
+    return invoke
+
+
+def _plan_record_ranges(
+    bucket: str,
+    key: str,
+    s3_client: "S3Client",
+    file_type: FileType,
+    range_size: int,
+) -> List[Dict[str, Any]]:
+    """Splits a CSV or NDJSON object stored in S3 into byte ranges of whole lines
+
+    Args:
+        bucket (str): the name of the S3 bucket
+        key (str): the key of the file in the S3 bucket
+        s3_client (S3Client): the S3 client to use for the requests
+        file_type (FileType): type of the file
+        range_size (int): the number of bytes after which a range ends, at the end of the line it reached
+
+    Raises:
+        ValueError: if the file is empty or compressed
+
+    Returns:
+        List[Dict[str, Any]]: the `start`, `end` and `header` fields of every task
+    """
+    response = _head_object(bucket, key, s3_client)
+    size = response["ContentLength"]
+    if size == 0:
+        raise ValueError("empty data from bytes")
+
+    head = _get_range_from_s3(bucket, key, s3_client, 0, min(MAGIC_BYTES_SIZE, size))
+    if detect_compression(key, response.get("ContentEncoding"), head):
+        raise ValueError(
+            "Compressed files can't be split into byte ranges, as their records can only be found by decompressing them from the start"
+        )
+
+    header = None
+    if file_type == "csv":
+        header_end = _find_record_start(bucket, key, s3_client, 1, size)
+        header = _get_range_from_s3(bucket, key, s3_client, 0, header_end).decode()
+
+    range_size = max(range_size, -(-size // MAX_UPLOAD_PARTS))
+    ranges = []
+    start = 0
+    while start < size:
+        end = _find_record_start(bucket, key, s3_client, start + range_size, size)
+        ranges.append({"start": start, "end": end, "header": header if start else None})
+        start = end
+
+    return ranges
+
+
+def _find_record_start(
+    bucket: str, key: str, s3_client: "S3Client", offset: int, size: int
+) -> int:
+    """Returns the offset of the first line of a file stored in S3 that starts at or after `offset`
+
+    Args:
+        bucket (str): the name of the S3 bucket
+        key (str): the key of the file in the S3 bucket
+        s3_client (S3Client): the S3 client to use for the requests
+        offset (int): the offset the line starts at or after
+        size (int): the size of the file
+
+    Returns:
+        int: the offset following the first line break at or after `offset - 1`, or `size` if there is none
+    """
+    position = offset - 1
+    while position < size:
+        window = _get_range_from_s3(
+            bucket,
+            key,
+            s3_client,
+            position,
+            min(position + RECORD_BOUNDARY_WINDOW, size),
+        )
+        line_break = window.find(b"\n")
+        if line_break >= 0:
+            return position + line_break + 1
+        position += len(window)
+
+    return size
+
+
+def _plan_row_group_ranges(
+    bucket: str, key: str, s3_client: "S3Client", range_size: int
+) -> List[Dict[str, Any]]:
+    """Splits a Parquet object stored in S3 into groups of consecutive row groups, from its footer
+
+    Args:
+        bucket (str): the name of the S3 bucket
+        key (str): the key of the file in the S3 bucket
+        s3_client (S3Client): the S3 client to use for the requests
+        range_size (int): the compressed size in bytes after which a group ends, at the end of the row group it reached
+
+    Raises:
+        ValueError: if the file is not a valid Parquet file
+
+    Returns:
+        List[Dict[str, Any]]: the `start`, `end` and `row_groups` fields of every task
+    """
+    _, _, metadata, _ = _get_parquet_tail_from_s3(bucket, key, s3_client)
+    sizes = [
+        sum(chunk.length for chunk in row_group.columns)
+        for row_group in metadata.row_groups
+    ]
+    # The last upload part holds the joined footer
+    range_size = max(range_size, -(-sum(sizes) // (MAX_UPLOAD_PARTS - 1)))
+
+    ranges: List[Dict[str, Any]] = []
+    row_groups: List[int] = []
+    group_size = 0
+    for index, size in enumerate(sizes):
+        row_groups.append(index)
+        group_size += size
+        if group_size >= range_size:
+            ranges.append(_row_group_range(metadata.row_groups, row_groups))
+            row_groups = []
+            group_size = 0
+
+    if row_groups or not ranges:
+        ranges.append(_row_group_range(metadata.row_groups, row_groups))
+
+    return ranges
+
+
+def _row_group_range(
+    all_row_groups: List[ParquetRowGroup], row_groups: List[int]
+) -> Dict[str, Any]:
+    """Returns the task fields of a group of row groups, with the byte range their column chunks span"""
+    chunks = [chunk for index in row_groups for chunk in all_row_groups[index].columns]
+
+    return {
+        "start": min((chunk.start for chunk in chunks), default=0),
+        "end": max((chunk.start + chunk.length for chunk in chunks), default=0),
+        "row_groups": row_groups,
+    }
+
+
+def _obfuscate_record_range(
+    bucket: str,
+    key: str,
+    s3_client: "S3Client",
+    task: FanOutTask,
+    missing_fields: List[str],
+) -> bytes:
+    """Obfuscates the CSV or NDJSON lines of a task's byte range
+
+    NDJSON ranges infer their own schema, so a PII field that no line of the range has is
+    absent from it rather than missing from the file. It is appended to `missing_fields` instead
+    of raising, and the coordinator raises if no range found it.
+
+    Args:
+        bucket (str): the name of the S3 bucket
+        key (str): the key of the file in the S3 bucket
+        s3_client (S3Client): the S3 client to use for the requests
+        task (FanOutTask): the task
+        missing_fields (List[str]): a list the PII fields absent from an NDJSON range are appended to
+
+    Raises:
+        KeyError: if specified PII fields are not found in the CSV header
+
+    Returns:
+        bytes: the obfuscated lines
+    """
+    records = _get_range_from_s3(bucket, key, s3_client, task.start, task.end)
+    header = task.header.encode() if task.header else b""
+
+    output = io.BytesIO()
+    _obfuscate_eager(
+        header + records,
+        output,
+        resolve_masking(task.pii_fields, task.masking_string),
+        task.file_type,
+        infer_schema=False,
+        missing_fields=missing_fields if task.file_type == "ndjson" else None,
+    )
+
+    if header:
+        # The first part holds the header, this one only needed it to name its columns
+        return output.getvalue().split(b"\n", 1)[1]
+
+    return output.getvalue()
+
+
+def _obfuscate_row_group_range(
+    bucket: str, key: str, s3_client: "S3Client", task: FanOutTask
+) -> Tuple[bytes, bytes]:
+    """Obfuscates the row groups of a task into a Parquet file, and cuts it into the upload part and its footer
+
+    The row groups are downloaded into a sparse temporary file, at their original offsets, and a
+    footer describing only them is appended to it, so Polars reads them as a Parquet file of its
+    own. The upload part is the obfuscated Parquet file without its footer and tail, and without
+    its leading magic bytes, except for the first part.
+
+    Args:
+        bucket (str): the name of the S3 bucket
+        key (str): the key of the file in the S3 bucket
+        s3_client (S3Client): the S3 client to use for the requests
+        task (FanOutTask): the task
+
+    Raises:
+        KeyError: if specified PII fields are not found in the file
+
+    Returns:
+        Tuple[bytes, bytes]: the upload part and the thrift encoded footer of the obfuscated Parquet file
+    """
+    masking = resolve_masking(task.pii_fields, task.masking_string)
+    skip_columns = [
+        column for column, strategy in masking.items() if not strategy.reads_values
+    ]
+    row_groups = task.row_groups or []
+
+    with (
+        tempfile.NamedTemporaryFile(suffix=".parquet") as source,
+        tempfile.NamedTemporaryFile(suffix=".parquet") as obfuscated,
+    ):
+        metadata = _download_parquet_columns_from_s3(
+            bucket, key, s3_client, skip_columns, source, row_groups=row_groups
+        )
+        source.seek(0, io.SEEK_END)
+        source.write(
+            serialize_parquet_footer(
+                parquet_footer_with_row_groups(
+                    metadata.raw,
+                    [
+                        (metadata.raw[FILE_METADATA_ROW_GROUPS][index], 0)
+                        for index in row_groups
+                    ],
+                )
+            )
+        )
+        source.flush()
+
+        _obfuscate_parquet(source.name, obfuscated, masking, task.chunk_size)
+        obfuscated.flush()
+
+        footer_start = read_parquet_metadata(obfuscated.name).footer_start
+        body_start = 0 if task.part_number == 1 else len(PARQUET_MAGIC)
+        obfuscated.seek(body_start)
+        body = obfuscated.read(footer_start - body_start)
+        footer = obfuscated.read()[:-PARQUET_TAIL_SIZE]
+
+    return body, footer
+
+
+def _join_parquet_footers(parts: List[FanOutPart]) -> bytes:
+    """Builds the footer of the Parquet file made of the upload parts of every worker
+
+    The row groups of every part are moved by the offset the part starts at in the joined file,
+    less the leading magic bytes cut from every part but the first.
+
+    Args:
+        parts (List[FanOutPart]): the upload parts, in order
+
+    Returns:
+        bytes: the last upload part, the joined footer and the Parquet tail
+    """
+    footers = [
+        parse_parquet_footer(base64.b64decode(part.footer or ""), 0).raw
+        for part in parts
+    ]
+
+    row_groups = []
+    offset = 0
+    for part, footer in zip(parts, footers):
+        shift = offset - (0 if part.part_number == 1 else len(PARQUET_MAGIC))
+        row_groups.extend(
+            (row_group, shift) for row_group in footer.get(FILE_METADATA_ROW_GROUPS, [])
+        )
+        offset += part.size
+
+    return serialize_parquet_footer(
+        parquet_footer_with_row_groups(footers[0], row_groups)
+    )
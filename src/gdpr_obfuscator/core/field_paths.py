@@ -0,0 +1,161 @@
+"""Paths to PII fields nested in struct and list columns, masked in place without flattening."""
+
+from typing import Any, Dict, List, Mapping, Optional
+
+import polars as pl
+
+from .masking import MaskingStrategy
+
+LIST_ELEMENTS = "[]"
+"""Path step selecting every element of a list, as in "contacts[].phone\""""
+
+FieldTree = Dict[str, Any]
+"""The masked fields of a column, keyed by path step, whose leaves are masking strategies"""
+
+
+class NestedFieldsMask(MaskingStrategy):
+    """Masks fields nested in a struct or list column, leaving the rest of the column untouched
+
+    Struct fields are replaced with `struct.with_fields` and list elements with `list.eval`, so
+    every masked field of a column is updated by a single expression, without exploding,
+    unnesting or rebuilding the column.
+
+    Args:
+        fields (FieldTree): the masked fields of the column, keyed by path step, with the strategy of each field as leaves
+    """
+
+    def __init__(self, fields: FieldTree) -> None:
+        self.fields = fields
+
+    def mask_values(self, values: pl.Expr) -> pl.Expr:
+        return _mask_fields(values, self.fields)
+
+
+def parse_field_path(field: str) -> List[str]:
+    """Splits a dotted field path into its steps
+
+    For example "customer.address.street" is split into ["customer", "address", "street"] and
+    "contacts[].phone" into ["contacts", "[]", "phone"].
+
+    Args:
+        field (str): the field path
+
+    Returns:
+        List[str]: the name of every struct field, with `LIST_ELEMENTS` for every list level
+    """
+    steps = []
+    for name in field.split("."):
+        list_depth = 0
+        while name.endswith(LIST_ELEMENTS):
+            name = name[: -len(LIST_ELEMENTS)]
+            list_depth += 1
+
+        steps.append(name)
+        steps.extend([LIST_ELEMENTS] * list_depth)
+
+    return steps
+
+
+def resolve_field_paths(
+    schema: Mapping[str, pl.DataType],
+    masking: Dict[str, MaskingStrategy],
+    missing_fields: Optional[List[str]] = None,
+) -> Dict[str, MaskingStrategy]:
+    """Groups the masking strategies of PII fields by the top level column they belong to
+
+    Fields naming a top level column, including column names containing dots, mask the whole
+    column. Other fields are parsed as paths into struct and list columns, and the fields of
+    each column are combined into one `NestedFieldsMask`. A field nested in a column that is
+    also masked as a whole is ignored.
+
+    Args:
+        schema (Mapping[str, pl.DataType]): the column names and types of the file being obfuscated
+        masking (Dict[str, MaskingStrategy]): the masking strategy of every PII field
+        missing_fields (Optional[List[str]]): a list PII fields not found in the schema are appended to, leaving them out instead of raising
+
+    Raises:
+        KeyError: if specified PII fields are not found in the schema, unless `missing_fields` is given
+
+    Returns:
+        Dict[str, MaskingStrategy]: the masking strategy of every PII column
+    """
+    columns: Dict[str, MaskingStrategy] = {}
+    nested_fields: FieldTree = {}
+    not_found = []
+
+    for field, strategy in masking.items():
+        if field in schema:
+            columns[field] = strategy
+            continue
+
+        steps = parse_field_path(field)
+        if len(steps) == 1 or _field_dtype(schema, steps) is None:
+            not_found.append(field)
+            continue
+
+        _add_field(nested_fields, steps, strategy)
+
+    if missing_fields is not None:
+        missing_fields.extend(not_found)
+    elif not_found:
+        raise KeyError(f"PII fields not found: {not_found}")
+
+    for column, fields in nested_fields.items():
+        if column not in columns:
+            columns[column] = NestedFieldsMask(fields)
+
+    return columns
+
+
+def _field_dtype(
+    schema: Mapping[str, pl.DataType], steps: List[str]
+) -> Optional[pl.DataType]:
+    """Returns the type of the field a path leads to, or None if the path doesn't exist"""
+    dtype = schema.get(steps[0])
+
+    for step in steps[1:]:
+        if isinstance(dtype, pl.List) and step == LIST_ELEMENTS:
+            dtype = dtype.inner
+        elif isinstance(dtype, pl.Struct) and step != LIST_ELEMENTS:
+            dtype = next(
+                (field.dtype for field in dtype.fields if field.name == step), None
+            )
+        else:
+            return None
+
+    return dtype
+
+
+def _add_field(fields: FieldTree, steps: List[str], strategy: MaskingStrategy) -> None:
+    node = fields
+    for step in steps[:-1]:
+        if isinstance(node.get(step), MaskingStrategy):
+            # An enclosing field is already masked as a whole
+            return
+        node = node.setdefault(step, {})
+
+    node[steps[-1]] = strategy
+
+
+def _mask_fields(values: pl.Expr, fields: FieldTree) -> pl.Expr:
+    if LIST_ELEMENTS in fields:
+        masked = _mask_field(pl.element(), fields[LIST_ELEMENTS])
+        if not masked.meta.root_names():
+            # Constants don't read the elements, and list.eval doesn't broadcast them to every element
+            masked = pl.repeat(masked, pl.len())
+
+        return values.list.eval(masked)
+
+    return values.struct.with_fields(
+        [
+            _mask_field(pl.field(name), field).alias(name)
+            for name, field in fields.items()
+        ]
+    )
+
+
+def _mask_field(values: pl.Expr, field: Any) -> pl.Expr:
+    if isinstance(field, MaskingStrategy):
+        return field.mask_values(values)
+
+    return _mask_fields(values, field)
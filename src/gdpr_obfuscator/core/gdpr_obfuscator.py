@@ -1,33 +1,179 @@
 """Main obfuscation functionality for GDPR compliance."""
 
+import dataclasses
 import io
-from pathlib import Path
-from typing import List, Literal, Tuple
+import itertools
+import json
+import tempfile
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from contextlib import closing, contextmanager
+from typing import (
+    IO,
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Literal,
+    Optional,
+    Tuple,
+    Union,
+)
 
-import boto3
 import polars as pl
 from botocore.exceptions import ClientError
-from types_boto3_s3.client import S3Client
+
+from .avro import (
+    AvroRecords,
+    avro_polars_schema,
+    iter_avro_blocks,
+    masked_avro_schema,
+    read_avro_header,
+    write_avro_block,
+    write_avro_header,
+)
+from .compression import (
+    COMPRESSION_CONTENT_TYPES,
+    MAGIC_BYTES_SIZE,
+    Compression,
+    CompressionArg,
+    check_compression,
+    compressing_writer,
+    compression_from_key,
+    decompress_chunks,
+    detect_compression,
+)
+from .field_paths import resolve_field_paths
+from .json_array import (
+    is_json_array,
+    iter_ndjson_batches,
+    json_array_to_ndjson,
+    ndjson_to_json_array,
+)
+from .masking import (
+    MaskingStrategy,
+    MaskingStrategyArg,
+    resolve_masking,
+    resolve_unmasking,
+)
+from .parquet import (
+    PARQUET_MAGIC,
+    PARQUET_TAIL_SIZE,
+    ParquetMetadata,
+    parse_parquet_footer,
+    parse_parquet_tail,
+    read_parquet_metadata,
+)
+from .planner import EnginePlan, plan_engine
+from .s3_multipart_writer import S3MultipartWriter
+from .sources import (
+    LocalSource,
+    LocalSourceT,
+    S3Source,
+    Source,
+    SourceArg,
+    _parse_s3_path,
+    resolve_source,
+)
+
+if TYPE_CHECKING:
+    from types_boto3_s3.client import S3Client
+    from types_boto3_s3.type_defs import (
+        GetObjectOutputTypeDef,
+        HeadObjectOutputTypeDef,
+    )
+
+DEFAULT_CHUNK_SIZE = 50_000
+"""Default number of rows per batch used by the streaming engine"""
+
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+"""Number of bytes read from the S3 response body at a time when downloading to disk"""
+
+DEFAULT_MAX_CONCURRENCY = 8
+"""Default number of ranged S3 GET requests that run at the same time"""
+
+DEFAULT_PART_SIZE = 8 * 1024 * 1024
+"""Default size in bytes of each ranged S3 GET request used to download a file in parts"""
+
+PARQUET_FOOTER_PREFETCH_SIZE = 64 * 1024
+"""Number of bytes fetched from the end of a Parquet object by the first ranged GET, enough to hold most footers"""
+
+PARQUET_RANGE_COALESCE_GAP = 1024 * 1024
+"""Column chunk ranges closer than this many bytes are fetched with a single ranged GET, as one extra request costs more than the skipped bytes"""
+
+DEFAULT_MAX_POOL_CONNECTIONS = 50
+"""Default size of the connection pool of the cached S3 client, enough for several files downloaded and uploaded concurrently"""
+
+NDJSON_INFER_SCHEMA_LENGTH = None
+"""Every NDJSON record is used to infer the schema, as Polars silently drops fields that only appear after the records it infers the schema from"""
+
+ARROW_FILE_MAGIC = b"ARROW1"
+"""Magic bytes found at the start of Arrow IPC files, which Arrow IPC streams don't have"""
+
+FileType = Literal["csv", "json", "ndjson", "parquet", "arrow", "avro"]
+"""The supported file types: CSV, a JSON array of records, newline-delimited JSON records, Parquet, Arrow IPC or Avro"""
+
+CONTENT_TYPES = {
+    "csv": "text/csv",
+    "json": "application/json",
+    "ndjson": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+    "arrow": "application/vnd.apache.arrow.file",
+    "avro": "application/avro",
+}
+"""MIME types stored with obfuscated files uploaded to S3"""
+
+Engine = Literal["auto", "eager", "streaming"]
+"""The processing engines: `eager` loads files into memory, `streaming` processes them batch by batch and `auto` chooses one of them per file"""
+
+FrameT = Union[pl.DataFrame, pl.LazyFrame]
+
+_s3_clients: Dict[Tuple[int, bool], "S3Client"] = {}
+_s3_clients_lock = threading.Lock()
 
 
 def gdpr_obfuscator(
-    file_to_obfuscate: str,
+    file_to_obfuscate: SourceArg,
     pii_fields: List[str],
     masking_string: str = "***",
-    file_type: Literal["csv", "json", "parquet"] = "csv",
+    file_type: FileType = "csv",
+    engine: Engine = "eager",
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    infer_schema: bool = True,
+    part_size: int = DEFAULT_PART_SIZE,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    s3_client: Optional["S3Client"] = None,
+    masking_strategy: MaskingStrategyArg = None,
+    compression: CompressionArg = "auto",
+    memory_budget: Optional[int] = None,
 ) -> bytes:
     """
-    Obfuscates personally identifiable information (PII) fields in CSV, JSON and Parquet files retrieved from an AWS S3 bucket.
+    Obfuscates personally identifiable information (PII) fields in CSV, JSON and Parquet files retrieved from an AWS S3 bucket, local disk or memory.
 
     Args:
-        file_to_obfuscate (str): S3 address to the file to be obfuscated. Formated as `s3://<bucket_name>/<file_key>` (e.g., "s3://my-bucket-name/some_file_to_obfuscate.csv")
-        pii_fields (List[str]): List of column names containing PII to obfuscate (e.g. ["full_name", "date_of_birth", "address", "phone"])
+        file_to_obfuscate (SourceArg): The file to be obfuscated: an S3 address formated as `s3://<bucket_name>/<file_key>` (e.g., "s3://my-bucket-name/some_file_to_obfuscate.csv"), a local path as an `os.PathLike` such as `pathlib.Path("/data/some_file_to_obfuscate.csv")`, the contents of the file as bytes, or a binary file object. Uncompressed local files are memory-mapped by Polars rather than read into Python bytes
+        pii_fields (List[str]): List of column names containing PII to obfuscate (e.g. ["full_name", "date_of_birth", "address", "phone"]), or dotted paths to fields nested in struct and list columns (e.g. "customer.address.street", "contacts[].phone")
         masking_string (str): String used to replace PII data (default is "***")
-        file_type (Literal["csv", "json", "parquet"]): Type of file to obfuscate (default is "csv"), can be one of `csv`, `json`, or `parquet`
+        file_type (FileType): Type of file to obfuscate (default is "csv"), can be one of `csv`, `json`, `ndjson`, `parquet`, `arrow` or `avro`
+        engine (Engine): Processing engine (default is "eager"). `eager` loads the whole file into a DataFrame in memory. `streaming` downloads the file to a temporary file on local disk and masks it batch by batch with Polars' lazy `scan_*`/`sink_*` APIs, so the working memory is bounded by `chunk_size` rather than by the file size. `auto` measures the file first (with `HeadObject` for S3 files) and uses `eager` when its estimated peak memory fits in `memory_budget`, otherwise `streaming`, logging the choice
+        chunk_size (int): Number of rows processed per batch by the `streaming` engine (default is 50,000)
+        infer_schema (bool): Whether to infer CSV column types (default is True). When False, every CSV column is read as a raw string so non-PII fields are written back exactly as they appear in the source file (e.g. `1.50` is not rewritten as `1.5`) and no time is spent on type inference. Only applies to CSV files
+        part_size (int): Size in bytes of each ranged GET request used to download the file from S3 (default is 8 MiB). Files larger than this are downloaded in parts, concurrently
+        max_concurrency (int): Maximum number of S3 requests in flight at the same time while downloading the file (default is 8)
+        s3_client (Optional[S3Client]): boto3 S3 client used for every request (e.g. `boto3.Session(profile_name="dev").client("s3")`). Defaults to the client cached by `get_s3_client`, so connections are reused across calls
+        masking_strategy (MaskingStrategyArg): How PII values are replaced (default is None, replacing them with `masking_string`). Either a `MaskingStrategy` (e.g. `KeyedHash(key)`) applied to every PII field, or a dictionary mapping PII fields to strategies, where fields left out are replaced with `masking_string`
+        compression (CompressionArg): Codec the obfuscated file is compressed with, one of "gzip", "bz2" or "zstd", or None for an uncompressed file (default is "auto", compressing it like the input). Compressed CSV and JSON inputs are always detected from their first bytes, `ContentEncoding` or key suffix (e.g. ".csv.gz", ".json.zst") and decompressed while they are downloaded. Parquet files compress their column chunks internally and can't be compressed
+        memory_budget (Optional[int]): Memory in bytes the `auto` engine lets the eager engine use (default is None, three quarters of the memory size of the Lambda function, or of the memory limit of the process' container or host outside Lambda)
 
     Raises:
         ValueError: If an empty file_to_obfuscate is passed
-        FileNotFoundError: If the specified file doesn't exist (invalid s3 path)
+        ValueError: If an unsupported file_type, engine or compression is passed
+        ValueError: If a compressed file isn't valid for its codec
+        ValueError: If masking_strategy has fields that aren't PII fields
+        FileNotFoundError: If the specified file doesn't exist (invalid s3 path or os.PathLike local path)
         KeyError: If specified PII fields are not found in the file
         RuntimeError: If an unexpected S3 response error occurs
 
@@ -35,86 +181,1066 @@ def gdpr_obfuscator(
         bytes: A bytes object representing the obfuscated CSV file
     """
     try:
-        bucket, key = _parse_s3_path(file_to_obfuscate)
-        s3_client = boto3.client("s3")  # type: ignore
+        source = resolve_source(file_to_obfuscate)
+        masking = resolve_masking(pii_fields, masking_string, masking_strategy)
+        check_compression(compression)
 
-        file = _get_file_from_s3(bucket, key, s3_client)
+        buffer = io.BytesIO()
+        _obfuscate_source(
+            source,
+            s3_client,
+            buffer,
+            masking,
+            file_type,
+            engine,
+            chunk_size,
+            infer_schema,
+            part_size,
+            max_concurrency,
+            compression,
+            memory_budget,
+        )
 
-        has_trailing_newline = file.endswith(b"\n")
+        return buffer.getvalue()
 
-        if file_type == "csv":
-            df = pl.read_csv(source=file)
-        elif file_type == "json":
-            df = pl.read_json(source=file)
-        elif file_type == "parquet":
-            df = pl.read_parquet(source=file)
+    except pl.exceptions.NoDataError:
+        raise ValueError("empty data from bytes")
+
+
+def gdpr_obfuscate_to_s3(
+    file_to_obfuscate: SourceArg,
+    destination: str,
+    pii_fields: List[str],
+    masking_string: str = "***",
+    file_type: FileType = "csv",
+    engine: Engine = "eager",
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    infer_schema: bool = True,
+    part_size: int = DEFAULT_PART_SIZE,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    s3_client: Optional["S3Client"] = None,
+    masking_strategy: MaskingStrategyArg = None,
+    compression: CompressionArg = "auto",
+    memory_budget: Optional[int] = None,
+) -> str:
+    """
+    Obfuscates PII fields in a CSV, JSON or Parquet file stored in S3, on local disk or in memory and streams the result straight into an S3 object.
+
+    The obfuscated output is never held in memory as a whole: it is uploaded as an S3 multipart upload, in parts of `part_size` bytes, while later batches are still being processed. Parts are uploaded in parallel and the upload is aborted if anything fails, so no partial object is left behind.
+
+    Args:
+        file_to_obfuscate (SourceArg): The file to be obfuscated, see `gdpr_obfuscator`
+        destination (str): S3 address the obfuscated file is written to. Formated as `s3://<bucket_name>/<file_key>` (e.g., "s3://my-bucket-name/some_file_obfuscated.csv")
+        pii_fields (List[str]): List of column names containing PII to obfuscate (e.g. ["full_name", "date_of_birth", "address", "phone"]), or dotted paths to fields nested in struct and list columns (e.g. "customer.address.street", "contacts[].phone")
+        masking_string (str): String used to replace PII data (default is "***")
+        file_type (FileType): Type of file to obfuscate (default is "csv"), can be one of `csv`, `json`, `ndjson`, `parquet`, `arrow` or `avro`
+        engine (Engine): Processing engine (default is "eager"), see `gdpr_obfuscator`
+        chunk_size (int): Number of rows processed per batch by the `streaming` engine (default is 50,000)
+        infer_schema (bool): Whether to infer CSV column types (default is True), see `gdpr_obfuscator`
+        part_size (int): Size in bytes of each part downloaded and uploaded (default is 8 MiB). S3 requires upload parts of at least 5 MiB
+        max_concurrency (int): Maximum number of S3 requests in flight at the same time, for downloads and for uploads (default is 8)
+        s3_client (Optional[S3Client]): boto3 S3 client used for every request. Defaults to the client cached by `get_s3_client`
+        masking_strategy (MaskingStrategyArg): How PII values are replaced (default is None, replacing them with `masking_string`), see `gdpr_obfuscator`
+        compression (CompressionArg): Codec the obfuscated file is compressed with as it is uploaded, see `gdpr_obfuscator` (default is "auto", choosing it from the suffix of `destination`, e.g. "gzip" for ".csv.gz", and leaving the file uncompressed for other suffixes)
+        memory_budget (Optional[int]): Memory in bytes the `auto` engine lets the eager engine use, see `gdpr_obfuscator`
+
+    Raises:
+        ValueError: If an empty file_to_obfuscate is passed
+        ValueError: If an unsupported file_type, engine or compression is passed
+        ValueError: If a compressed file isn't valid for its codec
+        ValueError: If masking_strategy has fields that aren't PII fields
+        FileNotFoundError: If the specified file or the destination bucket doesn't exist (invalid s3 path or os.PathLike local path)
+        KeyError: If specified PII fields are not found in the file
+        RuntimeError: If an unexpected S3 response error occurs
+
+    Returns:
+        str: the S3 address of the obfuscated file
+    """
+    try:
+        source = resolve_source(file_to_obfuscate)
+        destination_bucket, destination_key = _parse_s3_path(destination)
+        masking = resolve_masking(pii_fields, masking_string, masking_strategy)
+        check_compression(compression)
+        if compression == "auto":
+            compression = compression_from_key(destination_key)
+        s3_client = s3_client or get_s3_client()
+
+        with S3MultipartWriter(
+            destination_bucket,
+            destination_key,
+            s3_client,
+            part_size=part_size,
+            max_concurrency=max_concurrency,
+            content_type=COMPRESSION_CONTENT_TYPES[compression]
+            if compression
+            else CONTENT_TYPES.get(file_type),
+        ) as output:
+            _obfuscate_source(
+                source,
+                s3_client,
+                output,
+                masking,
+                file_type,
+                engine,
+                chunk_size,
+                infer_schema,
+                part_size,
+                max_concurrency,
+                compression,
+                memory_budget,
+            )
+
+        return destination
+
+    except pl.exceptions.NoDataError:
+        raise ValueError("empty data from bytes")
+
+
+def gdpr_deobfuscator(
+    file_to_deobfuscate: SourceArg,
+    pii_fields: List[str],
+    masking_strategy: MaskingStrategyArg,
+    file_type: FileType = "csv",
+    engine: Engine = "eager",
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    infer_schema: bool = True,
+    part_size: int = DEFAULT_PART_SIZE,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    s3_client: Optional["S3Client"] = None,
+    compression: CompressionArg = "auto",
+    memory_budget: Optional[int] = None,
+) -> bytes:
+    """
+    Recovers the original values of PII fields masked with a reversible masking strategy (e.g. `DeterministicEncryption` or `Tokenize`) in a CSV, JSON or Parquet file retrieved from an AWS S3 bucket, local disk or memory.
+
+    Args:
+        file_to_deobfuscate (SourceArg): The obfuscated file, see `gdpr_obfuscator` (e.g., "s3://my-bucket-name/some_file_obfuscated.csv")
+        pii_fields (List[str]): List of column names or nested field paths to recover (e.g. ["email", "contacts[].phone"])
+        masking_strategy (MaskingStrategyArg): The reversible strategy the fields were obfuscated with, with the same key or vault, or a dictionary mapping every field to its strategy
+        file_type (FileType): Type of file to deobfuscate (default is "csv"), can be one of `csv`, `json`, `ndjson`, `parquet`, `arrow` or `avro`
+        engine (Engine): Processing engine (default is "eager"), see `gdpr_obfuscator`
+        chunk_size (int): Number of rows processed per batch by the `streaming` engine (default is 50,000)
+        infer_schema (bool): Whether to infer CSV column types (default is True). Only applies to CSV files
+        part_size (int): Size in bytes of each ranged GET request used to download the file from S3 (default is 8 MiB)
+        max_concurrency (int): Maximum number of S3 requests in flight at the same time while downloading the file (default is 8)
+        s3_client (Optional[S3Client]): boto3 S3 client used for every request. Defaults to the client cached by `get_s3_client`
+        compression (CompressionArg): Codec the recovered file is compressed with, see `gdpr_obfuscator` (default is "auto", compressing it like the input)
+        memory_budget (Optional[int]): Memory in bytes the `auto` engine lets the eager engine use, see `gdpr_obfuscator`
+
+    Raises:
+        ValueError: If an empty file_to_deobfuscate is passed
+        ValueError: If a field has no strategy or a strategy that isn't reversible
+        ValueError: If an unsupported compression is passed or a compressed file isn't valid for its codec
+        ValueError: If values can't be decrypted with the key of a `DeterministicEncryption` strategy
+        FileNotFoundError: If the specified file doesn't exist (invalid s3 path or os.PathLike local path)
+        KeyError: If specified fields are not found in the file
+
+    Returns:
+        bytes: A bytes object representing the file with its original values, as strings
+    """
+    try:
+        source = resolve_source(file_to_deobfuscate)
+        masking = resolve_unmasking(pii_fields, masking_strategy)
+        check_compression(compression)
+
+        buffer = io.BytesIO()
+        _obfuscate_source(
+            source,
+            s3_client,
+            buffer,
+            masking,
+            file_type,
+            engine,
+            chunk_size,
+            infer_schema,
+            part_size,
+            max_concurrency,
+            compression,
+            memory_budget,
+        )
+
+        return buffer.getvalue()
+
+    except pl.exceptions.NoDataError:
+        raise ValueError("empty data from bytes")
+
+
+def get_s3_client(
+    max_pool_connections: int = DEFAULT_MAX_POOL_CONNECTIONS,
+    tcp_keepalive: bool = True,
+) -> "S3Client":
+    """
+    Returns an S3 client shared by every call made in this process.
+
+    The client is created on first use and cached, so credential resolution and endpoint setup only happen once and warm invocations (e.g. in a reused Lambda container) reuse open TCP/TLS connections. Its connection pool holds up to `max_pool_connections` connections, kept alive with TCP keep-alive unless `tcp_keepalive` is False. A cached client with the same `tcp_keepalive` whose pool is at least that large is reused, the smallest one if there are several, so a client built with a larger pool, e.g. by `warm_up`, serves every call asking for less. Otherwise a new client is built and cached.
+
+    Args:
+        max_pool_connections (int): Maximum number of connections kept open in the client's connection pool (default is 50). Should be at least the number of S3 requests expected to be in flight at the same time
+        tcp_keepalive (bool): Whether TCP keep-alive probes are sent on the client's connections (default is True). Disable it on networks that drop or penalize keep-alive probes
+
+    Returns:
+        S3Client: the cached boto3 S3 client
+    """
+    with _s3_clients_lock:
+        large_enough = [
+            size
+            for size, keepalive in _s3_clients
+            if keepalive == tcp_keepalive and size >= max_pool_connections
+        ]
+        if large_enough:
+            return _s3_clients[(min(large_enough), tcp_keepalive)]
+
+        # Imported on first use, as boto3 adds to the import time of every cold start
+        import boto3
+        from botocore.config import Config
+
+        key = (max_pool_connections, tcp_keepalive)
+        _s3_clients[key] = boto3.client(
+            "s3",
+            config=Config(
+                max_pool_connections=max_pool_connections, tcp_keepalive=tcp_keepalive
+            ),
+        )
+
+        return _s3_clients[key]
+
+
+def _obfuscate_source(
+    source: Source,
+    s3_client: Optional["S3Client"],
+    output: IO[bytes],
+    masking: Dict[str, MaskingStrategy],
+    file_type: FileType,
+    engine: Engine,
+    chunk_size: int,
+    infer_schema: bool,
+    part_size: int,
+    max_concurrency: int,
+    compression: CompressionArg = "auto",
+    memory_budget: Optional[int] = None,
+) -> None:
+    """Obfuscates a file from wherever it is stored and writes its obfuscated version to `output`
+
+    Args:
+        source (Source): the file to obfuscate
+        s3_client (Optional[S3Client]): the S3 client to use for S3 sources, the client cached by `get_s3_client` if None
+        output (IO[bytes]): the binary file object the obfuscated file is written to
+        masking (Dict[str, MaskingStrategy]): the masking strategy of every PII column
+        file_type (FileType): type of the file to obfuscate
+        engine (Engine): the processing engine, "auto" to choose it from the size of the file
+        chunk_size (int): number of rows per streaming batch
+        infer_schema (bool): whether to infer CSV column types or read them as raw strings
+        part_size (int): size in bytes of each ranged GET request
+        max_concurrency (int): maximum number of ranged GET requests in flight at the same time
+        compression (CompressionArg): codec the obfuscated file is compressed with, "auto" to use the codec of the input
+        memory_budget (Optional[int]): memory in bytes the eager engine may use when the engine is "auto", None for the default budget
+
+    Raises:
+        ValueError: if an unsupported file_type or engine is passed
+        ValueError: if a Parquet file is to be compressed
+        KeyError: if specified PII fields are not found in the file
+    """
+    if engine == "auto":
+        engine = _plan_engine(source, s3_client, file_type, memory_budget).engine
+
+    if isinstance(source, S3Source):
+        return _obfuscate_from_s3(
+            source.bucket,
+            source.key,
+            s3_client or get_s3_client(),
+            output,
+            masking,
+            file_type,
+            engine,
+            chunk_size,
+            infer_schema,
+            part_size,
+            max_concurrency,
+            compression,
+        )
+
+    return _obfuscate_local(
+        source,
+        output,
+        masking,
+        file_type,
+        engine,
+        chunk_size,
+        infer_schema,
+        compression,
+    )
+
+
+def _plan_engine(
+    source: Source,
+    s3_client: Optional["S3Client"],
+    file_type: FileType,
+    memory_budget: Optional[int],
+) -> EnginePlan:
+    """Measures a file without reading it and chooses the engine it is processed with
+
+    S3 files are measured with a single HeadObject request, and local files from the file system.
+    Compression is detected like it is when the file is read, except that S3 files can only be
+    recognised from their `ContentEncoding` and key suffix before they are downloaded.
+
+    Args:
+        source (Source): the file to obfuscate
+        s3_client (Optional[S3Client]): the S3 client to use for S3 sources, the client cached by `get_s3_client` if None
+        file_type (FileType): type of the file to obfuscate
+        memory_budget (Optional[int]): memory in bytes the eager engine may use, None for the default budget
+
+    Raises:
+        FileNotFoundError: if an S3 file or its bucket doesn't exist
+
+    Returns:
+        EnginePlan: the chosen engine and the reason it was chosen
+    """
+    if isinstance(source, S3Source):
+        response = _head_object(source.bucket, source.key, s3_client or get_s3_client())
+        name = f"s3://{source.bucket}/{source.key}"
+        size: Optional[int] = response["ContentLength"]
+        compression = detect_compression(source.key, response.get("ContentEncoding"))
+    else:
+        name = source.name or type(source).__name__
+        size = source.size()
+        compression = detect_compression(
+            source.name, None, source.peek(MAGIC_BYTES_SIZE)
+        )
+
+    compressed = file_type != "parquet" and compression is not None
+
+    return plan_engine(
+        name,
+        file_type,
+        size,
+        compressed=compressed,
+        in_place=isinstance(source, LocalSource) and not compressed,
+        memory_budget=memory_budget,
+    )
+
+
+def _obfuscate_local(
+    source: LocalSourceT,
+    output: IO[bytes],
+    masking: Dict[str, MaskingStrategy],
+    file_type: FileType,
+    engine: Literal["eager", "streaming"],
+    chunk_size: int,
+    infer_schema: bool,
+    compression: CompressionArg = "auto",
+) -> None:
+    """Obfuscates a local file, the contents of a file or a file object and writes its obfuscated version to `output`
+
+    Uncompressed local files are handed to Polars by path, with both engines, so Polars
+    memory-maps them instead of the file being copied into Python bytes. Compressed files are
+    decompressed into memory by the eager engine and into a temporary file by the streaming
+    engine, and file objects are copied into a temporary file by the streaming engine, as for
+    files downloaded from S3.
+
+    Args:
+        source (LocalSourceT): the file to obfuscate
+        output (IO[bytes]): the binary file object the obfuscated file is written to
+        masking (Dict[str, MaskingStrategy]): the masking strategy of every PII column
+        file_type (FileType): type of the file to obfuscate
+        engine (Literal["eager", "streaming"]): the processing engine
+        chunk_size (int): number of rows per streaming batch
+        infer_schema (bool): whether to infer CSV column types or read them as raw strings
+        compression (CompressionArg): codec the obfuscated file is compressed with, "auto" to use the codec of the input
+
+    Raises:
+        ValueError: if an unsupported file_type or engine is passed
+        ValueError: if a Parquet file is to be compressed
+        KeyError: if specified PII fields are not found in the file
+    """
+    if engine not in ("eager", "streaming"):
+        raise ValueError(f"Unsupported engine: {engine}")
+
+    source_chunks = source.iter_chunks()
+    first_chunk = next(source_chunks, b"")
+    chunks = itertools.chain([first_chunk], source_chunks)
+
+    input_compression = None
+    if file_type == "parquet":
+        if compression not in ("auto", None):
+            raise ValueError(
+                "Parquet files can't be compressed, their column chunks are compressed internally"
+            )
+    else:
+        input_compression = detect_compression(
+            source.name, None, first_chunk[:MAGIC_BYTES_SIZE]
+        )
+    output_compression = input_compression if compression == "auto" else compression
+
+    if input_compression:
+        chunks = decompress_chunks(chunks, input_compression)
+
+    with (
+        closing(source_chunks),
+        compressing_writer(output, output_compression) as writer,
+    ):
+        if isinstance(source, LocalSource) and not input_compression:
+            if engine == "eager":
+                _obfuscate_eager(source.path, writer, masking, file_type, infer_schema)
+            else:
+                _obfuscate_streaming(
+                    source.path, writer, masking, file_type, chunk_size, infer_schema
+                )
+        elif engine == "eager":
+            _obfuscate_eager(b"".join(chunks), writer, masking, file_type, infer_schema)
         else:
-            raise ValueError(f"Unsupported file type: {file_type}")
+            with tempfile.NamedTemporaryFile(suffix=f".{file_type}") as local_file:
+                for chunk in chunks:
+                    local_file.write(chunk)
+                local_file.flush()
+
+                _obfuscate_streaming(
+                    local_file.name,
+                    writer,
+                    masking,
+                    file_type,
+                    chunk_size,
+                    infer_schema,
+                )
+
 
-        missing_columns = [col for col in pii_fields if col not in df.columns]
-        if missing_columns:
-            raise KeyError(f"PII fields not found: {missing_columns}")
+def _obfuscate_from_s3(
+    bucket: str,
+    key: str,
+    s3_client: "S3Client",
+    output: IO[bytes],
+    masking: Dict[str, MaskingStrategy],
+    file_type: FileType,
+    engine: Literal["eager", "streaming"],
+    chunk_size: int,
+    infer_schema: bool,
+    part_size: int,
+    max_concurrency: int,
+    compression: CompressionArg = "auto",
+) -> None:
+    """Downloads a file from S3 with the chosen engine and writes its obfuscated version to `output`
 
-        df_obfuscated = df.with_columns(
-            [pl.lit(masking_string).alias(col) for col in pii_fields]
+    Compressed CSV and JSON files are decompressed while they are downloaded: their parts are
+    fetched concurrently but fed to the decompressor in order.
+
+    Args:
+        bucket (str): the name of the S3 bucket
+        key (str): the key of the file in the S3 bucket
+        s3_client (S3Client): the S3 client to use for the requests
+        output (IO[bytes]): the binary file object the obfuscated file is written to
+        masking (Dict[str, MaskingStrategy]): the masking strategy of every PII column
+        file_type (FileType): type of the file to obfuscate
+        engine (Literal["eager", "streaming"]): the processing engine
+        chunk_size (int): number of rows per streaming batch
+        infer_schema (bool): whether to infer CSV column types or read them as raw strings
+        part_size (int): size in bytes of each ranged GET request
+        max_concurrency (int): maximum number of ranged GET requests in flight at the same time
+        compression (CompressionArg): codec the obfuscated file is compressed with, "auto" to use the codec of the input
+
+    Raises:
+        ValueError: if an unsupported file_type or engine is passed
+        ValueError: if a Parquet file is to be compressed
+        KeyError: if specified PII fields are not found in the file
+    """
+    if engine not in ("eager", "streaming"):
+        raise ValueError(f"Unsupported engine: {engine}")
+
+    if file_type == "parquet":
+        if compression not in ("auto", None):
+            raise ValueError(
+                "Parquet files can't be compressed, their column chunks are compressed internally"
+            )
+
+        return _obfuscate_parquet_from_s3(
+            bucket, key, s3_client, output, masking, engine, chunk_size, max_concurrency
         )
 
+    response = _get_first_part(bucket, key, s3_client, part_size)
+    input_compression = detect_compression(
+        key, response.get("ContentEncoding"), _peek_body(response, MAGIC_BYTES_SIZE)
+    )
+    output_compression = input_compression if compression == "auto" else compression
+
+    with compressing_writer(output, output_compression) as writer:
+        if engine == "eager":
+            if input_compression:
+                file = b"".join(
+                    _iter_decompressed_file_from_s3(
+                        bucket,
+                        key,
+                        s3_client,
+                        response,
+                        input_compression,
+                        part_size,
+                        max_concurrency,
+                    )
+                )
+            else:
+                file = _get_file_from_s3(
+                    bucket, key, s3_client, part_size, max_concurrency, response
+                )
+
+            _obfuscate_eager(file, writer, masking, file_type, infer_schema)
+        else:
+            with tempfile.NamedTemporaryFile(suffix=f".{file_type}") as source:
+                if input_compression:
+                    for chunk in _iter_decompressed_file_from_s3(
+                        bucket,
+                        key,
+                        s3_client,
+                        response,
+                        input_compression,
+                        part_size,
+                        max_concurrency,
+                    ):
+                        source.write(chunk)
+                    source.flush()
+                else:
+                    _download_file_from_s3(
+                        bucket,
+                        key,
+                        s3_client,
+                        source,
+                        part_size,
+                        max_concurrency,
+                        response,
+                    )
+
+                _obfuscate_streaming(
+                    source.name,
+                    writer,
+                    masking,
+                    file_type,
+                    chunk_size,
+                    infer_schema,
+                )
+
+
+def _obfuscate_parquet_from_s3(
+    bucket: str,
+    key: str,
+    s3_client: "S3Client",
+    output: IO[bytes],
+    masking: Dict[str, MaskingStrategy],
+    engine: Literal["eager", "streaming"],
+    chunk_size: int,
+    max_concurrency: int,
+) -> None:
+    """Downloads the column chunks a Parquet file needs from S3 and writes its obfuscated version to `output`
+
+    Args:
+        bucket (str): the name of the S3 bucket
+        key (str): the key of the file in the S3 bucket
+        s3_client (S3Client): the S3 client to use for the requests
+        output (IO[bytes]): the binary file object the obfuscated file is written to
+        masking (Dict[str, MaskingStrategy]): the masking strategy of every PII column
+        engine (Literal["eager", "streaming"]): the processing engine
+        chunk_size (int): number of rows per streaming batch
+        max_concurrency (int): maximum number of ranged GET requests in flight at the same time
+
+    Raises:
+        KeyError: if specified PII fields are not found in the file
+    """
+    skip_columns = [
+        column for column, strategy in masking.items() if not strategy.reads_values
+    ]
+
+    if engine == "eager":
         buffer = io.BytesIO()
+        _download_parquet_columns_from_s3(
+            bucket, key, s3_client, skip_columns, buffer, max_concurrency
+        )
+        _obfuscate_parquet(buffer.getvalue(), output, masking)
+    else:
+        with tempfile.NamedTemporaryFile(suffix=".parquet") as source:
+            _download_parquet_columns_from_s3(
+                bucket, key, s3_client, skip_columns, source, max_concurrency
+            )
+            _obfuscate_parquet(source.name, output, masking, chunk_size)
 
-        if file_type == "csv":
-            df_obfuscated.write_csv(file=buffer)
-            result = buffer.getvalue()
 
-            if not has_trailing_newline and result.endswith(b"\n"):
-                result = result[:-1]
+def _obfuscate_eager(
+    file: Union[bytes, str],
+    output: IO[bytes],
+    masking: Dict[str, MaskingStrategy],
+    file_type: FileType,
+    infer_schema: bool = True,
+    missing_fields: Optional[List[str]] = None,
+) -> None:
+    """Obfuscates a file held in memory or on local disk by loading it into a single DataFrame
+
+    Args:
+        file (Union[bytes, str]): the contents of the file to obfuscate, or a path to it on local disk, which Polars memory-maps
+        output (IO[bytes]): the binary file object the obfuscated file is written to
+        masking (Dict[str, MaskingStrategy]): the masking strategy of every PII column
+        file_type (FileType): type of the file to obfuscate
+        infer_schema (bool): whether to infer CSV column types or read them as raw strings
+        missing_fields (Optional[List[str]]): a list PII fields not found in a CSV, JSON or NDJSON file are appended to, leaving them unmasked instead of raising
+
+    Raises:
+        ValueError: if an unsupported file_type is passed
+        KeyError: if specified PII fields are not found in the file, unless `missing_fields` is given
+    """
+    if file_type == "parquet":
+        return _obfuscate_parquet(file, output, masking)
+
+    if file_type == "arrow":
+        return _obfuscate_arrow(file, output, masking)
+
+    if file_type == "avro":
+        return _obfuscate_avro(file, output, masking)
+
+    if file_type == "csv":
+        df = pl.read_csv(source=file, infer_schema=infer_schema)
+    elif file_type == "json":
+        df = pl.read_json(source=file)
+    elif file_type == "ndjson":
+        try:
+            df = pl.read_ndjson(
+                source=file, infer_schema_length=NDJSON_INFER_SCHEMA_LENGTH
+            )
+        except pl.exceptions.ComputeError as err:
+            raise _translate_ndjson_error(file, err)
+    else:
+        raise ValueError(f"Unsupported file type: {file_type}")
+
+    masking = resolve_field_paths(df.schema, masking, missing_fields)
+
+    df_obfuscated = _mask_pii_fields(df, masking)
+
+    if file_type == "csv":
+        has_trailing_newline = (
+            _has_trailing_newline(file)
+            if isinstance(file, str)
+            else file.endswith(b"\n")
+        )
+        with _match_trailing_newline(output, has_trailing_newline) as csv_output:
+            df_obfuscated.write_csv(file=csv_output)
+    elif file_type == "json":
+        df_obfuscated.write_json(file=output)
+    else:
+        df_obfuscated.write_ndjson(file=output)
+
+
+def _obfuscate_streaming(
+    source: str,
+    output: IO[bytes],
+    masking: Dict[str, MaskingStrategy],
+    file_type: FileType,
+    chunk_size: int,
+    infer_schema: bool = True,
+) -> None:
+    """Obfuscates a file stored on local disk batch by batch using Polars' streaming engine
+
+    Only one batch of `chunk_size` rows is materialised at a time, and NDJSON records are read
+    and written line by line. JSON arrays have no lazy reader in Polars, so they are parsed
+    incrementally instead (see `_obfuscate_json_array_streaming`). Other JSON documents, such as
+    a single object, are parsed eagerly.
+
+    Args:
+        source (str): path to the local file to obfuscate
+        output (IO[bytes]): the binary file object the obfuscated file is written to
+        masking (Dict[str, MaskingStrategy]): the masking strategy of every PII column
+        file_type (FileType): type of the file to obfuscate
+        chunk_size (int): number of rows per streaming batch
+        infer_schema (bool): whether to infer CSV column types or read them as raw strings
+
+    Raises:
+        ValueError: if an unsupported file_type is passed
+        KeyError: if specified PII fields are not found in the file
+    """
+    if file_type == "parquet":
+        return _obfuscate_parquet(source, output, masking, chunk_size)
+
+    if file_type == "arrow":
+        return _obfuscate_arrow(source, output, masking, chunk_size)
+
+    if file_type == "avro":
+        return _obfuscate_avro(source, output, masking)
+
+    if file_type == "json" and is_json_array(source):
+        return _obfuscate_json_array_streaming(source, output, masking, chunk_size)
+
+    if file_type == "csv":
+        lf = pl.scan_csv(source=source, infer_schema=infer_schema)
+    elif file_type == "json":
+        lf = pl.read_json(source=source).lazy()
+    elif file_type == "ndjson":
+        lf = pl.scan_ndjson(
+            source=source,
+            infer_schema_length=NDJSON_INFER_SCHEMA_LENGTH,
+            batch_size=chunk_size,
+        )
+    else:
+        raise ValueError(f"Unsupported file type: {file_type}")
+
+    try:
+        schema = lf.collect_schema()
+    except pl.exceptions.ComputeError as err:
+        if file_type == "ndjson":
+            raise _translate_ndjson_error(source, err)
+        raise
+
+    masking = resolve_field_paths(schema, masking)
+
+    lf_obfuscated = _mask_pii_fields(lf, masking)
+
+    with pl.Config(streaming_chunk_size=chunk_size):
+        if file_type == "csv":
+            with _match_trailing_newline(
+                output, _has_trailing_newline(source)
+            ) as csv_output:
+                lf_obfuscated.sink_csv(csv_output, batch_size=chunk_size)
         elif file_type == "json":
-            df_obfuscated.write_json(file=buffer)
-            result = buffer.getvalue()
-        elif file_type == "parquet":
-            df_obfuscated.write_parquet(file=buffer)
-            result = buffer.getvalue()
+            lf_obfuscated.collect().write_json(file=output)
+        else:
+            lf_obfuscated.sink_ndjson(output)
 
-        return result
 
-    except pl.exceptions.NoDataError:
-        raise ValueError("empty data from bytes")
+def _obfuscate_json_array_streaming(
+    source: str,
+    output: IO[bytes],
+    masking: Dict[str, MaskingStrategy],
+    chunk_size: int,
+) -> None:
+    """Obfuscates a JSON array of records stored on local disk batch by batch
+
+    The array is walked by an incremental parser that copies its records to a temporary NDJSON
+    file, one per line. Their schema is inferred from every record, then they are read, masked
+    and written back as a JSON array `chunk_size` records at a time, so memory usage doesn't
+    grow with the size of the file.
+
+    Args:
+        source (str): path to the local JSON array file to obfuscate
+        output (IO[bytes]): the binary file object the obfuscated JSON array is written to
+        masking (Dict[str, MaskingStrategy]): the masking strategy of every PII column
+        chunk_size (int): number of records per streaming batch
+
+    Raises:
+        ValueError: if the file isn't a valid JSON array
+        KeyError: if specified PII fields are not found in the file
+    """
+    with tempfile.NamedTemporaryFile(suffix=".ndjson") as records:
+        if not json_array_to_ndjson(source, records):
+            # Empty arrays have no records to infer a schema from
+            with open(source, mode="rb") as file:
+                return _obfuscate_eager(file.read(), output, masking, "json")
+
+        schema = pl.scan_ndjson(
+            records.name, infer_schema_length=NDJSON_INFER_SCHEMA_LENGTH
+        ).collect_schema()
+        masking = resolve_field_paths(schema, masking)
+
+        records.seek(0)
+        with ndjson_to_json_array(output) as ndjson_output:
+            for batch in iter_ndjson_batches(records, chunk_size):
+                df = pl.read_ndjson(batch, schema=schema)
+                _mask_pii_fields(df, masking).write_ndjson(ndjson_output)
+
+
+def _obfuscate_parquet(
+    source: Union[bytes, str],
+    output: IO[bytes],
+    masking: Dict[str, MaskingStrategy],
+    chunk_size: Optional[int] = None,
+) -> None:
+    """Obfuscates a Parquet file without ever reading or decoding PII columns whose masked values don't depend on them
+
+    Args:
+        source (Union[bytes, str]): the contents of the Parquet file, or a path to it on local disk
+        output (IO[bytes]): the binary file object the obfuscated file is written to
+        masking (Dict[str, MaskingStrategy]): the masking strategy of every PII column
+        chunk_size (Optional[int]): number of rows per streaming batch. When None the result is collected into a single DataFrame before being written
+
+    Raises:
+        KeyError: if specified PII fields are not found in the file
+    """
+    metadata = read_parquet_metadata(source)
+
+    masking = resolve_field_paths(pl.scan_parquet(source).collect_schema(), masking)
+
+    lf_obfuscated = _scan_parquet_row_groups(source, metadata, masking)
+
+    if chunk_size is None:
+        lf_obfuscated.collect().write_parquet(file=output)
+    else:
+        with pl.Config(streaming_chunk_size=chunk_size):
+            lf_obfuscated.sink_parquet(output, row_group_size=chunk_size)
+
+
+def _obfuscate_arrow(
+    source: Union[bytes, str],
+    output: IO[bytes],
+    masking: Dict[str, MaskingStrategy],
+    chunk_size: Optional[int] = None,
+) -> None:
+    """Obfuscates an Arrow IPC file or stream, writing the result in the same format
+
+    Arrow IPC files on local disk are memory-mapped without rechunking, so the buffers of the
+    non-PII columns are written to the output straight from the page cache, record batch by
+    record batch, and only the masked columns are allocated. Files held in memory are copied
+    once by Polars, and streams, which have no footer to locate their record batches, are read
+    as a whole. The output is uncompressed and uses the oldest Arrow layout Polars can write,
+    such as large strings rather than string views, so readers like Spark and DuckDB can
+    memory-map it in turn.
+
+    Args:
+        source (Union[bytes, str]): the contents of the Arrow IPC file or stream, or a path to it on local disk
+        output (IO[bytes]): the binary file object the obfuscated file is written to
+        masking (Dict[str, MaskingStrategy]): the masking strategy of every PII column
+        chunk_size (Optional[int]): number of rows per streaming batch, None to use the Polars default
+
+    Raises:
+        KeyError: if specified PII fields are not found in the file
+    """
+    if isinstance(source, bytes):
+        is_ipc_file = source.startswith(ARROW_FILE_MAGIC)
+    else:
+        with open(source, mode="rb") as file:
+            is_ipc_file = file.read(len(ARROW_FILE_MAGIC)) == ARROW_FILE_MAGIC
+
+    if not is_ipc_file:
+        df = pl.read_ipc_stream(source, rechunk=False)
+        masking = resolve_field_paths(df.schema, masking)
+        _mask_pii_fields(df, masking).write_ipc_stream(
+            output, compat_level=pl.CompatLevel.oldest()
+        )
+        return
+
+    if isinstance(source, bytes):
+        lf = pl.scan_ipc(source)
+    else:
+        lf = pl.read_ipc(source, memory_map=True, rechunk=False).lazy()
+
+    masking = resolve_field_paths(lf.collect_schema(), masking)
+
+    with pl.Config(streaming_chunk_size=chunk_size):
+        # Unlike write_ipc, sink_ipc writes record batches as they are masked
+        _mask_pii_fields(lf, masking).sink_ipc(
+            output, compat_level=pl.CompatLevel.oldest()
+        )
 
 
-def _parse_s3_path(s3_path: str) -> Tuple[str, str]:
-    """Parses a given S3 path, such as "s3://bucket_name/file_key.csv" and returns an s3 bucket name and a file key
+def _obfuscate_avro(
+    source: Union[bytes, str],
+    output: IO[bytes],
+    masking: Dict[str, MaskingStrategy],
+) -> None:
+    """Obfuscates an Avro object container file one block at a time, keeping its schema and codec
+
+    Every block is decompressed and only its PII fields are decoded, into a DataFrame of the
+    block's records that is masked like any other file. The masked values are encoded between
+    the original bytes of the other fields and the block is recompressed and written before
+    the next one is read, so memory usage depends on the size of the blocks rather than the
+    file. PII fields whose masking strategy doesn't read their values are skipped without being
+    decoded. Masked fields that aren't strings become strings in the output schema.
 
     Args:
-        s3_path (str): an s3 path formatted as "s3://bucket_name/file_key.csv"
+        source (Union[bytes, str]): the contents of the Avro file, or a path to it on local disk
+        output (IO[bytes]): the binary file object the obfuscated file is written to
+        masking (Dict[str, MaskingStrategy]): the masking strategy of every PII column
 
     Raises:
-        FileNotFoundError: if an empty path string is given
-        FileNotFoundError: if it has a malformed s3 path such as missing the "s3://" prefix
+        ValueError: if the file isn't a valid Avro file, or a PII field has no Polars equivalent
+        ImportError: if the codec of the file requires a package that isn't installed
+        KeyError: if specified PII fields are not found in the file
+    """
+    with (
+        io.BytesIO(source) if isinstance(source, bytes) else open(source, mode="rb")
+    ) as file:
+        header = read_avro_header(file)
+        masking = resolve_field_paths(avro_polars_schema(header.schema), masking)
+
+        decoded_fields = [col for col in masking if masking[col].reads_values]
+        dtypes = avro_polars_schema(header.schema, strict_fields=decoded_fields)
+        output_header = dataclasses.replace(
+            header, schema=masked_avro_schema(header.schema, masking)
+        )
+        if output_header.schema != header.schema:
+            output_header.metadata = {
+                **header.metadata,
+                "avro.schema": json.dumps(
+                    output_header.schema, separators=(",", ":")
+                ).encode(),
+            }
+        records = AvroRecords(
+            header.schema,
+            output_header.schema,
+            decoded_fields,
+            [col for col in masking if col not in decoded_fields],
+        )
+
+        write_avro_header(output, output_header)
+        for count, data in iter_avro_blocks(file, header):
+            values, gaps = records.decode_block(data, count)
+            df = pl.DataFrame(
+                [pl.Series(col, values[col], dtype=dtypes[col]) for col in values]
+                or [pl.Series("__row__", [None] * count)]
+            )
+            df_obfuscated = _mask_pii_fields(df, masking)
+
+            write_avro_block(
+                output,
+                output_header,
+                count,
+                records.encode_block(
+                    {col: df_obfuscated[col].to_list() for col in masking}, gaps
+                ),
+            )
+
+
+def _scan_parquet_row_groups(
+    source: Union[bytes, str],
+    metadata: ParquetMetadata,
+    masking: Dict[str, MaskingStrategy],
+) -> pl.LazyFrame:
+    """Builds a LazyFrame that masks a Parquet file one row group at a time
+
+    Only the non-PII columns and the PII columns whose masking strategy reads their values are
+    projected from the source, so the other PII column chunks are never decompressed or
+    decoded. Their masked values are broadcast to each row group's row count instead.
+
+    Args:
+        source (Union[bytes, str]): the contents of the Parquet file, or a path to it on local disk
+        metadata (ParquetMetadata): the parsed footer of the Parquet file
+        masking (Dict[str, MaskingStrategy]): the masking strategy of every PII column
+
+    Returns:
+        pl.LazyFrame: the obfuscated rows, in the original column order
+    """
+    read_columns = [
+        col
+        for col in metadata.columns
+        if col not in masking or masking[col].reads_values
+    ]
+    lf = _mask_pii_fields(
+        pl.scan_parquet(source=source).select(read_columns),
+        {col: masking[col] for col in masking if col in read_columns},
+    )
+
+    generated_columns = [col for col in masking if col not in read_columns]
+    if not metadata.row_groups:
+        return _mask_pii_fields(
+            lf, {col: masking[col] for col in generated_columns}
+        ).select(metadata.columns)
+
+    masked_columns = [masking[col].mask(col).alias(col) for col in generated_columns]
+
+    row_groups = []
+    offset = 0
+    for row_group in metadata.row_groups:
+        if read_columns:
+            lf_row_group = lf.slice(offset, row_group.num_rows)
+        else:
+            lf_row_group = pl.LazyFrame().select(
+                pl.repeat(None, row_group.num_rows).alias("__row__")
+            )
+
+        row_groups.append(
+            lf_row_group.with_columns(masked_columns).select(metadata.columns)
+        )
+        offset += row_group.num_rows
+
+    return pl.concat(row_groups)
+
+
+def _mask_pii_fields(frame: FrameT, masking: Dict[str, MaskingStrategy]) -> FrameT:
+    """Replaces every value of the PII columns of a DataFrame or LazyFrame using their masking strategy
+
+    Args:
+        frame (FrameT): the DataFrame or LazyFrame to obfuscate
+        masking (Dict[str, MaskingStrategy]): the masking strategy of every PII column
 
     Returns:
-        Tuple[str, str]: a tuple containing the bucket name and the file key respectivelly
+        FrameT: a frame of the same kind with the PII columns masked
+    """
+    return frame.with_columns(
+        [strategy.mask(col).alias(col) for col, strategy in masking.items()]
+    )
+
+
+def _has_trailing_newline(path: str) -> bool:
+    """Checks whether a local file ends with a newline character
+
+    Args:
+        path (str): path to the local file
+
+    Returns:
+        bool: True if the last byte of the file is a newline
+    """
+    with open(path, mode="rb") as file:
+        if file.seek(0, io.SEEK_END) == 0:
+            return False
+
+        file.seek(-1, io.SEEK_END)
+
+        return file.read(1) == b"\n"
+
+
+@contextmanager
+def _match_trailing_newline(
+    output: IO[bytes], has_trailing_newline: bool
+) -> Iterator[IO[bytes]]:
+    """Yields a file object that drops the final newline written to `output` if the source file had none
+
+    Args:
+        output (IO[bytes]): the binary file object the obfuscated file is written to
+        has_trailing_newline (bool): whether the source file ended with a newline
+
+    Yields:
+        IO[bytes]: the file object the obfuscated CSV file should be written to
     """
-    prefix = "s3://"
-    sanitized_s3_path = s3_path.strip()
-    if not s3_path:
-        raise FileNotFoundError("Invalid S3 path: Empty path string")
-    if not sanitized_s3_path.startswith(prefix):
-        raise FileNotFoundError('Invalid S3 path: Missing or malformed "s3://" prefix')
+    if has_trailing_newline:
+        yield output
+    else:
+        yield _TrailingNewlineTrimmer(output)  # type: ignore
+
+
+class _TrailingNewlineTrimmer(io.RawIOBase):
+    """Forwards writes to another file object, holding back a trailing newline until more data follows it"""
 
-    path = Path(sanitized_s3_path)
+    def __init__(self, output: IO[bytes]) -> None:
+        super().__init__()
+        self.output = output
+        self.pending_newline = False
 
-    bucket_name = path.parts[1]
-    key = "/".join(path.parts[2:])
+    def writable(self) -> bool:
+        return True
 
-    return bucket_name, key
+    def write(self, data: Any) -> int:
+        data = bytes(data)
+        if not data:
+            return 0
 
+        if self.pending_newline:
+            self.output.write(b"\n")
 
-def _get_file_from_s3(bucket: str, key: str, s3_client: S3Client) -> bytes:
+        self.pending_newline = data.endswith(b"\n")
+        self.output.write(data[:-1] if self.pending_newline else data)
+
+        return len(data)
+
+
+def _get_file_from_s3(
+    bucket: str,
+    key: str,
+    s3_client: "S3Client",
+    part_size: int = DEFAULT_PART_SIZE,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    response: Optional["GetObjectOutputTypeDef"] = None,
+) -> bytes:
     """Retrieves a file from S3 and returns its contents as a bytes object
 
+    The first `part_size` bytes are requested with a ranged GET, which also reports the size
+    of the file. Any remaining parts are fetched concurrently and streamed straight into a
+    single preallocated buffer, so the parts are never concatenated.
+
     Args:
         bucket (str): the name of the S3 bucket
         key (str): the key of the file in the S3 bucket
         s3_client (S3Client): the S3 client to use for the request
+        part_size (int): size in bytes of each ranged GET request
+        max_concurrency (int): maximum number of ranged GET requests in flight at the same time
+        response (Optional[GetObjectOutputTypeDef]): the response of the first part when it was already requested with `_get_first_part`
 
     Raises:
         RuntimeError: if the S3 response is not successful
@@ -124,10 +1250,339 @@ def _get_file_from_s3(bucket: str, key: str, s3_client: S3Client) -> bytes:
     Returns:
         bytes: the contents of the file as a bytes object
     """
+    response = response or _get_first_part(bucket, key, s3_client, part_size)
+    file_size = _get_object_size(response)
+    first_part = response["Body"].read()
+
+    if file_size is None or len(first_part) >= file_size:
+        return first_part
+
+    buffer = io.BytesIO()
+    buffer.seek(file_size - 1)
+    buffer.write(b"\0")
+
+    with buffer.getbuffer() as view:
+        view[: len(first_part)] = first_part
+
+        def write(offset: int, chunk: bytes) -> None:
+            view[offset : offset + len(chunk)] = chunk
+
+        _get_remaining_parts_from_s3(
+            bucket,
+            key,
+            s3_client,
+            len(first_part),
+            file_size,
+            part_size,
+            max_concurrency,
+            write,
+            response.get("ETag"),
+        )
+
+    return buffer.getvalue()
+
+
+def _download_file_from_s3(
+    bucket: str,
+    key: str,
+    s3_client: "S3Client",
+    file: IO[bytes],
+    part_size: int = DEFAULT_PART_SIZE,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    response: Optional["GetObjectOutputTypeDef"] = None,
+) -> None:
+    """Streams a file from S3 into a seekable binary file object without holding it all in memory
+
+    Parts are fetched concurrently like in `_get_file_from_s3` and written at their offset
+    in `file` one chunk at a time.
+
+    Args:
+        bucket (str): the name of the S3 bucket
+        key (str): the key of the file in the S3 bucket
+        s3_client (S3Client): the S3 client to use for the request
+        file (IO[bytes]): the file object the contents are written to
+        part_size (int): size in bytes of each ranged GET request
+        max_concurrency (int): maximum number of ranged GET requests in flight at the same time
+        response (Optional[GetObjectOutputTypeDef]): the response of the first part when it was already requested with `_get_first_part`
+
+    Raises:
+        RuntimeError: if the S3 response is not successful
+        FileNotFoundError: if the specified key does not exist
+        FileNotFoundError: if the specified bucket does not exist
+    """
+    response = response or _get_first_part(bucket, key, s3_client, part_size)
+    file_size = _get_object_size(response)
+
+    first_part_size = 0
+    for chunk in response["Body"].iter_chunks(chunk_size=DOWNLOAD_CHUNK_SIZE):
+        file.write(chunk)
+        first_part_size += len(chunk)
+
+    if file_size is not None and first_part_size < file_size:
+        lock = threading.Lock()
+
+        def write(offset: int, chunk: bytes) -> None:
+            with lock:
+                file.seek(offset)
+                file.write(chunk)
+
+        _get_remaining_parts_from_s3(
+            bucket,
+            key,
+            s3_client,
+            first_part_size,
+            file_size,
+            part_size,
+            max_concurrency,
+            write,
+            response.get("ETag"),
+        )
+
+    file.flush()
+
+
+def _iter_decompressed_file_from_s3(
+    bucket: str,
+    key: str,
+    s3_client: "S3Client",
+    response: "GetObjectOutputTypeDef",
+    compression: Compression,
+    part_size: int,
+    max_concurrency: int,
+) -> Iterator[bytes]:
+    """Yields the decompressed contents of a compressed file stored in S3 while it is being downloaded
+
+    Up to `max_concurrency` parts following the one being decompressed are fetched
+    concurrently, so at most that many compressed parts are held in memory. Every part is
+    pinned to the ETag of the first one, like in `_get_remaining_parts_from_s3`.
+
+    Args:
+        bucket (str): the name of the S3 bucket
+        key (str): the key of the file in the S3 bucket
+        s3_client (S3Client): the S3 client to use for the requests
+        response (GetObjectOutputTypeDef): the response of the first part, requested with `_get_first_part`
+        compression (Compression): the codec the file is compressed with
+        part_size (int): size in bytes of each ranged GET request
+        max_concurrency (int): maximum number of ranged GET requests in flight at the same time
+
+    Raises:
+        ValueError: if the file isn't valid for its codec
+
+    Returns:
+        Iterator[bytes]: the decompressed contents of the file, in order
+    """
+
+    def iter_compressed() -> Iterator[bytes]:
+        file_size = _get_object_size(response)
+        etag = response.get("ETag")
+        offset = 0
+        for chunk in response["Body"].iter_chunks(chunk_size=DOWNLOAD_CHUNK_SIZE):
+            offset += len(chunk)
+            yield chunk
+
+        if file_size is None or offset >= file_size:
+            return
+
+        with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+            offsets = iter(range(offset, file_size, part_size))
+            pending: "deque[Future[bytes]]" = deque()
+
+            def fetch_next_part() -> None:
+                start = next(offsets, None)
+                if start is not None:
+                    end = min(start + part_size, file_size)
+                    pending.append(
+                        executor.submit(
+                            _get_range_from_s3,
+                            bucket,
+                            key,
+                            s3_client,
+                            start,
+                            end,
+                            etag,
+                        )
+                    )
+
+            for _ in range(max_concurrency):
+                fetch_next_part()
+
+            while pending:
+                part = pending.popleft().result()
+                fetch_next_part()
+                yield part
+
+    return decompress_chunks(iter_compressed(), compression)
+
+
+def _peek_body(response: "GetObjectOutputTypeDef", size: int) -> bytes:
+    """Returns the first `size` bytes of a GetObject response body, leaving them to be read again
+
+    Args:
+        response (GetObjectOutputTypeDef): the S3 GetObject response, whose body is replaced
+        size (int): the number of bytes to peek at
+
+    Returns:
+        bytes: the first bytes of the body, fewer than `size` if the body is shorter
+    """
+    head = response["Body"].read(size)
+    response["Body"] = _PrefixedBody(head, response["Body"])  # type: ignore
+
+    return head
+
+
+class _PrefixedBody:
+    """Replays bytes already read from an S3 response body before the rest of the body"""
+
+    def __init__(self, prefix: bytes, body: Any) -> None:
+        self.prefix = prefix
+        self.body = body
+
+    def read(self, amt: Optional[int] = None) -> bytes:
+        prefix, self.prefix = self.prefix, b""
+        if amt is None:
+            return prefix + self.body.read()
+        if len(prefix) >= amt:
+            self.prefix = prefix[amt:]
+            return prefix[:amt]
+
+        return prefix + self.body.read(amt - len(prefix))
+
+    def iter_chunks(self, chunk_size: int = DOWNLOAD_CHUNK_SIZE) -> Iterator[bytes]:
+        prefix, self.prefix = self.prefix, b""
+        if prefix:
+            yield prefix
+
+        yield from self.body.iter_chunks(chunk_size=chunk_size)
+
+
+def _get_first_part(
+    bucket: str, key: str, s3_client: "S3Client", part_size: int
+) -> "GetObjectOutputTypeDef":
+    """Requests the first `part_size` bytes of a file stored in S3
+
+    Empty files can't satisfy a byte range, so they are requested again without one.
+
+    Args:
+        bucket (str): the name of the S3 bucket
+        key (str): the key of the file in the S3 bucket
+        s3_client (S3Client): the S3 client to use for the request
+        part_size (int): the number of bytes to request
+
+    Returns:
+        GetObjectOutputTypeDef: the S3 GetObject response
+    """
     try:
-        response = s3_client.get_object(Bucket=bucket, Key=key)
+        return _get_object(
+            bucket, key, s3_client, byte_range=f"bytes=0-{part_size - 1}"
+        )
+    except ClientError as err:
+        if err.response.get("Error", {}).get("Code") != "InvalidRange":
+            raise err
+
+        return _get_object(bucket, key, s3_client)
 
-        if response.get("ResponseMetadata").get("HTTPStatusCode") != 200:
+
+def _get_remaining_parts_from_s3(
+    bucket: str,
+    key: str,
+    s3_client: "S3Client",
+    start: int,
+    file_size: int,
+    part_size: int,
+    max_concurrency: int,
+    write: Callable[[int, bytes], None],
+    etag: Optional[str] = None,
+) -> None:
+    """Fetches the bytes of a file from `start` to its end as concurrent ranged GET requests
+
+    Every request is pinned to `etag`, the ETag of the first part, so the parts can't come
+    from different versions of a file overwritten during the download.
+
+    Args:
+        bucket (str): the name of the S3 bucket
+        key (str): the key of the file in the S3 bucket
+        s3_client (S3Client): the S3 client to use for the requests
+        start (int): the offset of the first byte to fetch
+        file_size (int): the total size of the file
+        part_size (int): size in bytes of each ranged GET request
+        max_concurrency (int): maximum number of ranged GET requests in flight at the same time
+        write (Callable[[int, bytes], None]): called from the worker threads with the offset and contents of every chunk received
+        etag (Optional[str]): the ETag the file must still have, see `_get_object`
+    """
+
+    def get_part(offset: int) -> None:
+        end = min(offset + part_size, file_size)
+        response = _get_object(
+            bucket,
+            key,
+            s3_client,
+            byte_range=f"bytes={offset}-{end - 1}",
+            if_match=etag,
+        )
+        for chunk in response["Body"].iter_chunks(chunk_size=DOWNLOAD_CHUNK_SIZE):
+            write(offset, chunk)
+            offset += len(chunk)
+
+    with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+        futures = [
+            executor.submit(get_part, offset)
+            for offset in range(start, file_size, part_size)
+        ]
+        for future in as_completed(futures):
+            future.result()
+
+
+def _get_object_size(response: "GetObjectOutputTypeDef") -> Optional[int]:
+    """Returns the total size of a file from the Content-Range of a ranged GetObject response
+
+    Args:
+        response (GetObjectOutputTypeDef): the S3 GetObject response
+
+    Returns:
+        Optional[int]: the size of the file, or None if the response isn't a ranged response
+    """
+    content_range = response.get("ContentRange")
+    if not content_range:
+        return None
+
+    return int(content_range.rsplit("/", 1)[1])
+
+
+def _get_object(
+    bucket: str,
+    key: str,
+    s3_client: "S3Client",
+    byte_range: Optional[str] = None,
+    if_match: Optional[str] = None,
+) -> "GetObjectOutputTypeDef":
+    """Calls S3 GetObject, translating missing bucket and key errors into FileNotFoundError
+
+    Args:
+        bucket (str): the name of the S3 bucket
+        key (str): the key of the file in the S3 bucket
+        s3_client (S3Client): the S3 client to use for the request
+        byte_range (Optional[str]): an HTTP Range header value (e.g. "bytes=0-99") to fetch only part of the file
+        if_match (Optional[str]): an ETag the object must still have, so S3 fails the request with a 412 PreconditionFailed error if it was overwritten
+
+    Raises:
+        RuntimeError: if the S3 response is not successful
+        FileNotFoundError: if the specified key does not exist
+        FileNotFoundError: if the specified bucket does not exist
+        ClientError: if the object no longer has the `if_match` ETag
+
+    Returns:
+        GetObjectOutputTypeDef: the S3 GetObject response
+    """
+    kwargs: Dict[str, Any] = {}
+    if byte_range is not None:
+        kwargs["Range"] = byte_range
+    if if_match is not None:
+        kwargs["IfMatch"] = if_match
+
+    try:
+        response = s3_client.get_object(Bucket=bucket, Key=key, **kwargs)
+
+        if response.get("ResponseMetadata").get("HTTPStatusCode") not in (200, 206):
             response_error_code = (
                 response.get("ResponseMetadata").get("Error", {}).get("Code")
             )
@@ -138,17 +1593,246 @@ def _get_file_from_s3(bucket: str, key: str, s3_client: S3Client) -> bytes:
                 f"Unexpected S3 response error. Error Code: {response_error_code}, Error Message: {response_error_message}"
             )
 
-        return response["Body"].read()
+        return response
 
     except ClientError as err:
-        error_map = {
-            "NoSuchKey": FileNotFoundError("The specified key does not exist."),
-            "NoSuchBucket": FileNotFoundError("The specified bucket does not exist."),
-        }
-        # # print(err.response["Error"]["Code"])
-        error_code = err.response.get("Error", {}).get("Code")
-        if error_code in error_map:
-            # print(err)
-            raise error_map[error_code]
+        raise _translate_client_error(err)
+
+
+def _head_object(
+    bucket: str, key: str, s3_client: "S3Client"
+) -> "HeadObjectOutputTypeDef":
+    """Calls S3 HeadObject, translating missing bucket and key errors into FileNotFoundError
+
+    Args:
+        bucket (str): the name of the S3 bucket
+        key (str): the key of the file in the S3 bucket
+        s3_client (S3Client): the S3 client to use for the request
+
+    Raises:
+        FileNotFoundError: if the specified key does not exist
+        FileNotFoundError: if the specified bucket does not exist
+
+    Returns:
+        HeadObjectOutputTypeDef: the S3 HeadObject response
+    """
+    try:
+        return s3_client.head_object(Bucket=bucket, Key=key)
+    except ClientError as err:
+        raise _translate_client_error(err)
+
+
+def _translate_ndjson_error(
+    file: Union[bytes, str], err: pl.exceptions.ComputeError
+) -> Exception:
+    """Translates the error Polars raises when inferring the schema of an empty NDJSON file into the ValueError of empty CSV files
+
+    Args:
+        file (Union[bytes, str]): the contents of the NDJSON file, or a path to it on local disk
+        err (pl.exceptions.ComputeError): the error raised while reading the file
+
+    Returns:
+        Exception: a ValueError if the file holds nothing but whitespace, otherwise the original error
+    """
+    if isinstance(file, bytes):
+        is_blank = not file.strip()
+    else:
+        with open(file, "rb") as f:
+            is_blank = all(
+                not chunk.strip()
+                for chunk in iter(lambda: f.read(DOWNLOAD_CHUNK_SIZE), b"")
+            )
+
+    return ValueError("empty data from bytes") if is_blank else err
+
+
+def _translate_client_error(err: ClientError) -> Exception:
+    """Translates S3 missing bucket and key errors into FileNotFoundError
+
+    Args:
+        err (ClientError): the error raised by an S3 request
+
+    Returns:
+        Exception: a FileNotFoundError for missing buckets and keys, otherwise the original error
+    """
+    error_map = {
+        "NoSuchKey": FileNotFoundError("The specified key does not exist."),
+        # HeadObject responses have no body, so S3 only reports the status code of missing keys
+        "404": FileNotFoundError("The specified key does not exist."),
+        "NoSuchBucket": FileNotFoundError("The specified bucket does not exist."),
+    }
+    error_code = err.response.get("Error", {}).get("Code")
+
+    return error_map.get(error_code, err)  # type: ignore
+
+
+def _get_range_from_s3(
+    bucket: str,
+    key: str,
+    s3_client: "S3Client",
+    start: int,
+    end: int,
+    if_match: Optional[str] = None,
+) -> bytes:
+    """Retrieves the bytes between `start` (inclusive) and `end` (exclusive) of a file stored in S3
+
+    Args:
+        bucket (str): the name of the S3 bucket
+        key (str): the key of the file in the S3 bucket
+        s3_client (S3Client): the S3 client to use for the request
+        start (int): the offset of the first byte to retrieve
+        end (int): the offset after the last byte to retrieve
+        if_match (Optional[str]): the ETag the object must still have, see `_get_object`
+
+    Returns:
+        bytes: the requested bytes
+    """
+    response = _get_object(
+        bucket,
+        key,
+        s3_client,
+        byte_range=f"bytes={start}-{end - 1}",
+        if_match=if_match,
+    )
+
+    return response["Body"].read()
+
+
+def _download_parquet_columns_from_s3(
+    bucket: str,
+    key: str,
+    s3_client: "S3Client",
+    skip_columns: List[str],
+    file: IO[bytes],
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    coalesce_gap: int = PARQUET_RANGE_COALESCE_GAP,
+    row_groups: Optional[List[int]] = None,
+) -> ParquetMetadata:
+    """Downloads a Parquet file from S3 without the column chunks of `skip_columns`
+
+    The footer is fetched first with a ranged GET, then only the byte ranges of the other
+    column chunks are fetched, several at a time, pinned to the ETag of the footer. Each range is written at its original
+    offset in `file`, which must be seekable. The skipped column chunks are left as holes
+    (zero bytes), so the result is only valid for readers that don't project those columns.
+
+    Args:
+        bucket (str): the name of the S3 bucket
+        key (str): the key of the file in the S3 bucket
+        s3_client (S3Client): the S3 client to use for the requests
+        skip_columns (List[str]): top level columns whose column chunks are not downloaded
+        file (IO[bytes]): a seekable binary file object the Parquet file is written to
+        max_concurrency (int): maximum number of ranged GET requests in flight at the same time
+        coalesce_gap (int): ranges separated by fewer bytes than this are merged into one request
+        row_groups (Optional[List[int]]): indexes of the row groups whose column chunks are downloaded, None to download every row group. The footer still describes every row group
+
+    Raises:
+        RuntimeError: if the S3 response is not successful
+        FileNotFoundError: if the specified key does not exist
+        FileNotFoundError: if the specified bucket does not exist
+        ValueError: if the file is not a valid Parquet file
+
+    Returns:
+        ParquetMetadata: the parsed footer of the Parquet file
+    """
+    tail, tail_start, metadata, etag = _get_parquet_tail_from_s3(bucket, key, s3_client)
+
+    file.seek(tail_start)
+    file.write(tail)
+
+    if tail_start > 0:
+        ranges = _coalesce_ranges(
+            [
+                (chunk.start, min(chunk.start + chunk.length, tail_start))
+                for index, row_group in enumerate(metadata.row_groups)
+                if row_groups is None or index in row_groups
+                for chunk in row_group.columns
+                if chunk.column not in skip_columns and chunk.start < tail_start
+            ],
+            coalesce_gap,
+        )
+
+        file.seek(0)
+        file.write(PARQUET_MAGIC)
+
+        with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+            futures = {
+                executor.submit(
+                    _get_range_from_s3, bucket, key, s3_client, start, end, etag
+                ): start
+                for start, end in ranges
+            }
+            for future in as_completed(futures):
+                file.seek(futures[future])
+                file.write(future.result())
+
+    file.flush()
+
+    return metadata
+
+
+def _get_parquet_tail_from_s3(
+    bucket: str, key: str, s3_client: "S3Client"
+) -> Tuple[bytes, int, ParquetMetadata, Optional[str]]:
+    """Fetches the end of a Parquet file stored in S3, from the start of its footer at least, and parses its footer
+
+    The last `PARQUET_FOOTER_PREFETCH_SIZE` bytes are fetched first, and the rest of the footer
+    with a second ranged GET pinned to the ETag of the first when it is larger.
+
+    Args:
+        bucket (str): the name of the S3 bucket
+        key (str): the key of the file in the S3 bucket
+        s3_client (S3Client): the S3 client to use for the requests
+
+    Raises:
+        RuntimeError: if the S3 response is not successful
+        FileNotFoundError: if the specified key does not exist
+        FileNotFoundError: if the specified bucket does not exist
+        ValueError: if the file is not a valid Parquet file
+
+    Returns:
+        Tuple[bytes, int, ParquetMetadata, Optional[str]]: the bytes fetched, their offset within the file, the parsed footer and the ETag of the file
+    """
+    response = _get_object(
+        bucket, key, s3_client, byte_range=f"bytes=-{PARQUET_FOOTER_PREFETCH_SIZE}"
+    )
+    etag = response.get("ETag")
+    tail = response["Body"].read()
+    file_size = _get_object_size(response) or len(tail)
+    tail_start = file_size - len(tail)
+
+    footer_length = parse_parquet_tail(tail[-PARQUET_TAIL_SIZE:])
+    footer_start = file_size - PARQUET_TAIL_SIZE - footer_length
+    if footer_start < tail_start:
+        tail = (
+            _get_range_from_s3(bucket, key, s3_client, footer_start, tail_start, etag)
+            + tail
+        )
+        tail_start = footer_start
+
+    metadata = parse_parquet_footer(
+        tail[footer_start - tail_start : -PARQUET_TAIL_SIZE], footer_start
+    )
+
+    return tail, tail_start, metadata, etag
+
+
+def _coalesce_ranges(
+    ranges: List[Tuple[int, int]], coalesce_gap: int
+) -> List[Tuple[int, int]]:
+    """Sorts byte ranges and merges the ones that overlap or are closer than `coalesce_gap`
+
+    Args:
+        ranges (List[Tuple[int, int]]): a list of (start, end) byte ranges, end exclusive
+        coalesce_gap (int): ranges separated by fewer bytes than this are merged
+
+    Returns:
+        List[Tuple[int, int]]: the merged byte ranges
+    """
+    coalesced: List[Tuple[int, int]] = []
+    for start, end in sorted(ranges):
+        if coalesced and start - coalesced[-1][1] < coalesce_gap:
+            coalesced[-1] = (coalesced[-1][0], max(end, coalesced[-1][1]))
         else:
-            raise err
+            coalesced.append((start, end))
+
+    return coalesced
@@ -0,0 +1,525 @@
+"""asyncio API for obfuscating files stored in S3 from an event loop."""
+
+import asyncio
+import inspect
+import io
+import os
+from concurrent.futures import Executor, ThreadPoolExecutor
+from functools import partial
+from typing import TYPE_CHECKING, Any, Awaitable, Dict, List, Optional, Tuple
+
+import polars as pl
+from botocore.exceptions import ClientError
+
+from .batch import ObfuscationResult
+from .compression import (
+    COMPRESSION_CONTENT_TYPES,
+    MAGIC_BYTES_SIZE,
+    CompressionArg,
+    check_compression,
+    compressing_writer,
+    compression_from_key,
+    decompress,
+    detect_compression,
+)
+from .gdpr_obfuscator import (
+    CONTENT_TYPES,
+    DEFAULT_PART_SIZE,
+    FileType,
+    _get_object_size,
+    _obfuscate_eager,
+    _parse_s3_path,
+    _translate_client_error,
+    get_s3_client,
+)
+from .masking import MaskingStrategy, MaskingStrategyArg, resolve_masking
+
+if TYPE_CHECKING:
+    from types_boto3_s3.client import S3Client
+
+DEFAULT_ASYNC_MAX_CONCURRENCY = 64
+"""Default number of S3 requests kept in flight at the same time by the asyncio API"""
+
+_polars_executor: Optional[ThreadPoolExecutor] = None
+
+
+async def gdpr_obfuscator_async(
+    file_to_obfuscate: str,
+    pii_fields: List[str],
+    masking_string: str = "***",
+    file_type: FileType = "csv",
+    infer_schema: bool = True,
+    part_size: int = DEFAULT_PART_SIZE,
+    max_concurrency: int = DEFAULT_ASYNC_MAX_CONCURRENCY,
+    s3_client: Any = None,
+    executor: Optional[Executor] = None,
+    masking_strategy: MaskingStrategyArg = None,
+    compression: CompressionArg = "auto",
+) -> bytes:
+    """
+    Obfuscates PII fields in a CSV, JSON or Parquet file stored in S3 without blocking the event loop.
+
+    The file is downloaded as concurrent ranged GET requests and masked on `executor`, so the event loop stays free to serve other requests while Polars works. S3 requests are awaited natively when `s3_client` is an [aiobotocore](https://github.com/aio-libs/aiobotocore) client, and run on a pool of I/O threads when it is a boto3 client.
+
+    Args:
+        file_to_obfuscate (str): S3 address to the file to be obfuscated. Formated as `s3://<bucket_name>/<file_key>` (e.g., "s3://my-bucket-name/some_file_to_obfuscate.csv")
+        pii_fields (List[str]): List of column names containing PII to obfuscate (e.g. ["full_name", "date_of_birth", "address", "phone"]), or dotted paths to fields nested in struct and list columns (e.g. "customer.address.street", "contacts[].phone")
+        masking_string (str): String used to replace PII data (default is "***")
+        file_type (FileType): Type of file to obfuscate (default is "csv"), can be one of `csv`, `json`, `ndjson`, `parquet`, `arrow` or `avro`
+        infer_schema (bool): Whether to infer CSV column types (default is True), see `gdpr_obfuscator`
+        part_size (int): Size in bytes of each ranged GET request (default is 8 MiB)
+        max_concurrency (int): Maximum number of S3 requests in flight at the same time (default is 64)
+        s3_client (Any): aiobotocore or boto3 S3 client used for every request (default is the client returned by `get_s3_client`)
+        executor (Optional[Executor]): Executor the Polars work runs on (default is a thread pool with one thread per CPU, shared by every call)
+        masking_strategy (MaskingStrategyArg): How PII values are replaced (default is None, replacing them with `masking_string`), see `gdpr_obfuscator`
+        compression (CompressionArg): Codec the obfuscated file is compressed with (default is "auto", compressing it like the input), see `gdpr_obfuscator`
+
+    Raises:
+        ValueError: If an empty file_to_obfuscate is passed
+        ValueError: If an unsupported file_type or compression is passed
+        ValueError: If masking_strategy has fields that aren't PII fields
+        FileNotFoundError: If the specified file doesn't exist (invalid s3 path)
+        KeyError: If specified PII fields are not found in the file
+
+    Returns:
+        bytes: the obfuscated file
+    """
+    masking = resolve_masking(pii_fields, masking_string, masking_strategy)
+    check_compression(compression)
+
+    async with _AsyncS3Client(s3_client, max_concurrency) as client:
+        return await _obfuscate_async(
+            client,
+            file_to_obfuscate,
+            masking,
+            file_type,
+            infer_schema,
+            part_size,
+            executor,
+            compression,
+        )
+
+
+async def gdpr_obfuscator_batch_async(
+    sources: List[str],
+    pii_fields: List[str],
+    masking_string: str = "***",
+    file_type: FileType = "csv",
+    destinations: Optional[List[str]] = None,
+    max_workers: int = os.cpu_count() or 1,
+    infer_schema: bool = True,
+    part_size: int = DEFAULT_PART_SIZE,
+    max_concurrency: int = DEFAULT_ASYNC_MAX_CONCURRENCY,
+    s3_client: Any = None,
+    executor: Optional[Executor] = None,
+    masking_strategy: MaskingStrategyArg = None,
+    compression: CompressionArg = "auto",
+) -> List[ObfuscationResult]:
+    """
+    Obfuscates PII fields in many files stored in S3 concurrently from an event loop.
+
+    Every file is downloaded, masked and (when `destinations` are given) uploaded concurrently. The S3 requests of all files share a single limit of `max_concurrency` requests in flight, while at most `max_workers` files are held in memory at the same time. A file that fails to be obfuscated never stops the rest of the batch: its error is returned in its result instead of being raised.
+
+    Args:
+        sources (List[str]): S3 addresses of the files to be obfuscated
+        pii_fields (List[str]): List of column names containing PII to obfuscate, the same for every file
+        masking_string (str): String used to replace PII data (default is "***")
+        file_type (FileType): Type of the files to obfuscate (default is "csv")
+        destinations (Optional[List[str]]): S3 addresses the obfuscated files are uploaded to, one per source. When None, the obfuscated files are returned as bytes instead
+        max_workers (int): Maximum number of files obfuscated at the same time (default is the number of CPUs)
+        infer_schema (bool): Whether to infer CSV column types (default is True)
+        part_size (int): Size in bytes of each part downloaded and uploaded (default is 8 MiB)
+        max_concurrency (int): Maximum number of S3 requests in flight at the same time, across every file (default is 64)
+        s3_client (Any): aiobotocore or boto3 S3 client shared by every file (default is the client returned by `get_s3_client`)
+        executor (Optional[Executor]): Executor the Polars work runs on (default is a thread pool with one thread per CPU, shared by every call)
+        masking_strategy (MaskingStrategyArg): How PII values are replaced (default is None, replacing them with `masking_string`), see `gdpr_obfuscator`
+        compression (CompressionArg): Codec the obfuscated files are compressed with (default is "auto", compressing each file like its input, or from the suffix of its destination when `destinations` are given), see `gdpr_obfuscator`
+
+    Raises:
+        ValueError: If masking_strategy has fields that aren't PII fields
+        ValueError: If an unsupported compression is passed
+        ValueError: If `destinations` is given and doesn't have one address per source
+
+    Returns:
+        List[ObfuscationResult]: one result per source, in the same order as `sources`
+    """
+    if destinations is not None and len(destinations) != len(sources):
+        raise ValueError(
+            f"Expected {len(sources)} destinations, got {len(destinations)}"
+        )
+
+    masking = resolve_masking(pii_fields, masking_string, masking_strategy)
+    check_compression(compression)
+    files = asyncio.Semaphore(max_workers)
+
+    async with _AsyncS3Client(s3_client, max_concurrency) as client:
+
+        async def obfuscate(
+            source: str, destination: Optional[str]
+        ) -> ObfuscationResult:
+            async with files:
+                try:
+                    output_compression = compression
+                    if destination is not None and compression == "auto":
+                        output_compression = compression_from_key(destination)
+
+                    result = await _obfuscate_async(
+                        client,
+                        source,
+                        masking,
+                        file_type,
+                        infer_schema,
+                        part_size,
+                        executor,
+                        output_compression,
+                    )
+                    if destination is None:
+                        return ObfuscationResult(source=source, result=result)
+
+                    await _upload_async(
+                        client,
+                        destination,
+                        result,
+                        file_type,
+                        part_size,
+                        output_compression,
+                    )
+                    return ObfuscationResult(source=source, destination=destination)
+                except Exception as err:
+                    return ObfuscationResult(
+                        source=source, destination=destination, error=err
+                    )
+
+        return list(
+            await asyncio.gather(
+                *map(obfuscate, sources, destinations or [None] * len(sources))
+            )
+        )
+
+
+async def _obfuscate_async(
+    client: "_AsyncS3Client",
+    file_to_obfuscate: str,
+    masking: Dict[str, MaskingStrategy],
+    file_type: FileType,
+    infer_schema: bool,
+    part_size: int,
+    executor: Optional[Executor],
+    compression: CompressionArg = "auto",
+) -> bytes:
+    """Downloads a file from S3 and obfuscates it on `executor`
+
+    Compressed CSV and JSON files are detected from their first bytes or key suffix and
+    decompressed on `executor` before being masked.
+
+    Args:
+        client (_AsyncS3Client): the client to use for the S3 requests
+        file_to_obfuscate (str): S3 address to the file to be obfuscated
+        masking (Dict[str, MaskingStrategy]): the masking strategy of every PII column
+        file_type (FileType): type of the file to obfuscate
+        infer_schema (bool): whether to infer CSV column types or read them as raw strings
+        part_size (int): size in bytes of each ranged GET request
+        executor (Optional[Executor]): executor the Polars work runs on
+        compression (CompressionArg): codec the obfuscated file is compressed with, "auto" to use the codec of the input
+
+    Raises:
+        ValueError: if an empty file is passed or an unsupported file_type is passed
+        ValueError: if a Parquet file is to be compressed or a compressed file isn't valid for its codec
+        FileNotFoundError: if the specified file doesn't exist
+        KeyError: if specified PII fields are not found in the file
+
+    Returns:
+        bytes: the obfuscated file
+    """
+    bucket, key = _parse_s3_path(file_to_obfuscate)
+    file = await _download_async(client, bucket, key, part_size)
+
+    output = io.BytesIO()
+    try:
+        await asyncio.get_running_loop().run_in_executor(
+            executor or _get_polars_executor(),
+            partial(
+                _obfuscate_file_contents,
+                file,
+                key,
+                output,
+                masking,
+                file_type,
+                infer_schema,
+                compression,
+            ),
+        )
+    except pl.exceptions.NoDataError:
+        raise ValueError("empty data from bytes")
+
+    return output.getvalue()
+
+
+def _obfuscate_file_contents(
+    file: bytes,
+    key: str,
+    output: io.BytesIO,
+    masking: Dict[str, MaskingStrategy],
+    file_type: FileType,
+    infer_schema: bool,
+    compression: CompressionArg,
+) -> None:
+    """Decompresses a downloaded file if needed, obfuscates it and compresses the result
+
+    Args:
+        file (bytes): the contents of the file, as stored in S3
+        key (str): the key of the file in the S3 bucket
+        output (io.BytesIO): the buffer the obfuscated file is written to
+        masking (Dict[str, MaskingStrategy]): the masking strategy of every PII column
+        file_type (FileType): type of the file to obfuscate
+        infer_schema (bool): whether to infer CSV column types or read them as raw strings
+        compression (CompressionArg): codec the obfuscated file is compressed with, "auto" to use the codec of the input
+    """
+    input_compression = None
+    if file_type == "parquet":
+        if compression not in ("auto", None):
+            raise ValueError(
+                "Parquet files can't be compressed, their column chunks are compressed internally"
+            )
+    else:
+        input_compression = detect_compression(key, None, file[:MAGIC_BYTES_SIZE])
+        if input_compression:
+            file = decompress(file, input_compression)
+
+    output_compression = input_compression if compression == "auto" else compression
+    with compressing_writer(output, output_compression) as writer:
+        _obfuscate_eager(file, writer, masking, file_type, infer_schema)
+
+
+async def _download_async(
+    client: "_AsyncS3Client", bucket: str, key: str, part_size: int
+) -> bytes:
+    """Downloads a file from S3 as concurrent ranged GET requests
+
+    The parts after the first are pinned to its ETag, so a file overwritten during the
+    download fails with a 412 PreconditionFailed error instead of mixing two versions.
+
+    Args:
+        client (_AsyncS3Client): the client to use for the S3 requests
+        bucket (str): the name of the S3 bucket
+        key (str): the key of the file in the S3 bucket
+        part_size (int): size in bytes of each ranged GET request
+
+    Returns:
+        bytes: the contents of the file
+    """
+    try:
+        first_part, file_size, etag = await client.get_object(
+            bucket, key, f"bytes=0-{part_size - 1}"
+        )
+    except ClientError as err:
+        if err.response.get("Error", {}).get("Code") != "InvalidRange":
+            raise err
+
+        first_part, file_size, etag = await client.get_object(bucket, key)
+
+    if file_size is None or file_size <= len(first_part):
+        return first_part
+
+    buffer = io.BytesIO()
+    buffer.seek(file_size - 1)
+    buffer.write(b"\0")
+    view = buffer.getbuffer()
+    view[: len(first_part)] = first_part
+
+    async def get_part(offset: int) -> None:
+        end = min(offset + part_size, file_size)
+        view[offset:end], _, _ = await client.get_object(
+            bucket, key, f"bytes={offset}-{end - 1}", etag
+        )
+
+    try:
+        await _gather_or_cancel(
+            [get_part(offset) for offset in range(part_size, file_size, part_size)]
+        )
+    finally:
+        # Every part has finished or been cancelled, so none writes into the view once released
+        view.release()
+
+    return buffer.getvalue()
+
+
+async def _upload_async(
+    client: "_AsyncS3Client",
+    destination: str,
+    body: bytes,
+    file_type: FileType,
+    part_size: int,
+    compression: CompressionArg = None,
+) -> None:
+    """Uploads a file to S3, as concurrent multipart upload parts when it is larger than `part_size`
+
+    The multipart upload is aborted if any part fails, once the other parts have finished or
+    been cancelled, so no partial object or orphaned part is left behind.
+
+    Args:
+        client (_AsyncS3Client): the client to use for the S3 requests
+        destination (str): S3 address the file is uploaded to
+        body (bytes): the contents of the file
+        file_type (FileType): type of the file, used to set its content type
+        part_size (int): size in bytes of each uploaded part
+        compression (CompressionArg): codec the file is compressed with, used instead of its type to set its content type
+    """
+    bucket, key = _parse_s3_path(destination)
+    content_type = {
+        "ContentType": COMPRESSION_CONTENT_TYPES.get(compression)  # type: ignore
+        or CONTENT_TYPES[file_type]
+    }
+
+    if len(body) <= part_size:
+        await client.call(
+            "put_object", Bucket=bucket, Key=key, Body=body, **content_type
+        )
+        return
+
+    response = await client.call(
+        "create_multipart_upload", Bucket=bucket, Key=key, **content_type
+    )
+    upload_id = response["UploadId"]
+
+    async def upload_part(part_number: int, offset: int) -> Dict[str, Any]:
+        response = await client.call(
+            "upload_part",
+            Bucket=bucket,
+            Key=key,
+            UploadId=upload_id,
+            PartNumber=part_number,
+            Body=body[offset : offset + part_size],
+        )
+        return {"PartNumber": part_number, "ETag": response["ETag"]}
+
+    try:
+        parts = await _gather_or_cancel(
+            [
+                upload_part(part_number, offset)
+                for part_number, offset in enumerate(
+                    range(0, len(body), part_size), start=1
+                )
+            ]
+        )
+        await client.call(
+            "complete_multipart_upload",
+            Bucket=bucket,
+            Key=key,
+            UploadId=upload_id,
+            MultipartUpload={"Parts": parts},
+        )
+    except BaseException:
+        await client.call(
+            "abort_multipart_upload", Bucket=bucket, Key=key, UploadId=upload_id
+        )
+        raise
+
+
+async def _gather_or_cancel(awaitables: List[Awaitable[Any]]) -> List[Any]:
+    """Awaits awaitables concurrently like `asyncio.gather`, but cancels the others and waits for them when one fails
+
+    `asyncio.gather` leaves the other awaitables running when one raises, so a caller cleaning
+    up after the error, e.g. aborting a multipart upload, would race with requests still in flight.
+
+    Args:
+        awaitables (List[Awaitable[Any]]): the awaitables to run
+
+    Returns:
+        List[Any]: the result of every awaitable, in order
+    """
+    tasks = [asyncio.ensure_future(awaitable) for awaitable in awaitables]
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+
+def _get_polars_executor() -> ThreadPoolExecutor:
+    """Returns the thread pool Polars work runs on when no executor is passed, creating it on first use"""
+    global _polars_executor
+    if _polars_executor is None:
+        _polars_executor = ThreadPoolExecutor(
+            max_workers=os.cpu_count(), thread_name_prefix="gdpr-obfuscator-polars"
+        )
+
+    return _polars_executor
+
+
+class _AsyncS3Client:
+    """Awaits S3 requests under a concurrency limit, natively for aiobotocore clients and on I/O threads for boto3 clients
+
+    Args:
+        s3_client (Any): an aiobotocore or boto3 S3 client, or None to use the client returned by `get_s3_client`
+        max_concurrency (int): maximum number of requests in flight at the same time
+    """
+
+    def __init__(self, s3_client: Any, max_concurrency: int) -> None:
+        self.s3_client: "S3Client" = s3_client or get_s3_client(max_concurrency)
+        self.is_async = inspect.iscoroutinefunction(self.s3_client.get_object)
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.io_executor = (
+            None if self.is_async else ThreadPoolExecutor(max_workers=max_concurrency)
+        )
+
+    async def __aenter__(self) -> "_AsyncS3Client":
+        return self
+
+    async def __aexit__(self, *args: Any) -> None:
+        if self.io_executor is not None:
+            self.io_executor.shutdown(wait=False)
+
+    async def call(self, operation: str, **kwargs: Any) -> Dict[str, Any]:
+        """Runs an S3 client method, reading the response body if it has one"""
+        method = getattr(self.s3_client, operation)
+
+        async with self.semaphore:
+            if self.is_async:
+                response = await method(**kwargs)
+                if "Body" in response:
+                    async with response["Body"] as stream:
+                        response["Body"] = await stream.read()
+                return response
+
+            future = self.io_executor.submit(_call_and_read, method, kwargs)  # type: ignore
+            try:
+                return await asyncio.wrap_future(future)
+            except asyncio.CancelledError:
+                # A request already running on its thread can't be stopped, so it is waited
+                # for before the cancelled caller goes on, e.g. to abort its upload
+                if not future.cancel():
+                    await asyncio.wait([asyncio.wrap_future(future)])
+                raise
+
+    async def get_object(
+        self,
+        bucket: str,
+        key: str,
+        byte_range: Optional[str] = None,
+        if_match: Optional[str] = None,
+    ) -> Tuple[bytes, Optional[int], Optional[str]]:
+        """Returns the contents of an object, or of a byte range of it, the total size of the object and its ETag
+
+        A request with `if_match` fails with a 412 PreconditionFailed error if the object no longer has that ETag.
+        """
+        kwargs = {"Range": byte_range} if byte_range else {}
+        if if_match:
+            kwargs["IfMatch"] = if_match
+        try:
+            response = await self.call("get_object", Bucket=bucket, Key=key, **kwargs)
+        except ClientError as err:
+            raise _translate_client_error(err)
+
+        return response["Body"], _get_object_size(response), response.get("ETag")  # type: ignore
+
+
+def _call_and_read(method: Any, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+    """Calls a boto3 client method, reading the response body if it has one"""
+    response = method(**kwargs)
+    if "Body" in response:
+        response["Body"] = response["Body"].read()
+
+    return response
@@ -0,0 +1,224 @@
+"""Incremental reading and writing of JSON arrays of records, so they can be streamed as NDJSON."""
+
+import codecs
+import io
+import itertools
+import json
+from contextlib import contextmanager
+from typing import IO, Any, Iterator
+
+JSON_ARRAY_READ_SIZE = 1024 * 1024
+"""Number of bytes read from a JSON array at a time"""
+
+NDJSON_WRITE_SIZE = 1024 * 1024
+"""Number of bytes of NDJSON records buffered before being written"""
+
+_JSON_WHITESPACE = " \t\n\r"
+
+_JSON_ESCAPE_SIZE = 12
+"""Length of the longest JSON token a chunk boundary can split, a surrogate pair escape"""
+
+_decoder = json.JSONDecoder()
+
+
+def is_json_array(path: str) -> bool:
+    """Checks whether a local JSON file holds an array, from its first non-whitespace character
+
+    Args:
+        path (str): path to the local file
+
+    Returns:
+        bool: True if the file starts with "["
+    """
+    with open(path, mode="rb") as file:
+        head = file.read(JSON_ARRAY_READ_SIZE).decode("utf-8-sig", errors="ignore")
+
+    return head.lstrip(_JSON_WHITESPACE).startswith("[")
+
+
+def iter_json_array(
+    file: IO[bytes], read_size: int = JSON_ARRAY_READ_SIZE
+) -> Iterator[str]:
+    """Yields the text of every element of a JSON array, reading the file incrementally
+
+    Each element is validated by Python's C JSON decoder, but only its text is kept, on a single
+    line: whitespace between tokens can't hold escaped characters, so the newlines of pretty-printed
+    arrays are replaced with spaces. Only the element being parsed and the unparsed rest of the
+    last chunk read are held in memory.
+
+    Args:
+        file (IO[bytes]): the binary file object to read the array from
+        read_size (int): number of bytes read at a time (default is 1 MiB)
+
+    Raises:
+        ValueError: if the file isn't a valid JSON array
+
+    Yields:
+        str: the JSON text of every element, in order
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    buffer = ""
+    position = 0
+    eof = False
+
+    def read_more() -> None:
+        nonlocal buffer, position, eof
+        # Grows geometrically, so elements larger than read_size are parsed a bounded number of times
+        chunk = file.read(max(read_size, len(buffer) - position))
+        eof = not chunk
+        buffer = buffer[position:] + decoder.decode(chunk, final=eof)
+        position = 0
+
+    state = "start"
+    while True:
+        while position < len(buffer) and buffer[position] in _JSON_WHITESPACE:
+            position += 1
+
+        if position == len(buffer):
+            if eof:
+                break
+            read_more()
+            continue
+
+        char = buffer[position]
+        if state == "start":
+            if char != "[":
+                raise ValueError("Invalid JSON array: the file doesn't start with [")
+            state = "first_element"
+            position += 1
+        elif state == "separator":
+            if char not in ",]":
+                raise ValueError("Invalid JSON array: expecting ',' or ']'")
+            state = "element" if char == "," else "end"
+            position += 1
+        elif state == "end":
+            raise ValueError("Invalid JSON array: extra data after the array")
+        elif char == "]" and state == "first_element":
+            state = "end"
+            position += 1
+        else:
+            try:
+                _, end = _decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError as err:
+                if not eof and _is_truncated(err, len(buffer)):
+                    read_more()
+                    continue
+                raise ValueError(f"Invalid JSON array: {err.msg}")
+
+            if end == len(buffer) and not eof:
+                # A number at the end of the chunk may continue in the next one
+                read_more()
+                continue
+
+            element = buffer[position:end]
+            yield element.replace("\n", " ").replace("\r", " ")
+            state = "separator"
+            position = end
+
+    if state != "end":
+        raise ValueError("Invalid JSON array: the file is truncated")
+
+
+def json_array_to_ndjson(source: str, destination: IO[bytes]) -> int:
+    """Copies every record of a JSON array file to a file object as NDJSON, one record per line
+
+    Args:
+        source (str): path to the local JSON array file
+        destination (IO[bytes]): the binary file object the NDJSON records are written to
+
+    Raises:
+        ValueError: if the file isn't a valid JSON array
+
+    Returns:
+        int: the number of records copied
+    """
+    num_records = 0
+    lines = []
+    buffered = 0
+
+    with open(source, mode="rb") as file:
+        for element in iter_json_array(file):
+            lines.append(element)
+            buffered += len(element)
+            num_records += 1
+            if buffered >= NDJSON_WRITE_SIZE:
+                destination.write(("\n".join(lines) + "\n").encode())
+                lines, buffered = [], 0
+
+    if lines:
+        destination.write(("\n".join(lines) + "\n").encode())
+    destination.flush()
+
+    return num_records
+
+
+def iter_ndjson_batches(file: IO[bytes], batch_size: int) -> Iterator[bytes]:
+    """Yields the records of an NDJSON file object in batches
+
+    Args:
+        file (IO[bytes]): the binary file object to read the records from, from its current position
+        batch_size (int): number of records per batch
+
+    Yields:
+        bytes: the NDJSON lines of up to `batch_size` records
+    """
+    while True:
+        lines = list(itertools.islice(file, batch_size))
+        if not lines:
+            return
+
+        yield b"".join(lines)
+
+
+@contextmanager
+def ndjson_to_json_array(output: IO[bytes]) -> Iterator[IO[bytes]]:
+    """Yields a file object that joins the NDJSON records written to it into a JSON array written to `output`
+
+    Records are forwarded as they are written, so the array is never held in memory as a whole.
+
+    Args:
+        output (IO[bytes]): the binary file object the JSON array is written to
+
+    Yields:
+        IO[bytes]: the file object the NDJSON records should be written to
+    """
+    output.write(b"[")
+    yield _NDJSONToJSONArray(output)  # type: ignore
+    output.write(b"]")
+
+
+class _NDJSONToJSONArray(io.RawIOBase):
+    """Forwards NDJSON records to another file object, replacing the newlines between records with commas
+
+    Newlines can't appear inside NDJSON records, so every newline ends a record. The last one is
+    held back until another record follows it.
+    """
+
+    def __init__(self, output: IO[bytes]) -> None:
+        super().__init__()
+        self.output = output
+        self.pending_separator = False
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data: Any) -> int:
+        data = bytes(data)
+        if not data:
+            return 0
+
+        if self.pending_separator:
+            self.output.write(b",")
+
+        self.pending_separator = data.endswith(b"\n")
+        records = data[:-1] if self.pending_separator else data
+        self.output.write(records.replace(b"\n", b","))
+
+        return len(data)
+
+
+def _is_truncated(err: json.JSONDecodeError, buffer_size: int) -> bool:
+    """Checks whether a decoding error may come from an element cut off at the end of the buffer"""
+    return err.pos >= buffer_size - _JSON_ESCAPE_SIZE or err.msg.startswith(
+        "Unterminated string"
+    )
@@ -0,0 +1,538 @@
+"""Masking strategies deciding how the values of PII columns are replaced."""
+
+import hashlib
+import hmac
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Union
+
+import polars as pl
+
+from .token_vault import SQLiteTokenVault, TokenVault
+
+try:
+    from cryptography.exceptions import InvalidTag
+    from cryptography.hazmat.primitives.ciphers.aead import AESSIV
+except ImportError:  # pragma: no cover
+    AESSIV = None
+
+DEFAULT_TOKEN_CACHE_SIZE = 100_000
+"""Number of value-token pairs Tokenize keeps in memory by default"""
+
+MaskingStrategyArg = Union["MaskingStrategy", Dict[str, "MaskingStrategy"], None]
+"""A single strategy for every PII field, a strategy per PII field, or None for the masking string"""
+
+
+class MaskingStrategy:
+    """Base class of the ways the values of a PII column can be replaced
+
+    Subclasses build a Polars expression computing the masked values of a column, so masking
+    runs inside the same vectorised `with_columns` step for every strategy. They implement
+    `mask_values` (and `unmask_values` if reversible), which transforms any expression, so the
+    same strategy masks top level columns and fields nested in struct and list columns.
+
+    Attributes:
+        reads_values (bool): whether the masked values depend on the original values. When False, PII columns are never read or downloaded from Parquet files
+        reversible (bool): whether `unmask` can recover the original values from the masked ones
+    """
+
+    reads_values: bool = True
+    reversible: bool = False
+
+    def mask(self, column: str) -> pl.Expr:
+        """Returns an expression computing the masked values of a column
+
+        Args:
+            column (str): the name of the PII column
+
+        Returns:
+            pl.Expr: an expression evaluating to the masked values
+        """
+        return self.mask_values(pl.col(column))
+
+    def unmask(self, column: str) -> pl.Expr:
+        """Returns an expression recovering the original values of a masked column, for reversible strategies
+
+        Args:
+            column (str): the name of the masked column
+
+        Returns:
+            pl.Expr: an expression evaluating to the original values, as strings
+        """
+        return self.unmask_values(pl.col(column))
+
+    def mask_values(self, values: pl.Expr) -> pl.Expr:
+        """Returns an expression computing the masked version of some values
+
+        Args:
+            values (pl.Expr): an expression evaluating to the PII values, e.g. a column or a struct field
+
+        Returns:
+            pl.Expr: an expression evaluating to the masked values
+        """
+        raise NotImplementedError
+
+    def unmask_values(self, values: pl.Expr) -> pl.Expr:
+        """Returns an expression recovering the original version of some masked values, for reversible strategies
+
+        Args:
+            values (pl.Expr): an expression evaluating to the masked values
+
+        Returns:
+            pl.Expr: an expression evaluating to the original values, as strings
+        """
+        raise NotImplementedError
+
+
+class ConstantMask(MaskingStrategy):
+    """Replaces every value with the same masking string
+
+    Args:
+        masking_string (str): string used to replace PII data (default is "***")
+    """
+
+    reads_values = False
+
+    def __init__(self, masking_string: str = "***") -> None:
+        self.masking_string = masking_string
+
+    def mask_values(self, values: pl.Expr) -> pl.Expr:
+        return pl.lit(self.masking_string, dtype=pl.String)
+
+
+class KeyedHash(MaskingStrategy):
+    """Replaces every value with its keyed hash (HMAC), a pseudonym that is always the same for the same value and key
+
+    Masked columns can still be joined, grouped and counted across files obfuscated with the
+    same key, while the original values can't be recovered without it. The hash is computed
+    once per distinct value of each batch and broadcast back to every row, so low-cardinality
+    columns cost little more than a constant mask. Null values are left as nulls.
+
+    Args:
+        key (Union[str, bytes]): the secret key. Keep it out of the obfuscated data: anyone holding it can test guesses of the original values
+        length (Optional[int]): number of hexadecimal characters kept from each hash (default is the full digest)
+        algorithm (str): the `hashlib` hash algorithm used by the HMAC (default is "sha256")
+    """
+
+    def __init__(
+        self,
+        key: Union[str, bytes],
+        length: Optional[int] = None,
+        algorithm: str = "sha256",
+    ) -> None:
+        self.key = key.encode() if isinstance(key, str) else key
+        self.length = length
+        self.algorithm = algorithm
+        hashlib.new(algorithm)
+
+    def mask_values(self, values: pl.Expr) -> pl.Expr:
+        return values.cast(pl.String).map_batches(
+            lambda values: map_unique_values(values, self.hash_values),
+            return_dtype=pl.String,
+            is_elementwise=True,
+        )
+
+    def hash_values(self, values: List[str]) -> List[str]:
+        """Returns the truncated hexadecimal HMAC of every value
+
+        Args:
+            values (List[str]): the values to hash
+
+        Returns:
+            List[str]: the hash of every value, in the same order
+        """
+        return [
+            hmac.digest(self.key, value.encode(), self.algorithm).hex()[: self.length]
+            for value in values
+        ]
+
+
+class PartialMask(MaskingStrategy):
+    """Masks the middle of each value character by character, keeping its first and last characters and its length
+
+    For example `PartialMask(keep_last=4)` masks "07700 900123" as "********0123". Values that
+    aren't longer than the number of characters kept are masked entirely. Null values are left
+    as nulls.
+
+    Args:
+        keep_first (int): number of leading characters kept (default is 0)
+        keep_last (int): number of trailing characters kept (default is 0)
+        mask_char (str): the single character replacing each masked character (default is "*")
+
+    Raises:
+        ValueError: if mask_char isn't a single character or a number of kept characters is negative
+    """
+
+    def __init__(
+        self, keep_first: int = 0, keep_last: int = 0, mask_char: str = "*"
+    ) -> None:
+        if len(mask_char) != 1:
+            raise ValueError("mask_char must be a single character")
+        if keep_first < 0 or keep_last < 0:
+            raise ValueError("keep_first and keep_last can't be negative")
+
+        self.keep_first = keep_first
+        self.keep_last = keep_last
+        self.mask_char = mask_char
+
+    def mask_values(self, values: pl.Expr) -> pl.Expr:
+        value = values.cast(pl.String)
+        length = value.str.len_chars().cast(pl.Int64)
+        end = value.str.tail(self.keep_last) if self.keep_last else pl.lit("")
+
+        # Lengths are computed for every row, including the short ones masked entirely
+        masked = pl.concat_str(
+            value.str.head(self.keep_first),
+            end.str.pad_start(
+                (length - self.keep_first).clip(lower_bound=0), self.mask_char
+            ),
+        )
+        fully_masked = pl.lit("").str.pad_start(length, self.mask_char)
+
+        return (
+            pl.when(length > self.keep_first + self.keep_last)
+            .then(masked)
+            .otherwise(fully_masked)
+        )
+
+
+class RegexMask(MaskingStrategy):
+    """Replaces the parts of each value matching a regular expression
+
+    For example `RegexMask(r"^[^@]+", "***")` keeps the domain of email addresses, masking
+    "jane@example.com" as "***@example.com". Null values are left as nulls.
+
+    Args:
+        pattern (str): a regular expression using the Rust `regex` crate syntax
+        replacement (str): the replacement of each match, which may reference capture groups as `$1` or `${name}` (default is "***")
+        replace_all (bool): whether every match is replaced, rather than only the first one (default is False)
+    """
+
+    def __init__(
+        self, pattern: str, replacement: str = "***", replace_all: bool = False
+    ) -> None:
+        self.pattern = pattern
+        self.replacement = replacement
+        self.replace_all = replace_all
+
+    def mask_values(self, values: pl.Expr) -> pl.Expr:
+        value = values.cast(pl.String)
+
+        if self.replace_all:
+            return value.str.replace_all(self.pattern, self.replacement)
+
+        return value.str.replace(self.pattern, self.replacement)
+
+
+class Tokenize(MaskingStrategy):
+    """Replaces every value with a random token stored in a vault, so that the original values can be re-identified later
+
+    Unlike a keyed hash, a token reveals nothing about its value: re-identification requires
+    access to the vault. The same value always gets the same token from the same vault.
+    Each batch of a column is deduplicated and all of its distinct values are resolved with a
+    single bulk vault query. The tokens of recently seen values are kept in an LRU cache, so
+    values repeated across batches and files don't reach the vault again. Null values are left
+    as nulls. `unmask` returns the original values of tokens, or nulls for tokens not in the vault.
+
+    Args:
+        vault (Union[TokenVault, str]): the vault storing the tokens, or the path of a SQLite database used as a `SQLiteTokenVault`
+        cache_size (int): maximum number of value-token pairs cached in memory, 0 disables the cache (default is 100,000)
+    """
+
+    reversible = True
+
+    def __init__(
+        self,
+        vault: Union[TokenVault, str],
+        cache_size: int = DEFAULT_TOKEN_CACHE_SIZE,
+    ) -> None:
+        self.vault = SQLiteTokenVault(vault) if isinstance(vault, str) else vault
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, str]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+
+    def mask_values(self, values: pl.Expr) -> pl.Expr:
+        return values.cast(pl.String).map_batches(
+            lambda values: map_unique_values(values, self.tokenize_values),
+            return_dtype=pl.String,
+            is_elementwise=True,
+        )
+
+    def unmask_values(self, values: pl.Expr) -> pl.Expr:
+        return values.map_batches(
+            lambda tokens: map_unique_values(tokens, self.vault.detokenize),
+            return_dtype=pl.String,
+            is_elementwise=True,
+        )
+
+    def tokenize_values(self, values: List[str]) -> List[str]:
+        """Returns the token of every value, looking up values missing from the cache in the vault
+
+        Args:
+            values (List[str]): distinct values to tokenise
+
+        Returns:
+            List[str]: the token of every value, in the same order
+        """
+        with self._cache_lock:
+            tokens = {value: self._cache.get(value) for value in values}
+            for value, token in tokens.items():
+                if token is not None:
+                    self._cache.move_to_end(value)
+
+        missing = [value for value, token in tokens.items() if token is None]
+        if missing:
+            tokens.update(zip(missing, self.vault.get_or_create_tokens(missing)))
+            self._cache_tokens({value: tokens[value] for value in missing})
+
+        return [tokens[value] for value in values]
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # The cache and its lock stay behind: worker processes fill their own
+        return {"vault": self.vault, "cache_size": self.cache_size}
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__init__(**state)
+
+    def _cache_tokens(self, tokens: Dict[str, str]) -> None:
+        with self._cache_lock:
+            self._cache.update(tokens)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+
+class DeterministicEncryption(MaskingStrategy):
+    """Replaces every value with its deterministic authenticated encryption (AES-SIV), base64 encoded
+
+    The same value always gets the same ciphertext under the same key, so masked columns can
+    still be joined, grouped and counted, and `unmask` decrypts them back without any vault.
+    Values are deduplicated per batch and converted to and from bytes and base64 in single
+    vectorised Polars operations, so only the AES-SIV call itself runs once per distinct
+    value. Null values are left as nulls. Requires the `cryptography` package.
+
+    Args:
+        key (bytes): a 32, 48 or 64 bytes AES-SIV key, see `generate_key`. Anyone holding it can decrypt the masked values
+        associated_data (Optional[bytes]): authenticated but unencrypted context bound to every ciphertext, which must be the same to decrypt it (default is None)
+
+    Raises:
+        ImportError: if the `cryptography` package isn't installed
+        ValueError: if the key isn't 32, 48 or 64 bytes long
+    """
+
+    reversible = True
+
+    def __init__(self, key: bytes, associated_data: Optional[bytes] = None) -> None:
+        _require_cryptography()
+        self.key = key
+        self.associated_data = [associated_data] if associated_data else None
+        self._aead = AESSIV(key)
+
+    @staticmethod
+    def generate_key() -> bytes:
+        """Returns a new random 64 bytes key, for AES-256-SIV
+
+        Raises:
+            ImportError: if the `cryptography` package isn't installed
+
+        Returns:
+            bytes: the key, to be stored as securely as the original data
+        """
+        _require_cryptography()
+        return AESSIV.generate_key(512)
+
+    def mask_values(self, values: pl.Expr) -> pl.Expr:
+        return values.cast(pl.String).map_batches(
+            lambda values: map_unique_series(values, self.encrypt_values),
+            return_dtype=pl.String,
+            is_elementwise=True,
+        )
+
+    def unmask_values(self, values: pl.Expr) -> pl.Expr:
+        return values.map_batches(
+            lambda values: map_unique_series(values, self.decrypt_values),
+            return_dtype=pl.String,
+            is_elementwise=True,
+        )
+
+    def encrypt_values(self, values: pl.Series) -> pl.Series:
+        """Returns the base64 encoded ciphertext of every value
+
+        Args:
+            values (pl.Series): a String Series without nulls
+
+        Returns:
+            pl.Series: the ciphertext of every value, in the same order
+        """
+        encrypt, associated_data = self._aead.encrypt, self.associated_data
+        ciphertexts = [
+            encrypt(plaintext, associated_data)
+            for plaintext in values.cast(pl.Binary).to_list()
+        ]
+
+        return pl.Series(ciphertexts, dtype=pl.Binary).bin.encode("base64")
+
+    def decrypt_values(self, values: pl.Series) -> pl.Series:
+        """Returns the original value of every base64 encoded ciphertext
+
+        Args:
+            values (pl.Series): a String Series of ciphertexts, without nulls
+
+        Raises:
+            ValueError: if a value isn't a ciphertext of this key and associated data
+
+        Returns:
+            pl.Series: the decrypted value of every ciphertext, in the same order
+        """
+        decrypt, associated_data = self._aead.decrypt, self.associated_data
+        try:
+            plaintexts = [
+                decrypt(ciphertext, associated_data)
+                for ciphertext in values.str.decode("base64").to_list()
+            ]
+        except (InvalidTag, pl.exceptions.ComputeError):
+            raise ValueError("values can't be decrypted with this key")
+
+        return pl.Series(plaintexts, dtype=pl.Binary).cast(pl.String)
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # The AES-SIV context can't be pickled: worker processes create their own
+        associated_data = self.associated_data[0] if self.associated_data else None
+        return {"key": self.key, "associated_data": associated_data}
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__init__(**state)
+
+
+def map_unique_values(
+    values: pl.Series, function: Callable[[List[str]], List[str]]
+) -> pl.Series:
+    """Applies a function to the distinct non-null values of a Series and broadcasts the results back to every row
+
+    Args:
+        values (pl.Series): a String Series
+        function (Callable[[List[str]], List[str]]): maps a list of distinct values to a list of replacements, in the same order
+
+    Returns:
+        pl.Series: the replacement of every value, with nulls left as nulls
+    """
+    return map_unique_series(
+        values,
+        lambda unique_values: pl.Series(
+            function(unique_values.to_list()), dtype=pl.String
+        ),
+    )
+
+
+def map_unique_series(
+    values: pl.Series, function: Callable[[pl.Series], pl.Series]
+) -> pl.Series:
+    """Applies a vectorised function to the distinct non-null values of a Series and broadcasts the results back to every row
+
+    Batches where every value is distinct skip the broadcast, which costs more than the
+    deduplication itself.
+
+    Args:
+        values (pl.Series): a String Series
+        function (Callable[[pl.Series], pl.Series]): maps a Series of distinct values to a String Series of replacements, in the same order
+
+    Returns:
+        pl.Series: the replacement of every value, with nulls left as nulls
+    """
+    non_null_values = values.drop_nulls()
+    unique_values = non_null_values.unique()
+
+    # When every value is distinct there is nothing to broadcast: results are scattered back directly
+    if len(unique_values) == len(non_null_values):
+        replacements = function(non_null_values).alias(values.name)
+        if len(non_null_values) == len(values):
+            return replacements
+
+        return pl.Series(values.name, [None] * len(values), dtype=pl.String).scatter(
+            values.is_not_null().arg_true(), replacements
+        )
+
+    replacements = function(unique_values)
+
+    return values.replace_strict(
+        unique_values, replacements, default=None, return_dtype=pl.String
+    )
+
+
+def resolve_masking(
+    pii_fields: List[str],
+    masking_string: str,
+    masking_strategy: MaskingStrategyArg = None,
+) -> Dict[str, MaskingStrategy]:
+    """Pairs every PII field with the strategy used to mask it
+
+    Args:
+        pii_fields (List[str]): list of column names containing PII to obfuscate
+        masking_string (str): string used to replace PII data of fields without a strategy
+        masking_strategy (MaskingStrategyArg): a strategy for every field, a strategy per field, or None to use the masking string
+
+    Raises:
+        ValueError: if masking_strategy has fields that aren't PII fields
+
+    Returns:
+        Dict[str, MaskingStrategy]: the strategy of every PII field, in the order of `pii_fields`
+    """
+    default = ConstantMask(masking_string)
+
+    if masking_strategy is None:
+        return {field: default for field in pii_fields}
+
+    if isinstance(masking_strategy, MaskingStrategy):
+        return {field: masking_strategy for field in pii_fields}
+
+    unknown_fields = [field for field in masking_strategy if field not in pii_fields]
+    if unknown_fields:
+        raise ValueError(f"masking_strategy fields not in pii_fields: {unknown_fields}")
+
+    return {field: masking_strategy.get(field, default) for field in pii_fields}
+
+
+def resolve_unmasking(
+    fields: List[str], masking_strategy: MaskingStrategyArg
+) -> Dict[str, MaskingStrategy]:
+    """Pairs every masked field with a strategy recovering its original values
+
+    Args:
+        fields (List[str]): list of masked column names to recover
+        masking_strategy (MaskingStrategyArg): the reversible strategy the fields were masked with, or a strategy per field
+
+    Raises:
+        ValueError: if masking_strategy has fields that aren't in `fields`
+        ValueError: if a field has no strategy or a strategy that isn't reversible
+
+    Returns:
+        Dict[str, MaskingStrategy]: the unmasking strategy of every field, in the order of `fields`
+    """
+    masking = resolve_masking(fields, "***", masking_strategy)
+
+    irreversible_fields = [
+        field for field, strategy in masking.items() if not strategy.reversible
+    ]
+    if irreversible_fields:
+        raise ValueError(
+            f"masking_strategy isn't reversible for fields: {irreversible_fields}"
+        )
+
+    return {field: _Unmask(strategy) for field, strategy in masking.items()}
+
+
+class _Unmask(MaskingStrategy):
+    """Applies the `unmask` expression of a reversible strategy in place of its `mask` expression"""
+
+    def __init__(self, strategy: MaskingStrategy) -> None:
+        self.strategy = strategy
+
+    def mask_values(self, values: pl.Expr) -> pl.Expr:
+        return self.strategy.unmask_values(values)
+
+
+def _require_cryptography() -> None:
+    if AESSIV is None:
+        raise ImportError(
+            "DeterministicEncryption requires the cryptography package, "
+            "install it with the `encryption` extra or `pip install cryptography`"
+        )
@@ -0,0 +1,477 @@
+"""Parquet footer parsing used to plan column projections and ranged reads, and footer rewriting used to split and join Parquet files."""
+
+import struct
+from dataclasses import dataclass
+from typing import Any, Dict, List, Tuple, Union
+
+PARQUET_MAGIC = b"PAR1"
+"""Magic bytes found at the start and at the end of every Parquet file"""
+
+PARQUET_TAIL_SIZE = 8
+"""Size of the Parquet file tail: a 4 byte little-endian footer length followed by the magic bytes"""
+
+# Thrift compact protocol type ids
+T_STOP = 0
+T_BOOLEAN_TRUE = 1
+T_BOOLEAN_FALSE = 2
+T_BYTE = 3
+T_I16 = 4
+T_I32 = 5
+T_I64 = 6
+T_DOUBLE = 7
+T_BINARY = 8
+T_LIST = 9
+T_SET = 10
+T_MAP = 11
+T_STRUCT = 12
+
+# Field ids of the Parquet thrift definitions (parquet-format/src/main/thrift/parquet.thrift)
+FILE_METADATA_SCHEMA = 2
+FILE_METADATA_NUM_ROWS = 3
+FILE_METADATA_ROW_GROUPS = 4
+SCHEMA_ELEMENT_NAME = 4
+SCHEMA_ELEMENT_NUM_CHILDREN = 5
+ROW_GROUP_COLUMNS = 1
+ROW_GROUP_NUM_ROWS = 3
+ROW_GROUP_FILE_OFFSET = 5
+ROW_GROUP_ORDINAL = 7
+COLUMN_CHUNK_FILE_OFFSET = 2
+COLUMN_CHUNK_META_DATA = 3
+COLUMN_CHUNK_OFFSET_INDEX_OFFSET = 4
+COLUMN_CHUNK_OFFSET_INDEX_LENGTH = 5
+COLUMN_CHUNK_COLUMN_INDEX_OFFSET = 6
+COLUMN_CHUNK_COLUMN_INDEX_LENGTH = 7
+COLUMN_META_DATA_PATH_IN_SCHEMA = 3
+COLUMN_META_DATA_TOTAL_COMPRESSED_SIZE = 7
+COLUMN_META_DATA_DATA_PAGE_OFFSET = 9
+COLUMN_META_DATA_INDEX_PAGE_OFFSET = 10
+COLUMN_META_DATA_DICTIONARY_PAGE_OFFSET = 11
+COLUMN_META_DATA_BLOOM_FILTER_OFFSET = 14
+COLUMN_META_DATA_BLOOM_FILTER_LENGTH = 15
+
+
+class ThriftStruct(Dict[int, Any]):
+    """A decoded thrift struct mapping field ids to values, keeping the wire type of each field"""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.types: Dict[int, int] = {}
+
+
+class ThriftList(List[Any]):
+    """A decoded thrift list or set, keeping the wire type of its elements"""
+
+    def __init__(self, element_type: int) -> None:
+        super().__init__()
+        self.element_type = element_type
+
+
+@dataclass(frozen=True)
+class ParquetColumnChunk:
+    """Location of a single column chunk inside a Parquet file"""
+
+    column: str
+    start: int
+    length: int
+
+
+@dataclass(frozen=True)
+class ParquetRowGroup:
+    """Row count and column chunk locations of a Parquet row group"""
+
+    num_rows: int
+    columns: List[ParquetColumnChunk]
+
+
+@dataclass(frozen=True)
+class ParquetMetadata:
+    """The parts of a Parquet footer needed to plan projections and ranged reads"""
+
+    columns: List[str]
+    num_rows: int
+    row_groups: List[ParquetRowGroup]
+    footer_start: int
+    raw: ThriftStruct
+
+
+def read_parquet_metadata(source: Union[bytes, str]) -> ParquetMetadata:
+    """Reads the footer of a Parquet file held in memory or stored on local disk
+
+    Args:
+        source (Union[bytes, str]): the contents of a Parquet file, or a path to one
+
+    Raises:
+        ValueError: if the source is not a valid Parquet file
+
+    Returns:
+        ParquetMetadata: the parsed Parquet footer
+    """
+    if isinstance(source, str):
+        with open(source, mode="rb") as file:
+            file_size = file.seek(0, 2)
+            footer_length = parse_parquet_tail(_read_at(file, file_size - 8, 8))
+            footer_start = file_size - PARQUET_TAIL_SIZE - footer_length
+            footer = _read_at(file, footer_start, footer_length)
+    else:
+        footer_length = parse_parquet_tail(source[-PARQUET_TAIL_SIZE:])
+        footer_start = len(source) - PARQUET_TAIL_SIZE - footer_length
+        footer = source[footer_start : footer_start + footer_length]
+
+    return parse_parquet_footer(footer, footer_start)
+
+
+def parse_parquet_tail(tail: bytes) -> int:
+    """Returns the footer length stored in the last 8 bytes of a Parquet file
+
+    Args:
+        tail (bytes): the last 8 bytes of a Parquet file
+
+    Raises:
+        ValueError: if the bytes don't end with the Parquet magic bytes
+
+    Returns:
+        int: the length of the thrift encoded footer
+    """
+    if len(tail) != PARQUET_TAIL_SIZE or tail[4:] != PARQUET_MAGIC:
+        raise ValueError("Invalid Parquet file: missing PAR1 magic bytes")
+
+    return struct.unpack("<I", tail[:4])[0]
+
+
+def parse_parquet_footer(footer: bytes, footer_start: int) -> ParquetMetadata:
+    """Parses a thrift compact encoded Parquet FileMetaData footer
+
+    Args:
+        footer (bytes): the thrift encoded footer
+        footer_start (int): the offset of the footer within the Parquet file
+
+    Returns:
+        ParquetMetadata: the parsed Parquet footer
+    """
+    file_metadata, _ = _ThriftCompactReader(footer).read_struct()
+
+    row_groups = []
+    for row_group in file_metadata.get(FILE_METADATA_ROW_GROUPS, []):
+        chunks = []
+        for column_chunk in row_group[ROW_GROUP_COLUMNS]:
+            metadata = column_chunk[COLUMN_CHUNK_META_DATA]
+            start = metadata[COLUMN_META_DATA_DATA_PAGE_OFFSET]
+            dictionary_page_offset = metadata.get(
+                COLUMN_META_DATA_DICTIONARY_PAGE_OFFSET
+            )
+            if dictionary_page_offset and dictionary_page_offset < start:
+                start = dictionary_page_offset
+
+            chunks.append(
+                ParquetColumnChunk(
+                    column=metadata[COLUMN_META_DATA_PATH_IN_SCHEMA][0].decode(),
+                    start=start,
+                    length=metadata[COLUMN_META_DATA_TOTAL_COMPRESSED_SIZE],
+                )
+            )
+
+        row_groups.append(
+            ParquetRowGroup(num_rows=row_group[ROW_GROUP_NUM_ROWS], columns=chunks)
+        )
+
+    return ParquetMetadata(
+        columns=_top_level_columns(file_metadata[FILE_METADATA_SCHEMA]),
+        num_rows=file_metadata[FILE_METADATA_NUM_ROWS],
+        row_groups=row_groups,
+        footer_start=footer_start,
+        raw=file_metadata,
+    )
+
+
+def parquet_footer_with_row_groups(
+    file_metadata: ThriftStruct, row_groups: List[Tuple[ThriftStruct, int]]
+) -> ThriftStruct:
+    """Returns a copy of a Parquet footer describing other row groups, moved by the given number of bytes
+
+    Used to read some of the row groups of a file, and to join the row groups of files whose
+    bodies are concatenated. The row count and row group ordinals are recomputed. Page indexes
+    and bloom filters are optional, and their offsets point into data that may not be kept, so
+    their references are dropped rather than moved.
+
+    Args:
+        file_metadata (ThriftStruct): the decoded FileMetaData struct whose schema and key-value metadata are kept
+        row_groups (List[Tuple[ThriftStruct, int]]): every RowGroup struct of the new footer, with the number of bytes its column chunks moved by
+
+    Returns:
+        ThriftStruct: the new FileMetaData struct
+    """
+    result = _copy_struct(file_metadata)
+    result[FILE_METADATA_ROW_GROUPS] = ThriftList(T_STRUCT)
+    result[FILE_METADATA_NUM_ROWS] = 0
+
+    for ordinal, (row_group, shift) in enumerate(row_groups):
+        moved_row_group = _copy_struct(row_group)
+        _move_offset(moved_row_group, ROW_GROUP_FILE_OFFSET, shift)
+        if ROW_GROUP_ORDINAL in moved_row_group:
+            moved_row_group[ROW_GROUP_ORDINAL] = ordinal
+
+        columns = ThriftList(T_STRUCT)
+        for column_chunk in row_group[ROW_GROUP_COLUMNS]:
+            moved_column_chunk = _copy_struct(
+                column_chunk,
+                drop=(
+                    COLUMN_CHUNK_OFFSET_INDEX_OFFSET,
+                    COLUMN_CHUNK_OFFSET_INDEX_LENGTH,
+                    COLUMN_CHUNK_COLUMN_INDEX_OFFSET,
+                    COLUMN_CHUNK_COLUMN_INDEX_LENGTH,
+                ),
+            )
+            _move_offset(moved_column_chunk, COLUMN_CHUNK_FILE_OFFSET, shift)
+
+            metadata = _copy_struct(
+                column_chunk[COLUMN_CHUNK_META_DATA],
+                drop=(
+                    COLUMN_META_DATA_BLOOM_FILTER_OFFSET,
+                    COLUMN_META_DATA_BLOOM_FILTER_LENGTH,
+                ),
+            )
+            for field_id in (
+                COLUMN_META_DATA_DATA_PAGE_OFFSET,
+                COLUMN_META_DATA_INDEX_PAGE_OFFSET,
+                COLUMN_META_DATA_DICTIONARY_PAGE_OFFSET,
+            ):
+                _move_offset(metadata, field_id, shift)
+            moved_column_chunk[COLUMN_CHUNK_META_DATA] = metadata
+            columns.append(moved_column_chunk)
+
+        moved_row_group[ROW_GROUP_COLUMNS] = columns
+        result[FILE_METADATA_ROW_GROUPS].append(moved_row_group)
+        result[FILE_METADATA_NUM_ROWS] += row_group[ROW_GROUP_NUM_ROWS]
+
+    return result
+
+
+def serialize_parquet_footer(file_metadata: ThriftStruct) -> bytes:
+    """Encodes a FileMetaData struct as a Parquet footer, followed by the Parquet file tail
+
+    Args:
+        file_metadata (ThriftStruct): the decoded FileMetaData struct
+
+    Raises:
+        ValueError: if the struct holds a value the thrift compact encoder doesn't support
+
+    Returns:
+        bytes: the bytes that end a Parquet file, from the start of its footer
+    """
+    footer = _ThriftCompactWriter().write_struct(file_metadata)
+
+    return footer + struct.pack("<I", len(footer)) + PARQUET_MAGIC
+
+
+def _copy_struct(source: ThriftStruct, drop: Tuple[int, ...] = ()) -> ThriftStruct:
+    """Returns a shallow copy of a thrift struct without the fields in `drop`"""
+    result = ThriftStruct()
+    for field_id, value in source.items():
+        if field_id not in drop:
+            result[field_id] = value
+            result.types[field_id] = source.types[field_id]
+
+    return result
+
+
+def _move_offset(thrift_struct: ThriftStruct, field_id: int, shift: int) -> None:
+    """Adds `shift` to a file offset field of a thrift struct, when it is set"""
+    if thrift_struct.get(field_id):
+        thrift_struct[field_id] += shift
+
+
+def _top_level_columns(schema: List[ThriftStruct]) -> List[str]:
+    """Returns the names of the top level columns of a flattened Parquet schema
+
+    Args:
+        schema (List[ThriftStruct]): the depth-first list of SchemaElement structs
+
+    Returns:
+        List[str]: the names of the direct children of the schema root
+    """
+    columns = []
+    index = 1
+    for _ in range(schema[0].get(SCHEMA_ELEMENT_NUM_CHILDREN, 0)):
+        columns.append(schema[index][SCHEMA_ELEMENT_NAME].decode())
+        index = _skip_schema_element(schema, index)
+
+    return columns
+
+
+def _skip_schema_element(schema: List[ThriftStruct], index: int) -> int:
+    """Returns the index of the schema element following the subtree rooted at `index`"""
+    num_children = schema[index].get(SCHEMA_ELEMENT_NUM_CHILDREN, 0)
+    index += 1
+    for _ in range(num_children):
+        index = _skip_schema_element(schema, index)
+
+    return index
+
+
+def _read_at(file: Any, offset: int, length: int) -> bytes:
+    """Reads `length` bytes at `offset` from a binary file object"""
+    file.seek(offset)
+
+    return file.read(length)
+
+
+class _ThriftCompactReader:
+    """A minimal decoder for the thrift compact protocol used by Parquet footers"""
+
+    def __init__(self, data: bytes) -> None:
+        self.data = data
+        self.position = 0
+
+    def read_struct(self) -> Tuple[ThriftStruct, int]:
+        result = ThriftStruct()
+        field_id = 0
+
+        while True:
+            header = self._read_byte()
+            field_type = header & 0x0F
+            if field_type == T_STOP:
+                return result, self.position
+
+            delta = header >> 4
+            field_id = field_id + delta if delta else self._read_zigzag()
+
+            if field_type in (T_BOOLEAN_TRUE, T_BOOLEAN_FALSE):
+                result[field_id] = field_type == T_BOOLEAN_TRUE
+                result.types[field_id] = T_BOOLEAN_TRUE
+            else:
+                result[field_id] = self._read_value(field_type)
+                result.types[field_id] = field_type
+
+    def _read_value(self, value_type: int) -> Any:
+        if value_type in (T_BOOLEAN_TRUE, T_BOOLEAN_FALSE):
+            return self._read_byte() == T_BOOLEAN_TRUE
+        if value_type == T_BYTE:
+            return struct.unpack("<b", bytes([self._read_byte()]))[0]
+        if value_type in (T_I16, T_I32, T_I64):
+            return self._read_zigzag()
+        if value_type == T_DOUBLE:
+            value = struct.unpack_from("<d", self.data, self.position)[0]
+            self.position += 8
+            return value
+        if value_type == T_BINARY:
+            length = self._read_varint()
+            value = bytes(self.data[self.position : self.position + length])
+            self.position += length
+            return value
+        if value_type in (T_LIST, T_SET):
+            return self._read_list()
+        if value_type == T_MAP:
+            return self._read_map()
+        if value_type == T_STRUCT:
+            return self.read_struct()[0]
+
+        raise ValueError(f"Invalid Parquet footer: unknown thrift type {value_type}")
+
+    def _read_list(self) -> ThriftList:
+        header = self._read_byte()
+        size = header >> 4
+        if size == 15:
+            size = self._read_varint()
+
+        result = ThriftList(header & 0x0F)
+        for _ in range(size):
+            result.append(self._read_value(result.element_type))
+
+        return result
+
+    def _read_map(self) -> Dict[Any, Any]:
+        size = self._read_varint()
+        if size == 0:
+            return {}
+
+        types = self._read_byte()
+        return {
+            self._read_value(types >> 4): self._read_value(types & 0x0F)
+            for _ in range(size)
+        }
+
+    def _read_byte(self) -> int:
+        value = self.data[self.position]
+        self.position += 1
+        return value
+
+    def _read_varint(self) -> int:
+        result = 0
+        shift = 0
+        while True:
+            byte = self._read_byte()
+            result |= (byte & 0x7F) << shift
+            if not byte & 0x80:
+                return result
+            shift += 7
+
+    def _read_zigzag(self) -> int:
+        value = self._read_varint()
+        return (value >> 1) ^ -(value & 1)
+
+
+class _ThriftCompactWriter:
+    """A minimal encoder for the thrift compact protocol, writing back the structs `_ThriftCompactReader` decodes"""
+
+    def __init__(self) -> None:
+        self.data = bytearray()
+
+    def write_struct(self, value: ThriftStruct) -> bytes:
+        last_field_id = 0
+        for field_id in sorted(value):
+            field_type = value.types[field_id]
+            if field_type in (T_BOOLEAN_TRUE, T_BOOLEAN_FALSE):
+                field_type = T_BOOLEAN_TRUE if value[field_id] else T_BOOLEAN_FALSE
+
+            delta = field_id - last_field_id
+            if 0 < delta <= 15:
+                self.data.append(delta << 4 | field_type)
+            else:
+                self.data.append(field_type)
+                self._write_zigzag(field_id)
+
+            if field_type not in (T_BOOLEAN_TRUE, T_BOOLEAN_FALSE):
+                self._write_value(field_type, value[field_id])
+            last_field_id = field_id
+
+        self.data.append(T_STOP)
+
+        return bytes(self.data)
+
+    def _write_value(self, value_type: int, value: Any) -> None:
+        if value_type in (T_BOOLEAN_TRUE, T_BOOLEAN_FALSE):
+            self.data.append(T_BOOLEAN_TRUE if value else T_BOOLEAN_FALSE)
+        elif value_type == T_BYTE:
+            self.data += struct.pack("<b", value)
+        elif value_type in (T_I16, T_I32, T_I64):
+            self._write_zigzag(value)
+        elif value_type == T_DOUBLE:
+            self.data += struct.pack("<d", value)
+        elif value_type == T_BINARY:
+            self._write_varint(len(value))
+            self.data += value
+        elif value_type in (T_LIST, T_SET):
+            self._write_list(value)
+        elif value_type == T_STRUCT:
+            self.write_struct(value)
+        else:
+            raise ValueError(f"Unsupported thrift type: {value_type}")
+
+    def _write_list(self, value: ThriftList) -> None:
+        if len(value) < 15:
+            self.data.append(len(value) << 4 | value.element_type)
+        else:
+            self.data.append(0xF0 | value.element_type)
+            self._write_varint(len(value))
+
+        for element in value:
+            self._write_value(value.element_type, element)
+
+    def _write_varint(self, value: int) -> None:
+        while value > 0x7F:
+            self.data.append(value & 0x7F | 0x80)
+            value >>= 7
+        self.data.append(value)
+
+    def _write_zigzag(self, value: int) -> None:
+        self._write_varint((value << 1) ^ (value >> 63))
@@ -0,0 +1,174 @@
+"""Choice of the processing engine of a file from its size and the memory available."""
+
+import errno
+import logging
+import os
+import shutil
+import tempfile
+from dataclasses import dataclass
+from typing import Literal, Optional
+
+logger = logging.getLogger(__name__)
+
+MEMORY_BUDGET_FRACTION = 0.75
+"""Fraction of the memory limit the eager engine may use, the rest is left to the Python interpreter, Polars and boto3"""
+
+EAGER_MEMORY_FACTORS = {
+    "csv": 3,
+    "json": 10,
+    "ndjson": 3,
+    "parquet": 10,
+    "arrow": 3,
+    "avro": 3,
+}
+"""Peak memory of the eager engine as a multiple of the size of an uncompressed file, measured on files of mixed string and numeric columns. Parquet files are compressed and JSON arrays are parsed into Python objects, so they grow the most"""
+
+COMPRESSED_SIZE_FACTOR = 5
+"""Assumed ratio between the decompressed and compressed size of gzip, bz2 and zstd compressed files, whose decompressed size isn't known until they are read"""
+
+_LAMBDA_MEMORY_SIZE_VARIABLE = "AWS_LAMBDA_FUNCTION_MEMORY_SIZE"
+
+_CGROUP_MEMORY_LIMIT_PATH = "/sys/fs/cgroup/memory.max"
+
+PlanPath = Literal["in_memory", "streaming", "spill_to_disk"]
+"""How a file is processed: loaded into memory, read in place batch by batch, or spilled to local disk and read batch by batch"""
+
+_PATH_DESCRIPTIONS = {
+    "in_memory": "in memory",
+    "streaming": "batch by batch, in place",
+    "spill_to_disk": "batch by batch, from a temporary file on local disk",
+}
+
+
+@dataclass(frozen=True)
+class EnginePlan:
+    """The engine chosen to process a file and why
+
+    Attributes:
+        engine (Literal["eager", "streaming"]): the processing engine
+        path (PlanPath): how the file is processed: `in_memory` with the eager engine, `streaming` when the streaming engine reads a local file in place, or `spill_to_disk` when it is first copied to a temporary file
+        reason (str): why the engine was chosen, as logged
+    """
+
+    engine: Literal["eager", "streaming"]
+    path: PlanPath
+    reason: str
+
+
+def memory_limit() -> Optional[int]:
+    """Returns the memory available to this process, in bytes
+
+    The memory size of the Lambda function is used when running in AWS Lambda, then the limit of
+    the process' cgroup (e.g. in a container), then the physical memory of the host.
+
+    Returns:
+        Optional[int]: the memory limit, or None if it can't be found
+    """
+    lambda_memory_size = os.environ.get(_LAMBDA_MEMORY_SIZE_VARIABLE)
+    if lambda_memory_size:
+        return int(lambda_memory_size) * 1024 * 1024
+
+    try:
+        with open(_CGROUP_MEMORY_LIMIT_PATH) as file:
+            cgroup_limit = file.read().strip()
+        if cgroup_limit != "max":
+            return int(cgroup_limit)
+    except (OSError, ValueError):
+        pass
+
+    try:
+        return os.sysconf("SC_PHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def plan_engine(
+    name: str,
+    file_type: str,
+    size: Optional[int],
+    compressed: bool = False,
+    in_place: bool = False,
+    memory_budget: Optional[int] = None,
+) -> EnginePlan:
+    """Chooses the engine a file is processed with and logs the choice
+
+    A file is loaded into memory with the eager engine when its estimated peak memory, its size
+    times `EAGER_MEMORY_FACTORS` (and `COMPRESSED_SIZE_FACTOR` if it is compressed), fits in the
+    memory budget. Larger files, and files of unknown size, are processed batch by batch with the
+    streaming engine, which first spills them to local disk unless they can be read in place. A
+    file is rejected before anything is downloaded when it is larger than the free space of the
+    temporary directory it would be spilled to. Compressed files only have their decompressed
+    size estimated, so a warning is logged instead when only the estimate is larger.
+
+    Args:
+        name (str): the address of the file, used in the log message
+        file_type (str): type of the file
+        size (Optional[int]): the size of the file in bytes, or None if it isn't known
+        compressed (bool): whether the file is compressed with gzip, bz2 or zstd
+        in_place (bool): whether the streaming engine reads the file where it is, an uncompressed local file, rather than from a temporary copy
+        memory_budget (Optional[int]): memory the eager engine may use in bytes (default is None, `MEMORY_BUDGET_FRACTION` of `memory_limit()`)
+
+    Raises:
+        OSError: with errno ENOSPC, if the file would be spilled to local disk and is larger than its free space
+
+    Returns:
+        EnginePlan: the chosen engine and the reason it was chosen
+    """
+    if memory_budget is None:
+        limit = memory_limit()
+        memory_budget = int(limit * MEMORY_BUDGET_FRACTION) if limit else None
+
+    expanded_size = None
+    if size is not None:
+        expanded_size = size * COMPRESSED_SIZE_FACTOR if compressed else size
+
+    if expanded_size is None:
+        reason = "its size is unknown"
+    elif memory_budget is None:
+        reason = "the memory limit is unknown"
+    else:
+        estimate = expanded_size * EAGER_MEMORY_FACTORS.get(file_type, 1)
+        comparison = "fits in" if estimate <= memory_budget else "exceeds"
+        reason = (
+            f"its estimated peak memory of {_mib(estimate)} {comparison} the "
+            f"memory budget of {_mib(memory_budget)}"
+        )
+        if estimate <= memory_budget:
+            return _log_plan(name, EnginePlan("eager", "in_memory", reason))
+
+    if in_place:
+        return _log_plan(name, EnginePlan("streaming", "streaming", reason))
+
+    free_space = shutil.disk_usage(tempfile.gettempdir()).free
+    if size is not None and size > free_space:
+        raise OSError(
+            errno.ENOSPC,
+            f"{name} is {_mib(size)}, more than the {_mib(free_space)} of free space "
+            f"left in {tempfile.gettempdir()} to spill it to while it is processed "
+            f"batch by batch, as {reason}",
+        )
+    if expanded_size is not None and expanded_size > free_space:
+        logger.warning(
+            "%s may not fit in the %s of free space left in %s once decompressed",
+            name,
+            _mib(free_space),
+            tempfile.gettempdir(),
+        )
+
+    return _log_plan(name, EnginePlan("streaming", "spill_to_disk", reason))
+
+
+def _log_plan(name: str, plan: EnginePlan) -> EnginePlan:
+    logger.info(
+        "Processing %s %s with the %s engine, as %s",
+        name,
+        _PATH_DESCRIPTIONS[plan.path],
+        plan.engine,
+        plan.reason,
+    )
+
+    return plan
+
+
+def _mib(size: int) -> str:
+    return f"{size / (1024 * 1024):.1f} MiB"
@@ -0,0 +1,172 @@
+"""A writable file object that streams its contents into an S3 multipart upload."""
+
+import io
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, List, Optional, Tuple
+
+from botocore.exceptions import ClientError
+
+if TYPE_CHECKING:
+    from types_boto3_s3.client import S3Client
+
+MIN_UPLOAD_PART_SIZE = 5 * 1024 * 1024
+"""Smallest part size S3 accepts for every part of a multipart upload except the last one"""
+
+
+class S3MultipartWriter(io.RawIOBase):
+    """Writes bytes to an S3 object, uploading them as multipart upload parts while more data is still being written
+
+    Data is buffered until more than `part_size` bytes are available, then each full part is
+    uploaded on a background thread. At most `max_concurrency` parts are held in memory or in
+    flight at any time: `write` blocks until an upload finishes when that limit is reached.
+    Outputs smaller than one part are uploaded with a single PutObject request instead.
+
+    Closing the writer completes the upload. Leaving a `with` block because of an exception, or
+    calling `abort`, aborts the multipart upload so that no partial object or orphaned parts are
+    left behind.
+
+    Args:
+        bucket (str): the name of the destination S3 bucket
+        key (str): the key of the destination object
+        s3_client (S3Client): the S3 client to use for the requests
+        part_size (int): size in bytes of each uploaded part, at least 5 MiB for real S3 buckets
+        max_concurrency (int): maximum number of parts uploaded at the same time
+        content_type (Optional[str]): MIME type stored with the uploaded object
+    """
+
+    def __init__(
+        self,
+        bucket: str,
+        key: str,
+        s3_client: "S3Client",
+        part_size: int,
+        max_concurrency: int,
+        content_type: Optional[str] = None,
+    ) -> None:
+        super().__init__()
+        self.bucket = bucket
+        self.key = key
+        self.s3_client = s3_client
+        self.part_size = part_size
+        self.content_type = content_type
+
+        self._buffer = bytearray()
+        self._upload_id: Optional[str] = None
+        self._parts: List[Tuple[int, Future]] = []
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency)
+        self._aborted = False
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data: Any) -> int:
+        self._raise_if_upload_failed()
+        self._buffer += data
+
+        # A part is only uploaded once more data follows it, so the last part is never empty
+        while len(self._buffer) > self.part_size:
+            self._upload_part(bytes(self._buffer[: self.part_size]))
+            del self._buffer[: self.part_size]
+
+        return len(data)
+
+    def close(self) -> None:
+        if self.closed:
+            return
+
+        try:
+            if not self._aborted:
+                self._complete()
+        except BaseException:
+            self.abort()
+            raise
+        finally:
+            self._executor.shutdown(wait=True)
+            super().close()
+
+    def abort(self) -> None:
+        """Aborts the multipart upload, discarding every part uploaded so far"""
+        if self._aborted:
+            return
+
+        self._aborted = True
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+        if self._upload_id is not None:
+            self.s3_client.abort_multipart_upload(
+                Bucket=self.bucket, Key=self.key, UploadId=self._upload_id
+            )
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is not None:
+            try:
+                self.abort()
+            finally:
+                super().close()
+        else:
+            self.close()
+
+    def _complete(self) -> None:
+        if self._upload_id is None:
+            self._call_s3(
+                self.s3_client.put_object,
+                Body=bytes(self._buffer),
+                **self._content_type_args(),
+            )
+            return
+
+        self._upload_part(bytes(self._buffer))
+        self._buffer.clear()
+
+        parts = [
+            {"PartNumber": part_number, "ETag": future.result()}
+            for part_number, future in self._parts
+        ]
+        self._call_s3(
+            self.s3_client.complete_multipart_upload,
+            UploadId=self._upload_id,
+            MultipartUpload={"Parts": parts},  # type: ignore
+        )
+
+    def _upload_part(self, body: bytes) -> None:
+        if self._upload_id is None:
+            response = self._call_s3(
+                self.s3_client.create_multipart_upload, **self._content_type_args()
+            )
+            self._upload_id = response["UploadId"]
+
+        part_number = len(self._parts) + 1
+
+        self._slots.acquire()
+        future = self._executor.submit(self._send_part, part_number, body)
+        future.add_done_callback(lambda _: self._slots.release())
+        self._parts.append((part_number, future))
+
+    def _send_part(self, part_number: int, body: bytes) -> str:
+        response = self.s3_client.upload_part(
+            Bucket=self.bucket,
+            Key=self.key,
+            UploadId=self._upload_id,  # type: ignore
+            PartNumber=part_number,
+            Body=body,
+        )
+
+        return response["ETag"]
+
+    def _raise_if_upload_failed(self) -> None:
+        for _, future in self._parts:
+            if future.done() and future.exception() is not None:
+                raise future.exception()  # type: ignore
+
+    def _content_type_args(self) -> dict:
+        return {"ContentType": self.content_type} if self.content_type else {}
+
+    def _call_s3(self, method: Any, **kwargs: Any) -> Any:
+        try:
+            return method(Bucket=self.bucket, Key=self.key, **kwargs)
+        except ClientError as err:
+            if err.response.get("Error", {}).get("Code") == "NoSuchBucket":
+                raise FileNotFoundError("The specified bucket does not exist.")
+            raise err
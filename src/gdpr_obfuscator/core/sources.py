@@ -0,0 +1,193 @@
+"""The places files are obfuscated from: S3 objects, local files, in-memory contents and file objects."""
+
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from typing import IO, Iterator, Optional, Tuple, Union
+
+READ_CHUNK_SIZE = 1024 * 1024
+"""Number of bytes read from local files and file objects at a time when they are copied or decompressed"""
+
+SourceArg = Union[str, "os.PathLike[str]", bytes, bytearray, memoryview, IO[bytes]]
+"""A file to obfuscate: an S3 address, a local `os.PathLike` path, the contents of a file, or a binary file object"""
+
+
+@dataclass(frozen=True)
+class S3Source:
+    """An object stored in S3
+
+    Attributes:
+        bucket (str): the name of the S3 bucket
+        key (str): the key of the file in the S3 bucket
+    """
+
+    bucket: str
+    key: str
+
+
+@dataclass(frozen=True)
+class LocalSource:
+    """A file on local disk, which Polars memory-maps rather than copying it into Python bytes
+
+    Attributes:
+        path (str): the path to the file
+    """
+
+    path: str
+
+    @property
+    def name(self) -> str:
+        """The name of the file, used to recognise compressed files by their suffix"""
+        return self.path
+
+    def size(self) -> Optional[int]:
+        """The size of the file in bytes"""
+        return os.path.getsize(self.path)
+
+    def peek(self, size: int) -> bytes:
+        """Returns the first `size` bytes of the file"""
+        with open(self.path, mode="rb") as file:
+            return file.read(size)
+
+    def iter_chunks(self) -> Iterator[bytes]:
+        """Yields the contents of the file in chunks of `READ_CHUNK_SIZE` bytes"""
+        with open(self.path, mode="rb") as file:
+            yield from iter(lambda: file.read(READ_CHUNK_SIZE), b"")
+
+
+@dataclass(frozen=True)
+class InMemorySource:
+    """The contents of a file, already in memory
+
+    Attributes:
+        data (bytes): the contents of the file
+    """
+
+    data: bytes
+
+    @property
+    def name(self) -> str:
+        """The name of the file, unknown for contents held in memory"""
+        return ""
+
+    def size(self) -> Optional[int]:
+        """The size of the file in bytes"""
+        return len(self.data)
+
+    def peek(self, size: int) -> bytes:
+        """Returns the first `size` bytes of the file"""
+        return self.data[:size]
+
+    def iter_chunks(self) -> Iterator[bytes]:
+        """Yields the contents of the file, in a single chunk"""
+        yield self.data
+
+
+@dataclass(frozen=True)
+class FileObjectSource:
+    """A binary file object, read from its current position
+
+    Attributes:
+        file (IO[bytes]): the file object
+    """
+
+    file: IO[bytes]
+
+    @property
+    def name(self) -> str:
+        """The name of the file object's file, if it has one"""
+        name = getattr(self.file, "name", "")
+        return name if isinstance(name, str) else ""
+
+    def size(self) -> Optional[int]:
+        """The number of bytes left in the file object, or None if it isn't seekable"""
+        if not self.file.seekable():
+            return None
+
+        position = self.file.tell()
+        end = self.file.seek(0, os.SEEK_END)
+        self.file.seek(position)
+
+        return end - position
+
+    def peek(self, size: int) -> bytes:
+        """Returns the next `size` bytes of the file object without consuming them, or no bytes if it isn't seekable"""
+        if not self.file.seekable():
+            return b""
+
+        position = self.file.tell()
+        head = self.file.read(size)
+        self.file.seek(position)
+
+        return head
+
+    def iter_chunks(self) -> Iterator[bytes]:
+        """Yields the rest of the file object in chunks of `READ_CHUNK_SIZE` bytes"""
+        yield from iter(lambda: self.file.read(READ_CHUNK_SIZE), b"")
+
+
+Source = Union[S3Source, LocalSource, InMemorySource, FileObjectSource]
+"""A resolved file to obfuscate"""
+
+LocalSourceT = Union[LocalSource, InMemorySource, FileObjectSource]
+"""A file to obfuscate that isn't stored in S3"""
+
+
+def resolve_source(source: SourceArg) -> Source:
+    """Works out where a file to obfuscate is stored
+
+    Strings are always S3 addresses, so an address taken from untrusted input, such as a Lambda
+    event, can never be read from the local file system. Local files must be passed as
+    `os.PathLike` paths, e.g. `pathlib.Path`.
+
+    Args:
+        source (SourceArg): the file to obfuscate
+
+    Raises:
+        FileNotFoundError: if an S3 address is malformed or a local path doesn't point to a file
+
+    Returns:
+        Source: the resolved source
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return InMemorySource(bytes(source))
+
+    if isinstance(source, os.PathLike):
+        path = os.fspath(source)
+        if not os.path.isfile(path):
+            raise FileNotFoundError(f"Local file not found: {path}")
+
+        return LocalSource(path)
+
+    if not isinstance(source, str):
+        return FileObjectSource(source)
+
+    return S3Source(*_parse_s3_path(source))
+
+
+def _parse_s3_path(s3_path: str) -> Tuple[str, str]:
+    """Parses a given S3 path, such as "s3://bucket_name/file_key.csv" and returns an s3 bucket name and a file key
+
+    Args:
+        s3_path (str): an s3 path formatted as "s3://bucket_name/file_key.csv"
+
+    Raises:
+        FileNotFoundError: if an empty path string is given
+        FileNotFoundError: if it has a malformed s3 path such as missing the "s3://" prefix
+
+    Returns:
+        Tuple[str, str]: a tuple containing the bucket name and the file key respectivelly
+    """
+    prefix = "s3://"
+    sanitized_s3_path = s3_path.strip()
+    if not s3_path:
+        raise FileNotFoundError("Invalid S3 path: Empty path string")
+    if not sanitized_s3_path.startswith(prefix):
+        raise FileNotFoundError('Invalid S3 path: Missing or malformed "s3://" prefix')
+
+    path = Path(sanitized_s3_path)
+
+    bucket_name = path.parts[1]
+    key = "/".join(path.parts[2:])
+
+    return bucket_name, key
@@ -0,0 +1,150 @@
+"""Token vaults storing the original values of tokenised PII so they can be re-identified."""
+
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+TOKEN_PREFIX = "tok_"
+"""Prefix of every token, telling tokens apart from the values they replace"""
+
+
+class TokenVault:
+    """Base class of the stores mapping PII values to random tokens and back
+
+    A vault must always return the same token for the same value, including across processes
+    sharing it, and must be safe to call from several threads.
+    """
+
+    def get_or_create_tokens(self, values: List[str]) -> List[str]:
+        """Returns the token of every value, creating tokens for values seen for the first time
+
+        Args:
+            values (List[str]): distinct values to tokenise
+
+        Returns:
+            List[str]: the token of every value, in the same order
+        """
+        raise NotImplementedError
+
+    def detokenize(self, tokens: List[str]) -> List[Optional[str]]:
+        """Returns the original value of every token
+
+        Args:
+            tokens (List[str]): tokens returned by `get_or_create_tokens`
+
+        Returns:
+            List[Optional[str]]: the value of every token, in the same order, or None for tokens not in the vault
+        """
+        raise NotImplementedError
+
+
+class SQLiteTokenVault(TokenVault):
+    """Stores tokens in a local SQLite database, so tokenisation runs without any external service
+
+    Each call resolves all of its values with a single bulk query: the values are loaded into a
+    temporary table, the missing ones are given random tokens and every token is read back with
+    a join, all inside one transaction. The database file can be shared by several threads and
+    processes, which always get the same token for the same value.
+
+    Args:
+        path (str): path of the SQLite database file, created if it doesn't exist. ":memory:" keeps the vault in memory, where it is lost when the process exits and isn't shared with worker processes
+        timeout (float): seconds to wait for another process to release the database lock (default is 30)
+    """
+
+    def __init__(self, path: str, timeout: float = 30.0) -> None:
+        self.path = path
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._connection: Optional[sqlite3.Connection] = None
+
+    def get_or_create_tokens(self, values: List[str]) -> List[str]:
+        if not values:
+            return []
+
+        with self._transaction() as connection:
+            self._load_lookup(connection, values)
+            connection.execute(
+                "INSERT OR IGNORE INTO tokens (value, token) "
+                "SELECT value, ? || lower(hex(randomblob(16))) FROM lookup",
+                (TOKEN_PREFIX,),
+            )
+            tokens: Dict[str, str] = dict(
+                connection.execute(
+                    "SELECT lookup.value, tokens.token FROM lookup "
+                    "JOIN tokens ON tokens.value = lookup.value"
+                )
+            )
+
+        return [tokens[value] for value in values]
+
+    def detokenize(self, tokens: List[str]) -> List[Optional[str]]:
+        if not tokens:
+            return []
+
+        with self._transaction() as connection:
+            self._load_lookup(connection, tokens)
+            values: Dict[str, str] = dict(
+                connection.execute(
+                    "SELECT tokens.token, tokens.value FROM lookup "
+                    "JOIN tokens ON tokens.token = lookup.value"
+                )
+            )
+
+        return [values.get(token) for token in tokens]
+
+    def close(self) -> None:
+        """Closes the database connection, which is reopened by the next call"""
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # Connections and locks can't be pickled: worker processes open their own
+        return {"path": self.path, "timeout": self.timeout}
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__init__(**state)
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            connection = sqlite3.connect(
+                self.path,
+                timeout=self.timeout,
+                isolation_level=None,
+                check_same_thread=False,
+            )
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS tokens ("
+                "value TEXT PRIMARY KEY, token TEXT NOT NULL UNIQUE)"
+            )
+            connection.execute(
+                "CREATE TEMP TABLE IF NOT EXISTS lookup (value TEXT PRIMARY KEY)"
+            )
+            self._connection = connection
+
+        return self._connection
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """Holds the lock and an immediate transaction, committed on success and rolled back on error"""
+        with self._lock:
+            connection = self._connect()
+            # Takes the write lock up front, so concurrent processes can't both create a token for a value
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                yield connection
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+            connection.execute("COMMIT")
+
+    @staticmethod
+    def _load_lookup(connection: sqlite3.Connection, values: List[str]) -> None:
+        connection.execute("DELETE FROM lookup")
+        connection.executemany(
+            "INSERT OR IGNORE INTO lookup (value) VALUES (?)",
+            ((value,) for value in values),
+        )
@@ -0,0 +1,55 @@
+"""Warm-up of the S3 client and of Polars, to be run while an AWS Lambda function initialises."""
+
+import io
+import logging
+import time
+from typing import Iterable
+
+import polars as pl
+
+from .gdpr_obfuscator import (
+    DEFAULT_MAX_POOL_CONNECTIONS,
+    FileType,
+    gdpr_obfuscator,
+    get_s3_client,
+)
+
+logger = logging.getLogger(__name__)
+
+_WARM_UP_FRAME = pl.DataFrame({"id": [1, 2], "name": ["Jane Doe", "John Doe"]})
+
+_WARM_UP_WRITERS = {
+    "csv": pl.DataFrame.write_csv,
+    "json": pl.DataFrame.write_json,
+    "ndjson": pl.DataFrame.write_ndjson,
+    "parquet": pl.DataFrame.write_parquet,
+    "arrow": pl.DataFrame.write_ipc,
+    "avro": pl.DataFrame.write_avro,
+}
+
+
+def warm_up(
+    file_types: Iterable[FileType] = ("csv",),
+    max_pool_connections: int = DEFAULT_MAX_POOL_CONNECTIONS,
+) -> None:
+    """Builds the cached S3 client and obfuscates a tiny in-memory file of every type, so the first real call doesn't pay for them
+
+    Meant to be called at module level in a Lambda handler module, so it runs during the init phase,
+    which isn't billed the same way and is skipped by warm invocations. No S3 request is made: the
+    client resolves its credentials and endpoints, and the sample files are obfuscated from memory,
+    loading the Polars readers, writers and expressions they use.
+
+    Args:
+        file_types (Iterable[FileType]): types of the sample files obfuscated (default is CSV only)
+        max_pool_connections (int): connection pool size of the S3 client built, the same as later calls to `get_s3_client` use (default is 50)
+    """
+    start = time.perf_counter()
+
+    get_s3_client(max_pool_connections)
+
+    for file_type in file_types:
+        sample = io.BytesIO()
+        _WARM_UP_WRITERS[file_type](_WARM_UP_FRAME, sample)
+        gdpr_obfuscator(sample.getvalue(), ["name"], file_type=file_type)
+
+    logger.info("Warmed up in %.0f ms", (time.perf_counter() - start) * 1000)
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""Measures the import time and first-call latency of the GDPR Obfuscator in fresh Python processes, as seen by a Lambda cold start"""
+
+import json
+import os
+import statistics
+import subprocess
+import sys
+from datetime import datetime
+from typing import Dict, List
+
+RUNS = 5
+
+EAGER_IMPORTS = """
+import boto3
+import botocore.config
+import types_boto3_s3.client
+import src.gdpr_obfuscator.core.batch
+import src.gdpr_obfuscator.core.gdpr_obfuscator_async
+import src.gdpr_obfuscator.core.masking
+import src.gdpr_obfuscator.core.token_vault
+"""
+"""The modules the package imported eagerly before its public names were loaded lazily"""
+
+SCENARIOS = {
+    "Eager imports, no warm-up": (EAGER_IMPORTS, False),
+    "Lazy imports, no warm-up": ("", False),
+    "Lazy imports, warm-up during init": ("", True),
+}
+"""Every scenario measured: the modules imported before the package, and whether `warm_up` runs before the first call"""
+
+_SCRIPT = """
+import json, time
+start = time.perf_counter()
+{imports}
+import src.gdpr_obfuscator as gdpr_obfuscator
+imported = time.perf_counter()
+if {warm_up}:
+    gdpr_obfuscator.warm_up()
+warmed_up = time.perf_counter()
+gdpr_obfuscator.get_s3_client()
+gdpr_obfuscator.gdpr_obfuscator(b"id,name\\n1,Jane Doe\\n", ["name"])
+called = time.perf_counter()
+print(json.dumps({{"import": imported - start, "warm_up": warmed_up - imported, "first_call": called - warmed_up}}))
+"""
+"""Run in a fresh process per measurement. The first call builds the S3 client and obfuscates a small CSV held in memory, everything a handler does before its first S3 request"""
+
+
+def measure(imports: str, warm_up: bool) -> Dict[str, float]:
+    """Runs a scenario in a fresh Python process and returns its timings in milliseconds"""
+    result = subprocess.run(
+        [sys.executable, "-c", _SCRIPT.format(imports=imports, warm_up=warm_up)],
+        capture_output=True,
+        text=True,
+        check=True,
+        env={**os.environ, "AWS_DEFAULT_REGION": "eu-west-2"},
+    )
+    timings = json.loads(result.stdout)
+
+    return {name: seconds * 1000 for name, seconds in timings.items()}
+
+
+def cold_start_benchmark(profiling_data_output_dir: str, runs: int = RUNS):
+    """Measures every scenario `runs` times and reports the median of every timing"""
+    print("Starting cold start benchmark...")
+
+    rows = []
+    for scenario, (imports, warm_up) in SCENARIOS.items():
+        timings: List[Dict[str, float]] = [
+            measure(imports, warm_up) for _ in range(runs)
+        ]
+        median = {
+            name: statistics.median(timing[name] for timing in timings)
+            for name in ["import", "warm_up", "first_call"]
+        }
+        print(
+            f"{scenario}: import {median['import']:.0f} ms, warm-up "
+            f"{median['warm_up']:.0f} ms, first call {median['first_call']:.0f} ms"
+        )
+
+        rows.append(
+            f"| {scenario} | {median['import']:.0f} ms | {median['warm_up']:.0f} ms "
+            f"| {median['first_call']:.0f} ms |"
+        )
+
+    data_table = "\n".join(
+        [
+            "| Scenario | Import | Warm-up (init phase) | First call |",
+            "|----------|--------|----------------------|------------|",
+            *rows,
+        ]
+    )
+
+    report = f"""# GDPR Obfuscator Cold Start Benchmark
+
+**Generated**: {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
+**Source**: `{__file__}`
+**Runs**: median of {runs} fresh Python processes per scenario, locally, without AWS
+
+## Results
+
+{data_table}
+
+The import is the time taken by `import gdpr_obfuscator`. With lazy imports, Polars and boto3 are loaded by the first call instead, unless `warm_up` loads them during the Lambda init phase. The first call builds the S3 client and obfuscates a small CSV held in memory, everything a handler does before its first S3 request.
+"""
+
+    os.makedirs(profiling_data_output_dir, exist_ok=True)
+    report_output_path = f"{profiling_data_output_dir}/cold_start_benchmark.md"
+
+    with open(report_output_path, "w") as f:
+        f.write(report)
+
+    print("\n📊 Benchmark Results:")
+    print(data_table)
+
+
+def main():
+    cold_start_benchmark(profiling_data_output_dir="profiling/")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""Measures how gdpr_obfuscator_batch scales with the number of worker processes"""
+
+import os
+import time
+from datetime import datetime
+from typing import List, Literal
+
+from src.gdpr_obfuscator.core.batch import gdpr_obfuscator_batch
+from src.gdpr_obfuscator_profiling.gdpr_obfuscator_profiling import get_pulumi_output
+
+
+def gdpr_obfuscator_batch_scaling(
+    file_to_obfuscate: str,
+    pii_fields: List[str],
+    profiling_data_output_dir: str,
+    num_files: int = 32,
+    executor: Literal["thread", "process"] = "process",
+):
+    """Times a batch of `num_files` copies of a file with 1 to `os.cpu_count()` workers."""
+    cpu_count = os.cpu_count() or 1
+    worker_counts = sorted(
+        {2**exponent for exponent in range(cpu_count.bit_length())} | {cpu_count}
+    )
+    bucket_prefix = file_to_obfuscate.rsplit("/", 1)[0]
+    sources = [file_to_obfuscate] * num_files
+    destinations = [
+        f"{bucket_prefix}/batch_scaling/obfuscated_{index}.csv"
+        for index in range(num_files)
+    ]
+
+    print("Starting batch scaling profiling...")
+
+    rows = []
+    baseline = None
+    for max_workers in worker_counts:
+        start = time.perf_counter()
+        results = gdpr_obfuscator_batch(
+            sources,
+            pii_fields,
+            destinations=destinations,
+            max_workers=max_workers,
+            executor=executor,
+        )
+        elapsed = time.perf_counter() - start
+
+        failed = [result for result in results if not result.ok]
+        if failed:
+            raise RuntimeError(f"{len(failed)} files failed: {failed[0].error}")
+
+        baseline = baseline or elapsed
+        speedup = baseline / elapsed
+        rows.append(
+            f"| {max_workers} | {elapsed:.3f}s | {num_files / elapsed:.2f} files/s "
+            f"| {speedup:.2f}x | {speedup / max_workers:.0%} |"
+        )
+        print(f"{max_workers} workers: {elapsed:.3f}s")
+
+    data_table = "\n".join(
+        [
+            "| Workers | Total Time | Throughput | Speedup | Efficiency |",
+            "|---------|------------|------------|---------|------------|",
+            *rows,
+        ]
+    )
+
+    report = f"""# GDPR Obfuscator Batch Scaling Report
+
+**Generated**: {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
+**Source**: `{__file__}`
+**Executor**: `{executor}`
+**Files per batch**: {num_files} copies of `{file_to_obfuscate}`
+**CPUs**: {cpu_count}
+
+## Scaling Summary
+
+{data_table}
+
+Speedup is relative to a single worker. Efficiency is the speedup divided by the number of workers: it drops as the batch becomes bound by network bandwidth or by the number of CPUs.
+"""
+
+    os.makedirs(profiling_data_output_dir, exist_ok=True)
+    report_output_path = f"{profiling_data_output_dir}/batch_scaling.md"
+
+    with open(report_output_path, "w") as f:
+        f.write(report)
+
+    print("\n📊 Scaling Results:")
+    print(data_table)
+
+
+def main():
+    pulumi_output = get_pulumi_output()
+    file_to_obfuscate = (
+        f"s3://{pulumi_output['bucket_name']}/{pulumi_output['pii_data_key_large']}"
+    )
+    pii_fields = ["name", "email_address", "phone_number", "address"]
+    profiling_data_output_dir = "profiling/"
+
+    gdpr_obfuscator_batch_scaling(
+        file_to_obfuscate=file_to_obfuscate,
+        pii_fields=pii_fields,
+        profiling_data_output_dir=profiling_data_output_dir,
+    )
+
+
+if __name__ == "__main__":
+    main()
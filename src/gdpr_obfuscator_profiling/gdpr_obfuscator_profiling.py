@@ -8,7 +8,7 @@ from cProfile import Profile
 from datetime import datetime
 from pstats import SortKey, Stats
 from typing import List, Literal
-from unittest.mock import MagicMock, patch
+from unittest.mock import MagicMock
 
 import boto3
 import polars as pl
@@ -178,13 +178,11 @@ def gdpr_obfuscator_profiling(
     mock_response["Body"].read.return_value = test_file_bytes
 
     # Profiling
-    with patch("boto3.client") as mock_boto_client:
-        mock_s3_client = MagicMock()
-        mock_s3_client.get_object.return_value = mock_response
-        mock_boto_client.return_value = mock_s3_client
+    mock_s3_client = MagicMock()
+    mock_s3_client.get_object.return_value = mock_response
 
-        with Profile() as mocked_profile:
-            gdpr_obfuscator(file_to_obfuscate, pii_fields)
+    with Profile() as mocked_profile:
+        gdpr_obfuscator(file_to_obfuscate, pii_fields, s3_client=mock_s3_client)
 
     os.makedirs(profiling_data_output_dir, exist_ok=True)
 
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""Measures the peak memory used to obfuscate growing JSON arrays with the eager and streaming engines"""
+
+import multiprocessing
+import os
+import re
+import resource
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import List, Tuple
+
+from src.gdpr_obfuscator.core.gdpr_obfuscator import (
+    DEFAULT_CHUNK_SIZE,
+    _obfuscate_eager,
+    _obfuscate_streaming,
+)
+from src.gdpr_obfuscator.core.masking import resolve_masking
+from src.gdpr_obfuscator_profiling.masking_strategies_benchmark import (
+    PII_FIELDS,
+    generate_pii_data,
+)
+
+ROW_COUNTS = [250_000, 500_000, 1_000_000, 2_000_000]
+
+
+def peak_memory_sampler() -> Tuple[threading.Event, List[int]]:
+    """Starts a thread recording the peak anonymous memory of the process, in bytes
+
+    Anonymous memory leaves out the pages of memory-mapped files, which the streaming engine reads
+    its temporary files with and the OS can reclaim at any time. Where /proc isn't available, the
+    peak resident set size is reported instead.
+    """
+    stop = threading.Event()
+    peak = [0]
+
+    def sample() -> None:
+        while not stop.is_set():
+            with open("/proc/self/status") as status:
+                match = re.search(r"RssAnon:\s+(\d+) kB", status.read())
+            peak[0] = max(peak[0], int(match.group(1)) * 1024 if match else 0)
+            time.sleep(0.005)
+
+    if os.path.exists("/proc/self/status"):
+        threading.Thread(target=sample, daemon=True).start()
+    else:
+        stop.set()
+
+    return stop, peak
+
+
+def measure(engine: str, path: str) -> Tuple[float, float]:
+    """Obfuscates a local JSON array file with an engine, returning the time taken and the peak memory in MiB"""
+    masking = resolve_masking(PII_FIELDS, "***")
+    stop, peak = peak_memory_sampler()
+    start = time.perf_counter()
+
+    with open(os.devnull, "wb") as output:
+        if engine == "eager":
+            with open(path, "rb") as file:
+                _obfuscate_eager(file.read(), output, masking, "json")
+        else:
+            _obfuscate_streaming(path, output, masking, "json", DEFAULT_CHUNK_SIZE)
+
+    elapsed = time.perf_counter() - start
+    stop.set()
+    peak_bytes = peak[0] or resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+    return elapsed, peak_bytes / (1024 * 1024)
+
+
+def json_array_memory_benchmark(
+    profiling_data_output_dir: str, row_counts: List[int] = ROW_COUNTS
+):
+    """Obfuscates JSON arrays of every size in a fresh process per engine and reports their peak memory"""
+    print("Starting JSON array memory benchmark...")
+
+    rows = []
+    with tempfile.TemporaryDirectory() as directory:
+        for num_rows in row_counts:
+            path = f"{directory}/pii_data_{num_rows}.json"
+            generate_pii_data(num_rows).write_json(path)
+            file_size = os.path.getsize(path) / (1024 * 1024)
+
+            results = {}
+            for engine in ["eager", "streaming"]:
+                # A new process per run, so every peak is measured from the same baseline
+                with ProcessPoolExecutor(
+                    max_workers=1, mp_context=multiprocessing.get_context("spawn")
+                ) as executor:
+                    results[engine] = executor.submit(measure, engine, path).result()
+                print(
+                    f"{num_rows:,} rows, {engine}: {results[engine][0]:.2f}s, "
+                    f"{results[engine][1]:.0f} MiB"
+                )
+
+            rows.append(
+                f"| {num_rows:,} | {file_size:.0f} MiB "
+                f"| {results['eager'][1]:.0f} MiB | {results['eager'][0]:.2f}s "
+                f"| {results['streaming'][1]:.0f} MiB | {results['streaming'][0]:.2f}s |"
+            )
+            os.remove(path)
+
+    data_table = "\n".join(
+        [
+            "| Rows | File size | Eager peak memory | Eager time | Streaming peak memory | Streaming time |",
+            "|------|-----------|-------------------|------------|-----------------------|----------------|",
+            *rows,
+        ]
+    )
+
+    report = f"""# GDPR Obfuscator JSON Array Memory Benchmark
+
+**Generated**: {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
+**Source**: `{__file__}`
+**Fields**: masking {len(PII_FIELDS)} fields ({", ".join(PII_FIELDS)}) of JSON arrays of records with the constant mask, from local files, with a `chunk_size` of {DEFAULT_CHUNK_SIZE:,}
+
+## Results
+
+{data_table}
+
+Peak memory is the anonymous memory of the process, including the Python interpreter and Polars. The eager engine grows with the file, while the streaming engine parses the array incrementally and only holds one batch of records at a time.
+"""
+
+    os.makedirs(profiling_data_output_dir, exist_ok=True)
+    report_output_path = f"{profiling_data_output_dir}/json_array_memory_benchmark.md"
+
+    with open(report_output_path, "w") as f:
+        f.write(report)
+
+    print("\n📊 Benchmark Results:")
+    print(data_table)
+
+
+def main():
+    json_array_memory_benchmark(profiling_data_output_dir="profiling/")
+
+
+if __name__ == "__main__":
+    main()
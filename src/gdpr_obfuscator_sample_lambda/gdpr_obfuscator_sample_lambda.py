@@ -1,40 +1,98 @@
+import json
 import logging
-from pathlib import Path
+import os
+from pathlib import Path, PurePosixPath
+from urllib.parse import unquote_plus
 
-import boto3
-
-from gdpr_obfuscator import gdpr_obfuscator
+from gdpr_obfuscator import (
+    gdpr_obfuscate_to_s3,
+    gdpr_obfuscator_batch,
+    gdpr_obfuscator_fan_out,
+    gdpr_obfuscator_fan_out_worker,
+    warm_up,
+)
+from gdpr_obfuscator.core.gdpr_obfuscator import (
+    DEFAULT_MAX_CONCURRENCY,
+    DEFAULT_MAX_POOL_CONNECTIONS,
+)
+from gdpr_obfuscator.core.planner import MEMORY_BUDGET_FRACTION, memory_limit
 
 logger = logging.getLogger(__name__)
 
 logger.setLevel(logging.INFO)
 
+FILE_TYPES = {
+    ".csv": "csv",
+    ".json": "json",
+    ".ndjson": "ndjson",
+    ".jsonl": "ndjson",
+    ".parquet": "parquet",
+    ".arrow": "arrow",
+    ".feather": "arrow",
+    ".avro": "avro",
+}
 
-def lambda_handler(event, context):
-    logger.info("Starting lambda_handler", extra={"event": event})
-
-    try:
-        s3_client = boto3.client("s3")
+COMPRESSION_SUFFIXES = {".gz", ".gzip", ".bz2", ".zst", ".zstd"}
 
-        filename_base = Path(event["file_to_obfuscate"]).stem
-        file_extension = Path(event["file_to_obfuscate"]).suffix
+OBFUSCATED_SUFFIX = "_obfuscated"
 
-        result = gdpr_obfuscator(event["file_to_obfuscate"], event["pii_fields"])
+# Longer than the longest Lambda timeout, so synchronous invocations of fan-out workers aren't cut short
+LAMBDA_INVOKE_READ_TIMEOUT = 900
 
-        logger.info("Obfuscation complete")
 
-        result_filename = f"{filename_base}_obfuscated{file_extension}"
+def max_workers():
+    """Returns the number of files of a batch of records obfuscated at the same time"""
+    return int(os.environ.get("MAX_WORKERS", 4 * (os.cpu_count() or 1)))
 
-        result_s3_address = f"s3://{event['destination_bucket']}/{result_filename}"
 
-        response = s3_client.put_object(
-            Bucket=event["destination_bucket"],
-            Key=result_filename,
-            Body=result,
-            ContentType="text/csv",
+# Runs during the Lambda init phase, so the first invocation doesn't build the S3 client or load Polars.
+# The client gets the pool gdpr_obfuscator_batch asks for with the most workers, so batches reuse it
+if os.environ.get("GDPR_OBFUSCATOR_WARM_UP", "false").lower() == "true":
+    warm_up(
+        max_pool_connections=max(
+            DEFAULT_MAX_POOL_CONNECTIONS, max_workers() * DEFAULT_MAX_CONCURRENCY
         )
+    )
+
 
-        logger.info("File uploaded to S3", extra={"response": response})
+def lambda_handler(event, context):
+    logger.info("Starting lambda_handler", extra={"event": event})
+
+    if "Records" in event:
+        return handle_records(event["Records"])
+
+    if "fan_out_task" in event:
+        # Errors are raised, so the coordinator that invoked this worker sees them
+        return gdpr_obfuscator_fan_out_worker(event["fan_out_task"])
+
+    try:
+        s3_address(event["file_to_obfuscate"])
+
+        if event.get("fan_out"):
+            result_s3_address = gdpr_obfuscator_fan_out(
+                event["file_to_obfuscate"],
+                obfuscated_destination(
+                    event["file_to_obfuscate"], event["destination_bucket"]
+                ),
+                event["pii_fields"],
+                file_type=file_type(event["file_to_obfuscate"]),
+                invoke=invoke_worker(context.invoked_function_arn),
+                **(
+                    {"range_size": event["range_size"]} if "range_size" in event else {}
+                ),
+            )
+        else:
+            result_s3_address = gdpr_obfuscate_to_s3(
+                event["file_to_obfuscate"],
+                obfuscated_destination(
+                    event["file_to_obfuscate"], event["destination_bucket"]
+                ),
+                event["pii_fields"],
+                file_type=file_type(event["file_to_obfuscate"]),
+                engine="auto",
+            )
+
+        logger.info("Obfuscated file uploaded to S3")
 
         result = {
             "statusCode": 200,
@@ -51,3 +109,196 @@ def lambda_handler(event, context):
             "statusCode": 500,
             "body": str(e),
         }
+
+
+def handle_records(records):
+    """Obfuscates every file of a batch of SQS messages or S3 event notifications concurrently
+
+    SQS message bodies are either this function's own event, with `file_to_obfuscate`,
+    `pii_fields` and `destination_bucket`, or an S3 event notification. S3 event notifications
+    take their PII fields and destination bucket from the `PII_FIELDS` (comma separated) and
+    `DESTINATION_BUCKET` environment variables.
+
+    For SQS batches, returns the messages that failed in the `batchItemFailures` format of SQS
+    partial batch responses, so only they are retried. S3 event notifications invoke the
+    function asynchronously, and Lambda ignores what asynchronous invocations return, so when
+    a file of one fails, or a record has no SQS message ID to report it by, an error is raised
+    once every other file is processed, for Lambda to retry the event and send it to its
+    dead-letter queue or on-failure destination.
+    """
+    files = []
+    # A dict rather than a set, to report failures in the order of their records
+    failures = {}
+    unidentified_failures = []
+
+    def fail(message_id, description):
+        if message_id:
+            failures[message_id] = None
+        else:
+            unidentified_failures.append(description)
+
+    for record in records:
+        message_id = record.get("messageId")
+        try:
+            files.extend(
+                (message_id, *record_file) for record_file in record_files(record)
+            )
+        except (KeyError, TypeError, ValueError) as e:
+            logger.error(
+                "Invalid record", extra={"message_id": message_id, "error": str(e)}
+            )
+            fail(message_id, f"invalid record: {e!r}")
+
+    # Files with the same PII fields and type are obfuscated by a single batch
+    groups = {}
+    for message_id, source, destination, pii_fields in files:
+        key = (tuple(pii_fields), file_type(source))
+        groups.setdefault(key, []).append((message_id, source, destination))
+
+    for (pii_fields, group_file_type), group in groups.items():
+        workers = min(max_workers(), len(group))
+        results = gdpr_obfuscator_batch(
+            [source for _, source, _ in group],
+            list(pii_fields),
+            file_type=group_file_type,
+            destinations=[destination for _, _, destination in group],
+            max_workers=workers,
+            engine="auto",
+            memory_budget=batch_memory_budget(workers),
+        )
+
+        for (message_id, _, _), result in zip(group, results):
+            if result.ok:
+                logger.info(
+                    "Obfuscated file uploaded to S3",
+                    extra={"source": result.source, "destination": result.destination},
+                )
+            else:
+                logger.error(
+                    "Failed to obfuscate file",
+                    extra={"source": result.source, "error": str(result.error)},
+                )
+                fail(message_id, f"{result.source}: {result.error!r}")
+
+    if unidentified_failures:
+        raise RuntimeError(
+            f"Failed to obfuscate {len(unidentified_failures)} records: "
+            + "; ".join(unidentified_failures)
+        )
+
+    if all(record.get("eventSource") == "aws:sqs" for record in records):
+        return {
+            "batchItemFailures": [
+                {"itemIdentifier": message_id} for message_id in failures
+            ]
+        }
+
+    return None
+
+
+def record_files(record):
+    """Returns the (source, destination, pii_fields) of every file a record asks to obfuscate"""
+    if record.get("eventSource") == "aws:sqs":
+        body = json.loads(record["body"])
+        if "file_to_obfuscate" in body:
+            s3_address(body["file_to_obfuscate"])
+
+            return [
+                (
+                    body["file_to_obfuscate"],
+                    obfuscated_destination(
+                        body["file_to_obfuscate"], body["destination_bucket"]
+                    ),
+                    body["pii_fields"],
+                )
+            ]
+
+        return [
+            record_file
+            for s3_record in body.get("Records", [])
+            for record_file in record_files(s3_record)
+        ]
+
+    if record.get("eventSource") == "aws:s3":
+        source = s3_record_address(record)
+        if Path(source).stem.endswith(OBFUSCATED_SUFFIX):
+            # Written by this function, obfuscating it again would trigger it forever
+            logger.info("Skipping obfuscated file", extra={"source": source})
+            return []
+
+        return [
+            (
+                source,
+                obfuscated_destination(source, os.environ["DESTINATION_BUCKET"]),
+                os.environ["PII_FIELDS"].split(","),
+            )
+        ]
+
+    raise ValueError(f"Unsupported event source: {record.get('eventSource')}")
+
+
+def s3_address(file_to_obfuscate):
+    """Raises a ValueError unless the file to obfuscate of an event is an S3 address, so events can't read local files"""
+    if not isinstance(file_to_obfuscate, str) or not file_to_obfuscate.startswith(
+        "s3://"
+    ):
+        raise ValueError(
+            f"file_to_obfuscate must be an S3 address starting with s3://, got {file_to_obfuscate!r}"
+        )
+
+
+def s3_record_address(record):
+    """Returns the S3 address of the object of an S3 event notification record, whose key is URL encoded"""
+    s3 = record["s3"]
+
+    return f"s3://{s3['bucket']['name']}/{unquote_plus(s3['object']['key'])}"
+
+
+def obfuscated_destination(file_to_obfuscate, destination_bucket):
+    """Returns the S3 address of the obfuscated copy of a file, under the same key prefix in the destination bucket, so files with the same name in different prefixes don't overwrite each other"""
+    key = PurePosixPath(file_to_obfuscate.removeprefix("s3://").split("/", 1)[-1])
+    obfuscated_key = key.with_name(f"{key.stem}{OBFUSCATED_SUFFIX}{key.suffix}")
+
+    return f"s3://{destination_bucket}/{obfuscated_key}"
+
+
+def file_type(file_to_obfuscate):
+    """Returns the type of a file from its suffix, ignoring compression suffixes, and CSV for unknown suffixes"""
+    suffixes = [
+        suffix.lower()
+        for suffix in Path(file_to_obfuscate).suffixes
+        if suffix.lower() not in COMPRESSION_SUFFIXES
+    ]
+
+    return FILE_TYPES.get(suffixes[-1], "csv") if suffixes else "csv"
+
+
+def batch_memory_budget(max_workers):
+    """Shares the memory budget of the function between the files obfuscated at the same time"""
+    limit = memory_limit()
+
+    return int(limit * MEMORY_BUDGET_FRACTION / max_workers) if limit else None
+
+
+def invoke_worker(function_name):
+    """Returns a fan-out `invoke` that runs every task in a separate synchronous invocation of this function"""
+    import boto3
+    from botocore.config import Config
+
+    lambda_client = boto3.client(
+        "lambda",
+        config=Config(read_timeout=LAMBDA_INVOKE_READ_TIMEOUT, max_pool_connections=50),
+    )
+
+    def invoke(task):
+        response = lambda_client.invoke(
+            FunctionName=function_name,
+            Payload=json.dumps({"fan_out_task": task}).encode(),
+        )
+        payload = json.loads(response["Payload"].read())
+        if "FunctionError" in response:
+            raise RuntimeError(f"Fan-out worker failed: {payload.get('errorMessage')}")
+
+        return payload
+
+    return invoke
@@ -46,6 +46,20 @@ def test_files():
                 ],
             },
         },
+        "ndjson": {
+            "complex_pii_data": {
+                "local_path": "tests/data/complex_pii_data.ndjson",
+                "result_local_path": "tests/data/complex_pii_data_obfuscated.ndjson",
+                "key": "complex_pii_data.ndjson",
+                "result_key": "complex_pii_data_obfuscated.ndjson",
+                "pii_fields": [
+                    "name",
+                    "email_address",
+                    "phone_number",
+                    "address",
+                ],
+            },
+        },
         "json": {
             "complex_pii_data": {
                 "local_path": "tests/data/complex_pii_data.json",
@@ -157,6 +171,16 @@ def test_files():
                     "address",
                 ],
             },
+            "edge_cases_raw_values": {
+                "local_path": "tests/data/edge_cases_raw_values.csv",
+                "result_local_path": "tests/data/edge_cases_raw_values_obfuscated.csv",
+                "key": "edge_cases_raw_values.csv",
+                "result_key": "edge_cases_raw_values_obfuscated.csv",
+                "pii_fields": [
+                    "name",
+                    "email_address",
+                ],
+            },
             "simple_pii_data_different_masking_string": {
                 "local_path": "tests/data/simple_pii_data_different_masking_string.csv",
                 "result_local_path": "tests/data/simple_pii_data_different_masking_string_obfuscated.csv",
@@ -189,6 +213,15 @@ def aws_credentials():
     os.environ["AWS_DEFAULT_REGION"] = "us-west-2"
 
 
+@pytest.fixture(scope="function")
+def small_upload_parts(monkeypatch):
+    """Lets moto and fan-out coordinators accept multipart upload parts smaller than 5 MiB"""
+    monkeypatch.setattr("moto.s3.models.S3_UPLOAD_PART_MIN_SIZE", 1024)
+    # The sample lambda imports the package as gdpr_obfuscator rather than src.gdpr_obfuscator
+    for package in ["src.gdpr_obfuscator", "gdpr_obfuscator"]:
+        monkeypatch.setattr(f"{package}.core.fan_out.MIN_UPLOAD_PART_SIZE", 1024)
+
+
 @pytest.fixture(scope="function")
 def s3_client(aws_credentials) -> Generator[S3Client, None, None]:
     with mock_aws():
@@ -0,0 +1,277 @@
+import importlib.util
+import io
+import json
+
+import polars as pl
+import pytest
+
+from src.gdpr_obfuscator.core.avro import (
+    AVRO_MAGIC,
+    AvroHeader,
+    AvroRecords,
+    avro_polars_schema,
+    iter_avro_blocks,
+    masked_avro_schema,
+    read_avro_header,
+    write_avro_block,
+    write_avro_header,
+)
+from src.gdpr_obfuscator.core.field_paths import resolve_field_paths
+from src.gdpr_obfuscator.core.masking import ConstantMask
+
+SCHEMA = {
+    "type": "record",
+    "name": "Customer",
+    "namespace": "com.example",
+    "fields": [
+        {"name": "id", "type": "long"},
+        {"name": "name", "type": ["null", "string"]},
+        {
+            "name": "status",
+            "type": {"type": "enum", "name": "Status", "symbols": ["NEW", "OLD"]},
+        },
+        {
+            "name": "address",
+            "type": {
+                "type": "record",
+                "name": "Address",
+                "fields": [
+                    {"name": "street", "type": "string"},
+                    {"name": "number", "type": "int"},
+                ],
+            },
+        },
+        {"name": "previous_address", "type": ["null", "Address"]},
+        {"name": "phones", "type": {"type": "array", "items": "string"}},
+        {"name": "attributes", "type": {"type": "map", "values": "double"}},
+        {"name": "key", "type": {"type": "fixed", "name": "Key", "size": 2}},
+    ],
+}
+
+RECORDS = [
+    {
+        "id": 1,
+        "name": "Jane Doe",
+        "status": "NEW",
+        "address": {"street": "1 High Street", "number": 1},
+        "previous_address": None,
+        "phones": ["07700 900123", "07700 900456"],
+        "attributes": [{"key": "height", "value": 1.7}],
+        "key": b"ab",
+    },
+    {
+        "id": -300,
+        "name": None,
+        "status": "OLD",
+        "address": {"street": "2 Low Street", "number": 64},
+        "previous_address": {"street": "3 Old Road", "number": -1},
+        "phones": [],
+        "attributes": [],
+        "key": b"cd",
+    },
+]
+
+
+def write_avro(records, codec="null", block_size=1):
+    header = AvroHeader(
+        schema=SCHEMA,
+        codec=codec,
+        metadata={
+            "avro.schema": json.dumps(SCHEMA).encode(),
+            "avro.codec": codec.encode(),
+        },
+        sync=bytes(range(16)),
+    )
+    fields = [field["name"] for field in SCHEMA["fields"]]
+    avro_records = AvroRecords(SCHEMA, SCHEMA, fields, [])
+    output = io.BytesIO()
+
+    write_avro_header(output, header)
+    for start in range(0, len(records), block_size):
+        block = records[start : start + block_size]
+        values = {field: [record[field] for record in block] for field in fields}
+        gaps = [[b""] * (len(fields) + 1) for _ in block]
+        write_avro_block(
+            output, header, len(block), avro_records.encode_block(values, gaps)
+        )
+
+    return output.getvalue()
+
+
+def read_avro(data):
+    file = io.BytesIO(data)
+    header = read_avro_header(file)
+    fields = [field["name"] for field in header.schema["fields"]]
+    avro_records = AvroRecords(header.schema, header.schema, fields, [])
+
+    records = []
+    for count, block in iter_avro_blocks(file, header):
+        values, _ = avro_records.decode_block(block, count)
+        records.extend(
+            {field: values[field][row] for field in fields} for row in range(count)
+        )
+
+    return header, records
+
+
+@pytest.mark.describe("Test reading and writing Avro object container files")
+class TestAvroContainerFiles:
+    # @pytest.mark.skip
+    @pytest.mark.it("check that values are encoded as specified by Avro")
+    def test_avro_binary_encoding(self):
+        schema = {
+            "type": "record",
+            "name": "r",
+            "fields": [
+                {"name": "a", "type": "long"},
+                {"name": "b", "type": "string"},
+                {"name": "c", "type": ["null", "string"]},
+            ],
+        }
+        records = AvroRecords(schema, schema, ["a", "b", "c"], [])
+
+        data = records.encode_block(
+            {"a": [1, -1, 64], "b": ["foo", "", ""], "c": [None, "a", None]},
+            [[b""] * 4] * 3,
+        )
+
+        assert data == (b"\x02\x06foo\x00" + b"\x01\x00\x02\x02a" + b"\x80\x01\x00\x00")
+
+    # @pytest.mark.skip
+    @pytest.mark.it("check that every type is read back as written, for every codec")
+    @pytest.mark.parametrize(
+        "codec",
+        [
+            "null",
+            "deflate",
+            "bzip2",
+            "xz",
+            pytest.param(
+                "zstandard",
+                marks=pytest.mark.skipif(
+                    importlib.util.find_spec("zstandard") is None,
+                    reason="zstandard isn't installed",
+                ),
+            ),
+        ],
+    )
+    def test_avro_round_trip(self, codec):
+        header, records = read_avro(write_avro(RECORDS, codec))
+
+        assert header.codec == codec
+        assert header.schema == SCHEMA
+        assert records == RECORDS
+
+    # @pytest.mark.skip
+    @pytest.mark.it("check that blocks are read one at a time")
+    def test_iter_avro_blocks(self):
+        file = io.BytesIO(write_avro(RECORDS * 3, "deflate", block_size=2))
+        header = read_avro_header(file)
+
+        assert [count for count, _ in iter_avro_blocks(file, header)] == [2, 2, 2]
+
+    # @pytest.mark.skip
+    @pytest.mark.it("check that it raises ValueError for invalid Avro files")
+    @pytest.mark.parametrize(
+        "data, message",
+        [
+            (b"PAR1", "Invalid Avro file: the file doesn't start with Obj\\x01"),
+            (AVRO_MAGIC + b"\x02", "Invalid Avro file: the file is truncated"),
+            (
+                write_avro(RECORDS)[:-1] + b"x",
+                "Invalid Avro file: a block isn't followed by the sync marker",
+            ),
+            (
+                write_avro(RECORDS).replace(b"Jane", b"\xff\xff\xff\xff"),
+                "Invalid Avro file: a block doesn't match the schema",
+            ),
+            (
+                write_avro(RECORDS).replace(b"\x08null", b"\x08lz4x"),
+                "Unsupported Avro codec: lz4x",
+            ),
+        ],
+        ids=["magic", "truncated", "sync_marker", "schema", "codec"],
+    )
+    def test_invalid_avro_files(self, data, message):
+        with pytest.raises(ValueError) as err:
+            read_avro(data)
+
+        assert str(err.value) == message
+
+
+@pytest.mark.describe("Test the Avro schemas of obfuscated files")
+class TestAvroSchemas:
+    # @pytest.mark.skip
+    @pytest.mark.it("check that Avro types are mapped to Polars types")
+    def test_avro_polars_schema(self):
+        dtypes = avro_polars_schema(SCHEMA)
+
+        assert dtypes["name"] == pl.String
+        assert dtypes["status"] == pl.String
+        assert dtypes["previous_address"] == pl.Struct(
+            {"street": pl.String, "number": pl.Int32}
+        )
+        assert dtypes["attributes"] == pl.List(
+            pl.Struct({"key": pl.String, "value": pl.Float64})
+        )
+        assert dtypes["key"] == pl.Binary
+
+    # @pytest.mark.skip
+    @pytest.mark.it(
+        "check that fields without a Polars type are only copied when they aren't PII"
+    )
+    def test_avro_unions_of_several_types(self):
+        schema = {
+            "type": "record",
+            "name": "r",
+            "fields": [
+                {"name": "id", "type": "long"},
+                {"name": "score", "type": ["null", "float", "boolean"]},
+            ],
+        }
+        records = AvroRecords(
+            schema, masked_avro_schema(schema, {"id": ConstantMask()}), [], ["id"]
+        )
+
+        values, gaps = records.decode_block(b"\x02\x04\x01" + b"\x04\x00", 2)
+        data = records.encode_block({"id": ["***", "***"]}, gaps)
+
+        assert avro_polars_schema(schema)["score"] == pl.Object
+        assert data == b"\x06***\x04\x01" + b"\x06***\x00"
+
+        with pytest.raises(ValueError) as err:
+            avro_polars_schema(schema, strict_fields=["score"])
+
+        assert str(err.value) == (
+            "PII field score can't be masked: "
+            "unions of several non-null types aren't supported"
+        )
+
+    # @pytest.mark.skip
+    @pytest.mark.it(
+        "check that masked fields that aren't strings become strings and the rest of the schema is kept"
+    )
+    def test_masked_avro_schema(self):
+        masking = resolve_field_paths(
+            avro_polars_schema(SCHEMA),
+            {
+                "id": ConstantMask(),
+                "name": ConstantMask(),
+                "status": ConstantMask(),
+                "previous_address.number": ConstantMask(),
+                "attributes[].value": ConstantMask(),
+            },
+        )
+
+        output_schema = masked_avro_schema(SCHEMA, masking)
+        fields = {field["name"]: field["type"] for field in output_schema["fields"]}
+
+        assert fields["id"] == "string"
+        assert fields["name"] == ["null", "string"]
+        assert fields["status"] == "string"
+        # Named types are updated where they are defined, references are kept
+        assert fields["previous_address"] == ["null", "Address"]
+        assert fields["address"]["fields"][1]["type"] == "string"
+        assert fields["attributes"] == {"type": "map", "values": "string"}
+        assert fields["phones"] == SCHEMA["fields"][5]["type"]
+        assert SCHEMA["fields"][0]["type"] == "long"
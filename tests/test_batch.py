@@ -0,0 +1,161 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from unittest.mock import MagicMock
+
+import polars as pl
+import pytest
+
+from src.gdpr_obfuscator.core.batch import _init_worker, gdpr_obfuscator_batch
+
+
+@pytest.mark.describe("Test the gdpr_obfuscator_batch function")
+class TestGDPRObfuscatorBatch:
+    # @pytest.mark.skip
+    @pytest.mark.it("check that it returns one obfuscated result per source, in order")
+    def test_gdpr_obfuscator_batch_returns_results(
+        self, s3_client_with_files, test_files, get_test_file, mock_aws_bucket_name
+    ):
+        names = ["complex_pii_data", "large_pii_data", "edge_cases_missing_data"]
+        sources = [
+            f"s3://{mock_aws_bucket_name}/{test_files['csv'][name]['key']}"
+            for name in names
+        ]
+
+        results = gdpr_obfuscator_batch(
+            sources,
+            ["name", "email_address", "phone_number", "address"],
+            max_workers=3,
+        )
+
+        assert [result.source for result in results] == sources
+        for name, result in zip(names, results):
+            assert result.ok
+            assert result.error is None
+            assert result.result == get_test_file(
+                test_files["csv"][name]["result_local_path"]
+            )
+
+    # @pytest.mark.skip
+    @pytest.mark.it("check that a failing file doesn't stop the rest of the batch")
+    def test_gdpr_obfuscator_batch_collects_errors(
+        self, s3_client_with_files, test_files, get_test_file, mock_aws_bucket_name
+    ):
+        test_file = test_files["csv"]["complex_pii_data"]
+        sources = [
+            f"s3://{mock_aws_bucket_name}/non_existent_file.csv",
+            f"s3://{mock_aws_bucket_name}/{test_file['key']}",
+            "not_an_s3_path.csv",
+        ]
+
+        results = gdpr_obfuscator_batch(sources, test_file["pii_fields"])
+
+        assert isinstance(results[0].error, FileNotFoundError)
+        assert results[1].ok
+        assert results[1].result == get_test_file(test_file["result_local_path"])
+        assert isinstance(results[2].error, FileNotFoundError)
+        assert not results[2].ok
+
+    # @pytest.mark.skip
+    @pytest.mark.it("check that results are uploaded to destinations with one client")
+    def test_gdpr_obfuscator_batch_destinations(
+        self, s3_client_with_files, test_files, get_test_file, mock_aws_bucket_name
+    ):
+        s3_client = MagicMock(wraps=s3_client_with_files)
+        batch = [
+            test_files["json"]["complex_pii_data"],
+            test_files["json"]["edge_cases_null_values"],
+        ]
+        destinations = [
+            f"s3://{mock_aws_bucket_name}/{test_file['result_key']}"
+            for test_file in batch
+        ]
+
+        results = gdpr_obfuscator_batch(
+            [f"s3://{mock_aws_bucket_name}/{test_file['key']}" for test_file in batch],
+            batch[0]["pii_fields"],
+            file_type="json",
+            destinations=destinations,
+            s3_client=s3_client,
+        )
+
+        assert [result.destination for result in results] == destinations
+        assert all(result.ok and result.result is None for result in results)
+        assert s3_client.put_object.call_count == len(batch)
+        for test_file in batch:
+            uploaded = s3_client_with_files.get_object(
+                Bucket=mock_aws_bucket_name, Key=test_file["result_key"]
+            )["Body"].read()
+            assert uploaded == get_test_file(test_file["result_local_path"])
+
+    # @pytest.mark.skip
+    @pytest.mark.it(
+        "check that it raises ValueError if destinations don't match sources"
+    )
+    def test_gdpr_obfuscator_batch_destinations_mismatch(self):
+        with pytest.raises(ValueError) as err:
+            gdpr_obfuscator_batch(
+                ["s3://bucket/a.csv", "s3://bucket/b.csv"],
+                ["name"],
+                destinations=["s3://bucket/a_obfuscated.csv"],
+            )
+
+        assert str(err.value) == "Expected 2 destinations, got 1"
+
+    # @pytest.mark.skip
+    @pytest.mark.it(
+        "check that the process executor returns results and errors from worker processes"
+    )
+    def test_gdpr_obfuscator_batch_process_executor(self, aws_credentials):
+        sources = ["not_an_s3_path.csv", "bucket/file.csv"]
+
+        results = gdpr_obfuscator_batch(
+            sources, ["name"], executor="process", max_workers=2
+        )
+
+        assert [result.source for result in results] == sources
+        assert isinstance(results[0].error, FileNotFoundError)
+        assert isinstance(results[1].error, FileNotFoundError)
+
+    # @pytest.mark.skip
+    @pytest.mark.it(
+        "check that it raises ValueError if an s3_client is passed to the process executor"
+    )
+    def test_gdpr_obfuscator_batch_process_executor_client(self, s3_client):
+        with pytest.raises(ValueError) as err:
+            gdpr_obfuscator_batch(
+                ["s3://bucket/a.csv"],
+                ["name"],
+                executor="process",
+                s3_client=s3_client,
+            )
+
+        assert str(err.value) == "s3_client can't be shared with worker processes"
+
+    # @pytest.mark.skip
+    @pytest.mark.it("check that it raises ValueError for an unsupported executor")
+    def test_gdpr_obfuscator_batch_unsupported_executor(self, s3_client):
+        with pytest.raises(ValueError) as err:
+            gdpr_obfuscator_batch(["s3://bucket/a.csv"], ["name"], executor="fiber")  # type: ignore
+
+        assert str(err.value) == "Unsupported executor: fiber"
+
+
+@pytest.mark.describe("Test _init_worker")
+class TestInitWorker:
+    # @pytest.mark.skip
+    @pytest.mark.it(
+        "check that worker processes use the capped Polars thread pool, leaving the calling process' environment alone"
+    )
+    def test_init_worker(self, aws_credentials, monkeypatch):
+        monkeypatch.delenv("POLARS_MAX_THREADS", raising=False)
+
+        with ProcessPoolExecutor(
+            max_workers=1,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(50, 3),
+        ) as pool:
+            assert pool.submit(pl.thread_pool_size).result() == 3
+
+        assert "POLARS_MAX_THREADS" not in os.environ
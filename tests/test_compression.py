@@ -0,0 +1,135 @@
+import bz2
+import gzip
+import importlib.util
+import io
+
+import pytest
+
+from src.gdpr_obfuscator.core.compression import (
+    check_compression,
+    compressing_writer,
+    compression_from_key,
+    decompress,
+    decompress_chunks,
+    detect_compression,
+)
+
+CODECS = [
+    "gzip",
+    "bz2",
+    pytest.param(
+        "zstd",
+        marks=pytest.mark.skipif(
+            importlib.util.find_spec("zstandard") is None,
+            reason="zstandard isn't installed",
+        ),
+    ),
+]
+
+
+def compress(data: bytes, compression: str) -> bytes:
+    output = io.BytesIO()
+    with compressing_writer(output, compression) as writer:
+        writer.write(data)
+
+    return output.getvalue()
+
+
+@pytest.mark.describe("Test the detect_compression function")
+class TestDetectCompression:
+    # @pytest.mark.skip
+    @pytest.mark.it("check that compression is detected from magic bytes")
+    @pytest.mark.parametrize("compression", CODECS)
+    def test_detect_magic_bytes(self, compression):
+        head = compress(b"id,name\n", compression)[:4]
+
+        assert detect_compression("data.csv", None, head) == compression
+
+    # @pytest.mark.skip
+    @pytest.mark.it("check that plain contents aren't detected as compressed")
+    def test_detect_plain_contents(self):
+        assert detect_compression("data.csv.gz", "gzip", b"id,n") is None
+        assert detect_compression("data.csv", None, b"BZh,") is None
+
+    # @pytest.mark.skip
+    @pytest.mark.it(
+        "check that Content-Encoding and key suffixes are used without contents"
+    )
+    def test_detect_metadata(self):
+        assert detect_compression("data", "gzip") == "gzip"
+        assert detect_compression("data", "identity, zstd") == "zstd"
+        assert detect_compression("data.JSON.BZ2") == "bz2"
+        assert detect_compression("data.csv") is None
+        assert compression_from_key("s3://bucket/data.json.zst") == "zstd"
+
+
+@pytest.mark.describe("Test the decompress_chunks function")
+class TestDecompressChunks:
+    # @pytest.mark.skip
+    @pytest.mark.it("check that files are decompressed chunk by chunk")
+    @pytest.mark.parametrize("compression", CODECS)
+    def test_decompress_chunks(self, compression):
+        data = b"id,name\n" + b"1,Jane Doe\n" * 10_000
+        compressed = compress(data, compression)
+        chunks = [compressed[i : i + 100] for i in range(0, len(compressed), 100)]
+
+        assert b"".join(decompress_chunks(chunks, compression)) == data
+
+    # @pytest.mark.skip
+    @pytest.mark.it("check that concatenated compressed streams are all decompressed")
+    def test_decompress_concatenated_streams(self):
+        compressed = gzip.compress(b"id,name\n") + gzip.compress(b"1,Jane Doe\n")
+
+        assert decompress(compressed, "gzip") == b"id,name\n1,Jane Doe\n"
+        assert decompress(bz2.compress(b"a") + bz2.compress(b"b"), "bz2") == b"ab"
+
+    # @pytest.mark.skip
+    @pytest.mark.it("check that it raises ValueError for invalid or truncated data")
+    @pytest.mark.parametrize("compression", CODECS)
+    def test_decompress_invalid(self, compression):
+        compressed = compress(b"id,name\n1,Jane Doe\n", compression)
+
+        with pytest.raises(ValueError) as err:
+            decompress(compressed[:-6], compression)
+        assert str(err.value) == (
+            f"Invalid {compression} compressed data: the file is truncated"
+        )
+
+        with pytest.raises(ValueError):
+            decompress(b"not compressed", compression)
+
+
+@pytest.mark.describe("Test the compressing_writer function")
+class TestCompressingWriter:
+    # @pytest.mark.skip
+    @pytest.mark.it("check that written bytes are compressed without closing output")
+    @pytest.mark.parametrize("compression", CODECS)
+    def test_compressing_writer(self, compression):
+        output = io.BytesIO()
+
+        with compressing_writer(output, compression) as writer:
+            writer.write(b"id,name\n")
+            writer.write(b"1,Jane Doe\n")
+
+        assert not output.closed
+        assert detect_compression("", None, output.getvalue()[:4]) == compression
+        assert decompress(output.getvalue(), compression) == b"id,name\n1,Jane Doe\n"
+
+    # @pytest.mark.skip
+    @pytest.mark.it("check that output is written unchanged without compression")
+    def test_compressing_writer_none(self):
+        output = io.BytesIO()
+
+        with compressing_writer(output, None) as writer:
+            writer.write(b"id,name\n")
+
+        assert writer is output
+        assert output.getvalue() == b"id,name\n"
+
+    # @pytest.mark.skip
+    @pytest.mark.it("check that it raises ValueError for unsupported codecs")
+    def test_unsupported_compression(self):
+        with pytest.raises(ValueError) as err:
+            check_compression("lz4")
+
+        assert str(err.value) == "Unsupported compression: lz4"
@@ -0,0 +1,319 @@
+import gzip
+import io
+import json
+from unittest.mock import MagicMock
+
+import polars as pl
+import pytest
+
+from src.gdpr_obfuscator.core.fan_out import (
+    FanOutTask,
+    gdpr_obfuscator_fan_out,
+    gdpr_obfuscator_fan_out_worker,
+)
+from src.gdpr_obfuscator.core.gdpr_obfuscator import gdpr_obfuscator
+from src.gdpr_obfuscator.core.parquet import read_parquet_metadata
+
+
+def _json_invoke(s3_client):
+    """Runs workers in process, passing their events through JSON as a Lambda invocation does"""
+
+    def invoke(event):
+        return json.loads(
+            json.dumps(
+                gdpr_obfuscator_fan_out_worker(json.loads(json.dumps(event)), s3_client)
+            )
+        )
+
+    return MagicMock(wraps=invoke)
+
+
+@pytest.mark.describe("Test the gdpr_obfuscator_fan_out function")
+class TestGDPRObfuscatorFanOut:
+    # @pytest.mark.skip
+    @pytest.mark.it(
+        "check that CSV and NDJSON files are split into ranges of whole lines whose parts join into the obfuscated file"
+    )
+    @pytest.mark.parametrize(
+        "file_type, name, range_size",
+        [
+            ("csv", "large_pii_data", 200_000),
+            ("csv", "complex_pii_data", 1024),
+            ("ndjson", "complex_pii_data", 1024),
+        ],
+    )
+    def test_record_ranges(
+        self,
+        s3_client_with_files,
+        monkeypatch,
+        test_files,
+        get_test_file,
+        mock_aws_bucket_name,
+        file_type,
+        name,
+        range_size,
+    ):
+        # The masked ranges of the small test files are smaller than the parts small_upload_parts allows
+        monkeypatch.setattr("moto.s3.models.S3_UPLOAD_PART_MIN_SIZE", 1)
+        monkeypatch.setattr("src.gdpr_obfuscator.core.fan_out.MIN_UPLOAD_PART_SIZE", 1)
+        test_file = test_files[file_type][name]
+        invoke = _json_invoke(s3_client_with_files)
+        source = get_test_file(test_file["local_path"])
+
+        result = gdpr_obfuscator_fan_out(
+            f"s3://{mock_aws_bucket_name}/{test_file['key']}",
+            f"s3://{mock_aws_bucket_name}/{test_file['result_key']}",
+            test_file["pii_fields"],
+            file_type=file_type,
+            range_size=range_size,
+            invoke=invoke,
+            s3_client=s3_client_with_files,
+        )
+
+        assert result == f"s3://{mock_aws_bucket_name}/{test_file['result_key']}"
+        assert invoke.call_count > 1
+        tasks = [FanOutTask.from_event(call.args[0]) for call in invoke.call_args_list]
+        assert [task.part_number for task in tasks] == list(range(1, len(tasks) + 1))
+        assert tasks[0].start == 0 and tasks[-1].end == len(source)
+        for previous, task in zip(tasks, tasks[1:]):
+            assert task.start == previous.end
+            assert source[task.start - 1 : task.start] == b"\n"
+
+        obfuscated = s3_client_with_files.get_object(
+            Bucket=mock_aws_bucket_name, Key=test_file["result_key"]
+        )
+        assert obfuscated["ContentType"] != "binary/octet-stream"
+        assert obfuscated["Body"].read() == gdpr_obfuscator(
+            source, test_file["pii_fields"], file_type=file_type, infer_schema=False
+        )
+
+    # @pytest.mark.skip
+    @pytest.mark.it(
+        "check that NDJSON ranges treat PII fields absent from their lines as absent, and fields absent from every range raise a KeyError"
+    )
+    def test_ndjson_range_schemas(
+        self, s3_client_with_empty_test_bucket, monkeypatch, mock_aws_bucket_name
+    ):
+        monkeypatch.setattr("moto.s3.models.S3_UPLOAD_PART_MIN_SIZE", 1)
+        monkeypatch.setattr("src.gdpr_obfuscator.core.fan_out.MIN_UPLOAD_PART_SIZE", 1)
+        s3_client = s3_client_with_empty_test_bucket
+        lines = [{"id": i, "name": f"name {i}"} for i in range(50)] + [
+            {"id": i, "name": f"name {i}", "email": f"{i}@example.com"}
+            for i in range(50, 100)
+        ]
+        source = "".join(json.dumps(line) + "\n" for line in lines).encode()
+        s3_client.put_object(
+            Bucket=mock_aws_bucket_name, Key="source.ndjson", Body=source
+        )
+
+        gdpr_obfuscator_fan_out(
+            f"s3://{mock_aws_bucket_name}/source.ndjson",
+            f"s3://{mock_aws_bucket_name}/result.ndjson",
+            ["name", "email"],
+            file_type="ndjson",
+            range_size=len(source) // 4,
+            invoke=_json_invoke(s3_client),
+            s3_client=s3_client,
+        )
+
+        result = s3_client.get_object(Bucket=mock_aws_bucket_name, Key="result.ndjson")[
+            "Body"
+        ].read()
+        result_lines = [json.loads(line) for line in result.splitlines()]
+        assert [line["id"] for line in result_lines] == list(range(100))
+        assert all(line["name"] == "***" for line in result_lines)
+        assert "email" not in result_lines[0]
+        assert all(line["email"] == "***" for line in result_lines[50:])
+
+        with pytest.raises(KeyError) as err:
+            gdpr_obfuscator_fan_out(
+                f"s3://{mock_aws_bucket_name}/source.ndjson",
+                f"s3://{mock_aws_bucket_name}/misspelled.ndjson",
+                ["name", "emial"],
+                file_type="ndjson",
+                range_size=len(source) // 4,
+                invoke=_json_invoke(s3_client),
+                s3_client=s3_client,
+            )
+
+        assert str(err.value) == "\"PII fields not found: ['emial']\""
+        uploads = s3_client.list_multipart_uploads(Bucket=mock_aws_bucket_name)
+        assert not uploads.get("Uploads")
+        objects = s3_client.list_objects_v2(Bucket=mock_aws_bucket_name)
+        assert "misspelled.ndjson" not in [obj["Key"] for obj in objects["Contents"]]
+
+    # @pytest.mark.skip
+    @pytest.mark.it(
+        "check that Parquet files are split into groups of row groups whose parts and joined footer form the obfuscated file"
+    )
+    def test_row_group_ranges(
+        self,
+        s3_client_with_empty_test_bucket,
+        small_upload_parts,
+        test_files,
+        get_test_file,
+        mock_aws_bucket_name,
+    ):
+        s3_client = s3_client_with_empty_test_bucket
+        test_file = test_files["parquet"]["large_pii_data"]
+        buffer = io.BytesIO()
+        pl.read_parquet(test_file["local_path"]).write_parquet(
+            buffer, row_group_size=1000
+        )
+        source = buffer.getvalue()
+        s3_client.put_object(
+            Bucket=mock_aws_bucket_name, Key="source.parquet", Body=source
+        )
+        invoke = _json_invoke(s3_client)
+
+        gdpr_obfuscator_fan_out(
+            f"s3://{mock_aws_bucket_name}/source.parquet",
+            f"s3://{mock_aws_bucket_name}/{test_file['result_key']}",
+            test_file["pii_fields"],
+            file_type="parquet",
+            range_size=len(source) // 4,
+            invoke=invoke,
+            s3_client=s3_client,
+        )
+
+        tasks = [FanOutTask.from_event(call.args[0]) for call in invoke.call_args_list]
+        assert len(tasks) > 2
+        assert sum((task.row_groups for task in tasks), []) == list(
+            range(len(read_parquet_metadata(source).row_groups))
+        )
+        result = s3_client.get_object(
+            Bucket=mock_aws_bucket_name, Key=test_file["result_key"]
+        )["Body"].read()
+        expected = pl.read_parquet(
+            io.BytesIO(get_test_file(test_file["result_local_path"]))
+        )
+        assert pl.read_parquet(io.BytesIO(result)).equals(expected)
+
+    # @pytest.mark.skip
+    @pytest.mark.it(
+        "check that the upload is aborted, leaving no object behind, when a worker fails"
+    )
+    def test_worker_failure(
+        self, s3_client_with_files, small_upload_parts, test_files, mock_aws_bucket_name
+    ):
+        test_file = test_files["csv"]["large_pii_data"]
+
+        def invoke(event):
+            if event["part_number"] == 2:
+                raise RuntimeError("Worker timed out")
+            return gdpr_obfuscator_fan_out_worker(event, s3_client_with_files)
+
+        with pytest.raises(RuntimeError, match="Worker timed out"):
+            gdpr_obfuscator_fan_out(
+                f"s3://{mock_aws_bucket_name}/{test_file['key']}",
+                f"s3://{mock_aws_bucket_name}/{test_file['result_key']}",
+                test_file["pii_fields"],
+                range_size=200_000,
+                invoke=invoke,
+                s3_client=s3_client_with_files,
+            )
+
+        uploads = s3_client_with_files.list_multipart_uploads(
+            Bucket=mock_aws_bucket_name
+        )
+        assert not uploads.get("Uploads")
+        objects = s3_client_with_files.list_objects_v2(Bucket=mock_aws_bucket_name)
+        assert test_file["result_key"] not in [
+            obj["Key"] for obj in objects["Contents"]
+        ]
+
+    # @pytest.mark.skip
+    @pytest.mark.it(
+        "check that obfuscated parts smaller than S3 accepts raise a ValueError and abort the upload"
+    )
+    def test_small_parts(self, s3_client_with_files, test_files, mock_aws_bucket_name):
+        test_file = test_files["csv"]["large_pii_data"]
+
+        with pytest.raises(ValueError, match="use a larger range_size"):
+            gdpr_obfuscator_fan_out(
+                f"s3://{mock_aws_bucket_name}/{test_file['key']}",
+                f"s3://{mock_aws_bucket_name}/{test_file['result_key']}",
+                test_file["pii_fields"],
+                range_size=200_000,
+                invoke=_json_invoke(s3_client_with_files),
+                s3_client=s3_client_with_files,
+            )
+
+        uploads = s3_client_with_files.list_multipart_uploads(
+            Bucket=mock_aws_bucket_name
+        )
+        assert not uploads.get("Uploads")
+
+    # @pytest.mark.skip
+    @pytest.mark.it(
+        "check that it runs workers in process with its own S3 client by default"
+    )
+    def test_default_invoke(
+        self,
+        s3_client_with_files,
+        small_upload_parts,
+        test_files,
+        get_test_file,
+        mock_aws_bucket_name,
+    ):
+        test_file = test_files["csv"]["complex_pii_data"]
+
+        gdpr_obfuscator_fan_out(
+            f"s3://{mock_aws_bucket_name}/{test_file['key']}",
+            f"s3://{mock_aws_bucket_name}/{test_file['result_key']}",
+            test_file["pii_fields"],
+            s3_client=s3_client_with_files,
+        )
+
+        result = s3_client_with_files.get_object(
+            Bucket=mock_aws_bucket_name, Key=test_file["result_key"]
+        )["Body"].read()
+        assert result == get_test_file(test_file["result_local_path"])
+
+    # @pytest.mark.skip
+    @pytest.mark.it(
+        "check that unsupported file types and compressed files raise a ValueError before any upload"
+    )
+    def test_unsupported_files(
+        self, s3_client_with_files, test_files, get_test_file, mock_aws_bucket_name
+    ):
+        test_file = test_files["csv"]["complex_pii_data"]
+        s3_client_with_files.put_object(
+            Bucket=mock_aws_bucket_name,
+            Key="compressed.csv.gz",
+            Body=gzip.compress(get_test_file(test_file["local_path"])),
+        )
+
+        with pytest.raises(ValueError, match="Unsupported file type for fan-out"):
+            gdpr_obfuscator_fan_out(
+                f"s3://{mock_aws_bucket_name}/{test_files['json']['complex_pii_data']['key']}",
+                f"s3://{mock_aws_bucket_name}/result.json",
+                test_file["pii_fields"],
+                file_type="json",
+                s3_client=s3_client_with_files,
+            )
+        with pytest.raises(ValueError, match="Compressed files can't be split"):
+            gdpr_obfuscator_fan_out(
+                f"s3://{mock_aws_bucket_name}/compressed.csv.gz",
+                f"s3://{mock_aws_bucket_name}/result.csv",
+                test_file["pii_fields"],
+                s3_client=s3_client_with_files,
+            )
+
+        uploads = s3_client_with_files.list_multipart_uploads(
+            Bucket=mock_aws_bucket_name
+        )
+        assert not uploads.get("Uploads")
+
+    # @pytest.mark.skip
+    @pytest.mark.it("check that a missing source file raises a FileNotFoundError")
+    def test_missing_file(self, s3_client_with_files, mock_aws_bucket_name):
+        with pytest.raises(
+            FileNotFoundError, match="The specified key does not exist."
+        ):
+            gdpr_obfuscator_fan_out(
+                f"s3://{mock_aws_bucket_name}/missing.csv",
+                f"s3://{mock_aws_bucket_name}/result.csv",
+                ["name"],
+                s3_client=s3_client_with_files,
+            )
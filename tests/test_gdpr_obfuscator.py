@@ -1,16 +1,44 @@
+import bz2
+import gzip
 import io
+import json
+import logging
+from pathlib import Path
 from unittest.mock import MagicMock
 
 import polars as pl
 import pytest
-from botocore.exceptions import ConnectionError
+from botocore.exceptions import ClientError, ConnectionError
 from moto import mock_aws
 
+from src.gdpr_obfuscator.core import gdpr_obfuscator as gdpr_obfuscator_module
+from src.gdpr_obfuscator.core.avro import (
+    AvroRecords,
+    iter_avro_blocks,
+    read_avro_header,
+    write_avro_block,
+    write_avro_header,
+)
+from src.gdpr_obfuscator.core.compression import decompress
 from src.gdpr_obfuscator.core.gdpr_obfuscator import (
+    _coalesce_ranges,
+    _download_file_from_s3,
+    _download_parquet_columns_from_s3,
     _get_file_from_s3,
     _parse_s3_path,
+    gdpr_deobfuscator,
+    gdpr_obfuscate_to_s3,
     gdpr_obfuscator,
+    get_s3_client,
+)
+from src.gdpr_obfuscator.core.masking import (
+    DeterministicEncryption,
+    KeyedHash,
+    PartialMask,
+    RegexMask,
+    Tokenize,
 )
+from src.gdpr_obfuscator.core.parquet import read_parquet_metadata
 
 
 @pytest.mark.describe("Test the gdpr_obfuscator function with CSV files")
@@ -341,6 +369,99 @@ class TestGDPRObfuscatorJSON:
             gdpr_obfuscator(file_to_obfuscate, pii_fields, file_type="invalid")  # type: ignore
 
 
+@pytest.mark.describe("Test the gdpr_obfuscator function with NDJSON files")
+@mock_aws
+class TestGDPRObfuscatorNDJSON:
+    # @pytest.mark.skip
+    @pytest.mark.it(
+        "check that every NDJSON record is obfuscated and written as its own line"
+    )
+    @pytest.mark.parametrize("engine", ["eager", "streaming"])
+    def test_ndjson_records(
+        self, s3_client_with_files, test_files, mock_aws_bucket_name, engine
+    ):
+        test_file = test_files["ndjson"]["complex_pii_data"]
+
+        result = gdpr_obfuscator(
+            f"s3://{mock_aws_bucket_name}/{test_file['key']}",
+            test_file["pii_fields"],
+            file_type="ndjson",
+            engine=engine,
+            chunk_size=3,
+        )
+
+        lines = result.splitlines(keepends=True)
+        assert len(lines) == 10
+        assert all(line.endswith(b"\n") for line in lines)
+        assert pl.read_ndjson(lines[4]).equals(
+            pl.read_ndjson(test_file["result_local_path"]).slice(4, 1)
+        )
+        assert pl.read_ndjson(result).equals(
+            pl.read_ndjson(test_file["result_local_path"])
+        )
+
+    # @pytest.mark.skip
+    @pytest.mark.it("check that fields first seen in later records are kept")
+    @pytest.mark.parametrize("engine", ["eager", "streaming"])
+    def test_ndjson_late_fields(
+        self, s3_client_with_files, mock_aws_bucket_name, engine
+    ):
+        records = b"".join(b'{"id": %d}\n' % i for i in range(500))
+        records += b'{"id": 500, "email": "jane@example.com"}\n'
+        s3_client_with_files.put_object(
+            Bucket=mock_aws_bucket_name, Key="logs.ndjson", Body=records
+        )
+
+        result = gdpr_obfuscator(
+            f"s3://{mock_aws_bucket_name}/logs.ndjson",
+            ["email"],
+            file_type="ndjson",
+            engine=engine,
+        )
+
+        assert result.splitlines()[-1] == b'{"id":500,"email":"***"}'
+
+    # @pytest.mark.skip
+    @pytest.mark.it("check that an empty ndjson file raises a ValueError exception")
+    @pytest.mark.parametrize("engine", ["eager", "streaming"])
+    @pytest.mark.parametrize("body", [b"", b"\n \n"])
+    def test_empty_file_exception(
+        self, s3_client_with_files, mock_aws_bucket_name, engine, body
+    ):
+        s3_client_with_files.put_object(
+            Bucket=mock_aws_bucket_name, Key="empty.ndjson", Body=body
+        )
+
+        with pytest.raises(ValueError, match=r"empty data from bytes"):
+            gdpr_obfuscator(
+                f"s3://{mock_aws_bucket_name}/empty.ndjson",
+                ["email"],
+                file_type="ndjson",
+                engine=engine,
+            )
+
+    # @pytest.mark.skip
+    @pytest.mark.it("check that NDJSON files are uploaded with the NDJSON content type")
+    def test_ndjson_to_s3(self, s3_client_with_files, test_files, mock_aws_bucket_name):
+        test_file = test_files["ndjson"]["complex_pii_data"]
+
+        gdpr_obfuscate_to_s3(
+            f"s3://{mock_aws_bucket_name}/{test_file['key']}",
+            f"s3://{mock_aws_bucket_name}/obfuscated.ndjson",
+            test_file["pii_fields"],
+            file_type="ndjson",
+            engine="streaming",
+        )
+
+        response = s3_client_with_files.get_object(
+            Bucket=mock_aws_bucket_name, Key="obfuscated.ndjson"
+        )
+        assert response["ContentType"] == "application/x-ndjson"
+        assert pl.read_ndjson(response["Body"].read()).equals(
+            pl.read_ndjson(test_file["result_local_path"])
+        )
+
+
 @pytest.mark.describe("Test the gdpr_obfuscator function with parquet files")
 class TestGDPRObfuscatorParquet:
     # @pytest.mark.skip
@@ -368,142 +489,1639 @@ class TestGDPRObfuscatorParquet:
         assert isinstance(result, bytes)
         assert result_df.equals(expected_df)
 
-
-@pytest.mark.describe("Test _get_file_from_s3")
-class TestGetFileFromS3:
     # @pytest.mark.skip
-    @pytest.mark.it("check that it returns the expected bytes object")
-    def test_get_file_from_s3_returns_bytes_object(
+    @pytest.mark.it(
+        "check that the PII column chunks of a parquet file are never read or decoded"
+    )
+    def test_parquet_pii_columns_are_not_decoded(
         self,
         s3_client_with_files,
-        mock_aws_bucket_name,
+        test_files,
         get_test_file,
+        mock_aws_bucket_name,
+    ):
+        test_file = test_files["parquet"]["complex_pii_data"]
+        pii_fields = test_file["pii_fields"]
+        source = bytearray(get_test_file(test_file["local_path"]))
+        expected_bytes = get_test_file(test_file["result_local_path"])
+
+        for row_group in read_parquet_metadata(bytes(source)).row_groups:
+            for chunk in row_group.columns:
+                if chunk.column in pii_fields:
+                    source[chunk.start : chunk.start + chunk.length] = b"\xff" * (
+                        chunk.length
+                    )
+
+        s3_client_with_files.put_object(
+            Bucket=mock_aws_bucket_name, Key="corrupted_pii.parquet", Body=bytes(source)
+        )
+        file_to_obfuscate = f"s3://{mock_aws_bucket_name}/corrupted_pii.parquet"
+
+        for engine in ("eager", "streaming"):
+            result = gdpr_obfuscator(
+                file_to_obfuscate,
+                pii_fields,
+                file_type="parquet",
+                engine=engine,  # type: ignore
+            )
+
+            expected_df = pl.read_parquet(io.BytesIO(expected_bytes))
+            result_df = pl.read_parquet(io.BytesIO(result))
+
+            assert result_df.equals(expected_df)
+
+    # @pytest.mark.skip
+    @pytest.mark.it(
+        "check that a parquet file with multiple row groups is obfuscated one row group at a time"
+    )
+    def test_parquet_multiple_row_groups(
+        self,
+        s3_client_with_files,
         test_files,
+        get_test_file,
+        mock_aws_bucket_name,
     ):
-        key = test_files["csv"]["complex_pii_data"]["key"]
-        expected = get_test_file(test_files["csv"]["complex_pii_data"]["local_path"])
+        test_file = test_files["parquet"]["large_pii_data"]
+        source_df = pl.read_parquet(io.BytesIO(get_test_file(test_file["local_path"])))
+        source = io.BytesIO()
+        source_df.write_parquet(source, row_group_size=1000)
+        expected_bytes = get_test_file(test_file["result_local_path"])
+
+        s3_client_with_files.put_object(
+            Bucket=mock_aws_bucket_name,
+            Key="row_groups.parquet",
+            Body=source.getvalue(),
+        )
 
-        result = _get_file_from_s3(mock_aws_bucket_name, key, s3_client_with_files)
+        result = gdpr_obfuscator(
+            f"s3://{mock_aws_bucket_name}/row_groups.parquet",
+            test_file["pii_fields"],
+            file_type="parquet",
+        )
 
-        assert isinstance(result, bytes)
-        assert result == expected
+        assert len(read_parquet_metadata(source.getvalue()).row_groups) > 1
+        assert pl.read_parquet(io.BytesIO(result)).equals(
+            pl.read_parquet(io.BytesIO(expected_bytes))
+        )
 
     # @pytest.mark.skip
-    @pytest.mark.it("check that an invalid s3 key raises a FileNotFoundError exception")
-    def test_get_file_from_s3_invalid_key(
+    @pytest.mark.it(
+        "check that a parquet file where every column is a PII field keeps its row count"
+    )
+    def test_parquet_all_columns_pii(
         self,
         s3_client_with_files,
         mock_aws_bucket_name,
     ):
-        key = "invalid_key"
+        source = io.BytesIO()
+        pl.DataFrame(
+            {"name": ["a", "b", "c"], "email": ["x", None, "z"]}
+        ).write_parquet(source)
+        s3_client_with_files.put_object(
+            Bucket=mock_aws_bucket_name, Key="all_pii.parquet", Body=source.getvalue()
+        )
 
-        with pytest.raises(
-            FileNotFoundError, match=r"The specified key does not exist."
-        ):
-            _get_file_from_s3(mock_aws_bucket_name, key, s3_client_with_files)
+        result = gdpr_obfuscator(
+            f"s3://{mock_aws_bucket_name}/all_pii.parquet",
+            ["email", "name"],
+            file_type="parquet",
+        )
 
+        assert pl.read_parquet(io.BytesIO(result)).equals(
+            pl.DataFrame({"name": ["***"] * 3, "email": ["***"] * 3})
+        )
+
+
+@pytest.mark.describe("Test the gdpr_obfuscator function with Arrow IPC files")
+class TestGDPRObfuscatorArrow:
     # @pytest.mark.skip
     @pytest.mark.it(
-        "check that it raises a FileNotFoundError exception if an invalid bucket name is passed "
+        "check that Arrow IPC files and streams are obfuscated in the same format with every engine"
     )
-    def test_get_file_from_s3_invalid_bucket_name(
+    @pytest.mark.parametrize("ipc_format", ["file", "stream"])
+    @pytest.mark.parametrize("engine", ["eager", "streaming"])
+    def test_arrow_file_and_stream(
         self,
         s3_client_with_files,
+        test_files,
+        get_test_file,
+        mock_aws_bucket_name,
+        ipc_format,
+        engine,
     ):
-        key = "test-file.csv"
-        bucket_name = "invalid-bucket-name"
-        with pytest.raises(
-            FileNotFoundError, match=r"The specified bucket does not exist."
-        ):
-            _get_file_from_s3(bucket_name, key, s3_client_with_files)
+        test_file = test_files["parquet"]["complex_pii_data"]
+        source_df = pl.read_parquet(io.BytesIO(get_test_file(test_file["local_path"])))
+        expected_df = pl.read_parquet(
+            io.BytesIO(get_test_file(test_file["result_local_path"]))
+        )
+        source = io.BytesIO()
+        if ipc_format == "file":
+            source_df.write_ipc(source)
+        else:
+            source_df.write_ipc_stream(source)
+        s3_client_with_files.put_object(
+            Bucket=mock_aws_bucket_name, Key="pii_data.arrow", Body=source.getvalue()
+        )
+
+        result = gdpr_obfuscator(
+            f"s3://{mock_aws_bucket_name}/pii_data.arrow",
+            test_file["pii_fields"],
+            file_type="arrow",
+            engine=engine,
+            chunk_size=2,
+        )
+
+        if ipc_format == "file":
+            assert result.startswith(b"ARROW1")
+            result_df = pl.read_ipc(io.BytesIO(result))
+        else:
+            assert not result.startswith(b"ARROW1")
+            result_df = pl.read_ipc_stream(io.BytesIO(result))
+        assert result_df.equals(expected_df)
 
     # @pytest.mark.skip
     @pytest.mark.it(
-        "check that it raises a Connection Error if there is a problem with the s3 connection"
+        "check that nested fields of Arrow IPC files are masked and the content type is set"
     )
-    def test_get_file_from_s3_connection_error(
+    def test_arrow_nested_fields_to_s3(
         self,
+        s3_client_with_files,
         mock_aws_bucket_name,
     ):
-        s3_client = MagicMock()
-        s3_client.get_object.side_effect = ConnectionError(error=Exception())
-        key = "test-file.csv"
-        with pytest.raises(ConnectionError):
-            _get_file_from_s3(mock_aws_bucket_name, key, s3_client)
+        source = io.BytesIO()
+        pl.DataFrame(
+            {
+                "id": [1, 2],
+                "customer": [
+                    {"name": "Jane Doe", "city": "Leeds"},
+                    {"name": "John Smith", "city": "York"},
+                ],
+            }
+        ).write_ipc(source)
+        s3_client_with_files.put_object(
+            Bucket=mock_aws_bucket_name, Key="nested.arrow", Body=source.getvalue()
+        )
+
+        gdpr_obfuscate_to_s3(
+            f"s3://{mock_aws_bucket_name}/nested.arrow",
+            f"s3://{mock_aws_bucket_name}/nested_obfuscated.arrow",
+            ["customer.name"],
+            file_type="arrow",
+            engine="streaming",
+        )
 
+        response = s3_client_with_files.get_object(
+            Bucket=mock_aws_bucket_name, Key="nested_obfuscated.arrow"
+        )
+        assert response["ContentType"] == "application/vnd.apache.arrow.file"
+        assert pl.read_ipc(response["Body"].read()).to_dicts() == [
+            {"id": 1, "customer": {"name": "***", "city": "Leeds"}},
+            {"id": 2, "customer": {"name": "***", "city": "York"}},
+        ]
+
+    # @pytest.mark.skip
+    @pytest.mark.it("check that it raises KeyError for fields missing from Arrow files")
+    def test_arrow_missing_fields(
+        self,
+        s3_client_with_files,
+        mock_aws_bucket_name,
+    ):
+        source = io.BytesIO()
+        pl.DataFrame({"id": [1]}).write_ipc(source)
+        s3_client_with_files.put_object(
+            Bucket=mock_aws_bucket_name, Key="missing.arrow", Body=source.getvalue()
+        )
+
+        with pytest.raises(KeyError) as err:
+            gdpr_obfuscator(
+                f"s3://{mock_aws_bucket_name}/missing.arrow",
+                ["email"],
+                file_type="arrow",
+            )
+
+        assert str(err.value) == "\"PII fields not found: ['email']\""
+
+
+@pytest.mark.describe("Test the gdpr_obfuscator function with Avro files")
+class TestGDPRObfuscatorAvro:
     # @pytest.mark.skip
     @pytest.mark.it(
-        "check that an unexpected S3 response status codes raises a RuntimeError"
+        "check that Avro files are obfuscated with their schema and codec kept, with every engine"
     )
-    def test_get_file_from_s3_unexpected_status_code(self, mock_aws_bucket_name):
-        s3_client = MagicMock()
-        s3_client.get_object.return_value = {
-            "ResponseMetadata": {
-                "HTTPStatusCode": 500,
-                "Error": {
-                    "Code": "InternalError",
-                    "Message": "We encountered an internal error. Please try again.",
-                },
-            },
-            "Body": MagicMock(),
-        }
-        key = "test-file.csv"
+    @pytest.mark.parametrize("codec", ["uncompressed", "deflate"])
+    @pytest.mark.parametrize("engine", ["eager", "streaming"])
+    def test_avro_schema_and_codec(
+        self,
+        s3_client_with_files,
+        test_files,
+        get_test_file,
+        mock_aws_bucket_name,
+        codec,
+        engine,
+    ):
+        test_file = test_files["parquet"]["complex_pii_data"]
+        source_df = pl.read_parquet(io.BytesIO(get_test_file(test_file["local_path"])))
+        expected_df = pl.read_parquet(
+            io.BytesIO(get_test_file(test_file["result_local_path"]))
+        )
+        source = io.BytesIO()
+        source_df.write_avro(source, compression=codec)  # type: ignore
+        s3_client_with_files.put_object(
+            Bucket=mock_aws_bucket_name, Key="pii_data.avro", Body=source.getvalue()
+        )
 
-        with pytest.raises(RuntimeError, match="Unexpected S3 response error"):
-            _get_file_from_s3(mock_aws_bucket_name, key, s3_client)
+        result = gdpr_obfuscator(
+            f"s3://{mock_aws_bucket_name}/pii_data.avro",
+            test_file["pii_fields"],
+            file_type="avro",
+            engine=engine,
+        )
 
+        source.seek(0)
+        source_header = read_avro_header(source)
+        result_header = read_avro_header(io.BytesIO(result))
+        assert result_header.metadata == source_header.metadata
+        assert pl.read_avro(io.BytesIO(result)).equals(expected_df)
 
-@pytest.mark.describe("Test the get_parse_s3_path function")
-class TestGetParseS3Pathget_parse_s3_path:
     # @pytest.mark.skip
     @pytest.mark.it(
-        "check that a valid s3 path returns the correct bucket name and key"
+        "check that Avro files are obfuscated block by block, with nested and non-string fields masked"
     )
-    def test_get_parse_s3_path(self):
-        path = "s3://bucket_name/file_key.csv"
-        bucket, key = _parse_s3_path(path)
+    def test_avro_blocks_to_s3(
+        self,
+        s3_client_with_files,
+        mock_aws_bucket_name,
+    ):
+        source_df = pl.DataFrame(
+            {
+                "id": [1, 2, 3],
+                "customer": [
+                    {"name": "Jane Doe", "city": "Leeds"},
+                    {"name": "John Smith", "city": "York"},
+                    None,
+                ],
+                "salary": [100, None, 300],
+            }
+        )
+        single_block = io.BytesIO()
+        source_df.write_avro(single_block)
+        single_block.seek(0)
+        header = read_avro_header(single_block)
+        (count, data), *_ = iter_avro_blocks(single_block, header)
+        _, gaps = AvroRecords(header.schema, header.schema, [], []).decode_block(
+            data, count
+        )
+        source = io.BytesIO()
+        write_avro_header(source, header)
+        write_avro_block(source, header, 2, gaps[0][0] + gaps[1][0])
+        write_avro_block(source, header, 1, gaps[2][0])
+        s3_client_with_files.put_object(
+            Bucket=mock_aws_bucket_name, Key="blocks.avro", Body=source.getvalue()
+        )
 
-        assert bucket == "bucket_name"
-        assert key == "file_key.csv"
+        gdpr_obfuscate_to_s3(
+            f"s3://{mock_aws_bucket_name}/blocks.avro",
+            f"s3://{mock_aws_bucket_name}/blocks_obfuscated.avro",
+            ["customer.name", "salary"],
+            file_type="avro",
+            engine="streaming",
+            masking_strategy={"salary": KeyedHash("secret", length=8)},
+        )
+
+        response = s3_client_with_files.get_object(
+            Bucket=mock_aws_bucket_name, Key="blocks_obfuscated.avro"
+        )
+        result = response["Body"].read()
+        result_file = io.BytesIO(result)
+        result_header = read_avro_header(result_file)
+
+        assert response["ContentType"] == "application/avro"
+        assert [count for count, _ in iter_avro_blocks(result_file, result_header)] == [
+            2,
+            1,
+        ]
+        assert pl.read_avro(io.BytesIO(result)).to_dicts() == [
+            {
+                "id": 1,
+                "customer": {"name": "***", "city": "Leeds"},
+                "salary": KeyedHash("secret", length=8).hash_values(["100"])[0],
+            },
+            {
+                "id": 2,
+                "customer": {"name": "***", "city": "York"},
+                "salary": None,
+            },
+            {
+                "id": 3,
+                "customer": None,
+                "salary": KeyedHash("secret", length=8).hash_values(["300"])[0],
+            },
+        ]
 
+
+@pytest.mark.describe("Test the gdpr_obfuscator function with the streaming engine")
+class TestGDPRObfuscatorStreamingEngine:
     # @pytest.mark.skip
     @pytest.mark.it(
-        "check that a path with a key with multiple nested directories returns the correct key"
+        "check that a csv file obfuscated with the streaming engine returns the same bytes as the eager engine"
     )
-    def test_get_parse_s3_path_with_nested_directories(self):
-        path = "s3://bucket_name/dir1/dir2/dir3/file_key.csv"
-        bucket, key = _parse_s3_path(path)
+    def test_streaming_csv_matches_eager(
+        self,
+        s3_client_with_files,
+        test_files,
+        mock_aws_bucket_name,
+    ):
+        file_to_obfuscate = f"s3://{mock_aws_bucket_name}/{test_files['csv']['complex_pii_data']['key']}"
+        pii_fields = test_files["csv"]["complex_pii_data"]["pii_fields"]
 
-        assert bucket == "bucket_name"
-        assert key == "dir1/dir2/dir3/file_key.csv"
+        eager_result = gdpr_obfuscator(file_to_obfuscate, pii_fields, engine="eager")
+        streaming_result = gdpr_obfuscator(
+            file_to_obfuscate, pii_fields, engine="streaming"
+        )
+
+        assert isinstance(streaming_result, bytes)
+        assert streaming_result == eager_result
 
     # @pytest.mark.skip
     @pytest.mark.it(
-        "check that a key with more than one file extension returns the correct key"
+        "check that a large csv file processed in small chunks returns the expected obfuscated file"
     )
-    def test_key_with_multiple_extensions(self):
-        path = "s3://bucket_name/file_key.csv.gz"
-        bucket, key = _parse_s3_path(path)
+    def test_streaming_csv_small_chunk_size(
+        self,
+        s3_client_with_files,
+        test_files,
+        get_test_file,
+        mock_aws_bucket_name,
+    ):
+        file_to_obfuscate = (
+            f"s3://{mock_aws_bucket_name}/{test_files['csv']['large_pii_data']['key']}"
+        )
+        pii_fields = test_files["csv"]["large_pii_data"]["pii_fields"]
+        expected_bytes = get_test_file(
+            test_files["csv"]["large_pii_data"]["result_local_path"]
+        )
 
-        assert bucket == "bucket_name"
-        assert key == "file_key.csv.gz"
+        result = gdpr_obfuscator(
+            file_to_obfuscate, pii_fields, engine="streaming", chunk_size=500
+        )
+
+        expected_df = pl.read_csv(io.BytesIO(expected_bytes))
+        result_df = pl.read_csv(io.BytesIO(result))
+
+        assert result_df.equals(expected_df)
 
     # @pytest.mark.skip
-    @pytest.mark.it("check that an invalid S3 path raises a FileNotFoundError exeption")
-    def test_invalid_s3_path_exception(self):
-        with pytest.raises(FileNotFoundError) as error:
-            _parse_s3_path("bucket_name/file_key.csv")
+    @pytest.mark.it(
+        "check that json and parquet files obfuscated with the streaming engine return the expected obfuscated files"
+    )
+    def test_streaming_json_and_parquet(
+        self,
+        s3_client_with_files,
+        test_files,
+        get_test_file,
+        mock_aws_bucket_name,
+    ):
+        readers = {"json": pl.read_json, "parquet": pl.read_parquet}
 
-        assert (
-            str(error.value) == 'Invalid S3 path: Missing or malformed "s3://" prefix'
+        for file_type, read in readers.items():
+            test_file = test_files[file_type]["complex_pii_data"]
+            file_to_obfuscate = f"s3://{mock_aws_bucket_name}/{test_file['key']}"
+            expected_bytes = get_test_file(test_file["result_local_path"])
+
+            result = gdpr_obfuscator(
+                file_to_obfuscate,
+                test_file["pii_fields"],
+                file_type=file_type,  # type: ignore
+                engine="streaming",
+            )
+
+            assert read(io.BytesIO(result)).equals(read(io.BytesIO(expected_bytes)))
+
+    # @pytest.mark.skip
+    @pytest.mark.it(
+        "check that a large json array processed in small chunks returns the same bytes as the eager engine"
+    )
+    def test_streaming_json_array_matches_eager(
+        self,
+        s3_client_with_files,
+        test_files,
+        mock_aws_bucket_name,
+    ):
+        test_file = test_files["json"]["large_pii_data"]
+        file_to_obfuscate = f"s3://{mock_aws_bucket_name}/{test_file['key']}"
+
+        eager_result = gdpr_obfuscator(
+            file_to_obfuscate, test_file["pii_fields"], file_type="json"
+        )
+        streaming_result = gdpr_obfuscator(
+            file_to_obfuscate,
+            test_file["pii_fields"],
+            file_type="json",
+            engine="streaming",
+            chunk_size=500,
         )
 
+        assert streaming_result == eager_result
+
     # @pytest.mark.skip
     @pytest.mark.it(
-        "check that an empty path string returns a FileNotFoundError exception"
+        "check that pretty-printed, empty and single object json files are streamed"
     )
-    def test_empty_path_exception(self):
-        with pytest.raises(FileNotFoundError) as error:
-            _parse_s3_path("")
+    def test_streaming_json_documents(self, s3_client_with_files, mock_aws_bucket_name):
+        records = [{"id": i} for i in range(300)] + [{"id": 300, "email": "a@b.com"}]
+        documents = {
+            "pretty.json": json.dumps(records, indent=2),
+            "empty.json": "[]",
+            "object.json": '{"id": 1, "email": "a@b.com"}',
+        }
+        for key, document in documents.items():
+            s3_client_with_files.put_object(
+                Bucket=mock_aws_bucket_name, Key=key, Body=document.encode()
+            )
+
+        results = {
+            key: gdpr_obfuscator(
+                f"s3://{mock_aws_bucket_name}/{key}",
+                ["email"] if key != "empty.json" else [],
+                file_type="json",
+                engine="streaming",
+                chunk_size=100,
+            )
+            for key in documents
+        }
 
-        assert str(error.value) == "Invalid S3 path: Empty path string"
+        assert json.loads(results["pretty.json"])[-2:] == [
+            {"id": 299, "email": "***"},
+            {"id": 300, "email": "***"},
+        ]
+        assert results["empty.json"] == b"[]"
+        assert results["object.json"] == b'[{"id":1,"email":"***"}]'
+
+    # @pytest.mark.skip
+    @pytest.mark.it(
+        "check that an empty csv file raises a ValueError exception with the streaming engine"
+    )
+    def test_streaming_empty_file_exception(
+        self,
+        s3_client_with_files,
+        test_files,
+        mock_aws_bucket_name,
+    ):
+        file_to_obfuscate = f"s3://{mock_aws_bucket_name}/{test_files['csv']['edge_cases_empty_file']['key']}"
+        pii_fields = test_files["csv"]["edge_cases_empty_file"]["pii_fields"]
+
+        with pytest.raises(ValueError, match=r"empty data from bytes"):
+            gdpr_obfuscator(file_to_obfuscate, pii_fields, engine="streaming")
+
+    # @pytest.mark.skip
+    @pytest.mark.it("check that an invalid engine argument raises a ValueError")
+    def test_invalid_engine_raises_value_error(
+        self,
+        s3_client_with_files,
+        test_files,
+        mock_aws_bucket_name,
+    ):
+        file_to_obfuscate = (
+            f"s3://{mock_aws_bucket_name}/{test_files['csv']['simple_pii_data']['key']}"
+        )
+        pii_fields = test_files["csv"]["simple_pii_data"]["pii_fields"]
+
+        with pytest.raises(ValueError, match="Unsupported engine"):
+            gdpr_obfuscator(file_to_obfuscate, pii_fields, engine="invalid")  # type: ignore
+
+
+@pytest.mark.describe("Test the gdpr_obfuscator function without CSV schema inference")
+class TestGDPRObfuscatorCSVRawValues:
+    # @pytest.mark.skip
+    @pytest.mark.it(
+        "check that non-PII fields are passed through byte-for-byte when infer_schema is False"
+    )
+    def test_raw_values_passed_through(
+        self,
+        s3_client_with_files,
+        test_files,
+        get_test_file,
+        mock_aws_bucket_name,
+    ):
+        file_to_obfuscate = f"s3://{mock_aws_bucket_name}/{test_files['csv']['edge_cases_raw_values']['key']}"
+        pii_fields = test_files["csv"]["edge_cases_raw_values"]["pii_fields"]
+        expected = get_test_file(
+            test_files["csv"]["edge_cases_raw_values"]["result_local_path"]
+        )
+
+        eager_result = gdpr_obfuscator(
+            file_to_obfuscate, pii_fields, infer_schema=False
+        )
+        streaming_result = gdpr_obfuscator(
+            file_to_obfuscate, pii_fields, engine="streaming", infer_schema=False
+        )
+
+        assert eager_result == expected
+        assert streaming_result == expected
+
+    # @pytest.mark.skip
+    @pytest.mark.it(
+        "check that inferred column types are re-serialized when infer_schema is True"
+    )
+    def test_inferred_values_are_rewritten(
+        self,
+        s3_client_with_files,
+        test_files,
+        get_test_file,
+        mock_aws_bucket_name,
+    ):
+        file_to_obfuscate = f"s3://{mock_aws_bucket_name}/{test_files['csv']['edge_cases_raw_values']['key']}"
+        pii_fields = test_files["csv"]["edge_cases_raw_values"]["pii_fields"]
+        expected = get_test_file(
+            test_files["csv"]["edge_cases_raw_values"]["result_local_path"]
+        )
+
+        result = gdpr_obfuscator(file_to_obfuscate, pii_fields)
+
+        assert result != expected
+
+
+@pytest.mark.describe("Test the gdpr_obfuscator function with masking strategies")
+class TestGDPRObfuscatorMaskingStrategies:
+    # @pytest.mark.skip
+    @pytest.mark.it(
+        "check that KeyedHash replaces PII values with their keyed hash for every file type and engine"
+    )
+    @pytest.mark.parametrize("file_type", ["csv", "json", "parquet"])
+    @pytest.mark.parametrize("engine", ["eager", "streaming"])
+    def test_keyed_hash_masking(
+        self,
+        s3_client_with_files,
+        test_files,
+        mock_aws_bucket_name,
+        file_type,
+        engine,
+    ):
+        test_file = test_files[file_type]["complex_pii_data"]
+        strategy = KeyedHash("secret")
+        read = {"csv": pl.read_csv, "json": pl.read_json, "parquet": pl.read_parquet}
+        original = read[file_type](test_file["local_path"])
+
+        result = gdpr_obfuscator(
+            f"s3://{mock_aws_bucket_name}/{test_file['key']}",
+            test_file["pii_fields"],
+            file_type=file_type,
+            engine=engine,
+            masking_strategy=strategy,
+        )
+
+        expected = original.with_columns(
+            [strategy.mask(col).alias(col) for col in test_file["pii_fields"]]
+        )
+        assert read[file_type](result).equals(expected)
+
+    # @pytest.mark.skip
+    @pytest.mark.it(
+        "check that fields without a strategy are replaced with the masking string"
+    )
+    def test_per_field_masking_strategy(
+        self, s3_client_with_files, test_files, mock_aws_bucket_name
+    ):
+        test_file = test_files["parquet"]["complex_pii_data"]
+        strategy = KeyedHash("secret", length=12)
+
+        result = pl.read_parquet(
+            gdpr_obfuscator(
+                f"s3://{mock_aws_bucket_name}/{test_file['key']}",
+                test_file["pii_fields"],
+                masking_string="###",
+                file_type="parquet",
+                masking_strategy={"email_address": strategy},
+            )
+        )
+
+        original = pl.read_parquet(test_file["local_path"])
+        assert result["email_address"].to_list() == strategy.hash_values(
+            original["email_address"].to_list()
+        )
+        assert result["name"].unique().to_list() == ["###"]
+        assert result["id"].equals(original["id"])
+
+
+@pytest.mark.describe("Test the gdpr_obfuscator function with nested fields")
+@mock_aws
+class TestGDPRObfuscatorNestedFields:
+    # @pytest.mark.skip
+    @pytest.mark.it(
+        "check that struct and list fields are masked in place for every engine"
+    )
+    @pytest.mark.parametrize("file_type", ["json", "parquet"])
+    @pytest.mark.parametrize("engine", ["eager", "streaming"])
+    def test_nested_fields(
+        self, s3_client_with_files, mock_aws_bucket_name, file_type, engine
+    ):
+        df = pl.DataFrame(
+            {
+                "id": [1, 2],
+                "customer": [
+                    {"name": "Jane Doe", "address": {"street": "1 High St"}},
+                    None,
+                ],
+                "contacts": [[{"phone": "07700 900123", "type": "mobile"}], []],
+            }
+        )
+        source = io.BytesIO()
+        if file_type == "json":
+            df.write_json(source)
+        else:
+            df.write_parquet(source)
+        s3_client_with_files.put_object(
+            Bucket=mock_aws_bucket_name, Key="events", Body=source.getvalue()
+        )
+
+        result = gdpr_obfuscator(
+            f"s3://{mock_aws_bucket_name}/events",
+            ["customer.address.street", "contacts[].phone"],
+            file_type=file_type,
+            engine=engine,
+            masking_strategy={"contacts[].phone": PartialMask(keep_last=3)},
+        )
+
+        read = pl.read_json if file_type == "json" else pl.read_parquet
+        assert read(result).to_dicts() == [
+            {
+                "id": 1,
+                "customer": {"name": "Jane Doe", "address": {"street": "***"}},
+                "contacts": [{"phone": "*********123", "type": "mobile"}],
+            },
+            {"id": 2, "customer": None, "contacts": []},
+        ]
+
+    # @pytest.mark.skip
+    @pytest.mark.it("check that it raises KeyError for nested fields not in the file")
+    def test_missing_nested_fields(
+        self, s3_client_with_files, test_files, mock_aws_bucket_name
+    ):
+        test_file = test_files["json"]["complex_pii_data"]
+
+        with pytest.raises(KeyError) as err:
+            gdpr_obfuscator(
+                f"s3://{mock_aws_bucket_name}/{test_file['key']}",
+                ["name", "name.first"],
+                file_type="json",
+            )
+
+        assert str(err.value) == "\"PII fields not found: ['name.first']\""
+
+
+@pytest.mark.describe("Test the gdpr_obfuscator function with the auto engine")
+class TestGDPRObfuscatorAutoEngine:
+    # @pytest.mark.skip
+    @pytest.mark.it(
+        "check that S3 files are processed in memory or spilled to disk depending on the memory budget"
+    )
+    @pytest.mark.parametrize(
+        "memory_budget, expected_message",
+        [
+            (1024 * 1024 * 1024, "in memory with the eager engine"),
+            (
+                1,
+                "batch by batch, from a temporary file on local disk with the streaming engine",
+            ),
+        ],
+        ids=["in_memory", "spill_to_disk"],
+    )
+    def test_auto_engine_s3(
+        self,
+        s3_client_with_files,
+        test_files,
+        get_test_file,
+        mock_aws_bucket_name,
+        caplog,
+        memory_budget,
+        expected_message,
+    ):
+        test_file = test_files["csv"]["complex_pii_data"]
+        file_to_obfuscate = f"s3://{mock_aws_bucket_name}/{test_file['key']}"
+
+        with caplog.at_level(logging.INFO):
+            result = gdpr_obfuscator(
+                file_to_obfuscate,
+                test_file["pii_fields"],
+                engine="auto",
+                memory_budget=memory_budget,
+            )
+
+        assert result == get_test_file(test_file["result_local_path"])
+        assert any(
+            message.startswith(f"Processing {file_to_obfuscate} {expected_message}")
+            for message in caplog.messages
+        )
+
+    # @pytest.mark.skip
+    @pytest.mark.it(
+        "check that local files that don't fit in the memory budget are streamed in place"
+    )
+    def test_auto_engine_local(self, test_files, caplog):
+        test_file = test_files["parquet"]["complex_pii_data"]
+
+        with caplog.at_level(logging.INFO):
+            result = gdpr_obfuscator(
+                Path(test_file["local_path"]),
+                test_file["pii_fields"],
+                file_type="parquet",
+                engine="auto",
+                memory_budget=1,
+            )
+
+        assert pl.read_parquet(io.BytesIO(result)).equals(
+            pl.read_parquet(test_file["result_local_path"])
+        )
+        assert any(
+            "batch by batch, in place with the streaming engine" in message
+            for message in caplog.messages
+        )
+
+    # @pytest.mark.skip
+    @pytest.mark.it("check that missing S3 files raise a FileNotFoundError")
+    def test_auto_engine_missing_file(self, s3_client_with_files, mock_aws_bucket_name):
+        with pytest.raises(FileNotFoundError) as error:
+            gdpr_obfuscator(
+                f"s3://{mock_aws_bucket_name}/missing.csv", ["name"], engine="auto"
+            )
+
+        assert str(error.value) == "The specified key does not exist."
+
+
+@pytest.mark.describe(
+    "Test the gdpr_obfuscator function with local and in-memory sources"
+)
+class TestGDPRObfuscatorLocalSources:
+    # @pytest.mark.skip
+    @pytest.mark.it(
+        "check that local paths, bytes and file objects are obfuscated with every engine"
+    )
+    @pytest.mark.parametrize("source_kind", ["pathlib", "bytes", "file_object"])
+    @pytest.mark.parametrize("engine", ["eager", "streaming"])
+    def test_local_sources(self, test_files, get_test_file, source_kind, engine):
+        test_file = test_files["csv"]["complex_pii_data"]
+        path = test_file["local_path"]
+        source = {
+            "pathlib": Path(path),
+            "bytes": get_test_file(path),
+            "file_object": io.BytesIO(get_test_file(path)),
+        }[source_kind]
+
+        result = gdpr_obfuscator(source, test_file["pii_fields"], engine=engine)
+
+        assert result == get_test_file(test_file["result_local_path"])
+
+    # @pytest.mark.skip
+    @pytest.mark.it(
+        "check that local files are handed to Polars by path rather than read into bytes"
+    )
+    def test_local_files_are_memory_mapped(self, test_files, monkeypatch):
+        test_file = test_files["parquet"]["complex_pii_data"]
+        obfuscate_eager = MagicMock(wraps=gdpr_obfuscator_module._obfuscate_eager)
+        monkeypatch.setattr(gdpr_obfuscator_module, "_obfuscate_eager", obfuscate_eager)
+
+        result = gdpr_obfuscator(
+            Path(test_file["local_path"]), test_file["pii_fields"], file_type="parquet"
+        )
+
+        assert obfuscate_eager.call_args.args[0] == test_file["local_path"]
+        assert pl.read_parquet(io.BytesIO(result)).equals(
+            pl.read_parquet(test_file["result_local_path"])
+        )
+
+    # @pytest.mark.skip
+    @pytest.mark.it(
+        "check that compressed local files are decompressed and compressed again"
+    )
+    @pytest.mark.parametrize("engine", ["eager", "streaming"])
+    def test_compressed_local_file(self, test_files, get_test_file, tmp_path, engine):
+        test_file = test_files["json"]["complex_pii_data"]
+        source = tmp_path / "pii_data.json.gz"
+        source.write_bytes(gzip.compress(get_test_file(test_file["local_path"])))
+
+        result = gdpr_obfuscator(
+            source, test_file["pii_fields"], file_type="json", engine=engine
+        )
+
+        assert pl.read_json(gzip.decompress(result)).equals(
+            pl.read_json(test_file["result_local_path"])
+        )
+
+    # @pytest.mark.skip
+    @pytest.mark.it("check that local files are uploaded to S3 once obfuscated")
+    def test_local_file_to_s3(
+        self, s3_client_with_files, test_files, get_test_file, mock_aws_bucket_name
+    ):
+        test_file = test_files["csv"]["complex_pii_data"]
+
+        gdpr_obfuscate_to_s3(
+            Path(test_file["local_path"]),
+            f"s3://{mock_aws_bucket_name}/local_obfuscated.csv",
+            test_file["pii_fields"],
+        )
+
+        response = s3_client_with_files.get_object(
+            Bucket=mock_aws_bucket_name, Key="local_obfuscated.csv"
+        )
+        assert response["Body"].read() == get_test_file(test_file["result_local_path"])
+
+    # @pytest.mark.skip
+    @pytest.mark.it(
+        "check that missing local files raise a FileNotFoundError, and strings are never read from local disk"
+    )
+    def test_missing_local_files(self, tmp_path, test_files):
+        with pytest.raises(FileNotFoundError) as error:
+            gdpr_obfuscator(tmp_path / "missing.csv", ["name"])
+
+        assert str(error.value) == f"Local file not found: {tmp_path / 'missing.csv'}"
+
+        existing = test_files["csv"]["complex_pii_data"]["local_path"]
+        for source in [existing, Path(existing).resolve().as_uri()]:
+            with pytest.raises(FileNotFoundError) as error:
+                gdpr_obfuscator(source, ["name"])
+
+            assert (
+                str(error.value)
+                == 'Invalid S3 path: Missing or malformed "s3://" prefix'
+            )
+
+
+@pytest.mark.describe("Test the gdpr_obfuscate_to_s3 function")
+class TestGDPRObfuscateToS3:
+    # @pytest.mark.skip
+    @pytest.mark.it(
+        "check that it uploads the obfuscated file and returns its S3 address"
+    )
+    def test_gdpr_obfuscate_to_s3_small_file(
+        self,
+        s3_client_with_files,
+        test_files,
+        get_test_file,
+        mock_aws_bucket_name,
+    ):
+        test_file = test_files["csv"]["complex_pii_data"]
+        destination = f"s3://{mock_aws_bucket_name}/{test_file['result_key']}"
+        expected = get_test_file(test_file["result_local_path"])
+
+        result = gdpr_obfuscate_to_s3(
+            f"s3://{mock_aws_bucket_name}/{test_file['key']}",
+            destination,
+            test_file["pii_fields"],
+        )
+
+        response = s3_client_with_files.get_object(
+            Bucket=mock_aws_bucket_name, Key=test_file["result_key"]
+        )
+
+        assert result == destination
+        assert response["Body"].read() == expected
+        assert response["ContentType"] == "text/csv"
+
+    # @pytest.mark.skip
+    @pytest.mark.it(
+        "check that large outputs are streamed to S3 as a multipart upload for every file type and engine"
+    )
+    @pytest.mark.parametrize("file_type", ["csv", "json", "parquet"])
+    @pytest.mark.parametrize("engine", ["eager", "streaming"])
+    def test_gdpr_obfuscate_to_s3_multipart(
+        self,
+        s3_client_with_files,
+        test_files,
+        mock_aws_bucket_name,
+        small_upload_parts,
+        file_type,
+        engine,
+    ):
+        test_file = test_files[file_type]["large_pii_data"]
+        file_to_obfuscate = f"s3://{mock_aws_bucket_name}/{test_file['key']}"
+        kwargs = {"file_type": file_type, "engine": engine}
+        expected = gdpr_obfuscator(file_to_obfuscate, test_file["pii_fields"], **kwargs)
+
+        gdpr_obfuscate_to_s3(
+            file_to_obfuscate,
+            f"s3://{mock_aws_bucket_name}/{test_file['result_key']}",
+            test_file["pii_fields"],
+            part_size=64 * 1024,
+            **kwargs,
+        )
+
+        response = s3_client_with_files.get_object(
+            Bucket=mock_aws_bucket_name, Key=test_file["result_key"]
+        )
+
+        assert response["Body"].read() == expected
+        assert response["ETag"].endswith(f'-{-(-len(expected) // (64 * 1024))}"')
+
+    # @pytest.mark.skip
+    @pytest.mark.it(
+        "check that nothing is left in the destination bucket when obfuscation fails"
+    )
+    def test_gdpr_obfuscate_to_s3_failure(
+        self, s3_client_with_files, test_files, mock_aws_bucket_name
+    ):
+        test_file = test_files["csv"]["complex_pii_data"]
+
+        with pytest.raises(KeyError):
+            gdpr_obfuscate_to_s3(
+                f"s3://{mock_aws_bucket_name}/{test_file['key']}",
+                f"s3://{mock_aws_bucket_name}/{test_file['result_key']}",
+                ["not_a_column"],
+            )
+
+        uploads = s3_client_with_files.list_multipart_uploads(
+            Bucket=mock_aws_bucket_name
+        )
+        keys = [
+            content["Key"]
+            for content in s3_client_with_files.list_objects_v2(
+                Bucket=mock_aws_bucket_name
+            )["Contents"]
+        ]
+
+        assert "Uploads" not in uploads
+        assert test_file["result_key"] not in keys
+
+    # @pytest.mark.skip
+    @pytest.mark.it(
+        "check that it raises FileNotFoundError if the destination bucket doesn't exist"
+    )
+    def test_gdpr_obfuscate_to_s3_missing_destination_bucket(
+        self, s3_client_with_files, test_files, mock_aws_bucket_name
+    ):
+        test_file = test_files["csv"]["complex_pii_data"]
+
+        with pytest.raises(FileNotFoundError) as err:
+            gdpr_obfuscate_to_s3(
+                f"s3://{mock_aws_bucket_name}/{test_file['key']}",
+                "s3://non-existent-bucket/result.csv",
+                test_file["pii_fields"],
+            )
+
+        assert str(err.value) == "The specified bucket does not exist."
+
+
+@pytest.mark.describe("Test _get_file_from_s3")
+class TestGetFileFromS3:
+    # @pytest.mark.skip
+    @pytest.mark.it("check that it returns the expected bytes object")
+    def test_get_file_from_s3_returns_bytes_object(
+        self,
+        s3_client_with_files,
+        mock_aws_bucket_name,
+        get_test_file,
+        test_files,
+    ):
+        key = test_files["csv"]["complex_pii_data"]["key"]
+        expected = get_test_file(test_files["csv"]["complex_pii_data"]["local_path"])
+
+        result = _get_file_from_s3(mock_aws_bucket_name, key, s3_client_with_files)
+
+        assert isinstance(result, bytes)
+        assert result == expected
+
+    # @pytest.mark.skip
+    @pytest.mark.it(
+        "check that a file larger than part_size is downloaded in concurrent ranged parts"
+    )
+    def test_get_file_from_s3_in_parts(
+        self,
+        s3_client_with_files,
+        mock_aws_bucket_name,
+        get_test_file,
+        test_files,
+    ):
+        key = test_files["csv"]["large_pii_data"]["key"]
+        expected = get_test_file(test_files["csv"]["large_pii_data"]["local_path"])
+        s3_client = MagicMock(wraps=s3_client_with_files)
+        part_size = 64 * 1024
+
+        result = _get_file_from_s3(
+            mock_aws_bucket_name, key, s3_client, part_size=part_size, max_concurrency=4
+        )
+
+        assert isinstance(result, bytes)
+        assert result == expected
+        assert s3_client.get_object.call_count == -(-len(expected) // part_size)
+
+    # @pytest.mark.skip
+    @pytest.mark.it(
+        "check that a file larger than part_size is downloaded to disk in concurrent ranged parts"
+    )
+    def test_download_file_from_s3_in_parts(
+        self,
+        s3_client_with_files,
+        mock_aws_bucket_name,
+        get_test_file,
+        test_files,
+    ):
+        key = test_files["csv"]["large_pii_data"]["key"]
+        expected = get_test_file(test_files["csv"]["large_pii_data"]["local_path"])
+        file = io.BytesIO()
+
+        _download_file_from_s3(
+            mock_aws_bucket_name,
+            key,
+            s3_client_with_files,
+            file,
+            part_size=100_000,
+            max_concurrency=3,
+        )
+
+        assert file.getvalue() == expected
+
+    # @pytest.mark.skip
+    @pytest.mark.it(
+        "check that a file overwritten while it is downloaded in parts fails instead of mixing both versions"
+    )
+    def test_get_file_from_s3_overwritten(
+        self,
+        s3_client_with_files,
+        mock_aws_bucket_name,
+        test_files,
+    ):
+        key = test_files["csv"]["large_pii_data"]["key"]
+        etag = s3_client_with_files.head_object(Bucket=mock_aws_bucket_name, Key=key)[
+            "ETag"
+        ]
+        get_object = s3_client_with_files.get_object
+
+        def get_object_and_overwrite(**kwargs):
+            response = get_object(**kwargs)
+            s3_client_with_files.put_object(
+                Bucket=mock_aws_bucket_name, Key=key, Body=b"overwritten" * 10_000
+            )
+            return response
+
+        s3_client = MagicMock(wraps=s3_client_with_files)
+        s3_client.get_object.side_effect = get_object_and_overwrite
+
+        with pytest.raises(ClientError) as err:
+            _get_file_from_s3(mock_aws_bucket_name, key, s3_client, part_size=64 * 1024)
+
+        assert err.value.response["Error"]["Code"] == "PreconditionFailed"
+        first_call, later_call = s3_client.get_object.call_args_list[:2]
+        assert "IfMatch" not in first_call.kwargs
+        assert later_call.kwargs["IfMatch"] == etag
+
+    # @pytest.mark.skip
+    @pytest.mark.it("check that an empty file returns an empty bytes object")
+    def test_get_file_from_s3_empty_file(
+        self,
+        s3_client_with_files,
+        mock_aws_bucket_name,
+        test_files,
+    ):
+        key = test_files["csv"]["edge_cases_empty_file"]["key"]
+
+        result = _get_file_from_s3(mock_aws_bucket_name, key, s3_client_with_files)
+
+        assert result == b""
+
+    # @pytest.mark.skip
+    @pytest.mark.it("check that an invalid s3 key raises a FileNotFoundError exception")
+    def test_get_file_from_s3_invalid_key(
+        self,
+        s3_client_with_files,
+        mock_aws_bucket_name,
+    ):
+        key = "invalid_key"
+
+        with pytest.raises(
+            FileNotFoundError, match=r"The specified key does not exist."
+        ):
+            _get_file_from_s3(mock_aws_bucket_name, key, s3_client_with_files)
+
+    # @pytest.mark.skip
+    @pytest.mark.it(
+        "check that it raises a FileNotFoundError exception if an invalid bucket name is passed "
+    )
+    def test_get_file_from_s3_invalid_bucket_name(
+        self,
+        s3_client_with_files,
+    ):
+        key = "test-file.csv"
+        bucket_name = "invalid-bucket-name"
+        with pytest.raises(
+            FileNotFoundError, match=r"The specified bucket does not exist."
+        ):
+            _get_file_from_s3(bucket_name, key, s3_client_with_files)
+
+    # @pytest.mark.skip
+    @pytest.mark.it(
+        "check that it raises a Connection Error if there is a problem with the s3 connection"
+    )
+    def test_get_file_from_s3_connection_error(
+        self,
+        mock_aws_bucket_name,
+    ):
+        s3_client = MagicMock()
+        s3_client.get_object.side_effect = ConnectionError(error=Exception())
+        key = "test-file.csv"
+        with pytest.raises(ConnectionError):
+            _get_file_from_s3(mock_aws_bucket_name, key, s3_client)
+
+    # @pytest.mark.skip
+    @pytest.mark.it(
+        "check that an unexpected S3 response status codes raises a RuntimeError"
+    )
+    def test_get_file_from_s3_unexpected_status_code(self, mock_aws_bucket_name):
+        s3_client = MagicMock()
+        s3_client.get_object.return_value = {
+            "ResponseMetadata": {
+                "HTTPStatusCode": 500,
+                "Error": {
+                    "Code": "InternalError",
+                    "Message": "We encountered an internal error. Please try again.",
+                },
+            },
+            "Body": MagicMock(),
+        }
+        key = "test-file.csv"
+
+        with pytest.raises(RuntimeError, match="Unexpected S3 response error"):
+            _get_file_from_s3(mock_aws_bucket_name, key, s3_client)
+
+
+@pytest.mark.describe("Test _download_parquet_columns_from_s3")
+class TestDownloadParquetColumnsFromS3:
+    # @pytest.mark.skip
+    @pytest.mark.it(
+        "check that only the footer and the non-PII column chunks are requested from S3"
+    )
+    def test_skips_pii_column_chunks(
+        self,
+        s3_client_with_files,
+        mock_aws_bucket_name,
+        get_test_file,
+        test_files,
+        monkeypatch,
+    ):
+        monkeypatch.setattr(
+            gdpr_obfuscator_module, "PARQUET_FOOTER_PREFETCH_SIZE", 1024
+        )
+        test_file = test_files["parquet"]["large_pii_data"]
+        pii_fields = test_file["pii_fields"]
+        original = get_test_file(test_file["local_path"])
+        metadata = read_parquet_metadata(original)
+        s3_client = MagicMock(wraps=s3_client_with_files)
+        buffer = io.BytesIO()
+
+        _download_parquet_columns_from_s3(
+            mock_aws_bucket_name,
+            test_file["key"],
+            s3_client,
+            pii_fields,
+            buffer,
+            coalesce_gap=0,
+        )
+
+        requested = []
+        for call in s3_client.get_object.call_args_list:
+            start, end = call.kwargs["Range"].removeprefix("bytes=").split("-")
+            if start:
+                requested.append((int(start), int(end) + 1))
+
+        pii_chunks = [
+            (chunk.start, chunk.start + chunk.length)
+            for row_group in metadata.row_groups
+            for chunk in row_group.columns
+            if chunk.column in pii_fields
+        ]
+        non_pii_columns = [col for col in metadata.columns if col not in pii_fields]
+        result = buffer.getvalue()
+
+        assert len(result) == len(original)
+        assert all(
+            end <= pii_start or start >= pii_end
+            for start, end in requested
+            for pii_start, pii_end in pii_chunks
+        )
+        assert pl.read_parquet(io.BytesIO(result), columns=non_pii_columns).equals(
+            pl.read_parquet(io.BytesIO(original), columns=non_pii_columns)
+        )
+
+    # @pytest.mark.skip
+    @pytest.mark.it(
+        "check that a file smaller than the footer prefetch is downloaded with a single request"
+    )
+    def test_small_file_single_request(
+        self,
+        s3_client_with_files,
+        mock_aws_bucket_name,
+        get_test_file,
+        test_files,
+    ):
+        test_file = test_files["parquet"]["complex_pii_data"]
+        s3_client = MagicMock(wraps=s3_client_with_files)
+        buffer = io.BytesIO()
+
+        _download_parquet_columns_from_s3(
+            mock_aws_bucket_name,
+            test_file["key"],
+            s3_client,
+            test_file["pii_fields"],
+            buffer,
+        )
+
+        assert s3_client.get_object.call_count == 1
+        assert buffer.getvalue() == get_test_file(test_file["local_path"])
+
+    # @pytest.mark.skip
+    @pytest.mark.it("check that an invalid s3 key raises a FileNotFoundError exception")
+    def test_invalid_key(
+        self,
+        s3_client_with_files,
+        mock_aws_bucket_name,
+    ):
+        with pytest.raises(
+            FileNotFoundError, match=r"The specified key does not exist."
+        ):
+            _download_parquet_columns_from_s3(
+                mock_aws_bucket_name,
+                "invalid_key.parquet",
+                s3_client_with_files,
+                [],
+                io.BytesIO(),
+            )
+
+    # @pytest.mark.skip
+    @pytest.mark.it("check that close byte ranges are coalesced into one request")
+    def test_coalesce_ranges(self):
+        ranges = [(300, 400), (0, 100), (110, 200), (1000, 1100)]
+
+        assert _coalesce_ranges(ranges, coalesce_gap=50) == [
+            (0, 200),
+            (300, 400),
+            (1000, 1100),
+        ]
+        assert _coalesce_ranges(ranges, coalesce_gap=0) == sorted(ranges)
+
+
+@pytest.mark.describe("Test the s3_client parameter and get_s3_client")
+class TestS3Client:
+    # @pytest.mark.skip
+    @pytest.mark.it("check that gdpr_obfuscator uses the s3_client it is passed")
+    def test_gdpr_obfuscator_uses_injected_client(
+        self, s3_client_with_files, test_files, get_test_file, mock_aws_bucket_name
+    ):
+        test_file = test_files["csv"]["complex_pii_data"]
+        s3_client = MagicMock(wraps=s3_client_with_files)
+        expected = get_test_file(test_file["result_local_path"])
+
+        result = gdpr_obfuscator(
+            f"s3://{mock_aws_bucket_name}/{test_file['key']}",
+            test_file["pii_fields"],
+            s3_client=s3_client,
+        )
+
+        assert result == expected
+        s3_client.get_object.assert_called()
+
+    # @pytest.mark.skip
+    @pytest.mark.it(
+        "check that get_s3_client reuses the smallest cached client whose pool is large enough"
+    )
+    def test_get_s3_client_is_cached(self, aws_credentials, monkeypatch):
+        monkeypatch.setattr(gdpr_obfuscator_module, "_s3_clients", {})
+        small = get_s3_client(max_pool_connections=7)
+
+        assert get_s3_client(max_pool_connections=7) is small
+        assert get_s3_client(max_pool_connections=5) is small
+        assert get_s3_client() is not small
+        assert get_s3_client() is get_s3_client(max_pool_connections=20)
+        assert get_s3_client(max_pool_connections=100) is not get_s3_client()
+        assert get_s3_client(max_pool_connections=5, tcp_keepalive=False) is not small
+
+    # @pytest.mark.skip
+    @pytest.mark.it(
+        "check that get_s3_client configures the connection pool and keep-alive"
+    )
+    def test_get_s3_client_config(self, aws_credentials, monkeypatch):
+        monkeypatch.setattr(gdpr_obfuscator_module, "_s3_clients", {})
+        s3_client = get_s3_client(max_pool_connections=7)
+
+        assert s3_client.meta.config.max_pool_connections == 7
+        assert s3_client.meta.config.tcp_keepalive is True
+        assert get_s3_client(tcp_keepalive=False).meta.config.tcp_keepalive is False
+
+
+@pytest.mark.describe("Test the get_parse_s3_path function")
+class TestGetParseS3Pathget_parse_s3_path:
+    # @pytest.mark.skip
+    @pytest.mark.it(
+        "check that a valid s3 path returns the correct bucket name and key"
+    )
+    def test_get_parse_s3_path(self):
+        path = "s3://bucket_name/file_key.csv"
+        bucket, key = _parse_s3_path(path)
+
+        assert bucket == "bucket_name"
+        assert key == "file_key.csv"
+
+    # @pytest.mark.skip
+    @pytest.mark.it(
+        "check that a path with a key with multiple nested directories returns the correct key"
+    )
+    def test_get_parse_s3_path_with_nested_directories(self):
+        path = "s3://bucket_name/dir1/dir2/dir3/file_key.csv"
+        bucket, key = _parse_s3_path(path)
+
+        assert bucket == "bucket_name"
+        assert key == "dir1/dir2/dir3/file_key.csv"
+
+    # @pytest.mark.skip
+    @pytest.mark.it(
+        "check that a key with more than one file extension returns the correct key"
+    )
+    def test_key_with_multiple_extensions(self):
+        path = "s3://bucket_name/file_key.csv.gz"
+        bucket, key = _parse_s3_path(path)
+
+        assert bucket == "bucket_name"
+        assert key == "file_key.csv.gz"
+
+    # @pytest.mark.skip
+    @pytest.mark.it("check that an invalid S3 path raises a FileNotFoundError exeption")
+    def test_invalid_s3_path_exception(self):
+        with pytest.raises(FileNotFoundError) as error:
+            _parse_s3_path("bucket_name/file_key.csv")
+
+        assert (
+            str(error.value) == 'Invalid S3 path: Missing or malformed "s3://" prefix'
+        )
+
+    # @pytest.mark.skip
+    @pytest.mark.it(
+        "check that an empty path string returns a FileNotFoundError exception"
+    )
+    def test_empty_path_exception(self):
+        with pytest.raises(FileNotFoundError) as error:
+            _parse_s3_path("")
+
+        assert str(error.value) == "Invalid S3 path: Empty path string"
+
+    # @pytest.mark.skip
+    @pytest.mark.it(
+        "check that format-preserving masks keep part of each value for every engine"
+    )
+    @pytest.mark.parametrize("engine", ["eager", "streaming"])
+    def test_format_preserving_masking(
+        self, s3_client_with_files, test_files, mock_aws_bucket_name, engine
+    ):
+        test_file = test_files["csv"]["complex_pii_data"]
+
+        result = pl.read_csv(
+            gdpr_obfuscator(
+                f"s3://{mock_aws_bucket_name}/{test_file['key']}",
+                test_file["pii_fields"],
+                engine=engine,
+                masking_strategy={
+                    "email_address": RegexMask(r"^[^@]+"),
+                    "phone_number": PartialMask(keep_last=4),
+                },
+            )
+        )
+
+        assert result["email_address"][0] == "***@email.com"
+        assert result["phone_number"][0] == "************0958"
+        assert result["name"][0] == "***"
+
+    # @pytest.mark.skip
+    @pytest.mark.it(
+        "check that tokenised values can be re-identified with the vault for every file type"
+    )
+    @pytest.mark.parametrize("file_type", ["csv", "json", "parquet"])
+    def test_tokenize_masking(
+        self,
+        s3_client_with_files,
+        test_files,
+        mock_aws_bucket_name,
+        tmp_path,
+        file_type,
+    ):
+        test_file = test_files[file_type]["complex_pii_data"]
+        strategy = Tokenize(str(tmp_path / "vault.db"))
+        read = {"csv": pl.read_csv, "json": pl.read_json, "parquet": pl.read_parquet}
+        original = read[file_type](test_file["local_path"])
+
+        result = read[file_type](
+            gdpr_obfuscator(
+                f"s3://{mock_aws_bucket_name}/{test_file['key']}",
+                test_file["pii_fields"],
+                file_type=file_type,
+                engine="streaming",
+                masking_strategy={"email_address": strategy},
+            )
+        )
+
+        assert not result["email_address"].is_in(original["email_address"]).any()
+        assert result.select(strategy.unmask("email_address"))["email_address"].equals(
+            original["email_address"]
+        )
+
+
+@pytest.mark.describe("Test the gdpr_deobfuscator function")
+@mock_aws
+class TestGDPRDeobfuscator:
+    # @pytest.mark.skip
+    @pytest.mark.it(
+        "check that encrypted PII fields are recovered for every file type and engine"
+    )
+    @pytest.mark.parametrize("file_type", ["csv", "json", "parquet"])
+    @pytest.mark.parametrize("engine", ["eager", "streaming"])
+    def test_deobfuscate_encrypted_fields(
+        self,
+        s3_client_with_files,
+        test_files,
+        mock_aws_bucket_name,
+        file_type,
+        engine,
+    ):
+        test_file = test_files[file_type]["complex_pii_data"]
+        fields = ["name", "email_address"]
+        strategy = DeterministicEncryption(DeterministicEncryption.generate_key())
+        read = {"csv": pl.read_csv, "json": pl.read_json, "parquet": pl.read_parquet}
+
+        obfuscated = gdpr_obfuscator(
+            f"s3://{mock_aws_bucket_name}/{test_file['key']}",
+            fields,
+            file_type=file_type,
+            masking_strategy=strategy,
+        )
+        s3_client_with_files.put_object(
+            Bucket=mock_aws_bucket_name, Key="obfuscated", Body=obfuscated
+        )
+
+        result = gdpr_deobfuscator(
+            f"s3://{mock_aws_bucket_name}/obfuscated",
+            fields,
+            strategy,
+            file_type=file_type,
+            engine=engine,
+        )
+
+        original = read[file_type](test_file["local_path"])
+        assert not read[file_type](obfuscated)["name"].is_in(original["name"]).any()
+        assert read[file_type](result).equals(original)
+
+    # @pytest.mark.skip
+    @pytest.mark.it("check that it raises ValueError for irreversible strategies")
+    def test_deobfuscate_irreversible(
+        self, s3_client_with_files, test_files, mock_aws_bucket_name
+    ):
+        test_file = test_files["csv"]["complex_pii_data"]
+
+        with pytest.raises(ValueError) as err:
+            gdpr_deobfuscator(
+                f"s3://{mock_aws_bucket_name}/{test_file['key']}",
+                ["name"],
+                KeyedHash("secret"),
+            )
+
+        assert (
+            str(err.value) == "masking_strategy isn't reversible for fields: ['name']"
+        )
+
+
+@pytest.mark.describe("Test obfuscating compressed files")
+@mock_aws
+class TestGDPRObfuscatorCompression:
+    # @pytest.mark.skip
+    @pytest.mark.it(
+        "check that compressed CSV and JSON files are decompressed and the output compressed the same way"
+    )
+    @pytest.mark.parametrize("file_type", ["csv", "json"])
+    @pytest.mark.parametrize("engine", ["eager", "streaming"])
+    @pytest.mark.parametrize("compression", ["gzip", "bz2"])
+    def test_compressed_input(
+        self,
+        s3_client_with_files,
+        test_files,
+        mock_aws_bucket_name,
+        file_type,
+        engine,
+        compression,
+    ):
+        test_file = test_files[file_type]["complex_pii_data"]
+        suffix, compress = {
+            "gzip": (".gz", gzip.compress),
+            "bz2": (".bz2", bz2.compress),
+        }[compression]
+        with open(test_file["local_path"], "rb") as f:
+            s3_client_with_files.put_object(
+                Bucket=mock_aws_bucket_name,
+                Key=test_file["key"] + suffix,
+                Body=compress(f.read()),
+            )
+
+        result = gdpr_obfuscator(
+            f"s3://{mock_aws_bucket_name}/{test_file['key']}{suffix}",
+            test_file["pii_fields"],
+            file_type=file_type,
+            engine=engine,
+        )
+        uncompressed_result = gdpr_obfuscator(
+            f"s3://{mock_aws_bucket_name}/{test_file['key']}{suffix}",
+            test_file["pii_fields"],
+            file_type=file_type,
+            engine=engine,
+            compression=None,
+        )
+
+        expected = gdpr_obfuscator(
+            f"s3://{mock_aws_bucket_name}/{test_file['key']}",
+            test_file["pii_fields"],
+            file_type=file_type,
+            engine=engine,
+        )
+        assert decompress(result, compression) == expected
+        assert uncompressed_result == expected
+
+    # @pytest.mark.skip
+    @pytest.mark.it(
+        "check that large compressed files are decompressed while downloaded in parts"
+    )
+    @pytest.mark.parametrize("engine", ["eager", "streaming"])
+    def test_compressed_input_in_parts(
+        self, s3_client_with_files, test_files, mock_aws_bucket_name, engine
+    ):
+        test_file = test_files["csv"]["large_pii_data"]
+        with open(test_file["local_path"], "rb") as f:
+            compressed = gzip.compress(f.read())
+        s3_client_with_files.put_object(
+            Bucket=mock_aws_bucket_name, Key="large_pii_data", Body=compressed
+        )
+        get_object = MagicMock(wraps=s3_client_with_files.get_object)
+        s3_client_with_files.get_object = get_object
+
+        result = gdpr_obfuscator(
+            f"s3://{mock_aws_bucket_name}/large_pii_data",
+            test_file["pii_fields"],
+            engine=engine,
+            part_size=64 * 1024,
+            max_concurrency=4,
+            s3_client=s3_client_with_files,
+            compression=None,
+        )
+
+        with open(test_file["result_local_path"], "rb") as f:
+            assert result == f.read()
+        assert get_object.call_count == -(-len(compressed) // (64 * 1024))
+
+    # @pytest.mark.skip
+    @pytest.mark.it(
+        "check that gdpr_obfuscate_to_s3 compresses the output according to the destination suffix"
+    )
+    def test_compressed_output_to_s3(
+        self, s3_client_with_files, test_files, mock_aws_bucket_name
+    ):
+        test_file = test_files["csv"]["simple_pii_data"]
+        source = f"s3://{mock_aws_bucket_name}/{test_file['key']}"
+
+        gdpr_obfuscate_to_s3(
+            source,
+            f"s3://{mock_aws_bucket_name}/obfuscated.csv.gz",
+            test_file["pii_fields"],
+        )
+        gdpr_obfuscate_to_s3(
+            source,
+            f"s3://{mock_aws_bucket_name}/obfuscated.csv",
+            test_file["pii_fields"],
+            compression="bz2",
+        )
+
+        compressed = s3_client_with_files.get_object(
+            Bucket=mock_aws_bucket_name, Key="obfuscated.csv.gz"
+        )
+        chosen = s3_client_with_files.get_object(
+            Bucket=mock_aws_bucket_name, Key="obfuscated.csv"
+        )
+        with open(test_file["result_local_path"], "rb") as f:
+            expected = f.read()
+        assert gzip.decompress(compressed["Body"].read()) == expected
+        assert compressed["ContentType"] == "application/gzip"
+        assert bz2.decompress(chosen["Body"].read()) == expected
+
+    # @pytest.mark.skip
+    @pytest.mark.it("check that it raises ValueError for compressed Parquet output")
+    def test_compressed_parquet_output(
+        self, s3_client_with_files, test_files, mock_aws_bucket_name
+    ):
+        test_file = test_files["parquet"]["complex_pii_data"]
+
+        with pytest.raises(ValueError):
+            gdpr_obfuscator(
+                f"s3://{mock_aws_bucket_name}/{test_file['key']}",
+                test_file["pii_fields"],
+                file_type="parquet",
+                compression="gzip",
+            )
+
+        with pytest.raises(ValueError) as err:
+            gdpr_obfuscator(
+                f"s3://{mock_aws_bucket_name}/{test_file['key']}",
+                test_file["pii_fields"],
+                file_type="parquet",
+                compression="lz4",
+            )
+        assert str(err.value) == "Unsupported compression: lz4"
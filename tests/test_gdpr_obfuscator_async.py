@@ -0,0 +1,396 @@
+import asyncio
+import gzip
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock
+
+import polars as pl
+import pytest
+from botocore.exceptions import ClientError
+
+from src.gdpr_obfuscator.core.gdpr_obfuscator_async import (
+    gdpr_obfuscator_async,
+    gdpr_obfuscator_batch_async,
+)
+
+
+class _FakeStream:
+    """An aiobotocore-like streaming body"""
+
+    def __init__(self, data):
+        self.data = data
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        pass
+
+    async def read(self):
+        return self.data
+
+
+class _FakeAsyncS3Client:
+    """An aiobotocore-like client, running the methods of a boto3 client as coroutines"""
+
+    def __init__(self, s3_client):
+        self.s3_client = s3_client
+        self.calls = []
+
+    def __getattr__(self, operation):
+        method = getattr(self.s3_client, operation)
+
+        async def call(**kwargs):
+            await asyncio.sleep(0)
+            self.calls.append(operation)
+            response = method(**kwargs)
+            if "Body" in response:
+                response["Body"] = _FakeStream(response["Body"].read())
+            return response
+
+        return call
+
+
+class _FailingS3Client:
+    """Wraps a boto3 client, failing one request of an operation and slowing down the others"""
+
+    def __init__(self, s3_client, operation, events):
+        self.s3_client = s3_client
+        self.operation = operation
+        self.events = events
+        self.calls = 0
+
+    def __getattr__(self, operation):
+        method = getattr(self.s3_client, operation)
+        if operation != self.operation:
+            if operation == "abort_multipart_upload":
+                self.events.append(operation)
+            return method
+
+        def call(**kwargs):
+            self.calls += 1
+            if self.calls == 2:
+                raise ClientError(
+                    {"Error": {"Code": "InternalError", "Message": "Failed"}},
+                    operation,
+                )
+            time.sleep(0.2)
+            response = method(**kwargs)
+            self.events.append(operation)
+            return response
+
+        return call
+
+
+@pytest.mark.describe("Test the gdpr_obfuscator_async function")
+class TestGDPRObfuscatorAsync:
+    # @pytest.mark.skip
+    @pytest.mark.it("check that it returns the obfuscated file for every file type")
+    @pytest.mark.parametrize("file_type", ["csv", "json", "parquet"])
+    def test_gdpr_obfuscator_async_file_types(
+        self,
+        s3_client_with_files,
+        test_files,
+        get_test_file,
+        mock_aws_bucket_name,
+        file_type,
+    ):
+        test_file = test_files[file_type]["complex_pii_data"]
+        file_to_obfuscate = f"s3://{mock_aws_bucket_name}/{test_file['key']}"
+
+        result = asyncio.run(
+            gdpr_obfuscator_async(
+                file_to_obfuscate, test_file["pii_fields"], file_type=file_type
+            )
+        )
+
+        if file_type == "parquet":
+            expected = get_test_file(test_file["result_local_path"])
+            assert pl.read_parquet(result).equals(pl.read_parquet(expected))
+        else:
+            assert result == get_test_file(test_file["result_local_path"])
+
+    # @pytest.mark.skip
+    @pytest.mark.it(
+        "check that large files are downloaded in concurrent ranged parts on the given executor"
+    )
+    def test_gdpr_obfuscator_async_in_parts(
+        self, s3_client_with_files, test_files, get_test_file, mock_aws_bucket_name
+    ):
+        test_file = test_files["csv"]["large_pii_data"]
+        s3_client = MagicMock(wraps=s3_client_with_files)
+        executor = ThreadPoolExecutor(max_workers=1)
+        part_size = 64 * 1024
+
+        result = asyncio.run(
+            gdpr_obfuscator_async(
+                f"s3://{mock_aws_bucket_name}/{test_file['key']}",
+                test_file["pii_fields"],
+                part_size=part_size,
+                max_concurrency=4,
+                s3_client=s3_client,
+                executor=executor,
+            )
+        )
+        executor.shutdown()
+
+        file_size = len(get_test_file(test_file["local_path"]))
+        assert result == get_test_file(test_file["result_local_path"])
+        assert s3_client.get_object.call_count == -(-file_size // part_size)
+
+    # @pytest.mark.skip
+    @pytest.mark.it(
+        "check that S3 requests are awaited natively with an aiobotocore-like client"
+    )
+    def test_gdpr_obfuscator_async_native_client(
+        self, s3_client_with_files, test_files, get_test_file, mock_aws_bucket_name
+    ):
+        test_file = test_files["csv"]["large_pii_data"]
+        s3_client = _FakeAsyncS3Client(s3_client_with_files)
+
+        result = asyncio.run(
+            gdpr_obfuscator_async(
+                f"s3://{mock_aws_bucket_name}/{test_file['key']}",
+                test_file["pii_fields"],
+                part_size=64 * 1024,
+                s3_client=s3_client,
+            )
+        )
+
+        assert result == get_test_file(test_file["result_local_path"])
+        assert s3_client.calls.count("get_object") > 1
+
+    # @pytest.mark.skip
+    @pytest.mark.it(
+        "check that a file overwritten while it is downloaded in parts fails instead of mixing both versions"
+    )
+    def test_gdpr_obfuscator_async_overwritten(
+        self, s3_client_with_files, test_files, mock_aws_bucket_name
+    ):
+        test_file = test_files["csv"]["large_pii_data"]
+        s3_client = _FakeAsyncS3Client(s3_client_with_files)
+        get_object = s3_client.get_object
+
+        async def get_object_and_overwrite(**kwargs):
+            response = await get_object(**kwargs)
+            s3_client_with_files.put_object(
+                Bucket=mock_aws_bucket_name,
+                Key=test_file["key"],
+                Body=b"overwritten" * 10_000,
+            )
+            return response
+
+        s3_client.get_object = get_object_and_overwrite
+
+        with pytest.raises(ClientError) as err:
+            asyncio.run(
+                gdpr_obfuscator_async(
+                    f"s3://{mock_aws_bucket_name}/{test_file['key']}",
+                    test_file["pii_fields"],
+                    part_size=64 * 1024,
+                    s3_client=s3_client,
+                )
+            )
+
+        assert err.value.response["Error"]["Code"] == "PreconditionFailed"
+
+    # @pytest.mark.skip
+    @pytest.mark.it(
+        "check that the ranged GET requests still running are finished or cancelled before a failed download returns"
+    )
+    def test_gdpr_obfuscator_async_failed_part(
+        self, s3_client_with_files, test_files, mock_aws_bucket_name
+    ):
+        test_file = test_files["csv"]["large_pii_data"]
+        events = []
+
+        with pytest.raises(ClientError):
+            asyncio.run(
+                gdpr_obfuscator_async(
+                    f"s3://{mock_aws_bucket_name}/{test_file['key']}",
+                    test_file["pii_fields"],
+                    part_size=64 * 1024,
+                    max_concurrency=4,
+                    s3_client=_FailingS3Client(
+                        s3_client_with_files, "get_object", events
+                    ),
+                )
+            )
+        events.append("returned")
+        time.sleep(0.5)
+
+        assert events[-1] == "returned"
+
+    # @pytest.mark.skip
+    @pytest.mark.it("check that it raises the same errors as gdpr_obfuscator")
+    def test_gdpr_obfuscator_async_errors(
+        self, s3_client_with_files, test_files, mock_aws_bucket_name
+    ):
+        test_file = test_files["csv"]
+
+        with pytest.raises(FileNotFoundError) as err:
+            asyncio.run(
+                gdpr_obfuscator_async(
+                    f"s3://{mock_aws_bucket_name}/non_existent_file.csv", ["name"]
+                )
+            )
+        assert str(err.value) == "The specified key does not exist."
+
+        with pytest.raises(ValueError) as err:
+            asyncio.run(
+                gdpr_obfuscator_async(
+                    f"s3://{mock_aws_bucket_name}/{test_file['edge_cases_empty_file']['key']}",
+                    ["name"],
+                )
+            )
+        assert str(err.value) == "empty data from bytes"
+
+        with pytest.raises(KeyError):
+            asyncio.run(
+                gdpr_obfuscator_async(
+                    f"s3://{mock_aws_bucket_name}/{test_file['complex_pii_data']['key']}",
+                    ["not_a_column"],
+                )
+            )
+
+    # @pytest.mark.skip
+    @pytest.mark.it("check that compressed files are decompressed and compressed back")
+    def test_gdpr_obfuscator_async_compressed(
+        self, s3_client_with_files, test_files, get_test_file, mock_aws_bucket_name
+    ):
+        test_file = test_files["csv"]["complex_pii_data"]
+        s3_client_with_files.put_object(
+            Bucket=mock_aws_bucket_name,
+            Key="complex_pii_data.csv.gz",
+            Body=gzip.compress(get_test_file(test_file["local_path"])),
+        )
+
+        result = asyncio.run(
+            gdpr_obfuscator_async(
+                f"s3://{mock_aws_bucket_name}/complex_pii_data.csv.gz",
+                test_file["pii_fields"],
+            )
+        )
+
+        assert gzip.decompress(result) == get_test_file(test_file["result_local_path"])
+
+
+@pytest.mark.describe("Test the gdpr_obfuscator_batch_async function")
+class TestGDPRObfuscatorBatchAsync:
+    # @pytest.mark.skip
+    @pytest.mark.it("check that it returns one result or error per source, in order")
+    def test_gdpr_obfuscator_batch_async_results(
+        self, s3_client_with_files, test_files, get_test_file, mock_aws_bucket_name
+    ):
+        test_file = test_files["csv"]["complex_pii_data"]
+        sources = [
+            f"s3://{mock_aws_bucket_name}/{test_file['key']}",
+            f"s3://{mock_aws_bucket_name}/non_existent_file.csv",
+            f"s3://{mock_aws_bucket_name}/{test_file['key']}",
+        ]
+
+        results = asyncio.run(
+            gdpr_obfuscator_batch_async(sources, test_file["pii_fields"], max_workers=2)
+        )
+
+        expected = get_test_file(test_file["result_local_path"])
+        assert [result.source for result in results] == sources
+        assert results[0].result == expected
+        assert isinstance(results[1].error, FileNotFoundError)
+        assert results[2].result == expected
+
+    # @pytest.mark.skip
+    @pytest.mark.it("check that results are uploaded to destinations in parts")
+    def test_gdpr_obfuscator_batch_async_destinations(
+        self,
+        s3_client_with_files,
+        test_files,
+        get_test_file,
+        mock_aws_bucket_name,
+        small_upload_parts,
+    ):
+        batch = [
+            test_files["csv"]["complex_pii_data"],
+            test_files["csv"]["large_pii_data"],
+        ]
+        destinations = [
+            f"s3://{mock_aws_bucket_name}/{test_file['result_key']}"
+            for test_file in batch
+        ]
+
+        results = asyncio.run(
+            gdpr_obfuscator_batch_async(
+                [
+                    f"s3://{mock_aws_bucket_name}/{test_file['key']}"
+                    for test_file in batch
+                ],
+                batch[0]["pii_fields"],
+                destinations=destinations,
+                part_size=64 * 1024,
+            )
+        )
+
+        assert all(result.ok for result in results)
+        for test_file in batch:
+            response = s3_client_with_files.get_object(
+                Bucket=mock_aws_bucket_name, Key=test_file["result_key"]
+            )
+            assert response["Body"].read() == get_test_file(
+                test_file["result_local_path"]
+            )
+            assert response["ContentType"] == "text/csv"
+
+    # @pytest.mark.skip
+    @pytest.mark.it(
+        "check that a failed upload part is aborted only once the other parts have finished or been cancelled"
+    )
+    def test_gdpr_obfuscator_batch_async_failed_upload_part(
+        self, s3_client_with_files, test_files, mock_aws_bucket_name, small_upload_parts
+    ):
+        test_file = test_files["csv"]["large_pii_data"]
+        events = []
+
+        results = asyncio.run(
+            gdpr_obfuscator_batch_async(
+                [f"s3://{mock_aws_bucket_name}/{test_file['key']}"],
+                test_file["pii_fields"],
+                destinations=[f"s3://{mock_aws_bucket_name}/{test_file['result_key']}"],
+                part_size=64 * 1024,
+                max_concurrency=4,
+                s3_client=_FailingS3Client(s3_client_with_files, "upload_part", events),
+            )
+        )
+        time.sleep(0.5)
+
+        assert isinstance(results[0].error, ClientError)
+        assert events[-1] == "abort_multipart_upload"
+        uploads = s3_client_with_files.list_multipart_uploads(
+            Bucket=mock_aws_bucket_name
+        )
+        assert not uploads.get("Uploads")
+
+    # @pytest.mark.skip
+    @pytest.mark.it(
+        "check that results are compressed according to destination suffixes"
+    )
+    def test_gdpr_obfuscator_batch_async_compressed_destinations(
+        self, s3_client_with_files, test_files, get_test_file, mock_aws_bucket_name
+    ):
+        test_file = test_files["csv"]["complex_pii_data"]
+
+        results = asyncio.run(
+            gdpr_obfuscator_batch_async(
+                [f"s3://{mock_aws_bucket_name}/{test_file['key']}"],
+                test_file["pii_fields"],
+                destinations=[f"s3://{mock_aws_bucket_name}/obfuscated.csv.gz"],
+            )
+        )
+
+        response = s3_client_with_files.get_object(
+            Bucket=mock_aws_bucket_name, Key="obfuscated.csv.gz"
+        )
+        assert results[0].ok
+        assert gzip.decompress(response["Body"].read()) == get_test_file(
+            test_file["result_local_path"]
+        )
+        assert response["ContentType"] == "application/gzip"
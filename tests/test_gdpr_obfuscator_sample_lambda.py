@@ -1,6 +1,16 @@
+import importlib
+import io
+import json
+from unittest.mock import MagicMock
+
+import boto3
 import pytest
 
+import gdpr_obfuscator
+from src.gdpr_obfuscator.core.gdpr_obfuscator import gdpr_obfuscator as obfuscate
+from src.gdpr_obfuscator_sample_lambda import gdpr_obfuscator_sample_lambda
 from src.gdpr_obfuscator_sample_lambda.gdpr_obfuscator_sample_lambda import (
+    invoke_worker,
     lambda_handler,
 )
 
@@ -40,3 +50,398 @@ class TestGDPRObfuscatorLambdaHandler:
         assert result == expected
 
         assert response["statusCode"] == 200
+
+    # @pytest.mark.skip
+    @pytest.mark.it(
+        "check that files that aren't S3 addresses are rejected, in events and in SQS messages"
+    )
+    @pytest.mark.parametrize(
+        "file_to_obfuscate", ["/proc/self/environ", "file:///var/task/handler.py"]
+    )
+    def test_local_files_rejected(
+        self, s3_client_with_files, mock_aws_bucket_name, file_to_obfuscate
+    ):
+        event = {
+            "file_to_obfuscate": file_to_obfuscate,
+            "pii_fields": ["name"],
+            "destination_bucket": mock_aws_bucket_name,
+        }
+
+        response = lambda_handler(event=event, context={})
+        batch_response = lambda_handler(
+            event={
+                "Records": [
+                    {
+                        "messageId": "local",
+                        "eventSource": "aws:sqs",
+                        "body": json.dumps(event),
+                    }
+                ]
+            },
+            context={},
+        )
+
+        assert response["statusCode"] == 500
+        assert response["body"].startswith(
+            "file_to_obfuscate must be an S3 address starting with s3://"
+        )
+        assert batch_response == {"batchItemFailures": [{"itemIdentifier": "local"}]}
+        assert "Contents" not in s3_client_with_files.list_objects_v2(
+            Bucket=mock_aws_bucket_name, Prefix="environ"
+        )
+
+    # @pytest.mark.skip
+    @pytest.mark.it(
+        "check that it warms up during init only when GDPR_OBFUSCATOR_WARM_UP is true"
+    )
+    @pytest.mark.parametrize("warm_up_variable, called", [("true", True), ("", False)])
+    def test_lambda_warm_up(self, monkeypatch, warm_up_variable, called):
+        warm_up = MagicMock()
+        monkeypatch.setattr(gdpr_obfuscator, "warm_up", warm_up)
+        monkeypatch.setenv("GDPR_OBFUSCATOR_WARM_UP", warm_up_variable)
+
+        importlib.reload(gdpr_obfuscator_sample_lambda)
+
+        assert warm_up.called is called
+
+    # @pytest.mark.skip
+    @pytest.mark.it(
+        "check that the warmed up S3 client is the one batches of records use"
+    )
+    def test_lambda_warm_up_pool_size(self, aws_credentials, monkeypatch):
+        monkeypatch.setattr(gdpr_obfuscator.core.gdpr_obfuscator, "_s3_clients", {})
+        monkeypatch.setenv("GDPR_OBFUSCATOR_WARM_UP", "true")
+        monkeypatch.setenv("MAX_WORKERS", "16")
+
+        importlib.reload(gdpr_obfuscator_sample_lambda)
+
+        assert list(gdpr_obfuscator.core.gdpr_obfuscator._s3_clients) == [(128, True)]
+        for workers in [1, 7, 16]:
+            assert gdpr_obfuscator.get_s3_client(
+                max(50, workers * 8)
+            ) is gdpr_obfuscator.get_s3_client(128)
+
+
+@pytest.mark.describe("Test gdpr_obfuscator_sample_lambda lambda_handler with Records")
+class TestGDPRObfuscatorLambdaHandlerRecords:
+    # @pytest.mark.skip
+    @pytest.mark.it(
+        "check that it obfuscates every file of an SQS batch and reports only the failed messages"
+    )
+    def test_sqs_batch(
+        self, s3_client_with_files, test_files, get_test_file, mock_aws_bucket_name
+    ):
+        records = [
+            {
+                "messageId": message_id,
+                "eventSource": "aws:sqs",
+                "body": json.dumps(
+                    {
+                        "file_to_obfuscate": f"s3://{mock_aws_bucket_name}/{key}",
+                        "pii_fields": test_files["csv"]["complex_pii_data"][
+                            "pii_fields"
+                        ],
+                        "destination_bucket": mock_aws_bucket_name,
+                    }
+                ),
+            }
+            for message_id, key in [
+                ("csv", test_files["csv"]["complex_pii_data"]["key"]),
+                ("json", test_files["json"]["complex_pii_data"]["key"]),
+                ("missing", "missing_file.csv"),
+            ]
+        ]
+        records.append(
+            {"messageId": "invalid", "eventSource": "aws:sqs", "body": "not json"}
+        )
+
+        response = lambda_handler(event={"Records": records}, context={})
+
+        assert response == {
+            "batchItemFailures": [
+                {"itemIdentifier": "invalid"},
+                {"itemIdentifier": "missing"},
+            ]
+        }
+        for file_type in ["csv", "json"]:
+            result = s3_client_with_files.get_object(
+                Bucket=mock_aws_bucket_name,
+                Key=test_files[file_type]["complex_pii_data"]["result_key"],
+            )["Body"].read()
+
+            assert result == get_test_file(
+                test_files[file_type]["complex_pii_data"]["result_local_path"]
+            )
+
+    # @pytest.mark.skip
+    @pytest.mark.it(
+        "check that it obfuscates the objects of S3 event notifications with the PII fields and destination bucket of its environment, raising once every file is processed when any fails"
+    )
+    def test_s3_event(
+        self,
+        s3_client_with_files,
+        test_files,
+        get_test_file,
+        mock_aws_bucket_name,
+        monkeypatch,
+    ):
+        monkeypatch.setenv(
+            "PII_FIELDS", ",".join(test_files["csv"]["complex_pii_data"]["pii_fields"])
+        )
+        monkeypatch.setenv("DESTINATION_BUCKET", mock_aws_bucket_name)
+        records = [
+            _s3_record(mock_aws_bucket_name, key)
+            for key in [
+                test_files["csv"]["complex_pii_data"]["key"],
+                test_files["ndjson"]["complex_pii_data"]["key"],
+                "missing+file.csv",
+            ]
+        ]
+
+        with pytest.raises(
+            RuntimeError,
+            match=f"Failed to obfuscate 1 records: s3://{mock_aws_bucket_name}/missing file.csv",
+        ):
+            lambda_handler(event={"Records": records}, context={})
+
+        for file_type in ["csv", "ndjson"]:
+            result = s3_client_with_files.get_object(
+                Bucket=mock_aws_bucket_name,
+                Key=test_files[file_type]["complex_pii_data"]["result_key"],
+            )["Body"].read()
+
+            assert result == get_test_file(
+                test_files[file_type]["complex_pii_data"]["result_local_path"]
+            )
+
+    # @pytest.mark.skip
+    @pytest.mark.it(
+        "check that obfuscated files keep the key prefix of their source, so files with the same name don't overwrite each other"
+    )
+    def test_s3_event_key_prefixes(
+        self,
+        s3_client_with_files,
+        test_files,
+        get_test_file,
+        mock_aws_bucket_name,
+        monkeypatch,
+    ):
+        test_file = test_files["csv"]["complex_pii_data"]
+        monkeypatch.setenv("PII_FIELDS", ",".join(test_file["pii_fields"]))
+        monkeypatch.setenv("DESTINATION_BUCKET", mock_aws_bucket_name)
+        for prefix in ["a", "b/c"]:
+            s3_client_with_files.put_object(
+                Bucket=mock_aws_bucket_name,
+                Key=f"{prefix}/data.csv",
+                Body=get_test_file(test_file["local_path"]),
+            )
+        records = [
+            _s3_record(mock_aws_bucket_name, "a/data.csv"),
+            _s3_record(mock_aws_bucket_name, "b/c/data.csv"),
+        ]
+
+        lambda_handler(event={"Records": records}, context={})
+
+        for prefix in ["a", "b/c"]:
+            result = s3_client_with_files.get_object(
+                Bucket=mock_aws_bucket_name, Key=f"{prefix}/data_obfuscated.csv"
+            )["Body"].read()
+            assert result == get_test_file(test_file["result_local_path"])
+
+    # @pytest.mark.skip
+    @pytest.mark.it(
+        "check that S3 event notifications return nothing when every file is obfuscated"
+    )
+    def test_s3_event_success(
+        self, s3_client_with_files, test_files, mock_aws_bucket_name, monkeypatch
+    ):
+        monkeypatch.setenv(
+            "PII_FIELDS", ",".join(test_files["csv"]["complex_pii_data"]["pii_fields"])
+        )
+        monkeypatch.setenv("DESTINATION_BUCKET", mock_aws_bucket_name)
+        records = [
+            _s3_record(
+                mock_aws_bucket_name, test_files["csv"]["complex_pii_data"]["key"]
+            )
+        ]
+
+        assert lambda_handler(event={"Records": records}, context={}) is None
+
+    # @pytest.mark.skip
+    @pytest.mark.it(
+        "check that records without an SQS message ID or S3 object are processed with the others and then raise"
+    )
+    def test_unidentified_records(
+        self, s3_client_with_files, test_files, get_test_file, mock_aws_bucket_name
+    ):
+        records = [
+            {
+                "messageId": "csv",
+                "eventSource": "aws:sqs",
+                "body": json.dumps(
+                    {
+                        "file_to_obfuscate": f"s3://{mock_aws_bucket_name}/{test_files['csv']['complex_pii_data']['key']}",
+                        "pii_fields": test_files["csv"]["complex_pii_data"][
+                            "pii_fields"
+                        ],
+                        "destination_bucket": mock_aws_bucket_name,
+                    }
+                ),
+            },
+            {"eventSource": "aws:s3"},
+            {"eventSource": "aws:dynamodb"},
+        ]
+
+        with pytest.raises(RuntimeError, match="Failed to obfuscate 2 records"):
+            lambda_handler(event={"Records": records}, context={})
+
+        result = s3_client_with_files.get_object(
+            Bucket=mock_aws_bucket_name,
+            Key=test_files["csv"]["complex_pii_data"]["result_key"],
+        )["Body"].read()
+        assert result == get_test_file(
+            test_files["csv"]["complex_pii_data"]["result_local_path"]
+        )
+
+    # @pytest.mark.skip
+    @pytest.mark.it(
+        "check that it unwraps S3 event notifications sent through SQS and skips test events and obfuscated files"
+    )
+    def test_s3_event_through_sqs(
+        self,
+        s3_client_with_files,
+        test_files,
+        get_test_file,
+        mock_aws_bucket_name,
+        monkeypatch,
+    ):
+        monkeypatch.setenv(
+            "PII_FIELDS", ",".join(test_files["csv"]["complex_pii_data"]["pii_fields"])
+        )
+        monkeypatch.setenv("DESTINATION_BUCKET", mock_aws_bucket_name)
+        batch = MagicMock(wraps=gdpr_obfuscator_sample_lambda.gdpr_obfuscator_batch)
+        monkeypatch.setattr(
+            gdpr_obfuscator_sample_lambda, "gdpr_obfuscator_batch", batch
+        )
+        s3_records = [
+            _s3_record(
+                mock_aws_bucket_name, test_files["csv"]["complex_pii_data"]["key"]
+            ),
+            _s3_record(
+                mock_aws_bucket_name,
+                test_files["csv"]["complex_pii_data"]["result_key"],
+            ),
+        ]
+        records = [
+            {
+                "messageId": "notification",
+                "eventSource": "aws:sqs",
+                "body": json.dumps({"Records": s3_records}),
+            },
+            {
+                "messageId": "test_event",
+                "eventSource": "aws:sqs",
+                "body": json.dumps({"Event": "s3:TestEvent"}),
+            },
+        ]
+
+        response = lambda_handler(event={"Records": records}, context={})
+
+        assert response == {"batchItemFailures": []}
+        assert batch.call_count == 1
+        assert batch.call_args.args[0] == [
+            f"s3://{mock_aws_bucket_name}/{test_files['csv']['complex_pii_data']['key']}"
+        ]
+        result = s3_client_with_files.get_object(
+            Bucket=mock_aws_bucket_name,
+            Key=test_files["csv"]["complex_pii_data"]["result_key"],
+        )["Body"].read()
+
+        assert result == get_test_file(
+            test_files["csv"]["complex_pii_data"]["result_local_path"]
+        )
+
+
+@pytest.mark.describe("Test gdpr_obfuscator_sample_lambda lambda_handler fan-out")
+class TestGDPRObfuscatorLambdaHandlerFanOut:
+    # @pytest.mark.skip
+    @pytest.mark.it(
+        "check that a fan_out event coordinates workers invoked through the same handler"
+    )
+    def test_fan_out(
+        self,
+        s3_client_with_files,
+        small_upload_parts,
+        test_files,
+        get_test_file,
+        mock_aws_bucket_name,
+        monkeypatch,
+    ):
+        test_file = test_files["csv"]["large_pii_data"]
+        invoked = MagicMock(
+            side_effect=lambda task: lambda_handler({"fan_out_task": task}, context={})
+        )
+        factory = MagicMock(return_value=invoked)
+        monkeypatch.setattr(gdpr_obfuscator_sample_lambda, "invoke_worker", factory)
+
+        response = lambda_handler(
+            event={
+                "file_to_obfuscate": f"s3://{mock_aws_bucket_name}/{test_file['key']}",
+                "pii_fields": test_file["pii_fields"],
+                "destination_bucket": mock_aws_bucket_name,
+                "fan_out": True,
+                "range_size": 200_000,
+            },
+            context=MagicMock(invoked_function_arn="arn:aws:lambda:function"),
+        )
+
+        assert response == {
+            "statusCode": 200,
+            "body": f"s3://{mock_aws_bucket_name}/{test_file['result_key']}",
+        }
+        factory.assert_called_once_with("arn:aws:lambda:function")
+        assert invoked.call_count > 1
+        result = s3_client_with_files.get_object(
+            Bucket=mock_aws_bucket_name, Key=test_file["result_key"]
+        )["Body"].read()
+        assert result == obfuscate(
+            get_test_file(test_file["local_path"]),
+            test_file["pii_fields"],
+            infer_schema=False,
+        )
+
+    # @pytest.mark.skip
+    @pytest.mark.it(
+        "check that workers are invoked synchronously and their errors are raised"
+    )
+    def test_invoke_worker(self, aws_credentials, monkeypatch):
+        lambda_client = MagicMock()
+        monkeypatch.setattr(boto3, "client", MagicMock(return_value=lambda_client))
+        invoke = invoke_worker("arn:aws:lambda:function")
+
+        lambda_client.invoke.return_value = {
+            "Payload": io.BytesIO(b'{"part_number": 1, "etag": "tag", "size": 1}')
+        }
+        assert invoke({"part_number": 1}) == {
+            "part_number": 1,
+            "etag": "tag",
+            "size": 1,
+        }
+        assert json.loads(lambda_client.invoke.call_args.kwargs["Payload"]) == {
+            "fan_out_task": {"part_number": 1}
+        }
+
+        lambda_client.invoke.return_value = {
+            "FunctionError": "Unhandled",
+            "Payload": io.BytesIO(b'{"errorMessage": "Task timed out"}'),
+        }
+        with pytest.raises(RuntimeError, match="Task timed out"):
+            invoke({"part_number": 2})
+
+
+def _s3_record(bucket, key):
+    return {
+        "eventSource": "aws:s3",
+        "eventName": "ObjectCreated:Put",
+        "s3": {"bucket": {"name": bucket}, "object": {"key": key}},
+    }
@@ -0,0 +1,115 @@
+import io
+import json
+
+import pytest
+
+from src.gdpr_obfuscator.core.json_array import (
+    is_json_array,
+    iter_json_array,
+    iter_ndjson_batches,
+    json_array_to_ndjson,
+    ndjson_to_json_array,
+)
+
+RECORDS = [
+    {"id": i, "name": f'Jane "Doe"\n{i}', "tags": [1.5, None, {"emoji": "😀"}]}
+    for i in range(200)
+]
+
+
+@pytest.mark.describe("Test the iter_json_array function")
+class TestIterJSONArray:
+    # @pytest.mark.skip
+    @pytest.mark.it(
+        "check that every element is yielded on one line whatever the read size"
+    )
+    @pytest.mark.parametrize("read_size", [1, 7, 4096])
+    @pytest.mark.parametrize("indent", [None, 2])
+    def test_iter_json_array(self, read_size, indent):
+        data = ("﻿" + json.dumps(RECORDS, indent=indent)).encode()
+
+        elements = list(iter_json_array(io.BytesIO(data), read_size))
+
+        assert [json.loads(element) for element in elements] == RECORDS
+        assert not any("\n" in element for element in elements)
+
+    # @pytest.mark.skip
+    @pytest.mark.it("check that empty arrays and scalar elements are read")
+    def test_iter_json_array_scalars(self):
+        assert list(iter_json_array(io.BytesIO(b" [ ] "))) == []
+        assert list(iter_json_array(io.BytesIO(b"[12345678, true,null]"), 3)) == [
+            "12345678",
+            "true",
+            "null",
+        ]
+
+    # @pytest.mark.skip
+    @pytest.mark.it("check that it raises ValueError for invalid JSON arrays")
+    @pytest.mark.parametrize(
+        "data, message",
+        [
+            (b'{"id": 1}', "the file doesn't start with ["),
+            (b'[{"id": 1},', "the file is truncated"),
+            (b'[{"id": 1} {"id": 2}]', "expecting ',' or ']'"),
+            (b'[{"id": 1},]', "Expecting value"),
+            (b'[{"id": 1}] []', "extra data after the array"),
+            (b'[{"id": "1', "Unterminated string starting at"),
+        ],
+    )
+    def test_iter_json_array_invalid(self, data, message):
+        with pytest.raises(ValueError) as err:
+            list(iter_json_array(io.BytesIO(data), 4))
+
+        assert str(err.value) == f"Invalid JSON array: {message}"
+
+
+@pytest.mark.describe("Test converting JSON arrays to and from NDJSON")
+class TestJSONArrayNDJSON:
+    # @pytest.mark.skip
+    @pytest.mark.it("check that JSON array files are copied as NDJSON records")
+    def test_json_array_to_ndjson(self, tmp_path):
+        source = tmp_path / "records.json"
+        source.write_text(json.dumps(RECORDS, indent=2))
+        destination = io.BytesIO()
+
+        num_records = json_array_to_ndjson(str(source), destination)
+
+        lines = destination.getvalue().splitlines()
+        assert num_records == len(lines) == 200
+        assert [json.loads(line) for line in lines] == RECORDS
+        assert is_json_array(str(source))
+
+        source.write_text('  {"id": 1}')
+        assert not is_json_array(str(source))
+
+    # @pytest.mark.skip
+    @pytest.mark.it("check that NDJSON files are read in batches of records")
+    def test_iter_ndjson_batches(self):
+        file = io.BytesIO(b"".join(b'{"id":%d}\n' % i for i in range(5)))
+
+        batches = list(iter_ndjson_batches(file, 2))
+
+        assert batches == [
+            b'{"id":0}\n{"id":1}\n',
+            b'{"id":2}\n{"id":3}\n',
+            b'{"id":4}\n',
+        ]
+
+    # @pytest.mark.skip
+    @pytest.mark.it(
+        "check that NDJSON records written in batches are joined into an array"
+    )
+    def test_ndjson_to_json_array(self):
+        output = io.BytesIO()
+        empty_output = io.BytesIO()
+
+        with ndjson_to_json_array(output) as writer:
+            writer.write(b'{"id":1}\n{"id":2}')
+            writer.write(b"\n")
+            writer.write(b'{"id":3}\n')
+
+        with ndjson_to_json_array(empty_output):
+            pass
+
+        assert output.getvalue() == b'[{"id":1},{"id":2},{"id":3}]'
+        assert empty_output.getvalue() == b"[]"
@@ -0,0 +1,151 @@
+import io
+
+import polars as pl
+import pytest
+
+from src.gdpr_obfuscator.core.parquet import (
+    FILE_METADATA_ROW_GROUPS,
+    parquet_footer_with_row_groups,
+    parse_parquet_tail,
+    read_parquet_metadata,
+    serialize_parquet_footer,
+)
+
+
+@pytest.mark.describe("Test read_parquet_metadata")
+class TestReadParquetMetadata:
+    # @pytest.mark.skip
+    @pytest.mark.it("check that it returns the columns and row count of a parquet file")
+    def test_columns_and_row_count(self, test_files, get_test_file):
+        test_file = test_files["parquet"]["large_pii_data"]
+        source = get_test_file(test_file["local_path"])
+        expected_df = pl.read_parquet(io.BytesIO(source))
+
+        metadata = read_parquet_metadata(source)
+
+        assert metadata.columns == expected_df.columns
+        assert metadata.num_rows == expected_df.height
+        assert sum(rg.num_rows for rg in metadata.row_groups) == expected_df.height
+
+    # @pytest.mark.skip
+    @pytest.mark.it(
+        "check that a local path and in memory bytes return the same metadata"
+    )
+    def test_path_and_bytes(self, test_files, get_test_file):
+        local_path = test_files["parquet"]["complex_pii_data"]["local_path"]
+
+        from_path = read_parquet_metadata(local_path)
+        from_bytes = read_parquet_metadata(get_test_file(local_path))
+
+        assert from_path.row_groups == from_bytes.row_groups
+        assert from_path.footer_start == from_bytes.footer_start
+
+    # @pytest.mark.skip
+    @pytest.mark.it(
+        "check that column chunk ranges point at the column data of every row group"
+    )
+    def test_column_chunk_ranges(self):
+        buffer = io.BytesIO()
+        pl.DataFrame(
+            {
+                "id": list(range(100)),
+                "customer": [{"name": f"n{i}", "age": i} for i in range(100)],
+                "notes": ["x"] * 100,
+            }
+        ).write_parquet(buffer, row_group_size=30)
+        source = buffer.getvalue()
+
+        metadata = read_parquet_metadata(source)
+
+        assert metadata.columns == ["id", "customer", "notes"]
+        assert len(metadata.row_groups) > 1
+        for row_group in metadata.row_groups:
+            assert [chunk.column for chunk in row_group.columns] == [
+                "id",
+                "customer",
+                "customer",
+                "notes",
+            ]
+            for chunk in row_group.columns:
+                assert 4 <= chunk.start < metadata.footer_start
+                assert chunk.start + chunk.length <= metadata.footer_start
+
+    # @pytest.mark.skip
+    @pytest.mark.it(
+        "check that a file without the parquet magic bytes raises a ValueError"
+    )
+    def test_invalid_magic_bytes(self):
+        with pytest.raises(ValueError, match="missing PAR1 magic bytes"):
+            parse_parquet_tail(b"\x00\x00\x00\x00NOPE")
+
+
+@pytest.mark.describe(
+    "Test serialize_parquet_footer and parquet_footer_with_row_groups"
+)
+class TestParquetFooterRewriting:
+    # @pytest.mark.skip
+    @pytest.mark.it("check that a decoded footer is encoded back to the same bytes")
+    def test_serialize_round_trip(self, test_files, get_test_file):
+        for test_file in test_files["parquet"].values():
+            source = get_test_file(test_file["local_path"])
+            metadata = read_parquet_metadata(source)
+
+            assert (
+                serialize_parquet_footer(metadata.raw)
+                == (source[metadata.footer_start :])
+            )
+
+    # @pytest.mark.skip
+    @pytest.mark.it(
+        "check that a footer with some of the row groups reads only those row groups"
+    )
+    def test_footer_with_some_row_groups(self):
+        df = pl.DataFrame(
+            {"id": list(range(100)), "name": [f"n{i}" for i in range(100)]}
+        )
+        buffer = io.BytesIO()
+        df.write_parquet(buffer, row_group_size=20)
+        source = buffer.getvalue()
+        metadata = read_parquet_metadata(source)
+        row_groups = metadata.raw[FILE_METADATA_ROW_GROUPS]
+
+        footer = serialize_parquet_footer(
+            parquet_footer_with_row_groups(
+                metadata.raw, [(row_groups[1], 0), (row_groups[3], 0)]
+            )
+        )
+
+        result = pl.read_parquet(io.BytesIO(source + footer))
+        assert result.equals(pl.concat([df[20:40], df[60:80]]))
+        assert read_parquet_metadata(source + footer).num_rows == 40
+
+    # @pytest.mark.skip
+    @pytest.mark.it(
+        "check that row groups moved by an offset are read from the bodies of joined files"
+    )
+    def test_footer_joining_files(self):
+        frames = [
+            pl.DataFrame({"id": list(range(start, start + 50))}) for start in (0, 50)
+        ]
+        files = []
+        for frame in frames:
+            buffer = io.BytesIO()
+            frame.write_parquet(buffer, row_group_size=20)
+            files.append((buffer.getvalue(), read_parquet_metadata(buffer.getvalue())))
+        first, second = files
+        first_body = first[0][: first[1].footer_start]
+        second_body = second[0][4 : second[1].footer_start]
+
+        footer = serialize_parquet_footer(
+            parquet_footer_with_row_groups(
+                first[1].raw,
+                [(row_group, 0) for row_group in first[1].raw[FILE_METADATA_ROW_GROUPS]]
+                + [
+                    (row_group, len(first_body) - 4)
+                    for row_group in second[1].raw[FILE_METADATA_ROW_GROUPS]
+                ],
+            )
+        )
+
+        result = pl.read_parquet(io.BytesIO(first_body + second_body + footer))
+        assert result.equals(pl.concat(frames))
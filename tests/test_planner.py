@@ -0,0 +1,143 @@
+import errno
+import logging
+
+import pytest
+
+from src.gdpr_obfuscator.core import planner
+from src.gdpr_obfuscator.core.planner import EnginePlan, memory_limit, plan_engine
+
+MiB = 1024 * 1024
+
+
+@pytest.mark.describe("Test the plan_engine function")
+class TestPlanEngine:
+    # @pytest.mark.skip
+    @pytest.mark.it(
+        "check that files whose estimated peak memory fits in the budget are processed in memory"
+    )
+    def test_plan_engine_in_memory(self, caplog):
+        with caplog.at_level(logging.INFO, logger=planner.__name__):
+            plan = plan_engine(
+                "s3://bucket/data.csv", "csv", 10 * MiB, memory_budget=30 * MiB
+            )
+
+        assert plan == EnginePlan(
+            "eager",
+            "in_memory",
+            "its estimated peak memory of 30.0 MiB fits in the memory budget of 30.0 MiB",
+        )
+        assert caplog.messages == [
+            "Processing s3://bucket/data.csv in memory with the eager engine, as its "
+            "estimated peak memory of 30.0 MiB fits in the memory budget of 30.0 MiB"
+        ]
+
+    # @pytest.mark.skip
+    @pytest.mark.it(
+        "check that larger files are streamed in place when local and spilled to disk otherwise"
+    )
+    @pytest.mark.parametrize(
+        "in_place, path", [(True, "streaming"), (False, "spill_to_disk")]
+    )
+    def test_plan_engine_streaming(self, in_place, path):
+        plan = plan_engine(
+            "data.csv", "csv", 11 * MiB, in_place=in_place, memory_budget=32 * MiB
+        )
+
+        assert plan.engine == "streaming"
+        assert plan.path == path
+        assert plan.reason == (
+            "its estimated peak memory of 33.0 MiB exceeds the memory budget of 32.0 MiB"
+        )
+
+    # @pytest.mark.skip
+    @pytest.mark.it(
+        "check that the estimate accounts for the file type and for compression"
+    )
+    def test_plan_engine_estimates(self):
+        budget = 100 * MiB
+
+        assert plan_engine("a.csv", "csv", 30 * MiB, memory_budget=budget).engine == (
+            "eager"
+        )
+        assert plan_engine("a.json", "json", 30 * MiB, memory_budget=budget).engine == (
+            "streaming"
+        )
+        assert (
+            plan_engine(
+                "a.csv.gz", "csv", 10 * MiB, compressed=True, memory_budget=budget
+            ).engine
+            == "streaming"
+        )
+
+    # @pytest.mark.skip
+    @pytest.mark.it("check that files of unknown size are streamed")
+    def test_plan_engine_unknown_size(self):
+        plan = plan_engine("file object", "csv", None, memory_budget=100 * MiB)
+
+        assert plan == EnginePlan("streaming", "spill_to_disk", "its size is unknown")
+
+    # @pytest.mark.skip
+    @pytest.mark.it(
+        "check that a file larger than the free space it would be spilled to raises an OSError"
+    )
+    def test_plan_engine_disk_space(self, monkeypatch):
+        monkeypatch.setattr(
+            planner.shutil,
+            "disk_usage",
+            lambda path: planner.shutil._ntuple_diskusage(100 * MiB, 99 * MiB, MiB),
+        )
+
+        with pytest.raises(OSError) as err:
+            plan_engine("data.csv", "csv", 2 * MiB, memory_budget=MiB)
+
+        assert err.value.errno == errno.ENOSPC
+        assert err.value.strerror.startswith(
+            "data.csv is 2.0 MiB, more than the 1.0 MiB of free space left in"
+        )
+        assert plan_engine("data.csv", "csv", 2 * MiB, in_place=True, memory_budget=MiB)
+
+    # @pytest.mark.skip
+    @pytest.mark.it(
+        "check that a warning is logged when a compressed file may not fit on local disk once decompressed"
+    )
+    def test_plan_engine_disk_space_compressed(self, caplog, monkeypatch):
+        monkeypatch.setattr(
+            planner.shutil,
+            "disk_usage",
+            lambda path: planner.shutil._ntuple_diskusage(100 * MiB, 98 * MiB, 2 * MiB),
+        )
+
+        with caplog.at_level(logging.WARNING, logger=planner.__name__):
+            plan = plan_engine(
+                "data.csv.gz", "csv", MiB, compressed=True, memory_budget=MiB
+            )
+
+        assert plan.path == "spill_to_disk"
+        assert caplog.messages[0].startswith(
+            "data.csv.gz may not fit in the 2.0 MiB of free space left in"
+        )
+
+
+@pytest.mark.describe("Test the memory_limit function")
+class TestMemoryLimit:
+    # @pytest.mark.skip
+    @pytest.mark.it("check that the memory size of the Lambda function is used first")
+    def test_memory_limit_lambda(self, monkeypatch):
+        monkeypatch.setenv("AWS_LAMBDA_FUNCTION_MEMORY_SIZE", "512")
+
+        assert memory_limit() == 512 * MiB
+
+    # @pytest.mark.skip
+    @pytest.mark.it(
+        "check that the cgroup limit and then the physical memory are used outside Lambda"
+    )
+    def test_memory_limit_outside_lambda(self, monkeypatch, tmp_path):
+        cgroup_limit = tmp_path / "memory.max"
+        monkeypatch.delenv("AWS_LAMBDA_FUNCTION_MEMORY_SIZE", raising=False)
+        monkeypatch.setattr(planner, "_CGROUP_MEMORY_LIMIT_PATH", str(cgroup_limit))
+
+        cgroup_limit.write_text("1073741824\n")
+        assert memory_limit() == 1024 * MiB
+
+        cgroup_limit.write_text("max\n")
+        assert memory_limit() > 0
@@ -0,0 +1,103 @@
+from unittest.mock import MagicMock
+
+import pytest
+
+from src.gdpr_obfuscator.core.s3_multipart_writer import S3MultipartWriter
+
+
+@pytest.mark.describe("Test S3MultipartWriter")
+class TestS3MultipartWriter:
+    # @pytest.mark.skip
+    @pytest.mark.it("check that small outputs are uploaded with a single put_object")
+    def test_s3_multipart_writer_small_output(
+        self, s3_client_with_empty_test_bucket, mock_aws_bucket_name
+    ):
+        s3_client = MagicMock(wraps=s3_client_with_empty_test_bucket)
+
+        with S3MultipartWriter(
+            mock_aws_bucket_name,
+            "result.csv",
+            s3_client,
+            part_size=1024,
+            max_concurrency=2,
+            content_type="text/csv",
+        ) as writer:
+            writer.write(b"name,email\n")
+            writer.write(b"***,***\n")
+
+        response = s3_client_with_empty_test_bucket.get_object(
+            Bucket=mock_aws_bucket_name, Key="result.csv"
+        )
+
+        assert response["Body"].read() == b"name,email\n***,***\n"
+        assert response["ContentType"] == "text/csv"
+        s3_client.create_multipart_upload.assert_not_called()
+
+    # @pytest.mark.skip
+    @pytest.mark.it("check that large outputs are uploaded in parts of part_size")
+    def test_s3_multipart_writer_uploads_parts(
+        self, s3_client_with_empty_test_bucket, mock_aws_bucket_name, small_upload_parts
+    ):
+        s3_client = MagicMock(wraps=s3_client_with_empty_test_bucket)
+        data = bytes(range(256)) * 40
+
+        with S3MultipartWriter(
+            mock_aws_bucket_name,
+            "result.bin",
+            s3_client,
+            part_size=1024,
+            max_concurrency=2,
+        ) as writer:
+            for start in range(0, len(data), 100):
+                writer.write(data[start : start + 100])
+
+        result = s3_client_with_empty_test_bucket.get_object(
+            Bucket=mock_aws_bucket_name, Key="result.bin"
+        )["Body"].read()
+
+        assert result == data
+        assert s3_client.upload_part.call_count == 10
+        s3_client.put_object.assert_not_called()
+
+    # @pytest.mark.skip
+    @pytest.mark.it("check that the upload is aborted when an exception is raised")
+    def test_s3_multipart_writer_aborts_on_exception(
+        self, s3_client_with_empty_test_bucket, mock_aws_bucket_name, small_upload_parts
+    ):
+        with pytest.raises(KeyError):
+            with S3MultipartWriter(
+                mock_aws_bucket_name,
+                "result.bin",
+                s3_client_with_empty_test_bucket,
+                part_size=1024,
+                max_concurrency=2,
+            ) as writer:
+                writer.write(b"x" * 4096)
+                raise KeyError("failed while writing")
+
+        uploads = s3_client_with_empty_test_bucket.list_multipart_uploads(
+            Bucket=mock_aws_bucket_name
+        )
+        objects = s3_client_with_empty_test_bucket.list_objects_v2(
+            Bucket=mock_aws_bucket_name
+        )
+
+        assert "Uploads" not in uploads
+        assert "Contents" not in objects
+
+    # @pytest.mark.skip
+    @pytest.mark.it(
+        "check that it raises FileNotFoundError if the destination bucket doesn't exist"
+    )
+    def test_s3_multipart_writer_missing_bucket(self, s3_client):
+        with pytest.raises(FileNotFoundError) as err:
+            with S3MultipartWriter(
+                "non-existent-bucket",
+                "result.csv",
+                s3_client,
+                part_size=1024,
+                max_concurrency=2,
+            ) as writer:
+                writer.write(b"name,email\n")
+
+        assert str(err.value) == "The specified bucket does not exist."
@@ -0,0 +1,72 @@
+import pickle
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from src.gdpr_obfuscator.core.token_vault import TOKEN_PREFIX, SQLiteTokenVault
+
+
+@pytest.mark.describe("Test the SQLiteTokenVault class")
+class TestSQLiteTokenVault:
+    # @pytest.mark.skip
+    @pytest.mark.it("check that every value gets a random token, reused on later calls")
+    def test_get_or_create_tokens(self, tmp_path):
+        vault = SQLiteTokenVault(str(tmp_path / "vault.db"))
+
+        first = vault.get_or_create_tokens(["jane@example.com", "john@example.com"])
+        second = vault.get_or_create_tokens(["bob@example.com", "jane@example.com"])
+
+        assert all(token.startswith(TOKEN_PREFIX) for token in first + second)
+        assert len(set(first + second)) == 3
+        assert second[1] == first[0]
+        assert vault.get_or_create_tokens([]) == []
+
+    # @pytest.mark.skip
+    @pytest.mark.it("check that tokens are mapped back to their original values")
+    def test_detokenize(self, tmp_path):
+        vault = SQLiteTokenVault(str(tmp_path / "vault.db"))
+        tokens = vault.get_or_create_tokens(["Leeds", "York"])
+
+        assert vault.detokenize([tokens[1], "tok_unknown", tokens[0]]) == [
+            "York",
+            None,
+            "Leeds",
+        ]
+
+    # @pytest.mark.skip
+    @pytest.mark.it("check that tokens are persisted in the database file")
+    def test_persisted_tokens(self, tmp_path):
+        path = str(tmp_path / "vault.db")
+        vault = SQLiteTokenVault(path)
+        token = vault.get_or_create_tokens(["Leeds"])[0]
+        vault.close()
+
+        with sqlite3.connect(path) as connection:
+            rows = connection.execute("SELECT value, token FROM tokens").fetchall()
+
+        assert rows == [("Leeds", token)]
+        assert SQLiteTokenVault(path).get_or_create_tokens(["Leeds"]) == [token]
+
+    # @pytest.mark.skip
+    @pytest.mark.it("check that a vault can be pickled and shared with other processes")
+    def test_pickle(self, tmp_path):
+        vault = SQLiteTokenVault(str(tmp_path / "vault.db"))
+        token = vault.get_or_create_tokens(["Leeds"])[0]
+
+        copy = pickle.loads(pickle.dumps(vault))
+
+        assert copy.path == vault.path
+        assert copy.detokenize([token]) == ["Leeds"]
+
+    # @pytest.mark.skip
+    @pytest.mark.it("check that concurrent threads get the same token for a value")
+    def test_concurrent_threads(self, tmp_path):
+        vault = SQLiteTokenVault(str(tmp_path / "vault.db"))
+        batches = [[f"value_{index}" for index in range(100)]] * 8
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(vault.get_or_create_tokens, batches))
+
+        assert all(result == results[0] for result in results)
+        assert len(set(results[0])) == 100
@@ -0,0 +1,76 @@
+import importlib
+import logging
+import subprocess
+import sys
+from unittest.mock import MagicMock
+
+import pytest
+
+import src.gdpr_obfuscator as gdpr_obfuscator_package
+from src.gdpr_obfuscator.core import gdpr_obfuscator as gdpr_obfuscator_module
+from src.gdpr_obfuscator.core import warm_up as warm_up_module
+from src.gdpr_obfuscator.core.warm_up import warm_up
+
+
+@pytest.mark.describe("Test the warm_up function")
+class TestWarmUp:
+    # @pytest.mark.skip
+    @pytest.mark.it(
+        "check that it builds the cached S3 client and obfuscates a sample of every file type"
+    )
+    def test_warm_up(self, aws_credentials, monkeypatch, caplog):
+        monkeypatch.setattr(gdpr_obfuscator_module, "_s3_clients", {})
+        obfuscator = MagicMock(wraps=warm_up_module.gdpr_obfuscator)
+        monkeypatch.setattr(warm_up_module, "gdpr_obfuscator", obfuscator)
+        file_types = ["csv", "json", "ndjson", "parquet", "arrow", "avro"]
+
+        with caplog.at_level(logging.INFO, logger=warm_up_module.__name__):
+            warm_up(file_types, max_pool_connections=7)
+
+        assert list(gdpr_obfuscator_module._s3_clients) == [(7, True)]
+        assert [call.kwargs["file_type"] for call in obfuscator.call_args_list] == (
+            file_types
+        )
+        assert caplog.messages[0].startswith("Warmed up in")
+
+
+@pytest.mark.describe("Test the lazy imports of the gdpr_obfuscator package")
+class TestLazyImports:
+    # @pytest.mark.skip
+    @pytest.mark.it(
+        "check that importing the package doesn't load Polars, boto3 or the type stubs"
+    )
+    def test_import_is_lazy(self):
+        script = (
+            "import sys, src.gdpr_obfuscator; "
+            "print(sorted({'polars', 'boto3', 'types_boto3_s3'} & set(sys.modules)))"
+        )
+
+        result = subprocess.run(
+            [sys.executable, "-c", script], capture_output=True, text=True, check=True
+        )
+
+        assert result.stdout.strip() == "[]"
+
+    # @pytest.mark.skip
+    @pytest.mark.it(
+        "check that every public name is loaded on first access and unknown names raise AttributeError"
+    )
+    def test_public_names(self):
+        package = gdpr_obfuscator_package
+
+        for name in package.__all__:
+            assert getattr(package, name) is getattr(
+                importlib.import_module(
+                    package._LAZY_ATTRIBUTES[name], package.__name__
+                ),
+                name,
+            )
+            assert name in dir(package)
+
+        with pytest.raises(AttributeError) as error:
+            package.missing_name
+
+        assert str(error.value) == (
+            "module 'src.gdpr_obfuscator' has no attribute 'missing_name'"
+        )